@@ -0,0 +1,394 @@
+"""This module contains the class AiModelClient, a long-lived client of the AI model's API
+that keeps its credentials and its HTTP connections around between requests.
+"""
+import asyncio
+import json
+import time
+from threading import Lock
+import requests
+from requests.adapters import HTTPAdapter
+from defines import (
+    AI_MODEL_API_BASE_URL,
+    AI_MODEL_API_KEY_FILE_PATH,
+    AI_MODEL_CONNECTION_POOL_SIZE,
+    AI_MODEL_REQUEST_TIMEOUT,
+    INSTRUCT_GPT_PROMPT_ANSWER_OPENING,
+    INSTRUCT_GPT_PROMPT_HEADER,
+    get_default_model_parameters,
+)
+from errors import (
+    InvalidParameterError,
+    RequestToAiModelFailedError,
+    RequestToAiModelThrottledError,
+    RequestToAiModelTimedOutError,
+    RequestToAiModelUnavailableError,
+)
+
+
+class SampledResponses(list):
+    """The responses to a request, which also carry the usage of tokens that the AI model reported for it, if any."""
+
+    def __init__(self, responses, usage=None, times_to_stop=None):
+        super().__init__(responses)
+
+        # The 'prompt_tokens' and 'completion_tokens' of the request, as reported by the API
+        self.usage = usage
+        # For streamed requests, the seconds until every response was complete enough to stop streaming it
+        self.times_to_stop = times_to_stop
+
+
+def create_chat_completions_body(model_parameters, prompt, parameters):
+    """Creates the body of a request to the chat completions API, which is sent on its own
+    or as a line of a batch job.
+
+    Args:
+        model_parameters (dict): the model, temperature and max tokens of the request
+        prompt (str): the prompt that will be sent to the AI model
+        parameters (dict): the parameters of this request, such as how many samples to generate
+
+    Returns:
+        dict: the body of the request
+    """
+    prompt = INSTRUCT_GPT_PROMPT_HEADER + prompt + INSTRUCT_GPT_PROMPT_ANSWER_OPENING
+
+    return {
+        **model_parameters,
+        "messages": [{"role": "user", "content": prompt}],
+        **parameters,
+    }
+
+
+class AiModelClient:
+    """Sends prompts to an OpenAI-compatible chat completions API through a pooled keep-alive session.
+    A single client can be shared by several threads and asynchronous tasks.
+    """
+
+    def __init__(
+        self,
+        api_key=None,
+        api_key_file_path=AI_MODEL_API_KEY_FILE_PATH,
+        base_url=AI_MODEL_API_BASE_URL,
+        model_parameters=None,
+        timeout=AI_MODEL_REQUEST_TIMEOUT,
+        connection_pool_size=AI_MODEL_CONNECTION_POOL_SIZE,
+    ):
+        """Creates the client. Neither the credentials nor the connections are set up until the first request.
+
+        Args:
+            api_key (str | None, optional): the API key. If None, it will be read from 'api_key_file_path'.
+            api_key_file_path (str, optional): the file that contains the API key.
+            base_url (str, optional): the base URL of the OpenAI-compatible API.
+            model_parameters (dict | None, optional): the model, temperature and max tokens of every request.
+                If None, the parameters set in 'defines' are used.
+            timeout (float, optional): how many seconds a request can take before it fails, unless overridden per request.
+            connection_pool_size (int, optional): how many connections are kept alive for reuse.
+
+        Raises:
+            InvalidParameterError: if 'connection_pool_size' is lower than 1
+        """
+        if connection_pool_size < 1:
+            raise InvalidParameterError(
+                f"The AiModelClient requires 'connection_pool_size' to be at least 1, but it was {connection_pool_size}"
+            )
+
+        self._api_key = api_key
+        self._api_key_file_path = api_key_file_path
+        self._base_url = base_url.rstrip("/")
+
+        if model_parameters is None:
+            model_parameters = get_default_model_parameters()
+
+        self._model_parameters = model_parameters
+        self._timeout = timeout
+        self._connection_pool_size = connection_pool_size
+
+        self._session = None
+
+        self._lock = Lock()
+
+    def get_model_parameters(self):
+        return self._model_parameters
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is not None:
+                return self._session
+
+            if self._api_key is None:
+                with open(self._api_key_file_path, "r", encoding="utf8") as file:
+                    self._api_key = file.read().strip()
+
+            session = requests.Session()
+
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=self._connection_pool_size,
+                pool_block=True,
+            )
+
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            session.headers.update({"Authorization": f"Bearer {self._api_key}"})
+
+            self._session = session
+
+            return self._session
+
+    def request_samples(self, prompt, number_of_samples, timeout=None):
+        """Requests several responses (samples) to the same prompt, in a single request.
+
+        Args:
+            prompt (str): the prompt that will be sent to the AI model
+            number_of_samples (int): how many responses the AI model should generate for the prompt
+            timeout (float | None, optional): how many seconds the request can take. If None, the timeout of the client is used.
+
+        Returns:
+            SampledResponses: the responses generated by the AI model, along with the tokens that the request used
+
+        Raises:
+            RequestToAiModelThrottledError: if the AI model rejected the request because of its rate limits
+            RequestToAiModelTimedOutError: if the request took longer than the timeout
+            RequestToAiModelUnavailableError: if the AI model couldn't be reached or failed on its side
+            RequestToAiModelFailedError: if the request was answered with any other error
+        """
+        response_body = self._post_chat_completions(
+            prompt, {"n": number_of_samples}, timeout
+        ).json()
+
+        return SampledResponses(
+            [choice["message"]["content"] for choice in response_body["choices"]],
+            response_body.get("usage"),
+        )
+
+    def _post_chat_completions(self, prompt, parameters, timeout, stream=False):
+        return self._send_request(
+            "POST",
+            "chat/completions",
+            timeout,
+            json=create_chat_completions_body(
+                self._model_parameters, prompt, parameters
+            ),
+            stream=stream,
+        )
+
+    def _send_request(self, method, path, timeout, **kwargs):
+        if timeout is None:
+            timeout = self._timeout
+
+        try:
+            response = self._get_session().request(
+                method, f"{self._base_url}/{path}", timeout=timeout, **kwargs
+            )
+        except requests.RequestException as exception:
+            self._raise_request_failure(exception, timeout)
+
+        if response.status_code == 200:
+            return response
+
+        # The body of an error is short, even if the request was streamed
+        response_text = response.text
+        response.close()
+
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+
+            raise RequestToAiModelThrottledError(
+                f"The AI model throttled the request: {response_text}",
+                float(retry_after) if retry_after is not None else None,
+            )
+
+        if response.status_code >= 500:
+            raise RequestToAiModelUnavailableError(
+                f"The AI model failed to answer the request with the status {response.status_code}: {response_text}"
+            )
+
+        raise RequestToAiModelFailedError(
+            f"The AI model answered the request with the status {response.status_code}: {response_text}"
+        )
+
+    @staticmethod
+    def _raise_request_failure(exception, timeout):
+        if isinstance(exception, requests.Timeout):
+            raise RequestToAiModelTimedOutError(
+                f"The request to the AI model timed out after {timeout} seconds: {exception}"
+            ) from exception
+
+        if isinstance(exception, requests.ConnectionError):
+            raise RequestToAiModelUnavailableError(
+                f"Couldn't connect to the AI model: {exception}"
+            ) from exception
+
+        raise RequestToAiModelFailedError(
+            f"The request to the AI model failed: {exception}"
+        ) from exception
+
+    def stream_samples_until(
+        self, prompt, number_of_samples, is_complete_function, timeout=None
+    ):
+        """Requests several responses (samples) to the same prompt in a single streamed request, and stops
+        reading each of them as soon as 'is_complete_function' accepts its text so far. The stream is closed
+        once every response is complete, so the AI model stops generating the rest.
+
+        Args:
+            prompt (str): the prompt that will be sent to the AI model
+            number_of_samples (int): how many responses the AI model should generate for the prompt
+            is_complete_function (Callable[[str], bool]): whether the text of a response already has everything needed from it
+            timeout (float | None, optional): how many seconds the request, and every wait for the next part of the stream,
+                can take. If None, the timeout of the client is used.
+
+        Returns:
+            SampledResponses: the responses, cut where they became complete, along with the seconds until each of them did
+
+        Raises:
+            RequestToAiModelThrottledError: if the AI model rejected the request because of its rate limits
+            RequestToAiModelTimedOutError: if the request took longer than the timeout
+            RequestToAiModelUnavailableError: if the AI model couldn't be reached or failed on its side
+            RequestToAiModelFailedError: if the request was answered with any other error
+        """
+        start = time.perf_counter()
+
+        response = self._post_chat_completions(
+            prompt, {"n": number_of_samples, "stream": True}, timeout, stream=True
+        )
+
+        texts = [""] * number_of_samples
+        times_to_stop = [None] * number_of_samples
+
+        try:
+            for line in response.iter_lines():
+                # Server-sent events, one per line, of which only the data matters
+                if not line.startswith(b"data:"):
+                    continue
+
+                data = line[len(b"data:") :].strip()
+
+                if data == b"[DONE]":
+                    break
+
+                for choice in json.loads(data)["choices"]:
+                    i = choice["index"]
+
+                    if times_to_stop[i] is not None:
+                        continue
+
+                    texts[i] += choice.get("delta", {}).get("content") or ""
+
+                    if choice.get("finish_reason") is not None or is_complete_function(
+                        texts[i]
+                    ):
+                        times_to_stop[i] = time.perf_counter() - start
+
+                if all(time_to_stop is not None for time_to_stop in times_to_stop):
+                    break
+        except requests.RequestException as exception:
+            self._raise_request_failure(exception, timeout)
+        finally:
+            # Closing a stream that hasn't finished drops its connection, which cancels the generation
+            response.close()
+
+        return SampledResponses(texts, times_to_stop=times_to_stop)
+
+    def request_response(self, prompt, timeout=None):
+        """Requests a response to a prompt.
+
+        Args:
+            prompt (str): the prompt that will be sent to the AI model
+            timeout (float | None, optional): how many seconds the request can take. If None, the timeout of the client is used.
+
+        Returns:
+            str: the response generated by the AI model
+        """
+        return self.request_samples(prompt, 1, timeout)[0]
+
+    async def arequest_samples(self, prompt, number_of_samples, timeout=None):
+        """Asynchronous counterpart of 'request_samples'. The request is sent from a worker thread,
+        sharing the pooled connections with every other request of this client.
+        """
+        return await asyncio.to_thread(
+            self.request_samples, prompt, number_of_samples, timeout
+        )
+
+    async def astream_samples_until(
+        self, prompt, number_of_samples, is_complete_function, timeout=None
+    ):
+        """Asynchronous counterpart of 'stream_samples_until'."""
+        return await asyncio.to_thread(
+            self.stream_samples_until,
+            prompt,
+            number_of_samples,
+            is_complete_function,
+            timeout,
+        )
+
+    async def arequest_response(self, prompt, timeout=None):
+        """Asynchronous counterpart of 'request_response'."""
+        return (await self.arequest_samples(prompt, 1, timeout))[0]
+
+    def upload_batch_file(self, file_path):
+        """Uploads the JSONL file of a batch job, whose every line is a request to the chat completions API.
+
+        Args:
+            file_path (str): the file to upload
+
+        Returns:
+            str: the id of the uploaded file
+        """
+        with open(file_path, "rb") as file:
+            return self._send_request(
+                "POST",
+                "files",
+                None,
+                data={"purpose": "batch"},
+                files={"file": file},
+            ).json()["id"]
+
+    def create_batch_job(self, input_file_id, completion_window="24h"):
+        """Creates a batch job that answers every request of an uploaded file within the completion window.
+
+        Args:
+            input_file_id (str): the id of the uploaded file
+            completion_window (str, optional): how long the AI model can take to finish the job
+
+        Returns:
+            dict: the batch job, along with its id and status
+        """
+        return self._send_request(
+            "POST",
+            "batches",
+            None,
+            json={
+                "input_file_id": input_file_id,
+                "endpoint": "/v1/chat/completions",
+                "completion_window": completion_window,
+            },
+        ).json()
+
+    def get_batch_job(self, batch_job_id):
+        """Retrieves a batch job, whose status tells whether it has finished.
+
+        Args:
+            batch_job_id (str): the id of the batch job
+
+        Returns:
+            dict: the batch job, along with its status and the ids of its output and error files once it has finished
+        """
+        return self._send_request("GET", f"batches/{batch_job_id}", None).json()
+
+    def download_file(self, file_id):
+        """Downloads the content of a file, such as the output of a batch job.
+
+        Args:
+            file_id (str): the id of the file
+
+        Returns:
+            str: the content of the file
+        """
+        return self._send_request("GET", f"files/{file_id}/content", None).text
+
+    def close(self):
+        """Closes the connections kept alive by this client."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
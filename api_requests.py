@@ -1,9 +1,37 @@
-import openai
-from defines import (
-    AI_MODEL,
-    INSTRUCT_GPT_PROMPT_ANSWER_OPENING,
-    INSTRUCT_GPT_PROMPT_HEADER,
-)
+import asyncio
+from threading import Lock
+from ai_model_client import AiModelClient
+
+_default_ai_model_client = None
+_default_ai_model_client_lock = Lock()
+
+
+def get_default_ai_model_client():
+    """Returns the client shared by the module-level request functions, creating it on first use.
+
+    Returns:
+        AiModelClient: the shared client
+    """
+    global _default_ai_model_client
+
+    with _default_ai_model_client_lock:
+        if _default_ai_model_client is None:
+            _default_ai_model_client = AiModelClient()
+
+        return _default_ai_model_client
+
+
+def request_samples_from_ai_model(prompt, number_of_samples):
+    """Tries to get several responses (samples) to the same prompt from GPT, in a single request
+
+    Args:
+        prompt (str): the prompt that will be sent to GPT
+        number_of_samples (int): how many responses GPT should generate for the prompt
+
+    Returns:
+        list[str]: the responses generated by GPT
+    """
+    return get_default_ai_model_client().request_samples(prompt, number_of_samples)
 
 
 def request_response_from_ai_model(prompt):
@@ -15,17 +43,86 @@ def request_response_from_ai_model(prompt):
     Returns:
         str: either a valid response or None
     """
-    # Read API key from file
-    with open("api_key.txt", "r", encoding="utf8") as file:
-        openai.api_key = file.read().strip()
+    return get_default_ai_model_client().request_response(prompt)
+
+
+def create_request_samples_function(request_response_function):
+    """Adapts a function that requests a single response into one that requests several samples,
+    for request functions (such as fakes or user input) that can't produce several responses at once.
+
+    Args:
+        request_response_function (Callable[[str], str]): the function that requests a single response
+
+    Returns:
+        Callable[[str, int], list[str]]: a function that requests 'number_of_samples' responses to a prompt
+    """
+
+    def request_samples(prompt, number_of_samples):
+        return [request_response_function(prompt) for _ in range(number_of_samples)]
+
+    return request_samples
 
-    prompt = INSTRUCT_GPT_PROMPT_HEADER + prompt + INSTRUCT_GPT_PROMPT_ANSWER_OPENING
 
-    response = openai.ChatCompletion.create(
-        model=AI_MODEL,
-        temperature=1,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=2048,
-    )
+def create_arequest_samples_function(arequest_response_function):
+    """Asynchronous counterpart of 'create_request_samples_function'. The samples are requested concurrently.
+
+    Args:
+        arequest_response_function (Callable[[str], Awaitable[str]]): the coroutine function that requests a single response
+
+    Returns:
+        Callable[[str, int], Awaitable[list[str]]]: a coroutine function that requests 'number_of_samples' responses to a prompt
+    """
+
+    async def arequest_samples(prompt, number_of_samples):
+        return list(
+            await asyncio.gather(
+                *[arequest_response_function(prompt) for _ in range(number_of_samples)]
+            )
+        )
+
+    return arequest_samples
+
+
+def split_arequest_samples_function(arequest_samples_function):
+    """Makes every call to 'arequest_samples_function' request a single sample, so that a request for
+    several samples becomes that many concurrent requests, each one scheduled and limited on its own.
+
+    Args:
+        arequest_samples_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that requests samples
+
+    Returns:
+        Callable[[str, int], Awaitable[list[str]]]: the coroutine function that splits the requests
+    """
+
+    async def arequest_samples(prompt, number_of_samples):
+        return [
+            samples[0]
+            for samples in await asyncio.gather(
+                *[
+                    arequest_samples_function(prompt, 1)
+                    for _ in range(number_of_samples)
+                ]
+            )
+        ]
+
+    return arequest_samples
+
+
+def limit_concurrency_of_arequest_samples_function(
+    arequest_samples_function, semaphore
+):
+    """Makes every call to 'arequest_samples_function' occupy a slot of 'semaphore'.
+
+    Args:
+        arequest_samples_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that requests several samples in one request
+        semaphore (asyncio.Semaphore): limits how many requests to the AI model can be in flight at once
+
+    Returns:
+        Callable[[str, int], Awaitable[list[str]]]: the concurrency-limited coroutine function
+    """
+
+    async def arequest_samples(prompt, number_of_samples):
+        async with semaphore:
+            return await arequest_samples_function(prompt, number_of_samples)
 
-    return response.choices[0]["message"]["content"]
+    return arequest_samples
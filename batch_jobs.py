@@ -0,0 +1,474 @@
+"""This module contains the class BatchJobs, that sends the requests of a run to the AI model as offline batch jobs,
+rather than one by one. The requests that are sent at once, such as all the generation prompts of a layer, and then all
+of its vote prompts, are written as the lines of a single JSONL file, which is submitted through a provider of batch jobs
+and polled until it's finished. Batch jobs take much longer than interactive requests, but cost less, and the provider
+takes care of their throughput.
+"""
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from threading import Lock
+from ai_model_client import SampledResponses, create_chat_completions_body
+from defines import (
+    BATCH_JOB_COLLECTION_SECONDS,
+    BATCH_JOB_COMPLETION_WINDOW,
+    BATCH_JOB_POLL_INTERVAL,
+    BATCH_JOBS_DIRECTORY,
+    get_default_model_parameters,
+)
+from enums.batch_job_status import BatchJobStatus
+from errors import InvalidParameterError, RequestToAiModelFailedError
+
+
+def _read_jsonl(text):
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class LocalBatchJobProvider:
+    """A stand-in for the batch API of an AI model, that keeps the files of its jobs in a local directory,
+    and answers every job once it has been polled a number of times.
+    """
+
+    def __init__(
+        self, directory_path, create_response_function, number_of_polls_to_finish=1
+    ):
+        """Creates the provider.
+
+        Args:
+            directory_path (str): the directory that the input and output files of the jobs are kept in
+            create_response_function (Callable[[str], str]): produces the response to every prompt of a job.
+                If it raises, the request is answered with an error, as a provider does with the requests that fail.
+            number_of_polls_to_finish (int, optional): how many times the status of a job must be polled for it to finish
+
+        Raises:
+            InvalidParameterError: if 'number_of_polls_to_finish' is lower than 1
+        """
+        if number_of_polls_to_finish < 1:
+            raise InvalidParameterError(
+                f"The LocalBatchJobProvider requires 'number_of_polls_to_finish' to be at least 1, but it was {number_of_polls_to_finish}"
+            )
+
+        self._directory_path = directory_path
+        self._create_response_function = create_response_function
+        self._number_of_polls_to_finish = number_of_polls_to_finish
+
+        self._number_of_polls_by_batch_job_id = {}
+
+        self._lock = Lock()
+
+    def _get_input_file_path(self, batch_job_id):
+        return os.path.join(self._directory_path, f"{batch_job_id}_input.jsonl")
+
+    def _get_output_file_path(self, batch_job_id):
+        return os.path.join(self._directory_path, f"{batch_job_id}_output.jsonl")
+
+    def get_batch_job_ids(self):
+        """Returns the ids of the jobs submitted so far, in the order they were submitted."""
+        with self._lock:
+            return list(self._number_of_polls_by_batch_job_id)
+
+    def read_batch_job_requests(self, batch_job_id):
+        """Returns the lines of the input file of a job, one per request."""
+        with open(
+            self._get_input_file_path(batch_job_id), "r", encoding="utf8"
+        ) as file:
+            return _read_jsonl(file.read())
+
+    def submit_batch_job(self, input_file_path):
+        """Copies the input file of a job into the directory of the provider.
+
+        Args:
+            input_file_path (str): the JSONL file whose every line is a request to the chat completions API
+
+        Returns:
+            str: the id of the job
+        """
+        batch_job_id = f"batch_{uuid.uuid4().hex}"
+
+        os.makedirs(self._directory_path, exist_ok=True)
+
+        shutil.copyfile(input_file_path, self._get_input_file_path(batch_job_id))
+
+        with self._lock:
+            self._number_of_polls_by_batch_job_id[batch_job_id] = 0
+
+        return batch_job_id
+
+    def _create_result(self, request):
+        prompt = request["body"]["messages"][-1]["content"]
+
+        try:
+            responses = [
+                self._create_response_function(prompt)
+                for _ in range(request["body"].get("n", 1))
+            ]
+        except Exception as exception:
+            return {
+                "custom_id": request["custom_id"],
+                "response": None,
+                "error": {"message": str(exception)},
+            }
+
+        return {
+            "custom_id": request["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "object": "chat.completion",
+                    "model": request["body"].get("model"),
+                    "choices": [
+                        {
+                            "index": i,
+                            "message": {"role": "assistant", "content": response},
+                            "finish_reason": "stop",
+                        }
+                        for i, response in enumerate(responses)
+                    ],
+                },
+            },
+            "error": None,
+        }
+
+    def get_batch_job_status(self, batch_job_id):
+        """Polls a job, which answers all of its requests and finishes when it has been polled enough times.
+
+        Args:
+            batch_job_id (str): the id of the job
+
+        Returns:
+            BatchJobStatus: the status of the job
+        """
+        with self._lock:
+            self._number_of_polls_by_batch_job_id[batch_job_id] += 1
+
+            if (
+                self._number_of_polls_by_batch_job_id[batch_job_id]
+                < self._number_of_polls_to_finish
+            ):
+                return BatchJobStatus.IN_PROGRESS
+
+        output_file_path = self._get_output_file_path(batch_job_id)
+
+        if not os.path.exists(output_file_path):
+            results = [
+                self._create_result(request)
+                for request in self.read_batch_job_requests(batch_job_id)
+            ]
+
+            with open(output_file_path, "w", encoding="utf8") as file:
+                file.writelines(f"{json.dumps(result)}\n" for result in results)
+
+        return BatchJobStatus.COMPLETED
+
+    def read_batch_job_results(self, batch_job_id):
+        """Reads the results of a finished job.
+
+        Args:
+            batch_job_id (str): the id of the job
+
+        Returns:
+            list[dict]: the results, one per request, in the format of the batch API of OpenAI
+        """
+        with open(
+            self._get_output_file_path(batch_job_id), "r", encoding="utf8"
+        ) as file:
+            return _read_jsonl(file.read())
+
+
+class AiModelBatchJobProvider:
+    """Submits the jobs to the batch API of an OpenAI-compatible AI model, through its client."""
+
+    def __init__(self, ai_model_client, completion_window=BATCH_JOB_COMPLETION_WINDOW):
+        """Creates the provider.
+
+        Args:
+            ai_model_client (AiModelClient): the client of the AI model
+            completion_window (str, optional): how long the AI model can take to finish every job
+        """
+        self._ai_model_client = ai_model_client
+        self._completion_window = completion_window
+
+        # The last state of every job, which has the ids of its output files once it's finished
+        self._batch_jobs_by_id = {}
+
+        self._lock = Lock()
+
+    def submit_batch_job(self, input_file_path):
+        """Uploads the input file of a job, and creates the job.
+
+        Args:
+            input_file_path (str): the JSONL file whose every line is a request to the chat completions API
+
+        Returns:
+            str: the id of the job
+        """
+        batch_job = self._ai_model_client.create_batch_job(
+            self._ai_model_client.upload_batch_file(input_file_path),
+            self._completion_window,
+        )
+
+        with self._lock:
+            self._batch_jobs_by_id[batch_job["id"]] = batch_job
+
+        return batch_job["id"]
+
+    def get_batch_job_status(self, batch_job_id):
+        """Polls a job.
+
+        Args:
+            batch_job_id (str): the id of the job
+
+        Returns:
+            BatchJobStatus: the status of the job
+        """
+        batch_job = self._ai_model_client.get_batch_job(batch_job_id)
+
+        with self._lock:
+            self._batch_jobs_by_id[batch_job_id] = batch_job
+
+        if batch_job["status"] == "completed":
+            return BatchJobStatus.COMPLETED
+
+        if batch_job["status"] in ("failed", "expired", "cancelling", "cancelled"):
+            return BatchJobStatus.FAILED
+
+        return BatchJobStatus.IN_PROGRESS
+
+    def read_batch_job_results(self, batch_job_id):
+        """Downloads the results of a finished job, both of the requests that were answered and of those that failed.
+
+        Args:
+            batch_job_id (str): the id of the job
+
+        Returns:
+            list[dict]: the results, one per request
+        """
+        with self._lock:
+            batch_job = self._batch_jobs_by_id[batch_job_id]
+
+        results = []
+
+        for file_id in (
+            batch_job.get("output_file_id"),
+            batch_job.get("error_file_id"),
+        ):
+            if file_id is not None:
+                results += _read_jsonl(self._ai_model_client.download_file(file_id))
+
+        return results
+
+
+def _convert_result_to_responses(result, batch_job_id, custom_id):
+    if result is None:
+        raise RequestToAiModelFailedError(
+            f"The batch job {batch_job_id} finished without a result for the request {custom_id}."
+        )
+
+    response = result.get("response")
+
+    if result.get("error") is not None or response is None:
+        raise RequestToAiModelFailedError(
+            f"The batch job {batch_job_id} failed to answer the request {custom_id}: {result.get('error')}"
+        )
+
+    if response["status_code"] != 200:
+        raise RequestToAiModelFailedError(
+            f"The batch job {batch_job_id} answered the request {custom_id} with the status {response['status_code']}: {response.get('body')}"
+        )
+
+    return SampledResponses(
+        [choice["message"]["content"] for choice in response["body"]["choices"]],
+        response["body"].get("usage"),
+    )
+
+
+class BatchJobs:
+    """Collects the requests that are sent at once into batch jobs, submits them through a provider, and answers every
+    request with its result once its job has finished. A request that arrives while a job is running waits for the next one.
+    """
+
+    def __init__(
+        self,
+        batch_job_provider,
+        directory_path=BATCH_JOBS_DIRECTORY,
+        model_parameters=None,
+        collection_seconds=BATCH_JOB_COLLECTION_SECONDS,
+        poll_interval=BATCH_JOB_POLL_INTERVAL,
+    ):
+        """Creates the collector of batch jobs.
+
+        Args:
+            batch_job_provider (LocalBatchJobProvider | AiModelBatchJobProvider): submits the jobs and reports their results
+            directory_path (str, optional): the directory that the input files of the jobs are written to
+            model_parameters (dict | None, optional): the model, temperature and max tokens of every request.
+                If None, the ones of the AI model client of the tree of thoughts that sends the requests are used,
+                or the parameters set in 'defines' outside of a tree of thoughts.
+            collection_seconds (float, optional): how long a job waits for more requests after the last one arrived
+                before it's submitted
+            poll_interval (float, optional): how many seconds to wait between polls of the status of a job
+
+        Raises:
+            InvalidParameterError: if 'collection_seconds' or 'poll_interval' are negative
+        """
+        if collection_seconds < 0:
+            raise InvalidParameterError(
+                f"The BatchJobs require 'collection_seconds' to be at least 0, but it was {collection_seconds}"
+            )
+
+        if poll_interval < 0:
+            raise InvalidParameterError(
+                f"The BatchJobs require 'poll_interval' to be at least 0, but it was {poll_interval}"
+            )
+
+        self._batch_job_provider = batch_job_provider
+        self._directory_path = directory_path
+        self._model_parameters = model_parameters
+        self._default_model_parameters = get_default_model_parameters()
+        self._collection_seconds = collection_seconds
+        self._poll_interval = poll_interval
+
+        self._pending_requests = []
+        self._collection_task = None
+
+        self._number_of_batch_jobs = 0
+        self._number_of_requests = 0
+
+    def get_number_of_batch_jobs(self):
+        return self._number_of_batch_jobs
+
+    def get_number_of_requests(self):
+        return self._number_of_requests
+
+    def set_default_model_parameters(self, model_parameters):
+        """Sets the model parameters of the requests if none were given when the batch jobs were created.
+
+        Args:
+            model_parameters (dict): the model, temperature and max tokens of every request
+        """
+        self._default_model_parameters = model_parameters
+
+    def _get_model_parameters(self):
+        if self._model_parameters is None:
+            return self._default_model_parameters
+
+        return self._model_parameters
+
+    async def arequest_samples(self, prompt, number_of_samples):
+        """Adds a request to the next batch job, and waits for its responses.
+
+        Args:
+            prompt (str): the prompt that will be sent to the AI model
+            number_of_samples (int): how many responses the AI model should generate for the prompt
+
+        Returns:
+            SampledResponses: the responses, along with the tokens that the request used
+
+        Raises:
+            RequestToAiModelFailedError: if the job failed, or it didn't answer this request
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        self._pending_requests.append((prompt, number_of_samples, future))
+
+        if self._collection_task is None:
+            self._collection_task = asyncio.create_task(self._run_next_batch_job())
+
+        return await future
+
+    async def _collect_requests(self):
+        # The requests that are sent at once arrive over a few iterations of the event loop, so the job waits
+        # until no more of them arrive
+        number_of_requests = 0
+
+        while number_of_requests != len(self._pending_requests):
+            number_of_requests = len(self._pending_requests)
+
+            await asyncio.sleep(self._collection_seconds)
+
+        requests = self._pending_requests
+
+        self._pending_requests = []
+        self._collection_task = None
+
+        return requests
+
+    def _write_input_file(self, requests):
+        os.makedirs(self._directory_path, exist_ok=True)
+
+        input_file_path = os.path.join(
+            self._directory_path, f"batch_job_{uuid.uuid4().hex}.jsonl"
+        )
+
+        with open(input_file_path, "w", encoding="utf8") as file:
+            for i, (prompt, number_of_samples, _) in enumerate(requests):
+                line = {
+                    "custom_id": f"request-{i}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": create_chat_completions_body(
+                        self._get_model_parameters(),
+                        prompt,
+                        {"n": number_of_samples},
+                    ),
+                }
+
+                file.write(f"{json.dumps(line)}\n")
+
+        return input_file_path
+
+    async def _run_batch_job(self, requests):
+        input_file_path = await asyncio.to_thread(self._write_input_file, requests)
+
+        batch_job_id = await asyncio.to_thread(
+            self._batch_job_provider.submit_batch_job, input_file_path
+        )
+
+        self._number_of_batch_jobs += 1
+        self._number_of_requests += len(requests)
+
+        while (
+            status := await asyncio.to_thread(
+                self._batch_job_provider.get_batch_job_status, batch_job_id
+            )
+        ) == BatchJobStatus.IN_PROGRESS:
+            await asyncio.sleep(self._poll_interval)
+
+        if status == BatchJobStatus.FAILED:
+            raise RequestToAiModelFailedError(
+                f"The batch job {batch_job_id} of {len(requests)} request(s) failed."
+            )
+
+        results = await asyncio.to_thread(
+            self._batch_job_provider.read_batch_job_results, batch_job_id
+        )
+
+        return batch_job_id, {result["custom_id"]: result for result in results}
+
+    async def _run_next_batch_job(self):
+        requests = await self._collect_requests()
+
+        try:
+            batch_job_id, results_by_custom_id = await self._run_batch_job(requests)
+        except Exception as exception:
+            for _, _, future in requests:
+                if not future.done():
+                    future.set_exception(exception)
+
+            return
+
+        for i, (_, _, future) in enumerate(requests):
+            if future.done():
+                continue
+
+            try:
+                future.set_result(
+                    _convert_result_to_responses(
+                        results_by_custom_id.get(f"request-{i}"),
+                        batch_job_id,
+                        f"request-{i}",
+                    )
+                )
+            except Exception as exception:
+                future.set_exception(exception)
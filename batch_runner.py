@@ -0,0 +1,232 @@
+"""This module contains the class BatchRunner, that processes many trees of thoughts at once in a single event loop.
+They share a client, a request scheduler and a cap on the requests in flight, whose slots are handed out
+to the trees in turns, so that a tree with many pending requests doesn't starve the rest.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from defines import DEFAULT_MAX_CONCURRENT_REQUESTS
+from errors import InvalidParameterError
+
+
+class FairConcurrencyLimiter:
+    """Limits how many requests are in flight at once among several owners. When a slot frees up,
+    it goes to the next owner in turn that is waiting for one, rather than to whichever request asked first.
+    It must only be used from a single event loop.
+    """
+
+    def __init__(self, max_concurrent_requests):
+        """Creates the limiter.
+
+        Args:
+            max_concurrent_requests (int): how many requests can be in flight at once, among all the owners
+
+        Raises:
+            InvalidParameterError: if 'max_concurrent_requests' is lower than 1
+        """
+        if max_concurrent_requests < 1:
+            raise InvalidParameterError(
+                f"The FairConcurrencyLimiter requires 'max_concurrent_requests' to be at least 1, but it was {max_concurrent_requests}"
+            )
+
+        self._number_of_free_slots = max_concurrent_requests
+
+        self._waiters_by_owner = {}
+        # The owners with waiting requests, in the order of their turns
+        self._turns = deque()
+
+    async def acquire(self, owner):
+        """Waits for a slot for a request of 'owner'.
+
+        Args:
+            owner (Hashable): who the request belongs to, such as the name of its tree of thoughts
+        """
+        if self._number_of_free_slots > 0 and not self._turns:
+            self._number_of_free_slots -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+
+        waiters = self._waiters_by_owner.setdefault(owner, deque())
+
+        if not waiters:
+            self._turns.append(owner)
+
+        waiters.append(future)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over right before the cancellation, in which case it's passed on
+            if future.done() and not future.cancelled():
+                self.release()
+
+            raise
+
+    def release(self):
+        """Frees a slot, handing it to the owner whose turn it is, if any is waiting."""
+        while self._turns:
+            owner = self._turns.popleft()
+
+            waiters = self._waiters_by_owner[owner]
+            future = waiters.popleft()
+
+            if waiters:
+                self._turns.append(owner)
+            else:
+                del self._waiters_by_owner[owner]
+
+            # The requests that were cancelled while waiting are skipped
+            if not future.done():
+                future.set_result(None)
+                return
+
+        self._number_of_free_slots += 1
+
+    def create_share(self, owner):
+        """Returns the share of the slots of 'owner', which can be used as a semaphore by its tree of thoughts.
+
+        Args:
+            owner (Hashable): who the share belongs to
+
+        Returns:
+            FairShare: the share
+        """
+        return FairShare(self, owner)
+
+
+class FairShare:
+    """The share of an owner of the slots of a FairConcurrencyLimiter. It works as an asynchronous context manager,
+    like an asyncio.Semaphore.
+    """
+
+    def __init__(self, fair_concurrency_limiter, owner):
+        self._fair_concurrency_limiter = fair_concurrency_limiter
+        self._owner = owner
+
+    async def __aenter__(self):
+        await self._fair_concurrency_limiter.acquire(self._owner)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._fair_concurrency_limiter.release()
+
+
+class BatchRunner:
+    """Processes many trees of thoughts concurrently, through a shared client, a shared request scheduler
+    and a shared cap on the requests in flight. Every tree keeps its own output directory, checkpoints and settings.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS,
+        ai_model_client=None,
+        request_scheduler=None,
+    ):
+        """Creates the runner.
+
+        Args:
+            max_concurrent_requests (int, optional): how many requests can be in flight at once, among all the trees
+            ai_model_client (AiModelClient | None, optional): the client whose pooled connections every tree will share.
+                If None, every tree keeps its own request functions.
+            request_scheduler (RequestScheduler | None, optional): the scheduler that keeps all the trees together
+                within the quotas of the AI model. If None, every tree keeps its own scheduler, if any.
+
+        Raises:
+            InvalidParameterError: if 'max_concurrent_requests' is lower than 1
+        """
+        if max_concurrent_requests < 1:
+            raise InvalidParameterError(
+                f"The BatchRunner requires 'max_concurrent_requests' to be at least 1, but it was {max_concurrent_requests}"
+            )
+
+        self._max_concurrent_requests = max_concurrent_requests
+        self._ai_model_client = ai_model_client
+        self._request_scheduler = request_scheduler
+
+        self._trees_of_thoughts = []
+
+    def add_tree_of_thoughts(self, tree_of_thoughts):
+        """Adds a tree of thoughts to the batch, which must have a name of its own within it.
+
+        Args:
+            tree_of_thoughts (TreeOfThoughts): the tree of thoughts, with its options already set
+
+        Raises:
+            InvalidParameterError: if the batch already has a tree of thoughts with the same name
+        """
+        name = tree_of_thoughts.get_tree_of_thoughts_name()
+
+        if any(
+            name.lower() == other.get_tree_of_thoughts_name().lower()
+            for other in self._trees_of_thoughts
+        ):
+            raise InvalidParameterError(
+                f"The BatchRunner requires every tree of thoughts to have a name of its own, since it names their outputs, but '{name}' was repeated"
+            )
+
+        if self._ai_model_client is not None:
+            tree_of_thoughts.set_ai_model_client(self._ai_model_client)
+
+        if self._request_scheduler is not None:
+            tree_of_thoughts.set_request_scheduler(self._request_scheduler)
+
+        self._trees_of_thoughts.append(tree_of_thoughts)
+
+    async def _aprocess_tree_of_thoughts(self, tree_of_thoughts, fair_share):
+        start = time.perf_counter()
+
+        result = {
+            "name": tree_of_thoughts.get_tree_of_thoughts_name(),
+            "winners": [],
+            "error": None,
+        }
+
+        # A tree that fails doesn't stop the rest of the batch
+        try:
+            result["winners"] = await tree_of_thoughts.aprocess_tree_of_thoughts(
+                semaphore=fair_share
+            )
+        except Exception as exception:
+            result["error"] = exception
+
+        result["wall_time"] = time.perf_counter() - start
+
+        return result
+
+    async def arun(self):
+        """Processes every tree of thoughts of the batch, and waits until all of them have finished.
+        The requests of the trees that run their request functions in worker threads are also limited
+        by the default executor of the event loop.
+
+        Returns:
+            list[dict]: for every tree of thoughts, in the order they were added, its 'name', its 'winners',
+                the 'error' that stopped it (or None) and its 'wall_time' in seconds
+        """
+        fair_concurrency_limiter = FairConcurrencyLimiter(self._max_concurrent_requests)
+
+        return list(
+            await asyncio.gather(
+                *[
+                    self._aprocess_tree_of_thoughts(
+                        tree_of_thoughts,
+                        fair_concurrency_limiter.create_share(
+                            tree_of_thoughts.get_tree_of_thoughts_name()
+                        ),
+                    )
+                    for tree_of_thoughts in self._trees_of_thoughts
+                ]
+            )
+        )
+
+    async def _arun_with_enough_worker_threads(self):
+        # The blocking request functions run in worker threads, which mustn't be fewer than the requests in flight
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self._max_concurrent_requests)
+        )
+
+        return await self.arun()
+
+    def run(self):
+        """Synchronous counterpart of 'arun', which runs the batch in an event loop of its own."""
+        return asyncio.run(self._arun_with_enough_worker_threads())
@@ -0,0 +1,284 @@
+"""Load-tests the whole engine against a local fake of the AI model's API. It sweeps the breadth, the number of steps,
+the depth (number of layers) and the concurrency, and reports for every combination the wall time, the requests per second,
+the percentiles of the latency of every call to the AI model and the peak memory, without spending real tokens.
+
+Run it from the root of the repository with: python -m benchmarks.bench_load
+For example: python -m benchmarks.bench_load --breadth 1 3 --steps 3 5 --concurrency 1 8 --latency lognormal --error-rate 0.02
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import time
+import tracemalloc
+from threading import Lock
+from ai_model_client import AiModelClient
+from enums.state_type import StateType
+from fake_ai_model_server import (
+    FakeAiModelServer,
+    create_constant_latency_profile,
+    create_lognormal_latency_profile,
+    create_random_fake_response_function,
+    create_uniform_latency_profile,
+)
+from request_scheduling import RequestScheduler
+
+from state import State
+from tree_of_thoughts import TreeOfThoughts
+
+# The latency profiles that can be chosen from the command line, scaled by '--latency-scale'
+LATENCY_PROFILES = {
+    "none": lambda scale: create_constant_latency_profile(0),
+    "constant": create_constant_latency_profile,
+    "uniform": lambda scale: create_uniform_latency_profile(scale / 2, scale * 3 / 2),
+    "lognormal": lambda scale: create_lognormal_latency_profile(scale, 0.75),
+}
+
+STATE_TYPES = [
+    state_type for state_type in StateType if state_type != StateType.CONTEXT
+]
+
+# So that the sweep doesn't wait for the backoff meant for a real API
+BACKOFF_OF_RETRIES = 0.01
+
+
+class _TimedFunction:
+    """Wraps a function that requests samples from the AI model, recording how long every call takes."""
+
+    def __init__(self, function):
+        self._function = function
+
+        self._latencies = []
+        self._lock = Lock()
+
+    def __call__(self, prompt, number_of_samples):
+        start = time.perf_counter()
+
+        try:
+            return self._function(prompt, number_of_samples)
+        finally:
+            with self._lock:
+                self._latencies.append(time.perf_counter() - start)
+
+    def get_latencies(self):
+        with self._lock:
+            return list(self._latencies)
+
+
+def calculate_percentile(sorted_values, percentile):
+    """Calculates a percentile with the nearest-rank method.
+
+    Args:
+        sorted_values (list[float]): the values, sorted
+        percentile (float): the percentile, between 0 and 100
+
+    Returns:
+        float: the percentile, or NaN if there are no values
+    """
+    if not sorted_values:
+        return math.nan
+
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+
+    return sorted_values[max(rank, 1) - 1]
+
+
+def create_state_layers(depth):
+    return [
+        {
+            "state_type": STATE_TYPES[i % len(STATE_TYPES)],
+            "state_type_text": f"Write the step {i + 1} of the solution.",
+            "include_ancestor_state_type_response": None,
+        }
+        for i in range(depth)
+    ]
+
+
+def run_configuration(fake_server, breadth, number_of_steps, depth, concurrency):
+    """Processes a tree of thoughts against the fake server, and measures it.
+
+    Args:
+        fake_server (FakeAiModelServer): the running fake server
+        breadth (int): the breadth of the tree of thoughts
+        number_of_steps (int): its number of steps
+        depth (int): its number of layers
+        concurrency (int): how many requests can be in flight at once
+
+    Returns:
+        dict: the configuration along with its measurements
+    """
+    ai_model_client = AiModelClient(
+        api_key="fake",
+        base_url=fake_server.get_base_url(),
+        connection_pool_size=concurrency,
+    )
+
+    timed_request_samples_function = _TimedFunction(ai_model_client.request_samples)
+
+    request_scheduler = RequestScheduler(
+        requests_per_minute=10**9,
+        tokens_per_minute=10**12,
+        initial_backoff=BACKOFF_OF_RETRIES,
+        max_backoff=BACKOFF_OF_RETRIES,
+        max_concurrency=concurrency,
+    )
+
+    tree_of_thoughts = TreeOfThoughts(
+        "load_test",
+        State("Solve the problem step by step.", StateType.CONTEXT),
+        create_state_layers(depth),
+        number_of_steps,
+        breadth,
+    )
+    tree_of_thoughts.set_ai_model_client(ai_model_client)
+    tree_of_thoughts.set_request_samples_from_ai_model_function(
+        timed_request_samples_function
+    )
+    tree_of_thoughts.set_request_scheduler(request_scheduler)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    asyncio.run(
+        tree_of_thoughts.aprocess_tree_of_thoughts(max_concurrent_requests=concurrency)
+    )
+
+    wall_time = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ai_model_client.close()
+
+    latencies = sorted(timed_request_samples_function.get_latencies())
+
+    return {
+        "breadth": breadth,
+        "number_of_steps": number_of_steps,
+        "depth": depth,
+        "concurrency": concurrency,
+        "wall_time": wall_time,
+        "number_of_calls": len(latencies),
+        "number_of_retries": request_scheduler.get_number_of_retries(),
+        "calls_per_second": len(latencies) / wall_time,
+        "p50": calculate_percentile(latencies, 50),
+        "p95": calculate_percentile(latencies, 95),
+        "p99": calculate_percentile(latencies, 99),
+        "peak_memory": peak_memory,
+    }
+
+
+def run_sweep(
+    breadths,
+    numbers_of_steps,
+    depths,
+    concurrencies,
+    latency_profile,
+    error_rate=0,
+    throttle_rate=0,
+    seed=0,
+    on_result_function=None,
+):
+    """Runs every combination of the settings against a single fake server.
+
+    Args:
+        breadths (list[int]): the breadths to sweep
+        numbers_of_steps (list[int]): the numbers of steps to sweep
+        depths (list[int]): the depths to sweep
+        concurrencies (list[int]): the concurrency limits to sweep
+        latency_profile (Callable[[random.Random], float]): the latencies of the fake server
+        error_rate (float, optional): the probability that a call fails with a server error
+        throttle_rate (float, optional): the probability that a call is throttled
+        seed (int, optional): the seed of the fake server, for repeatable sweeps
+        on_result_function (Callable[[dict], None] | None, optional): called with the results of every combination as soon as they're measured
+
+    Returns:
+        list[dict]: the results of every combination
+    """
+    results = []
+
+    with FakeAiModelServer(
+        create_random_fake_response_function(seed),
+        latency_profile=latency_profile,
+        error_rate=error_rate,
+        throttle_rate=throttle_rate,
+        seed=seed,
+    ) as fake_server:
+        for breadth, number_of_steps, depth, concurrency in itertools.product(
+            breadths, numbers_of_steps, depths, concurrencies
+        ):
+            result = run_configuration(
+                fake_server, breadth, number_of_steps, depth, concurrency
+            )
+
+            if on_result_function is not None:
+                on_result_function(result)
+
+            results.append(result)
+
+    return results
+
+
+def print_header():
+    print(
+        f"{'breadth':>7} {'steps':>5} {'depth':>5} {'conc.':>5} {'wall (s)':>9} {'calls':>6} {'retries':>7} "
+        + f"{'calls/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'peak (MiB)':>10}"
+    )
+
+
+def print_result(result):
+    print(
+        f"{result['breadth']:>7} {result['number_of_steps']:>5} {result['depth']:>5} {result['concurrency']:>5} "
+        + f"{result['wall_time']:>9.3f} {result['number_of_calls']:>6} {result['number_of_retries']:>7} "
+        + f"{result['calls_per_second']:>8.1f} {result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f} "
+        + f"{result['p99'] * 1000:>9.1f} {result['peak_memory'] / 2**20:>10.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-tests the engine against a local fake of the AI model's API"
+    )
+    parser.add_argument("--breadth", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--steps", type=int, nargs="+", default=[3, 5])
+    parser.add_argument("--depth", type=int, nargs="+", default=[2])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument(
+        "--latency", choices=list(LATENCY_PROFILES), default="lognormal"
+    )
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=0.02,
+        help="Typical latency of a call, in seconds",
+    )
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--json", help="Also writes the results to this file, for comparing runs"
+    )
+
+    args = parser.parse_args()
+
+    print_header()
+
+    results = run_sweep(
+        args.breadth,
+        args.steps,
+        args.depth,
+        args.concurrency,
+        LATENCY_PROFILES[args.latency](args.latency_scale),
+        args.error_rate,
+        args.throttle_rate,
+        args.seed,
+        print_result,
+    )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf8") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
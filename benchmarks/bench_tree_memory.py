@@ -0,0 +1,83 @@
+"""Measures the memory that Trees and CompactTrees take to hold the same trees of thoughts, how long they take
+to build, and how long it takes to walk the ancestors of their last layer.
+
+Run it from the root of the repository with: python -m benchmarks.bench_tree_memory
+"""
+import time
+import tracemalloc
+from compact_tree import CompactTree
+from enums.state_type import StateType
+
+from state import State
+from tree import Tree
+
+NUMBER_OF_TREES = 50
+NUMBER_OF_LAYERS = 5
+NUMBER_OF_STEPS = 10
+BREADTH = 3
+
+STATE_TYPES = [
+    state_type for state_type in StateType if state_type != StateType.CONTEXT
+]
+
+
+def build_tree(tree_class):
+    tree = tree_class(State("Context.", StateType.CONTEXT))
+
+    last_state_type = StateType.CONTEXT
+
+    for layer in range(NUMBER_OF_LAYERS):
+        state_type = STATE_TYPES[layer % len(STATE_TYPES)]
+
+        tree.add_state_type(
+            state_type, last_state_type, "Text", None, NUMBER_OF_STEPS, BREADTH
+        )
+
+        for node in tree.get_leaf_nodes_without_responses():
+            node.name.set_response("Response.")
+
+        for i, node in enumerate(tree.get_unresolved_leaf_nodes_with_responses()):
+            if i % 3 == 0:
+                node.name.add_vote()
+
+            node.name.consider_resolved()
+
+        last_state_type = state_type
+
+    return tree
+
+
+def walk_ancestors_of_last_layer(tree):
+    last_state_type = STATE_TYPES[(NUMBER_OF_LAYERS - 1) % len(STATE_TYPES)]
+
+    for node in tree.get_winners_of_type(last_state_type, BREADTH * NUMBER_OF_STEPS):
+        for ancestor in node.ancestors:
+            ancestor.name.get_response()
+
+
+def main():
+    for tree_class in [Tree, CompactTree]:
+        tracemalloc.start()
+
+        start = time.perf_counter()
+        trees = [build_tree(tree_class) for _ in range(NUMBER_OF_TREES)]
+        build_time = time.perf_counter() - start
+
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+
+        for tree in trees:
+            walk_ancestors_of_last_layer(tree)
+
+        walk_time = time.perf_counter() - start
+
+        print(
+            f"{tree_class.__name__:>12}: {NUMBER_OF_TREES} trees, peak memory {peak_memory / 1024:.0f} KiB, "
+            + f"built in {build_time * 1000:.1f} ms, ancestors walked in {walk_time * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Measures how long the leaf queries of a Tree take per layer as the tree grows deeper, next to
+how long the same queries take as walks of all the leaves of the tree.
+
+Run it from the root of the repository with: python -m benchmarks.bench_tree_scaling
+"""
+import time
+from enums.state_type import StateType
+
+from state import State
+from tree import Tree
+
+NUMBER_OF_LAYERS = 40
+NUMBER_OF_STEPS = 5
+BREADTH = 2
+REPETITIONS_PER_LAYER = 20
+
+
+def query_by_walking_the_tree(tree, state_type):
+    leaves = tree.get_root_node().leaves
+
+    without_responses = [node for node in leaves if not node.name.has_response()]
+    unresolved = [
+        node
+        for node in leaves
+        if node.name.has_response() and not node.name.is_resolved()
+    ]
+    resolved = [
+        node
+        for node in leaves
+        if node.name.is_resolved() and node.name.get_state_type() == state_type
+    ]
+
+    return without_responses, unresolved, resolved
+
+
+def query_through_the_indexes(tree, state_type):
+    return (
+        tree.get_leaf_nodes_without_responses(),
+        tree.get_unresolved_leaf_nodes_with_responses(),
+        tree.get_winners_of_type(state_type, BREADTH),
+    )
+
+
+def measure(query_function, tree, state_type):
+    start = time.perf_counter()
+
+    for _ in range(REPETITIONS_PER_LAYER):
+        query_function(tree, state_type)
+
+    return (time.perf_counter() - start) / REPETITIONS_PER_LAYER
+
+
+def resolve_layer(tree):
+    for node in tree.get_leaf_nodes_without_responses():
+        node.name.set_response("Response.")
+
+    for i, node in enumerate(tree.get_unresolved_leaf_nodes_with_responses()):
+        if i % 2 == 0:
+            node.name.add_vote()
+
+        node.name.consider_resolved()
+
+
+def main():
+    tree = Tree(State("Context.", StateType.CONTEXT))
+
+    # Layers cycle through the state types, like the layers of a tree of thoughts usually do
+    state_types = [
+        state_type for state_type in StateType if state_type != StateType.CONTEXT
+    ]
+    last_state_type = StateType.CONTEXT
+
+    print(f"{'layer':>5} {'nodes':>7} {'indexes (ms)':>13} {'walk (ms)':>10}")
+
+    for layer in range(1, NUMBER_OF_LAYERS + 1):
+        state_type = state_types[(layer - 1) % len(state_types)]
+
+        tree.add_state_type(
+            state_type,
+            last_state_type,
+            "Text",
+            None,
+            NUMBER_OF_STEPS,
+            BREADTH,
+        )
+        resolve_layer(tree)
+        last_state_type = state_type
+
+        indexes_time = measure(query_through_the_indexes, tree, last_state_type)
+        walk_time = measure(query_by_walking_the_tree, tree, last_state_type)
+
+        print(
+            f"{layer:>5} {len(tree.get_root_node().descendants) + 1:>7} {indexes_time * 1000:>13.3f} {walk_time * 1000:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
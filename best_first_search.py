@@ -0,0 +1,211 @@
+"""This module contains the functions that search a tree of thoughts best-first: the most voted node that hasn't been
+expanded yet, among every layer, is the next one to get children, which are voted on among themselves. Since every vote
+among siblings has as many votes as siblings, the votes of nodes of different layers can be compared with each other.
+"""
+import heapq
+from colorama import Fore
+from errors import BudgetExceededError, InvalidParameterError
+from output import output_message
+from responses.requesting import arequest_responses
+from voting import adetermine_winners
+
+
+class _BestFirstSearch:
+    """Keeps the frontier of the search, the nodes that haven't been expanded yet, in a priority queue,
+    along with the winners found so far and the node expansions spent.
+    """
+
+    def __init__(
+        self, tree, state_layers, number_of_steps, breadth, max_node_expansions
+    ):
+        if max_node_expansions < 1:
+            raise InvalidParameterError(
+                f"A best-first search requires a budget of at least 1 node expansion, but it was {max_node_expansions}"
+            )
+
+        self._tree = tree
+        self._state_layers = state_layers
+        self._number_of_steps = number_of_steps
+        self._breadth = breadth
+        self._max_node_expansions = max_node_expansions
+
+        self._frontier = []
+        self._depth_by_node = {}
+        self._winners = []
+        self._number_of_node_expansions = 0
+
+        # The files of the responses and votes of every state type are numbered across all the expansions
+        self._number_of_nodes_by_state_type = {}
+        self._number_of_votes_by_state_type = {}
+
+        self._push_node(tree.get_root_node(), 0)
+
+    def _push_node(self, node, depth):
+        self._depth_by_node[node] = depth
+
+        # The most voted first, and among those with the same votes, the deepest,
+        # so that the search reaches complete answers
+        heapq.heappush(
+            self._frontier,
+            (-node.name.get_votes(), -depth, node.creation_index, node),
+        )
+
+    def is_over(self):
+        return (
+            len(self._winners) >= self._breadth
+            or not self._frontier
+            or self._number_of_node_expansions >= self._max_node_expansions
+        )
+
+    def pop_node_to_expand(self):
+        """Pops the best node of the frontier that can be expanded. The nodes of the last layer that are popped
+        before it are winners, since no node that could still be created would have more votes.
+
+        Returns:
+            tuple[Node, dict] | None: the node and the layer of its children, or None if the search is over
+        """
+        while not self.is_over():
+            node = heapq.heappop(self._frontier)[-1]
+            depth = self._depth_by_node[node]
+
+            if depth == len(self._state_layers):
+                self._winners.append(node)
+                continue
+
+            return node, self._state_layers[depth]
+
+        return None
+
+    def expand_node(self, node, state_layer):
+        """Adds the children of a node to the tree.
+
+        Returns:
+            tuple[list[Node], int, int]: the children, the position of the first of them among the nodes of their state type,
+                and the position of their vote among the votes of their state type
+        """
+        children = [
+            self._tree.add_child_node(
+                node,
+                state_layer["state_type"],
+                state_layer["state_type_text"],
+                state_layer["include_ancestor_state_type_response"],
+            )
+            for _ in range(self._number_of_steps)
+        ]
+
+        self._number_of_node_expansions += 1
+
+        state_type = state_layer["state_type"]
+
+        file_index_offset = self._number_of_nodes_by_state_type.get(state_type, 0)
+        self._number_of_nodes_by_state_type[state_type] = file_index_offset + len(
+            children
+        )
+
+        vote_index = self._number_of_votes_by_state_type.get(state_type, 0)
+        self._number_of_votes_by_state_type[state_type] = vote_index + 1
+
+        return children, file_index_offset, vote_index
+
+    def push_children(self, node, children):
+        for child in children:
+            self._push_node(child, self._depth_by_node[node] + 1)
+
+    def determine_winners(self):
+        """Determines the winners of the search: those found, followed by the most voted nodes of the last layer
+        that are left in the frontier if the budget was spent before enough were found.
+
+        Returns:
+            list[Node]: up to 'breadth' winners, the most voted first
+        """
+        nodes_of_last_layer = sorted(
+            entry
+            for entry in self._frontier
+            if self._depth_by_node[entry[-1]] == len(self._state_layers)
+        )
+
+        return (self._winners + [entry[-1] for entry in nodes_of_last_layer])[
+            : self._breadth
+        ]
+
+
+def _output_budget_exceeded_message(exception, run_context):
+    # The nodes whose votes were interrupted aren't in the frontier, so they can't be winners
+    output_message(
+        Fore.LIGHTYELLOW_EX,
+        f"{exception} The best-first search stopped with the winners found so far.",
+        run_context.is_visual_output_active(),
+    )
+
+
+def _verify_tree_is_unprocessed(tree):
+    if not tree.get_root_node().is_leaf:
+        raise InvalidParameterError(
+            "A best-first search must start from a tree of thoughts that hasn't been processed, even partially."
+        )
+
+
+async def aprocess_best_first_search(
+    tree,
+    state_layers,
+    number_of_steps,
+    breadth,
+    max_node_expansions,
+    run_context,
+    arequest_samples_from_ai_model_function,
+):
+    """Searches the tree best-first, expanding one node at a time, until 'breadth' nodes of the last layer
+    are the best of the frontier or 'max_node_expansions' nodes have been expanded. The voting modes of the layers
+    don't apply, since every vote is among the children of a single node. The requests of every expansion
+    are sent concurrently.
+
+    Args:
+        tree (Tree | CompactTree): the tree, which mustn't have been processed
+        state_layers (list[dict]): the layers, in order
+        number_of_steps (int): how many children every expansion creates, and how many votes there are among them
+        breadth (int): how many winners to find
+        max_node_expansions (int): how many nodes can be expanded, among the whole search
+        run_context (RunContext): the settings of the current run
+        arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that will request samples from the AI model
+
+    Returns:
+        list[Node]: the winners, the most voted first, which may be fewer than 'breadth', or none,
+            if the budget was spent before reaching the last layer
+
+    Raises:
+        InvalidParameterError: if the tree has already been processed, or the budget is lower than 1
+    """
+    _verify_tree_is_unprocessed(tree)
+
+    best_first_search = _BestFirstSearch(
+        tree, state_layers, number_of_steps, breadth, max_node_expansions
+    )
+
+    try:
+        while node_to_expand := best_first_search.pop_node_to_expand():
+            node, state_layer = node_to_expand
+
+            children, file_index_offset, vote_index = best_first_search.expand_node(
+                node, state_layer
+            )
+
+            await arequest_responses(
+                children,
+                run_context,
+                arequest_samples_from_ai_model_function,
+                file_index_offset,
+            )
+
+            await adetermine_winners(
+                children,
+                number_of_steps,
+                run_context,
+                arequest_samples_from_ai_model_function,
+                vote_index,
+            )
+
+            best_first_search.push_children(node, children)
+    except BudgetExceededError as exception:
+        _output_budget_exceeded_message(exception, run_context)
+
+    return best_first_search.determine_winners()
@@ -0,0 +1,172 @@
+"""This module contains the class RunBudget, that accounts for the tokens and the cost of the requests of a run,
+and decides when the run must spend less, or stop.
+"""
+from threading import Lock
+from defines import (
+    AI_MODEL_COST_PER_COMPLETION_TOKEN,
+    AI_MODEL_COST_PER_PROMPT_TOKEN,
+)
+from errors import BudgetExceededError, InvalidParameterError
+from token_counting import count_tokens, count_tokens_of_prompt
+
+
+def determine_tokens_of_request(prompt, responses):
+    """Determines the tokens that a request used: those that the API reported, if it did, otherwise an estimate.
+    The prompt is only counted once, however many samples were requested.
+
+    Args:
+        prompt (str): the prompt of the request
+        responses (list[str] | SampledResponses): the responses to it
+
+    Returns:
+        tuple[int, int]: the prompt tokens and the completion tokens
+    """
+    usage = getattr(responses, "usage", None)
+
+    if usage is not None:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+    return count_tokens_of_prompt(prompt), sum(
+        count_tokens(response) for response in responses
+    )
+
+
+class RunBudget:
+    """Limits the tokens or the cost of a run. Past a soft limit, the layers that start afterwards are made smaller.
+    Past a hard limit, no more requests are sent, and the run stops with the winners it has.
+
+    The limits are checked before every request, so the requests already in flight when a hard limit is reached
+    still finish, and may take the run slightly past it.
+    """
+
+    def __init__(
+        self,
+        soft_max_tokens=None,
+        hard_max_tokens=None,
+        soft_max_cost=None,
+        hard_max_cost=None,
+        cost_per_prompt_token=AI_MODEL_COST_PER_PROMPT_TOKEN,
+        cost_per_completion_token=AI_MODEL_COST_PER_COMPLETION_TOKEN,
+    ):
+        """Creates the budget. Any of the limits can be left unset.
+
+        Args:
+            soft_max_tokens (int | None, optional): the tokens past which the later layers are made smaller
+            hard_max_tokens (int | None, optional): the tokens past which the run stops
+            soft_max_cost (float | None, optional): the cost past which the later layers are made smaller
+            hard_max_cost (float | None, optional): the cost past which the run stops
+            cost_per_prompt_token (float, optional): the cost of every token of a prompt
+            cost_per_completion_token (float, optional): the cost of every token of a response
+
+        Raises:
+            InvalidParameterError: if any of the limits is negative, or a soft limit is above its hard limit
+        """
+        for limit in (soft_max_tokens, hard_max_tokens, soft_max_cost, hard_max_cost):
+            if limit is not None and limit < 0:
+                raise InvalidParameterError(
+                    f"The RunBudget requires limits that aren't negative, but one was {limit}"
+                )
+
+        for soft_limit, hard_limit in (
+            (soft_max_tokens, hard_max_tokens),
+            (soft_max_cost, hard_max_cost),
+        ):
+            if (
+                soft_limit is not None
+                and hard_limit is not None
+                and soft_limit > hard_limit
+            ):
+                raise InvalidParameterError(
+                    f"The RunBudget requires soft limits below the hard ones, but the soft limit {soft_limit} is above {hard_limit}"
+                )
+
+        self._soft_max_tokens = soft_max_tokens
+        self._hard_max_tokens = hard_max_tokens
+        self._soft_max_cost = soft_max_cost
+        self._hard_max_cost = hard_max_cost
+        self._cost_per_prompt_token = cost_per_prompt_token
+        self._cost_per_completion_token = cost_per_completion_token
+
+        self._spending_by_layer = {}
+
+        self._lock = Lock()
+
+    def calculate_cost(self, prompt_tokens, completion_tokens):
+        return (
+            prompt_tokens * self._cost_per_prompt_token
+            + completion_tokens * self._cost_per_completion_token
+        )
+
+    def register_request(self, state_type, prompt_tokens, completion_tokens):
+        """Registers the tokens that a request used.
+
+        Args:
+            state_type (StateType): the state type of the layer that the request belongs to
+            prompt_tokens (int): the tokens of its prompt
+            completion_tokens (int): the tokens of its responses
+        """
+        with self._lock:
+            spending = self._spending_by_layer.setdefault(
+                state_type,
+                {
+                    "requests": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "cost": 0,
+                },
+            )
+
+            spending["requests"] += 1
+            spending["prompt_tokens"] += prompt_tokens
+            spending["completion_tokens"] += completion_tokens
+            spending["cost"] += self.calculate_cost(prompt_tokens, completion_tokens)
+
+    def get_spending_by_layer(self):
+        """Returns what the requests of every layer spent.
+
+        Returns:
+            dict[StateType, dict[str, float]]: the requests, prompt tokens, completion tokens and cost of every layer
+        """
+        with self._lock:
+            return {
+                state_type: dict(spending)
+                for state_type, spending in self._spending_by_layer.items()
+            }
+
+    def get_spent_tokens(self):
+        with self._lock:
+            return sum(
+                spending["prompt_tokens"] + spending["completion_tokens"]
+                for spending in self._spending_by_layer.values()
+            )
+
+    def get_spent_cost(self):
+        with self._lock:
+            return sum(
+                spending["cost"] for spending in self._spending_by_layer.values()
+            )
+
+    @staticmethod
+    def _is_reached(spent, limit):
+        return limit is not None and spent >= limit
+
+    def is_soft_limit_reached(self):
+        return self._is_reached(
+            self.get_spent_tokens(), self._soft_max_tokens
+        ) or self._is_reached(self.get_spent_cost(), self._soft_max_cost)
+
+    def is_hard_limit_reached(self):
+        return self._is_reached(
+            self.get_spent_tokens(), self._hard_max_tokens
+        ) or self._is_reached(self.get_spent_cost(), self._hard_max_cost)
+
+    def verify_hard_limit_isnt_reached(self):
+        """Verifies that another request can be sent.
+
+        Raises:
+            BudgetExceededError: if the hard limit of tokens or cost has been reached
+        """
+        if self.is_hard_limit_reached():
+            raise BudgetExceededError(
+                f"The run reached its hard budget, having spent {self.get_spent_tokens()} tokens, which cost {self.get_spent_cost():.4f}."
+            )
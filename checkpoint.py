@@ -0,0 +1,292 @@
+"""This module contains the functions that take snapshots of a tree of thoughts while it's processed, and that
+restore them, so that a run that failed can continue from where it stopped instead of starting over.
+
+A snapshot holds the structure of the tree, the responses, the votes and the resolution of every node, along with
+the state layers that were still queued. The votes of the nodes that weren't resolved yet aren't kept, since the votes
+among them are requested again as a whole.
+"""
+import json
+import os
+from enums.state_type import StateType
+from enums.voting_mode import VotingMode
+from errors import InvalidCheckpointError
+from state import State
+
+CHECKPOINT_FORMAT_VERSION = 1
+
+# The positions of the fields of every node in a snapshot
+_PARENT_POSITION = 0
+_STATE_TYPE = 1
+_STATE_TYPE_RELATED_TEXT_POSITION = 2
+_INCLUDE_ANCESTOR_STATE_TYPE_RESPONSE = 3
+_RESPONSE = 4
+_VOTES = 5
+_IS_RESOLVED = 6
+
+
+def _convert_state_type_to_name(state_type):
+    return None if state_type is None else state_type.name
+
+
+def _convert_name_to_state_type(name):
+    return None if name is None else StateType[name]
+
+
+def _convert_state_layer_to_json(state_layer):
+    return {
+        "state_type": state_layer["state_type"].name,
+        "state_type_text": state_layer["state_type_text"],
+        "include_ancestor_state_type_response": _convert_state_type_to_name(
+            state_layer["include_ancestor_state_type_response"]
+        ),
+        "voting_mode": state_layer.get("voting_mode", VotingMode.STANDARD).name,
+    }
+
+
+def _convert_json_to_state_layer(json_state_layer):
+    return {
+        "state_type": StateType[json_state_layer["state_type"]],
+        "state_type_text": json_state_layer["state_type_text"],
+        "include_ancestor_state_type_response": _convert_name_to_state_type(
+            json_state_layer["include_ancestor_state_type_response"]
+        ),
+        "voting_mode": VotingMode[json_state_layer["voting_mode"]],
+    }
+
+
+def _convert_tree_to_json(tree):
+    nodes = tree.get_nodes_in_creation_order()
+
+    positions_of_nodes = {node: position for position, node in enumerate(nodes)}
+
+    # The same few texts are shared by every node of a layer, so they're only stored once
+    state_type_related_texts = []
+    positions_of_state_type_related_texts = {}
+
+    json_nodes = []
+
+    for node in nodes[1:]:
+        state = node.name
+
+        state_type_related_text = state.get_state_type_related_text()
+
+        if state_type_related_text not in positions_of_state_type_related_texts:
+            positions_of_state_type_related_texts[state_type_related_text] = len(
+                state_type_related_texts
+            )
+            state_type_related_texts.append(state_type_related_text)
+
+        json_nodes.append(
+            [
+                positions_of_nodes[node.parent],
+                state.get_state_type().name,
+                positions_of_state_type_related_texts[state_type_related_text],
+                _convert_state_type_to_name(
+                    state.get_include_ancestor_state_type_response()
+                ),
+                state.get_response(),
+                state.get_votes() if state.is_resolved() else 0,
+                state.is_resolved(),
+            ]
+        )
+
+    return {
+        "context": nodes[0].name.get_context(),
+        "state_type_related_texts": state_type_related_texts,
+        "nodes": json_nodes,
+    }
+
+
+def create_snapshot(
+    tree_of_thoughts_name,
+    number_of_steps,
+    breadth,
+    tree,
+    queued_state_layers,
+    state_layer_in_progress,
+    state_type_of_last_winners,
+    layer_number_of_steps=None,
+    layer_breadth=None,
+):
+    """Takes a snapshot of a tree of thoughts that is being processed.
+
+    Args:
+        tree_of_thoughts_name (str): the name of the tree of thoughts
+        number_of_steps (int): the number of steps of every layer
+        breadth (int): how many winners every layer has
+        tree (Tree | CompactTree): the tree with the nodes processed so far
+        queued_state_layers (Iterable[dict]): the state layers that haven't been started yet
+        state_layer_in_progress (dict | None): the state layer whose nodes are in the tree, but that hasn't finished
+        state_type_of_last_winners (StateType): the state type of the last layer that finished
+        layer_number_of_steps (int | None, optional): the steps of the layers from now on, if a budget reduced them
+        layer_breadth (int | None, optional): the breadth of the layers from now on, if a budget reduced it
+
+    Returns:
+        dict: the snapshot, which can be serialized to json
+    """
+    return {
+        "version": CHECKPOINT_FORMAT_VERSION,
+        "tree_of_thoughts_name": tree_of_thoughts_name,
+        "number_of_steps": number_of_steps,
+        "breadth": breadth,
+        "layer_number_of_steps": number_of_steps
+        if layer_number_of_steps is None
+        else layer_number_of_steps,
+        "layer_breadth": breadth if layer_breadth is None else layer_breadth,
+        "tree": _convert_tree_to_json(tree),
+        "queued_state_layers": [
+            _convert_state_layer_to_json(state_layer)
+            for state_layer in queued_state_layers
+        ],
+        "state_layer_in_progress": None
+        if state_layer_in_progress is None
+        else _convert_state_layer_to_json(state_layer_in_progress),
+        "state_type_of_last_winners": state_type_of_last_winners.name,
+    }
+
+
+def write_snapshot(file_path, snapshot):
+    """Writes a snapshot to a file. The file is replaced at once, so a failure while writing it
+    leaves the previous snapshot intact.
+
+    Args:
+        file_path (str): the path of the file
+        snapshot (dict): the snapshot
+    """
+    temporary_file_path = f"{file_path}.tmp"
+
+    with open(temporary_file_path, "w", encoding="utf8") as file:
+        json.dump(snapshot, file, ensure_ascii=False, separators=(",", ":"))
+
+    os.replace(temporary_file_path, file_path)
+
+
+def read_snapshot(file_path):
+    """Reads a snapshot from a file.
+
+    Args:
+        file_path (str): the path of the file
+
+    Returns:
+        dict | None: the snapshot, or None if the file doesn't exist
+
+    Raises:
+        InvalidCheckpointError: if the file isn't a snapshot that this version can restore
+    """
+    if not os.path.isfile(file_path):
+        return None
+
+    try:
+        with open(file_path, "r", encoding="utf8") as file:
+            snapshot = json.load(file)
+    except json.JSONDecodeError as exception:
+        raise InvalidCheckpointError(
+            f"The checkpoint at {file_path} is corrupt: {exception}"
+        ) from exception
+
+    if snapshot.get("version") != CHECKPOINT_FORMAT_VERSION:
+        raise InvalidCheckpointError(
+            f"The checkpoint at {file_path} has the version {snapshot.get('version')}, but only the version {CHECKPOINT_FORMAT_VERSION} can be restored."
+        )
+
+    return snapshot
+
+
+def verify_snapshot_matches(
+    snapshot, tree_of_thoughts_name, context, number_of_steps, breadth
+):
+    """Verifies that a snapshot was taken from a tree of thoughts with the same settings, since
+    its nodes wouldn't make sense otherwise.
+
+    Args:
+        snapshot (dict): the snapshot
+        tree_of_thoughts_name (str): the name of the tree of thoughts that will be restored
+        context (str): its context
+        number_of_steps (int): its number of steps
+        breadth (int): its breadth
+
+    Raises:
+        InvalidCheckpointError: if any of the settings differs from those of the snapshot
+    """
+    settings = {
+        "tree_of_thoughts_name": (
+            snapshot["tree_of_thoughts_name"],
+            tree_of_thoughts_name,
+        ),
+        "context": (snapshot["tree"]["context"], context),
+        "number_of_steps": (snapshot["number_of_steps"], number_of_steps),
+        "breadth": (snapshot["breadth"], breadth),
+    }
+
+    for setting, (value_of_snapshot, value) in settings.items():
+        if value_of_snapshot != value:
+            raise InvalidCheckpointError(
+                f"The checkpoint was taken with a different {setting} than the tree of thoughts '{tree_of_thoughts_name}' has now."
+            )
+
+
+def restore_tree(snapshot, tree_class, tiebreak):
+    """Rebuilds the tree of a snapshot.
+
+    Args:
+        snapshot (dict): the snapshot
+        tree_class (type[Tree] | type[CompactTree]): the class of the tree to rebuild
+        tiebreak (Tiebreak): how the winners with the same number of votes are ordered
+
+    Returns:
+        Tree | CompactTree: the tree, with the same nodes, in the same order, as when the snapshot was taken
+    """
+    json_tree = snapshot["tree"]
+
+    tree = tree_class(State(json_tree["context"], StateType.CONTEXT), tiebreak)
+
+    nodes = [tree.get_root_node()]
+
+    for json_node in json_tree["nodes"]:
+        node = tree.add_child_node(
+            nodes[json_node[_PARENT_POSITION]],
+            StateType[json_node[_STATE_TYPE]],
+            json_tree["state_type_related_texts"][
+                json_node[_STATE_TYPE_RELATED_TEXT_POSITION]
+            ],
+            _convert_name_to_state_type(
+                json_node[_INCLUDE_ANCESTOR_STATE_TYPE_RESPONSE]
+            ),
+        )
+
+        if json_node[_RESPONSE] is not None:
+            node.name.set_response(json_node[_RESPONSE])
+
+        if json_node[_VOTES] > 0:
+            node.name.add_vote(json_node[_VOTES])
+
+        if json_node[_IS_RESOLVED]:
+            node.name.consider_resolved()
+
+        nodes.append(node)
+
+    return tree
+
+
+def restore_state_layers(snapshot):
+    """Restores the state layers of a snapshot.
+
+    Args:
+        snapshot (dict): the snapshot
+
+    Returns:
+        tuple[list[dict], dict | None, StateType]: the queued state layers, the state layer in progress if any,
+            and the state type of the last layer that finished
+    """
+    state_layer_in_progress = snapshot["state_layer_in_progress"]
+
+    return (
+        [
+            _convert_json_to_state_layer(json_state_layer)
+            for json_state_layer in snapshot["queued_state_layers"]
+        ],
+        None
+        if state_layer_in_progress is None
+        else _convert_json_to_state_layer(state_layer_in_progress),
+        StateType[snapshot["state_type_of_last_winners"]],
+    )
@@ -0,0 +1,580 @@
+"""This module contains the class CompactTree, an alternative to Tree that stores the nodes of a tree of thoughts
+in typed arrays rather than as one 'anytree' Node and one State per node. It's meant for holding many trees
+in memory at once, for example during large sweeps.
+"""
+import heapq
+from array import array
+from threading import Lock
+from enums.state_type import StateType
+from enums.tiebreak import Tiebreak
+from errors import InvalidParameterError
+
+from state import State
+from winner_ranking import create_ranking_key, rank
+
+# Stands for 'None' in the array of the state types whose responses are included from an ancestor
+NO_STATE_TYPE_CODE = 0
+
+NO_NODE_INDEX = -1
+
+
+class CompactState:
+    """A view of the state stored at a position of a CompactTree, with the same methods as State."""
+
+    __slots__ = ("_tree", "_index")
+
+    def __init__(self, tree, index):
+        self._tree = tree
+        self._index = index
+
+    def get_context(self):
+        return self._tree._context
+
+    def get_state_type(self):
+        return StateType(self._tree._state_type_codes[self._index])
+
+    def get_state_type_related_text(self):
+        return self._tree._state_type_related_texts[
+            self._tree._state_type_related_text_indexes[self._index]
+        ]
+
+    def get_include_ancestor_state_type_response(self):
+        code = self._tree._include_ancestor_state_type_response_codes[self._index]
+
+        if code == NO_STATE_TYPE_CODE:
+            return None
+
+        return StateType(code)
+
+    def has_response(self):
+        return self._tree._responses[self._index] is not None
+
+    def get_response(self):
+        return self._tree._responses[self._index]
+
+    def set_response(self, response):
+        self._tree._set_response(self._index, response)
+
+    def is_resolved(self):
+        return bool(self._tree._resolved_flags[self._index])
+
+    def add_vote(self, number_of_votes=1):
+        self._tree._add_vote(self._index, number_of_votes)
+
+    def get_votes(self):
+        return self._tree._votes[self._index]
+
+    def consider_resolved(self):
+        self._tree._consider_resolved(self._index)
+
+    def __str__(self):
+        return f"State: {self.get_state_type()} | Is resolved: {self.is_resolved()}"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class CompactNode:
+    """A view of a node of a CompactTree, with the attributes of an 'anytree' Node that a tree of thoughts uses.
+    Views are created on demand, so two views of the same node are equal, rather than identical.
+    """
+
+    __slots__ = ("_tree", "_index")
+
+    def __init__(self, tree, index):
+        self._tree = tree
+        self._index = index
+
+    @property
+    def name(self) -> CompactState:
+        return CompactState(self._tree, self._index)
+
+    @property
+    def parent(self):
+        parent_index = self._tree._parent_indexes[self._index]
+
+        if parent_index == NO_NODE_INDEX:
+            return None
+
+        return CompactNode(self._tree, parent_index)
+
+    @property
+    def children(self):
+        first_child_index = self._tree._first_child_indexes[self._index]
+
+        return tuple(
+            CompactNode(self._tree, first_child_index + i)
+            for i in range(self._tree._numbers_of_children[self._index])
+        )
+
+    @property
+    def ancestors(self):
+        """The ancestors of this node, from the root to its parent, like in 'anytree'."""
+        ancestor_indexes = []
+
+        index = self._tree._parent_indexes[self._index]
+
+        while index != NO_NODE_INDEX:
+            ancestor_indexes.append(index)
+            index = self._tree._parent_indexes[index]
+
+        return tuple(
+            CompactNode(self._tree, index) for index in reversed(ancestor_indexes)
+        )
+
+    @property
+    def cache_of_children(self) -> dict:
+        """The dict in which the values shared by all the children of this node are cached."""
+        return self._tree._get_cache_of_children(self._index)
+
+    @property
+    def is_leaf(self):
+        return self._tree._numbers_of_children[self._index] == 0
+
+    @property
+    def creation_index(self):
+        """The order in which the node was created, like the attribute of the nodes of a Tree."""
+        return self._index
+
+    @property
+    def is_root(self):
+        return self._index == 0
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, CompactNode)
+            and self._tree is other._tree
+            and self._index == other._index
+        )
+
+    def __hash__(self):
+        return hash((id(self._tree), self._index))
+
+    def __repr__(self):
+        return f"CompactNode({self._index}, {self.name})"
+
+
+class CompactTree:
+    """Handles the nodes of a tree of thoughts like Tree does, but stores the parent, the children, the state type,
+    the votes and the resolution of every node in typed arrays, indexed by the order in which the nodes were created.
+    The nodes are handed out as CompactNode views, which behave like the 'anytree' Nodes of a Tree.
+    """
+
+    def __init__(self, context_state, tiebreak=Tiebreak.TREE_ORDER):
+        if not isinstance(context_state, State):
+            raise InvalidParameterError(
+                f"During creation of a CompactTree, the 'context_state' passed wasn't a State: {context_state}"
+            )
+
+        self._lock = Lock()
+
+        self._tiebreak = tiebreak
+
+        self._context = context_state.get_context()
+
+        self._parent_indexes = array("i")
+        # The children of a node are always created together, so they're stored contiguously
+        self._first_child_indexes = array("i")
+        self._numbers_of_children = array("H")
+        self._positions_among_siblings = array("H")
+        self._depths = array("H")
+
+        # The nodes of a layer are created together after those of the previous one, so the last layer
+        # starts at the first node of the depth of the last node
+        self._first_index_of_last_layer = 0
+        self._number_of_expanded_nodes = 0
+
+        self._state_type_codes = array("B")
+        self._include_ancestor_state_type_response_codes = array("B")
+        # Every node of a layer shares the same text, so it's only stored once
+        self._state_type_related_text_indexes = array("I")
+        self._state_type_related_texts = []
+        self._indexes_of_state_type_related_texts = {}
+
+        self._votes = array("I")
+        self._resolved_flags = array("B")
+        self._responses = []
+
+        # Only the nodes that have children, which are few, have caches
+        self._caches_of_children = {}
+
+        self._leaf_indexes_without_responses = {}
+        self._unresolved_leaf_indexes_with_responses = {}
+        self._resolved_leaf_indexes_by_state_type = {}
+
+        self._append_node(
+            NO_NODE_INDEX,
+            0,
+            context_state.get_state_type(),
+            context_state.get_state_type_related_text(),
+            context_state.get_include_ancestor_state_type_response(),
+        )
+
+        self._responses[0] = context_state.get_response()
+        self._votes[0] = context_state.get_votes()
+        self._resolved_flags[0] = context_state.is_resolved()
+
+        self._update_indexes_of_node(0)
+
+    def _intern_state_type_related_text(self, state_type_related_text):
+        if state_type_related_text not in self._indexes_of_state_type_related_texts:
+            self._indexes_of_state_type_related_texts[state_type_related_text] = len(
+                self._state_type_related_texts
+            )
+            self._state_type_related_texts.append(state_type_related_text)
+
+        return self._indexes_of_state_type_related_texts[state_type_related_text]
+
+    def _append_node(
+        self,
+        parent_index,
+        position_among_siblings,
+        state_type,
+        state_type_related_text,
+        include_ancestor_state_type_response,
+    ):
+        depth = 0 if parent_index == NO_NODE_INDEX else self._depths[parent_index] + 1
+
+        if self._depths and depth != self._depths[-1]:
+            self._first_index_of_last_layer = len(self._depths)
+
+        self._depths.append(depth)
+        self._parent_indexes.append(parent_index)
+        self._first_child_indexes.append(NO_NODE_INDEX)
+        self._numbers_of_children.append(0)
+        self._positions_among_siblings.append(position_among_siblings)
+
+        self._state_type_codes.append(state_type.value)
+        self._include_ancestor_state_type_response_codes.append(
+            NO_STATE_TYPE_CODE
+            if include_ancestor_state_type_response is None
+            else include_ancestor_state_type_response.value
+        )
+        self._state_type_related_text_indexes.append(
+            self._intern_state_type_related_text(state_type_related_text)
+        )
+
+        self._votes.append(0)
+        self._resolved_flags.append(state_type is StateType.CONTEXT)
+        self._responses.append(None)
+
+        return len(self._parent_indexes) - 1
+
+    def _remove_node_from_indexes(self, index):
+        self._leaf_indexes_without_responses.pop(index, None)
+        self._unresolved_leaf_indexes_with_responses.pop(index, None)
+
+        for resolved_leaf_indexes in self._resolved_leaf_indexes_by_state_type.values():
+            resolved_leaf_indexes.pop(index, None)
+
+    def _update_indexes_of_node(self, index):
+        self._remove_node_from_indexes(index)
+
+        if self._numbers_of_children[index] != 0:
+            return
+
+        has_response = self._responses[index] is not None
+
+        if self._resolved_flags[index]:
+            self._resolved_leaf_indexes_by_state_type.setdefault(
+                self._state_type_codes[index], {}
+            )[index] = None
+        elif has_response:
+            self._unresolved_leaf_indexes_with_responses[index] = None
+
+        if not has_response:
+            self._leaf_indexes_without_responses[index] = None
+
+    def _get_cache_of_children(self, index):
+        with self._lock:
+            return self._caches_of_children.setdefault(index, {})
+
+    def _set_response(self, index, response):
+        with self._lock:
+            self._responses[index] = response
+
+            self._update_indexes_of_node(index)
+
+    def _add_vote(self, index, number_of_votes):
+        with self._lock:
+            self._votes[index] += number_of_votes
+
+    def _consider_resolved(self, index):
+        with self._lock:
+            self._resolved_flags[index] = True
+
+            self._update_indexes_of_node(index)
+
+    def _determine_order_key(self, index):
+        # The path of positions among siblings from the root orders the nodes like a pre-order walk of 'anytree'
+        order_key = []
+
+        while index != 0:
+            order_key.append(self._positions_among_siblings[index])
+            index = self._parent_indexes[index]
+
+        order_key.reverse()
+
+        return order_key
+
+    def _create_nodes_in_tree_order(self, indexes) -> list[CompactNode]:
+        return [
+            CompactNode(self, index)
+            for index in sorted(indexes, key=self._determine_order_key)
+        ]
+
+    def get_root_node(self) -> CompactNode:
+        return CompactNode(self, 0)
+
+    def get_number_of_nodes(self) -> int:
+        return len(self._parent_indexes)
+
+    def get_nodes_in_creation_order(self) -> list[CompactNode]:
+        """Returns every node of the tree, in the order in which they were created, so that every parent
+        comes before its children, and the children of a parent keep their order.
+
+        Returns:
+            list[CompactNode]: the nodes
+        """
+        return [CompactNode(self, index) for index in range(self.get_number_of_nodes())]
+
+    def get_nodes_of_last_layer(self) -> list[CompactNode]:
+        """Returns the nodes of the last layer added to the tree, resolved or not, in the order in which they were created.
+
+        Returns:
+            list[CompactNode]: the nodes, of which the first one has the lowest creation index of the layer
+        """
+        return [
+            CompactNode(self, index)
+            for index in range(
+                self._first_index_of_last_layer, self.get_number_of_nodes()
+            )
+        ]
+
+    def get_number_of_expanded_nodes(self) -> int:
+        """Returns how many nodes have children, which is how many were expanded.
+
+        Returns:
+            int: the number of expanded nodes
+        """
+        return self._number_of_expanded_nodes
+
+    def add_child_node(
+        self,
+        parent_node: CompactNode,
+        state_type: StateType,
+        state_type_related_text: str,
+        include_ancestor_state_type_response: StateType | None,
+    ) -> CompactNode:
+        """Adds a single node as the last child of 'parent_node', for example to rebuild a tree from a checkpoint.
+        The children of a node are stored next to each other, so they must be added one after another.
+
+        Args:
+            parent_node (CompactNode): the parent of the new node
+            state_type (StateType): the state type of the new node
+            state_type_related_text (str): the text associated with the state type
+            include_ancestor_state_type_response (StateType | None): whether or not the response of an ancestor should be included in the prompt.
+
+        Returns:
+            CompactNode: the new node
+
+        Raises:
+            ValueError: if other nodes were added after the last child of 'parent_node'
+        """
+        parent_index = parent_node._index
+
+        with self._lock:
+            number_of_children = self._numbers_of_children[parent_index]
+
+            if number_of_children > 0 and self._first_child_indexes[
+                parent_index
+            ] + number_of_children != len(self._parent_indexes):
+                raise ValueError(
+                    f"The function {self.add_child_node.__name__} can't add a child to {parent_node}, "
+                    + "because other nodes were added after its last child."
+                )
+
+            child_index = self._append_node(
+                parent_index,
+                number_of_children,
+                state_type,
+                state_type_related_text,
+                include_ancestor_state_type_response,
+            )
+
+            if number_of_children == 0:
+                self._first_child_indexes[parent_index] = child_index
+                self._number_of_expanded_nodes += 1
+
+            self._numbers_of_children[parent_index] = number_of_children + 1
+
+            self._update_indexes_of_node(child_index)
+
+            # The parent is no longer a leaf
+            self._update_indexes_of_node(parent_index)
+
+        return CompactNode(self, child_index)
+
+    def set_tiebreak(self, tiebreak: Tiebreak) -> None:
+        """Sets how the winners with the same number of votes are ordered.
+
+        Args:
+            tiebreak (Tiebreak): the tiebreak
+        """
+        self._tiebreak = tiebreak
+
+    def _create_ranking_key(self, index, tiebreak):
+        return create_ranking_key(
+            self._votes[index],
+            tiebreak,
+            self._determine_order_key(index),
+            index,
+            self._responses[index],
+        )
+
+    def get_winners_of_type(
+        self,
+        state_type: StateType,
+        breadth: int | None,
+        tiebreak: Tiebreak | None = None,
+    ) -> list[CompactNode]:
+        """Returns the winning nodes of a specific state type
+
+        Args:
+            state_type (StateType): the state type that the winners will be returned from
+            breadth (int | None): the amount of winners that will be chosen among those of a state type.
+                If None, every resolved leaf node of the state type is returned, ranked.
+            tiebreak (Tiebreak | None, optional): how the nodes with the same votes are ordered. If None, the tiebreak of the tree is used.
+
+        Returns:
+            list[CompactNode]: the winners of the specific state type
+        """
+        if tiebreak is None:
+            tiebreak = self._tiebreak
+
+        with self._lock:
+            resolved_leaf_indexes = list(
+                self._resolved_leaf_indexes_by_state_type.get(state_type.value, {})
+            )
+
+        if breadth is not None and len(resolved_leaf_indexes) < breadth:
+            error_message = f"The function {self.get_winners_of_type.__name__} found less resolved leaf nodes ({len(resolved_leaf_indexes)}) "
+            error_message += f"than the specified breadth ({breadth})."
+            raise ValueError(error_message)
+
+        if breadth is not None and 0 < breadth:
+            # Only the nodes with at least as many votes as the last winner can be winners,
+            # so the tiebreak is only determined for those
+            minimum_votes = heapq.nlargest(
+                breadth, (self._votes[index] for index in resolved_leaf_indexes)
+            )[-1]
+
+            resolved_leaf_indexes = [
+                index
+                for index in resolved_leaf_indexes
+                if self._votes[index] >= minimum_votes
+            ]
+
+        return [
+            CompactNode(self, index)
+            for index in rank(
+                resolved_leaf_indexes,
+                lambda index: self._create_ranking_key(index, tiebreak),
+                breadth,
+            )
+        ]
+
+    def add_state_type(
+        self,
+        state_type_of_new_state: StateType,
+        state_type_of_last_winners: StateType,
+        state_type_related_text: str,
+        include_ancestor_state_type_response: StateType | None,
+        number_of_steps: int,
+        breadth: int,
+    ) -> None:
+        """Adds a new state to the tree, of the determined state type
+
+        Args:
+            state_type_of_new_state (StateType): the state type that the new state will have
+            state_type_of_last_winners (StateType): the state type of the last layer of winners
+            state_type_related_text (str): the text associated with the new type of state
+            include_ancestor_state_type_response (StateType | None): whether or not the response of an ancestor should be included in the prompt.
+            number_of_steps (int): the number of steps that this layer of states will have
+            breadth (int): now many winners will be picked among those voted the most
+        """
+        if not isinstance(
+            include_ancestor_state_type_response, (StateType, type(None))
+        ):
+            raise InvalidParameterError(
+                f"Attempted to set 'include_ancestor_state_type_response' that was neither a StateType nor None: {include_ancestor_state_type_response}"
+            )
+
+        if state_type_of_last_winners == StateType.CONTEXT:
+            # The context is the only state of its type, regardless of the breadth
+            winners = [self.get_root_node()]
+        else:
+            winners = self.get_winners_of_type(state_type_of_last_winners, breadth)
+
+        with self._lock:
+            for winner in winners:
+                parent_index = winner._index
+
+                for i in range(number_of_steps):
+                    child_index = self._append_node(
+                        parent_index,
+                        i,
+                        state_type_of_new_state,
+                        state_type_related_text,
+                        include_ancestor_state_type_response,
+                    )
+
+                    if i == 0:
+                        self._first_child_indexes[parent_index] = child_index
+                        self._number_of_expanded_nodes += 1
+
+                    self._update_indexes_of_node(child_index)
+
+                self._numbers_of_children[parent_index] = number_of_steps
+
+                # The parent is no longer a leaf
+                self._update_indexes_of_node(parent_index)
+
+    def get_unresolved_leaf_nodes_with_responses(self) -> list[CompactNode]:
+        """Returns the leaf nodes of the tree that are unresolved and have responses stored in them
+
+        Returns:
+            list[CompactNode]: the list of leaf nodes that are unresolved and have responses
+        """
+        with self._lock:
+            return self._create_nodes_in_tree_order(
+                self._unresolved_leaf_indexes_with_responses
+            )
+
+    def get_unresolved_leaf_nodes(self) -> list[CompactNode]:
+        """Returns the leaf nodes that aren't resolved yet, whether they have responses or not
+
+        Returns:
+            list[CompactNode]: the unresolved leaf nodes, in tree order
+        """
+        with self._lock:
+            # The context has no response, but is resolved from the start
+            return self._create_nodes_in_tree_order(
+                [
+                    index
+                    for index in self._leaf_indexes_without_responses
+                    if not self._resolved_flags[index]
+                ]
+                + list(self._unresolved_leaf_indexes_with_responses)
+            )
+
+    def get_leaf_nodes_without_responses(self) -> list[CompactNode]:
+        """Returns the leaf nodes that don't have responses stored in them
+
+        Returns:
+            list[CompactNode]: returns a list of leaf nodes that don't have responses stored in them
+        """
+        with self._lock:
+            return self._create_nodes_in_tree_order(
+                self._leaf_indexes_without_responses
+            )
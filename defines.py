@@ -2,11 +2,58 @@ MIN_NUMBER_OF_STEPS = 1
 MAX_NUMBER_OF_STEPS = 10
 
 AI_MODEL = "gpt-4"
+AI_MODEL_TEMPERATURE = 1
+AI_MODEL_MAX_TOKENS = 2048
+# The tokens of a prompt plus the maximum tokens of its response must fit in the context window
+AI_MODEL_CONTEXT_WINDOW = 8192
+
+AI_MODEL_API_BASE_URL = "https://api.openai.com/v1"
+AI_MODEL_API_KEY_FILE_PATH = "api_key.txt"
+# In seconds
+AI_MODEL_REQUEST_TIMEOUT = 120
+AI_MODEL_CONNECTION_POOL_SIZE = 16
+
+# Quotas of the AI model's API. The tokens of a request count its prompt plus the maximum tokens of every sample.
+AI_MODEL_REQUESTS_PER_MINUTE = 500
+AI_MODEL_TOKENS_PER_MINUTE = 40000
+MAX_RETRIES_OF_REQUEST_TO_AI_MODEL = 6
+# In dollars, as priced for the 8K context window of GPT-4
+AI_MODEL_COST_PER_PROMPT_TOKEN = 0.03 / 1000
+AI_MODEL_COST_PER_COMPLETION_TOKEN = 0.06 / 1000
+# In seconds
+INITIAL_RETRY_BACKOFF = 1
+MAX_RETRY_BACKOFF = 60
+
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
 
 VOTING_STRING_FOR_AI_MODEL = "The best answer is number X"
 
+# Every candidate of a layer that is scored rather than voted on gets this many scores, out of the maximum score,
+# which are added to its votes
+SCORING_STRING_FOR_AI_MODEL = "The score is X"
+MAX_SCORE = 10
+SCORES_PER_CANDIDATE = 3
+
+# How many candidates are voted on together in every group of a tournament, and how many votes every group gets
+TOURNAMENT_GROUP_SIZE = 4
+TOURNAMENT_VOTES_PER_GROUP = 3
+
+# Candidates whose responses are estimated to be at least this similar (by MinHash over word shingles) are voted on as one
+DUPLICATE_SIMILARITY_THRESHOLD = 0.8
+DUPLICATE_SHINGLE_SIZE = 3
+DUPLICATE_MINHASH_NUMBER_OF_HASHES = 64
+# Below this many characters among all the responses, their signatures aren't worth sending to other processes
+DUPLICATE_MIN_CHARACTERS_FOR_PROCESS_POOL = 100_000
+
+# Speculation generates the responses of the children of the candidates that are winning a vote by a wide enough lead,
+# before the vote is over, and never generates more than this many responses in a run
+SPECULATION_MAX_RESPONSES = 50
+
 DOUBLE_RETURNS = "\n\n"
 
+# Appended to the texts that had to be trimmed for a prompt to fit in the context window
+TRIMMED_TEXT_MARKER = " [...]"
+
 INSTRUCT_GPT_PROMPT_HEADER = "Question. "
 INSTRUCT_GPT_PROMPT_ANSWER_OPENING = (
     " Answer: Let's try to work out the answer step by step: "
@@ -14,6 +61,29 @@ INSTRUCT_GPT_PROMPT_ANSWER_OPENING = (
 
 TREES_OF_THOUGHTS_DIRECTORY = "trees_of_thoughts"
 
+RESPONSE_CACHE_DIRECTORY = f"{TREES_OF_THOUGHTS_DIRECTORY}/.response_cache"
+RESPONSE_CACHE_MAX_ENTRIES_IN_MEMORY = 1024
+RESPONSE_CACHE_MAX_SIZE_ON_DISK = 256 * 1024 * 1024
+
+# A single database that holds the artifacts of every run, and the response cache, instead of one file for each
+RUN_STORE_FILE_PATH = f"{TREES_OF_THOUGHTS_DIRECTORY}/run_store.sqlite3"
+RUN_STORE_WRITES_PER_TRANSACTION = 64
+
+# The requests sent within this many seconds of each other are submitted together as a batch job, whose status is then
+# polled every this many seconds, and which the AI model must finish within the completion window
+BATCH_JOB_COLLECTION_SECONDS = 0.5
+BATCH_JOB_POLL_INTERVAL = 60
+BATCH_JOB_COMPLETION_WINDOW = "24h"
+BATCH_JOBS_DIRECTORY = f"{TREES_OF_THOUGHTS_DIRECTORY}/.batch_jobs"
+
 
 def get_directory_path_for_tree_of_thoughts(tree_of_thoughts_name):
     return f"{TREES_OF_THOUGHTS_DIRECTORY}/{tree_of_thoughts_name.lower()}"
+
+
+def get_default_model_parameters():
+    return {
+        "model": AI_MODEL,
+        "temperature": AI_MODEL_TEMPERATURE,
+        "max_tokens": AI_MODEL_MAX_TOKENS,
+    }
@@ -0,0 +1,226 @@
+"""This module contains the class DuplicateCollapsing, that finds the candidates of a vote whose responses are
+nearly identical, so that they can be voted on as a single candidate instead of splitting the votes between them.
+The similarity of two responses is estimated with MinHash signatures over their shingles of words.
+"""
+import functools
+import hashlib
+import random
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from defines import (
+    DUPLICATE_MIN_CHARACTERS_FOR_PROCESS_POOL,
+    DUPLICATE_MINHASH_NUMBER_OF_HASHES,
+    DUPLICATE_SHINGLE_SIZE,
+    DUPLICATE_SIMILARITY_THRESHOLD,
+)
+from errors import InvalidParameterError
+
+# The hashes of the shingles are permuted modulo this prime, which is larger than any of them
+_MERSENNE_PRIME = 2**61 - 1
+_MAX_HASH = 2**32 - 1
+
+# The same permutations are used in every process, so that their signatures can be compared
+_PERMUTATIONS_SEED = 0
+
+
+def create_shingles(text, shingle_size=DUPLICATE_SHINGLE_SIZE):
+    """Splits a text into its overlapping sequences of words, ignoring case and spacing.
+
+    Args:
+        text (str): the text
+        shingle_size (int, optional): how many words every shingle has
+
+    Returns:
+        set[str]: the shingles. A text with fewer words than 'shingle_size' is a single shingle.
+    """
+    words = text.lower().split()
+
+    if len(words) <= shingle_size:
+        return {" ".join(words)}
+
+    return {
+        " ".join(words[i : i + shingle_size])
+        for i in range(len(words) - shingle_size + 1)
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _create_permutations(number_of_hashes):
+    random_generator = random.Random(_PERMUTATIONS_SEED)
+
+    return [
+        (
+            random_generator.randrange(1, _MERSENNE_PRIME),
+            random_generator.randrange(0, _MERSENNE_PRIME),
+        )
+        for _ in range(number_of_hashes)
+    ]
+
+
+def create_minhash_signature(
+    text,
+    number_of_hashes=DUPLICATE_MINHASH_NUMBER_OF_HASHES,
+    shingle_size=DUPLICATE_SHINGLE_SIZE,
+):
+    """Creates the MinHash signature of a text: for every permutation of the hashes of its shingles, the lowest one.
+    The fraction of positions in which the signatures of two texts match estimates the Jaccard similarity of their shingles.
+
+    Args:
+        text (str): the text
+        number_of_hashes (int, optional): how many permutations the signature has. More are more precise, and slower.
+        shingle_size (int, optional): how many words every shingle has
+
+    Returns:
+        tuple[int]: the signature
+    """
+    hashes = [
+        int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf8"), digest_size=4).digest(), "big"
+        )
+        for shingle in create_shingles(text, shingle_size)
+    ]
+
+    return tuple(
+        min((a * hash_ + b) % _MERSENNE_PRIME for hash_ in hashes) & _MAX_HASH
+        for a, b in _create_permutations(number_of_hashes)
+    )
+
+
+def estimate_similarity(signature, other_signature):
+    return sum(
+        value == other_value for value, other_value in zip(signature, other_signature)
+    ) / len(signature)
+
+
+class DuplicateCollapsing:
+    """Groups the candidates of a vote whose responses are near-duplicates of each other. The signatures of long responses
+    are created in a pool of processes, which is only started the first time it's needed. It also counts the candidates
+    that it collapsed, across every vote.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold=DUPLICATE_SIMILARITY_THRESHOLD,
+        number_of_hashes=DUPLICATE_MINHASH_NUMBER_OF_HASHES,
+        shingle_size=DUPLICATE_SHINGLE_SIZE,
+        min_characters_for_process_pool=DUPLICATE_MIN_CHARACTERS_FOR_PROCESS_POOL,
+        max_workers=None,
+    ):
+        """Creates the criteria to collapse near-duplicates.
+
+        Args:
+            similarity_threshold (float, optional): between 0 and 1, how similar two responses must be estimated to be
+                to count as near-duplicates
+            number_of_hashes (int, optional): how many permutations the MinHash signatures have
+            shingle_size (int, optional): how many words every shingle has
+            min_characters_for_process_pool (int, optional): how many characters the responses of a vote must have
+                among all of them for their signatures to be created in the pool of processes
+            max_workers (int | None, optional): how many processes the pool has. If None, as many as processors.
+
+        Raises:
+            InvalidParameterError: if the threshold isn't between 0 and 1, or the number of hashes or the size of the shingles is lower than 1
+        """
+        if not 0 < similarity_threshold <= 1:
+            raise InvalidParameterError(
+                f"The DuplicateCollapsing requires a similarity threshold between 0 and 1, but it was {similarity_threshold}"
+            )
+
+        if number_of_hashes < 1 or shingle_size < 1:
+            raise InvalidParameterError(
+                f"The DuplicateCollapsing requires at least 1 hash and shingles of at least 1 word, but they were {number_of_hashes} and {shingle_size}"
+            )
+
+        self._similarity_threshold = similarity_threshold
+        self._create_signature_function = functools.partial(
+            create_minhash_signature,
+            number_of_hashes=number_of_hashes,
+            shingle_size=shingle_size,
+        )
+        self._min_characters_for_process_pool = min_characters_for_process_pool
+        self._max_workers = max_workers
+
+        self._process_pool = None
+
+        self._number_of_collapsed_candidates = 0
+
+        self._lock = Lock()
+
+    def get_number_of_collapsed_candidates(self):
+        with self._lock:
+            return self._number_of_collapsed_candidates
+
+    def _get_process_pool(self):
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(self._max_workers)
+
+            return self._process_pool
+
+    def create_signatures(self, texts):
+        """Creates the MinHash signatures of the texts, in the pool of processes if they're long enough.
+
+        Args:
+            texts (list[str]): the texts
+
+        Returns:
+            list[tuple[int]]: their signatures, in the same order
+        """
+        if (
+            len(texts) > 1
+            and sum(len(text) for text in texts)
+            >= self._min_characters_for_process_pool
+        ):
+            return list(
+                self._get_process_pool().map(self._create_signature_function, texts)
+            )
+
+        return [self._create_signature_function(text) for text in texts]
+
+    def find_clusters(self, texts):
+        """Groups the texts that are near-duplicates. Near-duplicates of near-duplicates end up in the same group.
+
+        Args:
+            texts (list[str]): the texts, such as the responses of the candidates of a vote
+
+        Returns:
+            list[list[int]]: the positions of the texts of every group, in the order of their first texts
+        """
+        signatures = self.create_signatures(texts)
+
+        # Union-find, where every group is represented by the position of its first text
+        representatives = list(range(len(texts)))
+
+        def find_representative(i):
+            while representatives[i] != i:
+                representatives[i] = representatives[representatives[i]]
+                i = representatives[i]
+
+            return i
+
+        for i, signature in enumerate(signatures):
+            for j in range(i):
+                if (
+                    estimate_similarity(signature, signatures[j])
+                    >= self._similarity_threshold
+                ):
+                    first, second = sorted(
+                        (find_representative(i), find_representative(j))
+                    )
+                    representatives[second] = first
+
+        clusters = {}
+
+        for i in range(len(texts)):
+            clusters.setdefault(find_representative(i), []).append(i)
+
+        with self._lock:
+            self._number_of_collapsed_candidates += len(texts) - len(clusters)
+
+        return list(clusters.values())
+
+    def close(self):
+        """Shuts the pool of processes down, if it was started."""
+        with self._lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown()
+                self._process_pool = None
@@ -0,0 +1,122 @@
+"""This module contains the class EarlyStopping, that decides when the votes requested so far already
+determine the winners of a vote, so that the rest of its votes don't need to be requested.
+"""
+import math
+from statistics import NormalDist
+from threading import Lock
+from errors import InvalidParameterError
+
+
+class EarlyStopping:
+    """Stops requesting the votes of a vote once the winners can't change. By default, only once the remaining votes
+    couldn't change them even if all of them went to the runner-up. With a confidence, as soon as the probability
+    that they change, assuming the remaining votes are distributed like the ones so far, is below 1 - confidence.
+    It also counts the votes that it saved, across every vote it decided.
+    """
+
+    def __init__(self, confidence=None, batch_size=1):
+        """Creates the early stopping criteria.
+
+        Args:
+            confidence (float | None, optional): if set, between 0 and 1, the confidence with which the winners
+                must be decided to stop. If None, they must be certain.
+            batch_size (int, optional): how many votes are requested at once between checks
+
+        Raises:
+            InvalidParameterError: if the confidence isn't between 0 and 1, or the batch size is lower than 1
+        """
+        if confidence is not None and not 0 < confidence < 1:
+            raise InvalidParameterError(
+                f"The EarlyStopping requires a confidence between 0 and 1, but it was {confidence}"
+            )
+
+        if batch_size < 1:
+            raise InvalidParameterError(
+                f"The EarlyStopping requires a batch size of at least 1, but it was {batch_size}"
+            )
+
+        self._confidence = confidence
+        self._batch_size = batch_size
+
+        self._number_of_saved_votes = 0
+        self._number_of_requested_votes = 0
+
+        self._lock = Lock()
+
+    def get_batch_size(self):
+        return self._batch_size
+
+    def get_number_of_saved_votes(self):
+        with self._lock:
+            return self._number_of_saved_votes
+
+    def get_number_of_requested_votes(self):
+        with self._lock:
+            return self._number_of_requested_votes
+
+    def register_votes(self, number_of_requested_votes, number_of_saved_votes):
+        """Registers how many votes of a vote were requested, and how many weren't needed."""
+        with self._lock:
+            self._number_of_requested_votes += number_of_requested_votes
+            self._number_of_saved_votes += number_of_saved_votes
+
+    def _is_probably_decided(
+        self, votes, winner_votes, runner_up_votes, remaining_votes
+    ):
+        # Proportions smoothed by one vote per candidate, so that a vote without votes yet isn't considered certain
+        total_votes = sum(votes) + len(votes)
+
+        winner_proportion = (winner_votes + 1) / total_votes
+        runner_up_proportion = (runner_up_votes + 1) / total_votes
+
+        # Mean and variance of how the gap between both changes over the remaining votes
+        mean_of_final_gap = (
+            winner_votes
+            - runner_up_votes
+            + remaining_votes * (winner_proportion - runner_up_proportion)
+        )
+        variance_of_final_gap = remaining_votes * (
+            winner_proportion
+            + runner_up_proportion
+            - (winner_proportion - runner_up_proportion) ** 2
+        )
+
+        if mean_of_final_gap <= 0:
+            return False
+
+        return mean_of_final_gap > NormalDist().inv_cdf(self._confidence) * math.sqrt(
+            variance_of_final_gap
+        )
+
+    def is_decided(self, votes, number_of_winners, remaining_votes):
+        """Determines whether the candidates that will win are already decided.
+
+        Args:
+            votes (list[int]): the votes of every candidate so far
+            number_of_winners (int): how many of the candidates win
+            remaining_votes (int): how many votes could still be requested
+
+        Returns:
+            bool: whether the remaining votes aren't needed
+        """
+        if remaining_votes <= 0 or number_of_winners >= len(votes):
+            return True
+
+        if number_of_winners <= 0:
+            return True
+
+        sorted_votes = sorted(votes, reverse=True)
+
+        # The last of the winners, and the first of the rest
+        winner_votes = sorted_votes[number_of_winners - 1]
+        runner_up_votes = sorted_votes[number_of_winners]
+
+        if winner_votes > runner_up_votes + remaining_votes:
+            return True
+
+        if self._confidence is None:
+            return False
+
+        return self._is_probably_decided(
+            votes, winner_votes, runner_up_votes, remaining_votes
+        )
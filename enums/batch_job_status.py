@@ -0,0 +1,18 @@
+"""This module contains the Enum that determines whether a batch job of requests to the AI model has finished
+"""
+from enum import Enum
+
+
+class BatchJobStatus(Enum):
+    """Whether a batch job submitted to a provider has finished, as reported by the provider
+
+    Args:
+        Enum (Enum): the base Enum class
+    """
+
+    # The job is still being validated, queued or answered
+    IN_PROGRESS = 1
+    # Every request of the job was answered, or failed on its own, and the results can be read
+    COMPLETED = 2
+    # The job as a whole failed, expired or was cancelled
+    FAILED = 3
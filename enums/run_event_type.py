@@ -0,0 +1,25 @@
+"""This module contains the Enum that determines what happened in a run of a tree of thoughts
+"""
+from enum import Enum
+
+
+class RunEventType(Enum):
+    """What happened in a run of a tree of thoughts, as told to the hooks of the run
+
+    Args:
+        Enum (Enum): the base Enum class
+    """
+
+    # The nodes of a layer are about to be processed
+    LAYER_STARTED = 1
+    # The winners of a layer have been chosen
+    LAYER_FINISHED = 2
+    # An attempt to send a request for responses or votes to the AI model starts, once it has left the queues
+    # of the scheduler and the limits of concurrency. Every retry of a request is an attempt of its own.
+    REQUEST_STARTED = 3
+    # An attempt to send a request to the AI model was answered, or failed
+    REQUEST_FINISHED = 4
+    # A response or vote was found in the response cache, so it didn't need a request
+    CACHE_HIT = 5
+    # A vote was extracted from a response of the AI model
+    VOTE_PARSED = 6
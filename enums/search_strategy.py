@@ -0,0 +1,20 @@
+"""This module contains the Enum that determines how a tree of thoughts searches for its winners
+"""
+from enum import Enum
+
+
+class SearchStrategy(Enum):
+    """How the nodes of a tree of thoughts are chosen to be expanded
+
+    Args:
+        Enum (Enum): the base Enum class
+    """
+
+    # Every layer expands the winners of the previous one, a layer at a time
+    LAYER_SYNCHRONOUS = 1
+    # Like LAYER_SYNCHRONOUS, but the winners that every layer expands are limited so that
+    # the node expansions of the whole run fit in its budget
+    BEAM = 2
+    # The most voted node of the whole tree that hasn't been expanded yet is expanded next, and the votes are among
+    # its children alone, until the winners are the most voted nodes of the last layer or the budget is spent
+    BEST_FIRST = 3
@@ -0,0 +1,21 @@
+"""This module contains the Enum that determines how winners with the same number of votes are ordered
+"""
+from enum import Enum
+
+
+class Tiebreak(Enum):
+    """How the nodes with the same number of votes are ordered when the winners are chosen.
+    Whichever tiebreak is used, the nodes that still tie are ordered like in the tree.
+
+    Args:
+        Enum (Enum): the base Enum class
+    """
+
+    # The order of the nodes in a pre-order walk of the tree
+    TREE_ORDER = 1
+    # The order in which the nodes were created
+    CREATION_ORDER = 2
+    # The nodes with the shortest responses first
+    SHORTEST_RESPONSE = 3
+    # The nodes with the longest responses first
+    LONGEST_RESPONSE = 4
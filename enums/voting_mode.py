@@ -0,0 +1,23 @@
+"""This module contains the Enum that determines how the candidates of a layer are voted on
+"""
+from enum import Enum
+
+
+class VotingMode(Enum):
+    """How the responses of a layer of states are voted on
+
+    Args:
+        Enum (Enum): the base Enum class
+    """
+
+    # A single vote prompt contains every unresolved leaf node of the layer
+    STANDARD = 1
+    # Each vote prompt only contains the children of one of the previous winners,
+    # and is requested as soon as those children have their responses
+    SIBLING_GROUPS = 2
+    # The candidates are split into small groups that are voted on concurrently, and the winners
+    # of every group advance to the next round, until only the winners of the layer are left
+    TOURNAMENT = 3
+    # Every candidate is scored on its own, in a prompt that only contains its response, so that the prompts
+    # can be requested concurrently and cached by the content of the candidate. The scores are added to its votes
+    SCORING = 4
@@ -10,13 +10,49 @@ class RequestToAiModelFailedError(Exception):
     pass
 
 
+class RequestToAiModelThrottledError(RequestToAiModelFailedError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+
+        # How many seconds the AI model asked to wait before retrying, if it said so
+        self.retry_after = retry_after
+
+
+class RequestToAiModelTimedOutError(RequestToAiModelFailedError):
+    pass
+
+
+class RequestToAiModelUnavailableError(RequestToAiModelFailedError):
+    pass
+
+
+class PromptExceedsContextWindowError(Exception):
+    pass
+
+
 class UnableToExtractVoteFromResponse(Exception):
     pass
 
 
+class UnableToExtractScoreFromResponse(Exception):
+    pass
+
+
 class InvalidStateTypeError(Exception):
     pass
 
 
 class AncestorStateTypeNotFoundError(Exception):
     pass
+
+
+class InvalidVotingModeError(Exception):
+    pass
+
+
+class InvalidCheckpointError(Exception):
+    pass
+
+
+class BudgetExceededError(Exception):
+    pass
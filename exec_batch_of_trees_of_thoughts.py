@@ -0,0 +1,155 @@
+import argparse
+import glob
+import os
+from colorama import Fore
+from ai_model_client import AiModelClient
+from batch_runner import BatchRunner
+from defines import (
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    RUN_STORE_FILE_PATH,
+    TREES_OF_THOUGHTS_DIRECTORY,
+)
+from enums.state_type import StateType
+from errors import (
+    InvalidParameterError,
+    InvalidStateTypeError,
+    InvalidVotingModeError,
+    MissingContextFileError,
+)
+
+from json_utils import convert_raw_json_data, load_tree_of_thoughts
+from output import output_message
+from request_scheduling import RequestScheduler
+from run_store import RunStore
+from state import State
+from tree_of_thoughts import TreeOfThoughts
+
+
+def find_names_of_all_trees_of_thoughts():
+    return sorted(
+        os.path.splitext(os.path.basename(file_path))[0]
+        for file_path in glob.glob(f"{TREES_OF_THOUGHTS_DIRECTORY}/*.json")
+    )
+
+
+def create_tree_of_thoughts(tree_of_thoughts_name):
+    json_data = convert_raw_json_data(
+        tree_of_thoughts_name, load_tree_of_thoughts(tree_of_thoughts_name)
+    )
+
+    return TreeOfThoughts(
+        tree_of_thoughts_name,
+        State(json_data["context"], StateType.CONTEXT),
+        json_data["state_layers"],
+        json_data["number_of_steps"],
+        json_data["breadth"],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Executes many trees of thoughts at once, sharing the connections to the AI model and its quotas"
+    )
+    parser.add_argument(
+        "tree_of_thoughts_names",
+        nargs="*",
+        help="Names of the trees of thoughts (json names must match)",
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help=f"Execute every tree of thoughts in '{TREES_OF_THOUGHTS_DIRECTORY}'",
+    )
+    parser.add_argument(
+        "--max-concurrent-requests",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENT_REQUESTS,
+        help="How many requests can be in flight at once, among all the trees of thoughts",
+    )
+    parser.add_argument(
+        "--run-store",
+        action="store_true",
+        help="Keep the responses, votes and winners in a single database rather than a file for each (see export_run_store.py)",
+    )
+
+    args = parser.parse_args()
+
+    tree_of_thoughts_names = list(args.tree_of_thoughts_names)
+
+    if args.all:
+        tree_of_thoughts_names += find_names_of_all_trees_of_thoughts()
+
+    # Removes the repeated names, keeping their order
+    tree_of_thoughts_names = list(dict.fromkeys(tree_of_thoughts_names))
+
+    if not tree_of_thoughts_names:
+        print("Error: Name at least a tree of thoughts, or pass --all")
+        return
+
+    try:
+        ai_model_client = AiModelClient(
+            connection_pool_size=args.max_concurrent_requests
+        )
+
+        batch_runner = BatchRunner(
+            args.max_concurrent_requests,
+            ai_model_client,
+            RequestScheduler(max_concurrency=args.max_concurrent_requests),
+        )
+    except InvalidParameterError as exception:
+        print(f"Error:\n{exception}")
+        return
+
+    run_store = None
+
+    if args.run_store:
+        run_store = RunStore(RUN_STORE_FILE_PATH, compress=True)
+
+    for tree_of_thoughts_name in tree_of_thoughts_names:
+        try:
+            tree_of_thoughts = create_tree_of_thoughts(tree_of_thoughts_name)
+        except (
+            FileNotFoundError,
+            InvalidStateTypeError,
+            InvalidVotingModeError,
+            MissingContextFileError,
+            UnicodeDecodeError,
+        ) as exception:
+            print(
+                f"Skipping the tree of thoughts '{tree_of_thoughts_name}':\n{exception}"
+            )
+            continue
+
+        if run_store is not None:
+            tree_of_thoughts.set_run_store(run_store)
+
+        tree_of_thoughts.activate_create_files()
+        tree_of_thoughts.activate_checkpoints()
+
+        batch_runner.add_tree_of_thoughts(tree_of_thoughts)
+
+    try:
+        results = batch_runner.run()
+    finally:
+        ai_model_client.close()
+
+        if run_store is not None:
+            run_store.close()
+
+    for result in results:
+        if result["error"] is None:
+            output_message(
+                Fore.LIGHTGREEN_EX,
+                f"{result['name']}: finished with {len(result['winners'])} winners in {result['wall_time']:.1f} seconds",
+                True,
+            )
+        else:
+            output_message(
+                Fore.LIGHTRED_EX,
+                f"{result['name']}: failed after {result['wall_time']:.1f} seconds: {result['error']}",
+                True,
+            )
+
+
+if __name__ == "__main__":
+    main()
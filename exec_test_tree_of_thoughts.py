@@ -1,7 +1,7 @@
 import argparse
 from defines import INSTRUCT_GPT_PROMPT_ANSWER_OPENING, INSTRUCT_GPT_PROMPT_HEADER
 from enums.state_type import StateType
-from errors import InvalidStateTypeError
+from errors import InvalidStateTypeError, InvalidVotingModeError
 
 from json_utils import convert_raw_json_data, load_tree_of_thoughts
 from state import State
@@ -28,7 +28,7 @@ def main():
             args.tree_of_thoughts_name,
             load_tree_of_thoughts(args.tree_of_thoughts_name),
         )
-    except InvalidStateTypeError as exception:
+    except (InvalidStateTypeError, InvalidVotingModeError) as exception:
         print(f"Error:\n{exception}")
         return
     except UnicodeDecodeError as exception:
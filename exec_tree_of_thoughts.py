@@ -1,10 +1,26 @@
 import argparse
 from colorama import Fore
+from ai_model_client import AiModelClient
+from batch_jobs import AiModelBatchJobProvider, BatchJobs
+from budget import RunBudget
+from defines import RUN_STORE_FILE_PATH
+from duplicate_collapsing import DuplicateCollapsing
+from enums.search_strategy import SearchStrategy
 from enums.state_type import StateType
-from errors import InvalidStateTypeError, RequestToAiModelFailedError
+from errors import (
+    InvalidCheckpointError,
+    InvalidParameterError,
+    InvalidStateTypeError,
+    InvalidVotingModeError,
+    PromptExceedsContextWindowError,
+    RequestToAiModelFailedError,
+)
 
 from json_utils import convert_raw_json_data, load_tree_of_thoughts
 from output import output_message
+from request_scheduling import RequestScheduler
+from run_store import RunStore
+from speculation import Speculation
 from state import State
 from tree_of_thoughts import TreeOfThoughts
 
@@ -17,6 +33,58 @@ def main():
         "tree_of_thoughts_name",
         help="Name of the tree of thoughts (json name must match)",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the checkpoint of the last run, rather than starting over",
+    )
+    parser.add_argument(
+        "--run-store",
+        action="store_true",
+        help="Keep the responses, votes and winners in a single database rather than a file for each (see export_run_store.py)",
+    )
+
+    parser.add_argument(
+        "--stream-votes",
+        action="store_true",
+        help="Stop reading every vote as soon as it's given, rather than waiting for the rest of its response",
+    )
+    parser.add_argument(
+        "--collapse-duplicates",
+        action="store_true",
+        help="Vote on the answers that are nearly identical as one, rather than letting them split the votes",
+    )
+    parser.add_argument(
+        "--speculate",
+        action="store_true",
+        help="Start generating the next layer under the answers that are certain to win, before their votes are over",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Send the prompts of every layer as offline batch jobs, which can take hours but cost less",
+    )
+    parser.add_argument(
+        "--search",
+        choices=[search_strategy.name.lower() for search_strategy in SearchStrategy],
+        default=SearchStrategy.LAYER_SYNCHRONOUS.name.lower(),
+        help="How the nodes to expand are chosen. Every strategy except 'layer_synchronous' requires --max-node-expansions",
+    )
+    parser.add_argument(
+        "--max-node-expansions",
+        type=int,
+        help="How many nodes the search can expand, each of them into as many children as the number of steps",
+    )
+    parser.add_argument(
+        "--max-cost",
+        type=float,
+        help="Stop the run, keeping the winners so far, once it has cost this many dollars",
+    )
+    parser.add_argument(
+        "--soft-max-cost",
+        type=float,
+        help="Shrink the remaining layers once the run has cost this many dollars",
+    )
 
     args = parser.parse_args()
 
@@ -29,7 +97,7 @@ def main():
             args.tree_of_thoughts_name,
             load_tree_of_thoughts(args.tree_of_thoughts_name),
         )
-    except InvalidStateTypeError as exception:
+    except (InvalidStateTypeError, InvalidVotingModeError) as exception:
         print(f"Error:\n{exception}")
         return
     except UnicodeDecodeError as exception:
@@ -45,8 +113,67 @@ def main():
     )
 
     tree_of_thoughts.activate_visual_output()
+
+    try:
+        tree_of_thoughts.set_search_strategy(
+            SearchStrategy[args.search.upper()], args.max_node_expansions
+        )
+    except InvalidParameterError as exception:
+        print(f"Error:\n{exception}")
+        return
+
+    run_store = None
+
+    if args.run_store:
+        run_store = RunStore(RUN_STORE_FILE_PATH, compress=True)
+        tree_of_thoughts.set_run_store(run_store)
+
     tree_of_thoughts.activate_create_files()
 
+    tree_of_thoughts.set_request_scheduler(RequestScheduler())
+
+    tree_of_thoughts.activate_checkpoints()
+
+    if args.stream_votes:
+        tree_of_thoughts.activate_streaming_votes()
+
+    duplicate_collapsing = None
+
+    if args.collapse_duplicates:
+        duplicate_collapsing = DuplicateCollapsing()
+        tree_of_thoughts.set_duplicate_collapsing(duplicate_collapsing)
+
+    speculation = None
+
+    if args.speculate:
+        speculation = Speculation()
+        tree_of_thoughts.set_speculation(speculation)
+
+    batch_ai_model_client = None
+
+    if args.batch:
+        batch_ai_model_client = AiModelClient()
+        tree_of_thoughts.set_batch_jobs(
+            BatchJobs(AiModelBatchJobProvider(batch_ai_model_client))
+        )
+
+    if args.max_cost is not None or args.soft_max_cost is not None:
+        tree_of_thoughts.set_budget(
+            RunBudget(soft_max_cost=args.soft_max_cost, hard_max_cost=args.max_cost)
+        )
+
+    if args.resume:
+        try:
+            if not tree_of_thoughts.resume_from_checkpoint():
+                output_message(
+                    Fore.LIGHTYELLOW_EX,
+                    "There is no checkpoint to resume from, so the tree of thoughts will start over.",
+                    True,
+                )
+        except InvalidCheckpointError as exception:
+            print(f"Error:\n{exception}")
+            return
+
     try:
         tree_of_thoughts.process_tree_of_thoughts()
     except RequestToAiModelFailedError as exception:
@@ -55,6 +182,29 @@ def main():
             f"Execution of the tree of thoughts failed while requesting a response from the AI model: {exception}",
             True,
         )
+    except PromptExceedsContextWindowError as exception:
+        output_message(
+            Fore.LIGHTRED_EX,
+            f"Execution of the tree of thoughts stopped before sending a prompt that doesn't fit in the context window of the AI model: {exception}",
+            True,
+        )
+    finally:
+        if run_store is not None:
+            run_store.close()
+
+        if duplicate_collapsing is not None:
+            duplicate_collapsing.close()
+
+        if batch_ai_model_client is not None:
+            batch_ai_model_client.close()
+
+        if speculation is not None and speculation.get_hit_rate() is not None:
+            output_message(
+                Fore.LIGHTBLUE_EX,
+                f"{speculation.get_number_of_used_responses()} of the {speculation.get_number_of_speculated_responses()} "
+                + f"responses generated speculatively were used ({speculation.get_hit_rate():.0%})",
+                True,
+            )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+import argparse
+import os
+from defines import RUN_STORE_FILE_PATH, TREES_OF_THOUGHTS_DIRECTORY
+
+from run_store import RunStore
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exports the runs kept in a run store as a file for each response, vote and winner"
+    )
+    parser.add_argument(
+        "tree_of_thoughts_names",
+        nargs="*",
+        help="Names of the trees of thoughts whose runs are exported. If none, every run is exported",
+    )
+    parser.add_argument(
+        "--store",
+        default=RUN_STORE_FILE_PATH,
+        help=f"Path of the run store (default: {RUN_STORE_FILE_PATH})",
+    )
+    parser.add_argument(
+        "--output",
+        default=TREES_OF_THOUGHTS_DIRECTORY,
+        help=f"Directory that the files of every run are written under (default: {TREES_OF_THOUGHTS_DIRECTORY})",
+    )
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.store):
+        print(f"Error: There is no run store at {args.store}")
+        return
+
+    run_store = RunStore(args.store)
+
+    run_names = args.tree_of_thoughts_names or run_store.get_run_names()
+
+    for run_name in run_names:
+        directory_path = os.path.join(args.output, run_name.lower())
+
+        number_of_files = run_store.export_artifacts(run_name, directory_path)
+
+        print(f"Exported {number_of_files} file(s) of '{run_name}' to {directory_path}")
+
+    run_store.close()
+
+
+if __name__ == "__main__":
+    main()
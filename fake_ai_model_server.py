@@ -0,0 +1,344 @@
+"""This module contains a local stand-in for an OpenAI-compatible chat completions API, so that
+the requests to the AI model can be exercised without a network connection or spending tokens.
+"""
+import json
+import math
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from defines import MAX_SCORE, SCORING_STRING_FOR_AI_MODEL, VOTING_STRING_FOR_AI_MODEL
+
+
+def create_fake_response(prompt):
+    """Answers vote prompts with a valid vote, score prompts with a valid score, and any other prompt with a short text.
+
+    Args:
+        prompt (str): the prompt received by the fake server
+
+    Returns:
+        str: the response to the prompt
+    """
+    if VOTING_STRING_FOR_AI_MODEL in prompt:
+        return VOTING_STRING_FOR_AI_MODEL.replace("X", "1")
+
+    if SCORING_STRING_FOR_AI_MODEL in prompt:
+        return SCORING_STRING_FOR_AI_MODEL.replace("X", str(MAX_SCORE))
+
+    return "Fake response."
+
+
+def create_random_fake_response_function(seed=None):
+    """Creates a function that answers vote prompts with a valid vote for a random answer among those of the prompt,
+    score prompts with a random valid score, and any other prompt with a numbered text, so that the responses of siblings differ like those of a real model.
+
+    Args:
+        seed (int | None, optional): the seed of the random votes, for repeatable runs
+
+    Returns:
+        Callable[[str], str]: the function that produces the response to every prompt
+    """
+    random_generator = random.Random(seed)
+    lock = Lock()
+
+    number_of_responses = 0
+
+    def create_random_fake_response(prompt):
+        nonlocal number_of_responses
+
+        with lock:
+            if VOTING_STRING_FOR_AI_MODEL in prompt:
+                number_of_answers = max(len(re.findall(r"\nAnswer \d+:", prompt)), 1)
+
+                return VOTING_STRING_FOR_AI_MODEL.replace(
+                    "X", str(random_generator.randint(1, number_of_answers))
+                )
+
+            if SCORING_STRING_FOR_AI_MODEL in prompt:
+                return SCORING_STRING_FOR_AI_MODEL.replace(
+                    "X", str(random_generator.randint(1, MAX_SCORE))
+                )
+
+            number_of_responses += 1
+
+            return f"Fake response {number_of_responses}."
+
+    return create_random_fake_response
+
+
+def create_constant_latency_profile(seconds):
+    """Creates a latency profile in which every request takes the same time.
+
+    Args:
+        seconds (float): the latency of every request
+
+    Returns:
+        Callable[[random.Random], float]: the latency profile
+    """
+    return lambda random_generator: seconds
+
+
+def create_uniform_latency_profile(min_seconds, max_seconds):
+    """Creates a latency profile in which the latencies are spread evenly between a minimum and a maximum.
+
+    Args:
+        min_seconds (float): the minimum latency
+        max_seconds (float): the maximum latency
+
+    Returns:
+        Callable[[random.Random], float]: the latency profile
+    """
+    return lambda random_generator: random_generator.uniform(min_seconds, max_seconds)
+
+
+def create_lognormal_latency_profile(median_seconds, sigma):
+    """Creates a latency profile with a long tail, like those of real AI models: most requests take about
+    the median, and a few take several times longer.
+
+    Args:
+        median_seconds (float): the median latency
+        sigma (float): how long the tail is. 0 makes every latency the median.
+
+    Returns:
+        Callable[[random.Random], float]: the latency profile
+    """
+    return lambda random_generator: random_generator.lognormvariate(
+        math.log(median_seconds), sigma
+    )
+
+
+class _FakeHttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out close their connections before the answer is written. That's expected.
+        pass
+
+
+class _FakeAiModelRequestHandler(BaseHTTPRequestHandler):
+    # Needed for the connections to be kept alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send_json(self, status_code, body):
+        encoded_body = json.dumps(body).encode("utf8")
+
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded_body)))
+        self.end_headers()
+        self.wfile.write(encoded_body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("utf8") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _write_event(self, body):
+        self._write_chunk(f"data: {json.dumps(body)}\n\n".encode("utf8"))
+
+    def _send_stream(self, responses, stream_chunk_delay):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        # Every response is streamed word by word, and the responses are interleaved, like the OpenAI API does
+        pieces_of_responses = [
+            re.findall(r"\s*\S+", response) or [""] for response in responses
+        ]
+
+        for j in range(max(len(pieces) for pieces in pieces_of_responses)):
+            time.sleep(stream_chunk_delay)
+
+            for i, pieces in enumerate(pieces_of_responses):
+                if j >= len(pieces):
+                    continue
+
+                self._write_event(
+                    {
+                        "object": "chat.completion.chunk",
+                        "choices": [
+                            {
+                                "index": i,
+                                "delta": {"content": pieces[j]},
+                                "finish_reason": "stop"
+                                if j == len(pieces) - 1
+                                else None,
+                            }
+                        ],
+                    }
+                )
+
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        request_body = json.loads(
+            self.rfile.read(int(self.headers["Content-Length"])).decode("utf8")
+        )
+
+        fake_server = self.server.fake_ai_model_server
+
+        fake_server.register_request(self.path, self.headers, self.client_address)
+
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        if fake_server.should_throttle_request():
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        prompt = request_body["messages"][-1]["content"]
+
+        time.sleep(fake_server.get_response_delay())
+
+        if fake_server.should_fail_request():
+            self._send_json(500, {"error": {"message": "The fake server failed."}})
+            return
+
+        if request_body.get("stream"):
+            self._send_stream(
+                [
+                    fake_server.create_response(prompt)
+                    for _ in range(request_body.get("n", 1))
+                ],
+                fake_server.get_stream_chunk_delay(),
+            )
+            return
+
+        self._send_json(
+            200,
+            {
+                "object": "chat.completion",
+                "model": request_body.get("model"),
+                "choices": [
+                    {
+                        "index": i,
+                        "message": {
+                            "role": "assistant",
+                            "content": fake_server.create_response(prompt),
+                        },
+                        "finish_reason": "stop",
+                    }
+                    for i in range(request_body.get("n", 1))
+                ],
+            },
+        )
+
+
+class FakeAiModelServer:
+    """A local HTTP server that answers chat completion requests like the OpenAI API does.
+    It can be used as a context manager, which starts and stops it.
+    """
+
+    def __init__(
+        self,
+        create_response_function=create_fake_response,
+        response_delay=0,
+        number_of_throttled_requests=0,
+        latency_profile=None,
+        error_rate=0,
+        throttle_rate=0,
+        seed=None,
+        stream_chunk_delay=0,
+    ):
+        """Creates the server, bound to a free local port.
+
+        Args:
+            create_response_function (Callable[[str], str], optional): produces the response to every prompt received
+            response_delay (float, optional): how many seconds the server waits before answering each request
+            number_of_throttled_requests (int, optional): how many of the first requests are rejected with the status 429
+            latency_profile (Callable[[random.Random], float] | None, optional): draws how many seconds the server waits
+                before answering each request. Takes precedence over 'response_delay'.
+            error_rate (float, optional): the probability that a request fails with the status 500, after its latency
+            throttle_rate (float, optional): the probability that a request is rejected with the status 429, right away
+            seed (int | None, optional): the seed of the latencies, failures and throttles, for repeatable runs
+            stream_chunk_delay (float, optional): how many seconds the server waits before every word of the streamed responses
+        """
+        self._create_response_function = create_response_function
+        self._response_delay = response_delay
+        self._number_of_throttled_requests = number_of_throttled_requests
+        self._latency_profile = latency_profile
+        self._error_rate = error_rate
+        self._throttle_rate = throttle_rate
+        self._stream_chunk_delay = stream_chunk_delay
+
+        self._random_generator = random.Random(seed)
+
+        self._http_server = _FakeHttpServer(
+            ("127.0.0.1", 0), _FakeAiModelRequestHandler
+        )
+        self._http_server.fake_ai_model_server = self
+
+        self._thread = None
+
+        self._requests = []
+        self._lock = Lock()
+
+    def get_base_url(self):
+        host, port = self._http_server.server_address
+
+        return f"http://{host}:{port}/v1"
+
+    def get_response_delay(self):
+        if self._latency_profile is None:
+            return self._response_delay
+
+        with self._lock:
+            return max(self._latency_profile(self._random_generator), 0)
+
+    def get_stream_chunk_delay(self):
+        return self._stream_chunk_delay
+
+    def create_response(self, prompt):
+        return self._create_response_function(prompt)
+
+    def should_throttle_request(self):
+        with self._lock:
+            if self._number_of_throttled_requests <= 0:
+                return self._random_generator.random() < self._throttle_rate
+
+            self._number_of_throttled_requests -= 1
+
+            return True
+
+    def should_fail_request(self):
+        with self._lock:
+            return self._random_generator.random() < self._error_rate
+
+    def register_request(self, path, headers, client_address):
+        with self._lock:
+            self._requests.append(
+                {
+                    "path": path,
+                    "authorization": headers.get("Authorization"),
+                    "client_address": client_address,
+                }
+            )
+
+    def get_requests(self):
+        with self._lock:
+            return list(self._requests)
+
+    def start(self):
+        self._thread = Thread(target=self._http_server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._http_server.shutdown()
+        self._http_server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.stop()
@@ -10,18 +10,35 @@ def create_file_path_for_response(directory_path, node, i):
     return f"{directory_path}/{node.name.get_state_type().name.lower()}_{i + 1}.txt"
 
 
-def create_file_path_for_vote(directory_path, node, i):
+def create_file_path_for_vote(
+    directory_path, node, i, sibling_group_index=None, round_index=None
+):
+    if round_index is not None:
+        return f"{directory_path}/{node.name.get_state_type().name.lower()}_round_{round_index + 1}_group_{sibling_group_index + 1}_vote_{i + 1}.txt"
+
+    if sibling_group_index is not None:
+        return f"{directory_path}/{node.name.get_state_type().name.lower()}_group_{sibling_group_index + 1}_vote_{i + 1}.txt"
+
     return (
         f"{directory_path}/{node.name.get_state_type().name.lower()}_vote_{i + 1}.txt"
     )
 
 
+def create_file_path_for_score(directory_path, node, i):
+    # Named after the node itself, since a resumed layer only scores the nodes that weren't scored yet
+    return f"{directory_path}/{node.name.get_state_type().name.lower()}_node_{node.creation_index}_score_{i + 1}.txt"
+
+
 def create_file_path_for_winner(directory_path, node, i):
     return (
         f"{directory_path}/{node.name.get_state_type().name.lower()}_winner_{i + 1}.txt"
     )
 
 
+def create_file_path_for_checkpoint(directory_path):
+    return f"{directory_path}/checkpoint.json"
+
+
 def read_contents_of_file_if_it_exists(file_path):
     if os.path.isfile(file_path):
         with open(file_path, "r", encoding="utf8") as file:
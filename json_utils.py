@@ -3,7 +3,12 @@ import json
 
 from defines import TREES_OF_THOUGHTS_DIRECTORY
 from enums.state_type import StateType
-from errors import InvalidStateTypeError, MissingContextFileError
+from enums.voting_mode import VotingMode
+from errors import (
+    InvalidStateTypeError,
+    InvalidVotingModeError,
+    MissingContextFileError,
+)
 from file_utils import read_contents_of_file_if_it_exists
 
 
@@ -25,6 +30,7 @@ def convert_raw_json_data(tree_of_thoughts_name: str, raw_json_data: dict) -> di
     Raises:
         MissingContextFileError: if the context file for the tree of thoughts doesn't exist
         InvalidStateTypeError: if any of the state types contained in the json file are invalid
+        InvalidVotingModeError: if any of the voting modes contained in the json file are invalid
 
     Returns:
         dict: _description_
@@ -68,10 +74,22 @@ def convert_raw_json_data(tree_of_thoughts_name: str, raw_json_data: dict) -> di
                 error_message += f" is unrecognized.\nFix the json file of your tree of thoughts named '{tree_of_thoughts_name}'."
                 raise InvalidStateTypeError(error_message) from exception
 
+        # The voting mode is optional, and defaults to voting on the whole layer at once.
+        voting_mode = VotingMode.STANDARD
+
+        if state_layer.get("voting_mode") is not None:
+            try:
+                voting_mode = VotingMode[state_layer["voting_mode"]]
+            except KeyError as exception:
+                error_message = f"Failed to convert the raw json data to the program structures because the voting mode '{state_layer['voting_mode']}'"
+                error_message += f" is unrecognized.\nFix the json file of your tree of thoughts named '{tree_of_thoughts_name}'."
+                raise InvalidVotingModeError(error_message) from exception
+
         converted_json_data["state_layers"][i] = {
             "state_type": state_type_enum,
             "state_type_text": state_layer["state_type_text"],
             "include_ancestor_state_type_response": include_ancestor_state_type_response,
+            "voting_mode": voting_mode,
         }
 
     return converted_json_data
@@ -1,16 +1,101 @@
 from anytree import Node
+from compact_tree import CompactNode
 from enums.state_type import StateType
 from state import State
 
+ANCESTORS_BY_STATE_TYPE_CACHE_KEY = "ancestors_by_state_type"
+
 
 def create_child_state_node(
     state_type: StateType,
     state_type_related_text: str,
     include_ancestor_state_type_response: StateType | None,
     leaf_node: Node,
-):
+) -> Node:
     state = State(leaf_node.name.get_context(), state_type)
     state.set_state_type_related_text(state_type_related_text)
     state.set_include_ancestor_state_type_response(include_ancestor_state_type_response)
 
-    Node(state, parent=leaf_node)
+    return Node(state, parent=leaf_node)
+
+
+class DetachedChildNode:
+    """A child of a node that hasn't been added to its tree: it knows its parent, but its parent doesn't know it.
+    It allows creating the prompt that a child of the node would be sent, before deciding whether to add it.
+    """
+
+    __slots__ = ("name", "parent", "creation_index")
+
+    def __init__(self, state: State, parent):
+        self.name = state
+        self.parent = parent
+        self.creation_index = None
+
+
+def create_detached_child_state_node(
+    state_type: StateType,
+    state_type_related_text: str,
+    include_ancestor_state_type_response: StateType | None,
+    leaf_node,
+) -> DetachedChildNode:
+    state = State(leaf_node.name.get_context(), state_type)
+    state.set_state_type_related_text(state_type_related_text)
+    state.set_include_ancestor_state_type_response(include_ancestor_state_type_response)
+
+    return DetachedChildNode(state, leaf_node)
+
+
+def is_tree_node(node) -> bool:
+    """Determines whether 'node' is a node of either a Tree or a CompactTree."""
+    return isinstance(node, (Node, CompactNode))
+
+
+def get_cache_of_children(node) -> dict:
+    """Returns the dict stored along 'node' in which the values shared by all its children are cached,
+    such as the fragments of their prompts.
+
+    Args:
+        node (Node | CompactNode): a node of either a Tree or a CompactTree
+
+    Returns:
+        dict: the cache
+    """
+    cache_of_children = getattr(node, "cache_of_children", None)
+
+    if cache_of_children is None:
+        cache_of_children = {}
+        node.cache_of_children = cache_of_children
+
+    return cache_of_children
+
+
+def get_ancestors_by_state_type(node) -> dict:
+    """Returns the ancestors of 'node' by their state types. The map is built once per parent,
+    from the map of the parent itself, so finding an ancestor of a state type doesn't require a walk of the ancestors.
+
+    Args:
+        node (Node | CompactNode): a node of either a Tree or a CompactTree
+
+    Returns:
+        dict[StateType, Node | CompactNode]: for every state type among the ancestors, the first one found from the root
+    """
+    parent_node = node.parent
+
+    if parent_node is None:
+        return {}
+
+    cache_of_siblings = get_cache_of_children(parent_node)
+
+    ancestors_by_state_type = cache_of_siblings.get(ANCESTORS_BY_STATE_TYPE_CACHE_KEY)
+
+    if ancestors_by_state_type is None:
+        ancestors_by_state_type = dict(get_ancestors_by_state_type(parent_node))
+
+        # Like a walk of the ancestors from the root, the outermost ancestor of a state type is kept
+        ancestors_by_state_type.setdefault(
+            parent_node.name.get_state_type(), parent_node
+        )
+
+        cache_of_siblings[ANCESTORS_BY_STATE_TYPE_CACHE_KEY] = ancestors_by_state_type
+
+    return ancestors_by_state_type
@@ -1,10 +1,35 @@
 import re
 
 
+VOTE_PATTERN = r"best answer is number (\d+)"
+SCORE_PATTERN = r"score is (\d+)"
+
+
 def extract_vote(text):
-    pattern = r"best answer is number (\d+)"
+    pattern = VOTE_PATTERN
     match = re.search(pattern, text)
     if match:
         return int(match.group(1))
 
     return None
+
+
+def extract_score(text):
+    match = re.search(SCORE_PATTERN, text)
+    if match:
+        return int(match.group(1))
+
+    return None
+
+
+def contains_complete_vote(text):
+    """Whether a response that is still being generated already contains its whole vote. The number of the vote
+    must be followed by something else, since 'number 1' could still become 'number 12'.
+
+    Args:
+        text (str): the response so far
+
+    Returns:
+        bool: whether the vote can be extracted from it already
+    """
+    return re.search(VOTE_PATTERN + r"\D", text.lower()) is not None
@@ -0,0 +1,409 @@
+"""This module contains the class RequestScheduler, that sits between the engine and the function that
+requests samples from the AI model. It keeps the requests within the quotas of the AI model, retries
+the ones that fail temporarily, and adapts how many are sent at once to the throttling it observes.
+"""
+import asyncio
+import math
+import random
+import time
+from threading import Condition, Lock
+from defines import (
+    AI_MODEL_MAX_TOKENS,
+    AI_MODEL_REQUESTS_PER_MINUTE,
+    AI_MODEL_TOKENS_PER_MINUTE,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    INITIAL_RETRY_BACKOFF,
+    MAX_RETRIES_OF_REQUEST_TO_AI_MODEL,
+    MAX_RETRY_BACKOFF,
+)
+from errors import (
+    InvalidParameterError,
+    RequestToAiModelFailedError,
+    RequestToAiModelThrottledError,
+    RequestToAiModelTimedOutError,
+    RequestToAiModelUnavailableError,
+)
+from token_counting import count_tokens_of_prompt
+
+RETRYABLE_ERRORS = (
+    RequestToAiModelThrottledError,
+    RequestToAiModelTimedOutError,
+    RequestToAiModelUnavailableError,
+)
+
+# Additive increase / multiplicative decrease of the concurrency limit
+CONCURRENCY_ADDITIVE_INCREASE = 1
+CONCURRENCY_MULTIPLICATIVE_DECREASE = 0.5
+
+
+def estimate_tokens_of_request(prompt, number_of_samples):
+    """Estimates how many tokens a request counts against the quota: its prompt, plus the
+    maximum tokens that every sample could generate.
+
+    Args:
+        prompt (str): the prompt of the request
+        number_of_samples (int): how many samples are requested
+
+    Returns:
+        int: the estimated tokens
+    """
+    return count_tokens_of_prompt(prompt) + AI_MODEL_MAX_TOKENS * number_of_samples
+
+
+class TokenBucket:
+    """A bucket that refills continuously up to its capacity, from which every request takes an amount."""
+
+    def __init__(self, capacity, refill_per_second):
+        self._capacity = capacity
+        self._refill_per_second = refill_per_second
+
+        self._available = capacity
+        self._last_refill = time.monotonic()
+
+        self._lock = Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+
+        self._available = min(
+            self._capacity,
+            self._available + (now - self._last_refill) * self._refill_per_second,
+        )
+        self._last_refill = now
+
+    def try_take(self, amount):
+        """Takes 'amount' from the bucket if it's available.
+
+        Args:
+            amount (float): how much to take. Amounts beyond the capacity are capped to it, so they can still be taken eventually.
+
+        Returns:
+            float: 0 if the amount was taken, otherwise how many seconds to wait until it's available
+        """
+        amount = min(amount, self._capacity)
+
+        with self._lock:
+            self._refill()
+
+            if self._available >= amount:
+                self._available -= amount
+                return 0
+
+            return (amount - self._available) / self._refill_per_second
+
+    def give_back(self, amount):
+        """Returns to the bucket an amount that was taken but ended up not being used."""
+        with self._lock:
+            self._available = min(self._capacity, self._available + amount)
+
+
+class RequestScheduler:
+    """Enforces requests-per-minute and tokens-per-minute limits with token buckets, retries the requests that
+    fail temporarily with jittered exponential backoff, and adjusts the number of concurrent requests through
+    additive increase / multiplicative decrease (AIMD) depending on the throttling observed.
+    A scheduler can be shared by several trees of thoughts, so that together they stay within the quotas.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=AI_MODEL_REQUESTS_PER_MINUTE,
+        tokens_per_minute=AI_MODEL_TOKENS_PER_MINUTE,
+        max_retries=MAX_RETRIES_OF_REQUEST_TO_AI_MODEL,
+        initial_backoff=INITIAL_RETRY_BACKOFF,
+        max_backoff=MAX_RETRY_BACKOFF,
+        max_concurrency=DEFAULT_MAX_CONCURRENT_REQUESTS,
+        min_concurrency=1,
+    ):
+        """Creates the scheduler.
+
+        Args:
+            requests_per_minute (float, optional): how many requests can be sent per minute
+            tokens_per_minute (float, optional): how many tokens the requests can count per minute
+            max_retries (int, optional): how many times a request that failed temporarily is retried before giving up
+            initial_backoff (float, optional): the seconds to wait, at most, before the first retry. Doubles with every retry.
+            max_backoff (float, optional): the maximum seconds to wait before any retry
+            max_concurrency (int, optional): the highest number of requests that can be in flight at once
+            min_concurrency (int, optional): the lowest that the concurrency limit can be decreased to after throttling
+
+        Raises:
+            InvalidParameterError: if the limits are not positive, or the concurrency range is empty
+        """
+        if requests_per_minute <= 0 or tokens_per_minute <= 0:
+            raise InvalidParameterError(
+                f"The RequestScheduler requires positive limits, but they were {requests_per_minute} requests and {tokens_per_minute} tokens per minute"
+            )
+
+        if min_concurrency < 1 or max_concurrency < min_concurrency:
+            raise InvalidParameterError(
+                f"The RequestScheduler requires 1 <= min_concurrency <= max_concurrency, but they were {min_concurrency} and {max_concurrency}"
+            )
+
+        self._requests_bucket = TokenBucket(
+            requests_per_minute, requests_per_minute / 60
+        )
+        self._tokens_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+
+        self._max_retries = max_retries
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+
+        self._max_concurrency = max_concurrency
+        self._min_concurrency = min_concurrency
+        self._concurrency_limit = float(max_concurrency)
+        self._in_flight = 0
+
+        self._condition = Condition()
+        # The loops and events of the asynchronous requests waiting for a free slot
+        self._slot_waiters = []
+
+        self._number_of_requests = 0
+        self._number_of_retries = 0
+        self._number_of_throttles = 0
+
+    def get_concurrency_limit(self):
+        with self._condition:
+            return max(self._min_concurrency, math.floor(self._concurrency_limit))
+
+    def get_number_of_requests(self):
+        return self._number_of_requests
+
+    def get_number_of_retries(self):
+        return self._number_of_retries
+
+    def get_number_of_throttles(self):
+        return self._number_of_throttles
+
+    def _has_free_slot(self):
+        return self._in_flight < max(
+            self._min_concurrency, math.floor(self._concurrency_limit)
+        )
+
+    def _try_start_request(self):
+        with self._condition:
+            if not self._has_free_slot():
+                return False
+
+            self._in_flight += 1
+            self._number_of_requests += 1
+
+            return True
+
+    def _finish_request(self, exception):
+        """Frees the slot of a request, whether it succeeded, failed or was interrupted, and wakes up the
+        requests waiting for one. Only throttling and successes change the concurrency limit.
+        """
+        with self._condition:
+            self._in_flight -= 1
+
+            if isinstance(exception, RequestToAiModelThrottledError):
+                self._number_of_throttles += 1
+                self._concurrency_limit = max(
+                    self._min_concurrency,
+                    self._concurrency_limit * CONCURRENCY_MULTIPLICATIVE_DECREASE,
+                )
+            elif exception is None:
+                # Grows by about one request for every full window of successful requests
+                self._concurrency_limit = min(
+                    self._max_concurrency,
+                    self._concurrency_limit
+                    + CONCURRENCY_ADDITIVE_INCREASE / self._concurrency_limit,
+                )
+
+            self._condition.notify_all()
+
+            for loop, event in self._slot_waiters:
+                # The waiters may run on other threads, whose loops must set their events
+                loop.call_soon_threadsafe(event.set)
+
+    async def _wait_for_free_slot(self):
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+
+        with self._condition:
+            if self._has_free_slot():
+                return
+
+            self._slot_waiters.append((loop, event))
+
+        try:
+            await event.wait()
+        finally:
+            with self._condition:
+                self._slot_waiters.remove((loop, event))
+
+    def _determine_wait_for_quotas(self, prompt, number_of_samples):
+        wait = self._requests_bucket.try_take(1)
+
+        if wait > 0:
+            return wait
+
+        wait = self._tokens_bucket.try_take(
+            estimate_tokens_of_request(prompt, number_of_samples)
+        )
+
+        if wait > 0:
+            # This request won't be sent yet
+            self._requests_bucket.give_back(1)
+
+        return wait
+
+    def _determine_backoff(self, attempt, exception):
+        if self._max_retries <= attempt or not isinstance(exception, RETRYABLE_ERRORS):
+            return None
+
+        with self._condition:
+            self._number_of_retries += 1
+
+        if (
+            isinstance(exception, RequestToAiModelThrottledError)
+            and exception.retry_after is not None
+        ):
+            return exception.retry_after
+
+        # Full jitter, so that the requests throttled at the same time don't retry at the same time
+        return random.uniform(
+            0, min(self._max_backoff, self._initial_backoff * 2**attempt)
+        )
+
+    def _raise_failure(self, attempt, exception):
+        if isinstance(exception, RETRYABLE_ERRORS):
+            raise RequestToAiModelFailedError(
+                f"The request to the AI model failed after {attempt + 1} attempts: {exception}"
+            ) from exception
+
+        raise exception
+
+    def request_samples(self, request_samples_function, prompt, number_of_samples):
+        """Sends a request through 'request_samples_function' as soon as the quotas and the concurrency limit
+        allow it, retrying it if it fails temporarily.
+
+        Args:
+            request_samples_function (Callable[[str, int], list[str]]): the function that requests samples from the AI model
+            prompt (str): the prompt of the request
+            number_of_samples (int): how many samples are requested
+
+        Returns:
+            list[str]: the samples
+
+        Raises:
+            RequestToAiModelFailedError: if the request kept failing after all the retries
+        """
+        attempt = 0
+
+        while True:
+            wait = self._determine_wait_for_quotas(prompt, number_of_samples)
+
+            if wait > 0:
+                time.sleep(wait)
+                continue
+
+            with self._condition:
+                self._condition.wait_for(self._has_free_slot)
+
+                self._in_flight += 1
+                self._number_of_requests += 1
+
+            try:
+                responses = request_samples_function(prompt, number_of_samples)
+            except RequestToAiModelFailedError as exception:
+                self._finish_request(exception)
+
+                backoff = self._determine_backoff(attempt, exception)
+
+                if backoff is None:
+                    self._raise_failure(attempt, exception)
+
+                time.sleep(backoff)
+                attempt += 1
+                continue
+            except BaseException as exception:
+                self._finish_request(exception)
+                raise
+
+            self._finish_request(None)
+
+            return responses
+
+    async def arequest_samples(
+        self, arequest_samples_function, prompt, number_of_samples
+    ):
+        """Asynchronous counterpart of 'request_samples'.
+
+        Args:
+            arequest_samples_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that requests samples from the AI model
+            prompt (str): the prompt of the request
+            number_of_samples (int): how many samples are requested
+
+        Returns:
+            list[str]: the samples
+
+        Raises:
+            RequestToAiModelFailedError: if the request kept failing after all the retries
+        """
+        attempt = 0
+
+        while True:
+            wait = self._determine_wait_for_quotas(prompt, number_of_samples)
+
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            while not self._try_start_request():
+                await self._wait_for_free_slot()
+
+            try:
+                responses = await arequest_samples_function(prompt, number_of_samples)
+            except RequestToAiModelFailedError as exception:
+                self._finish_request(exception)
+
+                backoff = self._determine_backoff(attempt, exception)
+
+                if backoff is None:
+                    self._raise_failure(attempt, exception)
+
+                await asyncio.sleep(backoff)
+                attempt += 1
+                continue
+            except BaseException as exception:
+                # Including the cancellation of the request, which must not keep its slot
+                self._finish_request(exception)
+                raise
+
+            self._finish_request(None)
+
+            return responses
+
+    def schedule(self, request_samples_function):
+        """Wraps 'request_samples_function' so that every call goes through this scheduler.
+
+        Args:
+            request_samples_function (Callable[[str, int], list[str]]): the function that requests samples from the AI model
+
+        Returns:
+            Callable[[str, int], list[str]]: the scheduled function
+        """
+
+        def scheduled_request_samples(prompt, number_of_samples):
+            return self.request_samples(
+                request_samples_function, prompt, number_of_samples
+            )
+
+        return scheduled_request_samples
+
+    def aschedule(self, arequest_samples_function):
+        """Asynchronous counterpart of 'schedule'.
+
+        Args:
+            arequest_samples_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that requests samples from the AI model
+
+        Returns:
+            Callable[[str, int], Awaitable[list[str]]]: the scheduled coroutine function
+        """
+
+        async def scheduled_arequest_samples(prompt, number_of_samples):
+            return await self.arequest_samples(
+                arequest_samples_function, prompt, number_of_samples
+            )
+
+        return scheduled_arequest_samples
@@ -0,0 +1,227 @@
+"""This module contains the class ResponseCache, that stores the responses of the AI model
+under a hash of the prompt and the parameters of the model that produced them.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+from defines import (
+    RESPONSE_CACHE_DIRECTORY,
+    RESPONSE_CACHE_MAX_ENTRIES_IN_MEMORY,
+    RESPONSE_CACHE_MAX_SIZE_ON_DISK,
+    get_default_model_parameters,
+)
+from errors import InvalidParameterError
+from file_utils import (
+    create_directories,
+    read_contents_of_file_if_it_exists,
+    write_response_to_file,
+)
+
+# When the store on disk grows past its maximum size, the least recently used entries are evicted
+# until it shrinks to this fraction of the maximum, so that evictions don't happen on every write.
+DISK_EVICTION_TARGET_RATIO = 0.9
+
+
+class ResponseCache:
+    """An in-memory LRU of responses in front of a sharded store on disk, or of a RunStore. Entries are addressed by the content
+    of the prompt, so a response is reused wherever the same prompt appears again, regardless of the layer or run.
+    """
+
+    def __init__(
+        self,
+        directory_path=RESPONSE_CACHE_DIRECTORY,
+        max_entries_in_memory=RESPONSE_CACHE_MAX_ENTRIES_IN_MEMORY,
+        max_size_on_disk=RESPONSE_CACHE_MAX_SIZE_ON_DISK,
+        model_parameters=None,
+        run_store=None,
+    ):
+        """Creates the cache.
+
+        Args:
+            directory_path (str | None, optional): the directory of the store on disk. If None, the cache only lives in memory.
+            max_entries_in_memory (int, optional): how many responses the in-memory LRU holds.
+            max_size_on_disk (int | None, optional): the size in bytes past which the least recently used entries on disk are evicted.
+                If None, the store on disk grows without limit.
+            model_parameters (dict | None, optional): the parameters of the model that produces the responses. They are part of every key,
+                so changing the model invalidates its entries. If None, the parameters set in 'defines' are used.
+            run_store (RunStore | None, optional): if set, the entries on disk are kept in it, looked up through its index,
+                rather than as files in 'directory_path'.
+
+        Raises:
+            InvalidParameterError: if 'max_entries_in_memory' is lower than 1
+        """
+        if max_entries_in_memory < 1:
+            raise InvalidParameterError(
+                f"The ResponseCache requires 'max_entries_in_memory' to be at least 1, but it was {max_entries_in_memory}"
+            )
+
+        self._directory_path = directory_path
+        self._max_entries_in_memory = max_entries_in_memory
+        self._max_size_on_disk = max_size_on_disk
+        self._run_store = run_store
+
+        if model_parameters is None:
+            model_parameters = get_default_model_parameters()
+
+        self._serialized_model_parameters = json.dumps(model_parameters, sort_keys=True)
+
+        self._entries_in_memory = OrderedDict()
+
+        # Computed lazily, the first time that an entry is written to disk
+        self._size_on_disk = None
+
+        self._lock = Lock()
+
+    def create_key(self, prompt, sample_index=0):
+        """Creates the key under which a response to a prompt is stored.
+
+        Args:
+            prompt (str): the prompt sent to the AI model
+            sample_index (int, optional): which of the responses to the same prompt this is. Siblings and votes
+                send identical prompts, and each of them needs its own response.
+
+        Returns:
+            str: the hexadecimal digest that addresses the response
+        """
+        key_contents = json.dumps(
+            [self._serialized_model_parameters, prompt, sample_index]
+        )
+
+        return hashlib.sha256(key_contents.encode("utf8")).hexdigest()
+
+    def _create_file_path_for_key(self, key):
+        return f"{self._directory_path}/{key[:2]}/{key[2:4]}/{key}.txt"
+
+    def _store_in_memory(self, key, response):
+        self._entries_in_memory[key] = response
+        self._entries_in_memory.move_to_end(key)
+
+        while len(self._entries_in_memory) > self._max_entries_in_memory:
+            self._entries_in_memory.popitem(last=False)
+
+    def get(self, key):
+        """Returns the response stored under 'key', or None if there isn't any.
+
+        Args:
+            key (str): a key created through 'create_key'
+
+        Returns:
+            str | None: the stored response, if any
+        """
+        with self._lock:
+            if key in self._entries_in_memory:
+                self._entries_in_memory.move_to_end(key)
+                return self._entries_in_memory[key]
+
+            if self._run_store is not None:
+                response = self._run_store.get_cache_entry(key)
+
+                if response is not None:
+                    self._store_in_memory(key, response)
+
+                return response
+
+            if self._directory_path is None:
+                return None
+
+            file_path = self._create_file_path_for_key(key)
+
+            response = read_contents_of_file_if_it_exists(file_path)
+
+            if response is None:
+                return None
+
+            # Marks the entry as recently used, for the eviction on disk
+            os.utime(file_path)
+
+            self._store_in_memory(key, response)
+
+            return response
+
+    def put(self, key, response):
+        """Stores a response under 'key'.
+
+        Args:
+            key (str): a key created through 'create_key'
+            response (str): the response of the AI model
+        """
+        with self._lock:
+            self._store_in_memory(key, response)
+
+            if self._run_store is not None:
+                self._put_in_run_store(key, response)
+                return
+
+            if self._directory_path is None:
+                return
+
+            file_path = self._create_file_path_for_key(key)
+
+            create_directories(os.path.dirname(file_path))
+
+            previous_size = (
+                os.path.getsize(file_path) if os.path.isfile(file_path) else 0
+            )
+
+            write_response_to_file(file_path, response)
+
+            if self._max_size_on_disk is None:
+                return
+
+            if self._size_on_disk is None:
+                self._size_on_disk = self._calculate_size_on_disk()
+            else:
+                self._size_on_disk += os.path.getsize(file_path) - previous_size
+
+            if self._size_on_disk > self._max_size_on_disk:
+                self._evict_from_disk()
+
+    def _put_in_run_store(self, key, response):
+        size_growth = self._run_store.put_cache_entry(key, response)
+
+        if self._max_size_on_disk is None:
+            return
+
+        if self._size_on_disk is None:
+            self._size_on_disk = self._run_store.get_size_of_cache_entries()
+        else:
+            self._size_on_disk += size_growth
+
+        if self._size_on_disk > self._max_size_on_disk:
+            evicted_keys, self._size_on_disk = self._run_store.evict_cache_entries(
+                self._max_size_on_disk * DISK_EVICTION_TARGET_RATIO
+            )
+
+            for evicted_key in evicted_keys:
+                self._entries_in_memory.pop(evicted_key, None)
+
+    def _list_files_on_disk(self):
+        for directory_path, _, file_names in os.walk(self._directory_path):
+            for file_name in file_names:
+                yield os.path.join(directory_path, file_name)
+
+    def _calculate_size_on_disk(self):
+        return sum(
+            os.path.getsize(file_path) for file_path in self._list_files_on_disk()
+        )
+
+    def _evict_from_disk(self):
+        least_recently_used_first = sorted(
+            self._list_files_on_disk(), key=os.path.getmtime
+        )
+
+        target_size = self._max_size_on_disk * DISK_EVICTION_TARGET_RATIO
+
+        for file_path in least_recently_used_first:
+            if self._size_on_disk <= target_size:
+                break
+
+            self._size_on_disk -= os.path.getsize(file_path)
+
+            os.remove(file_path)
+
+            self._entries_in_memory.pop(
+                os.path.splitext(os.path.basename(file_path))[0], None
+            )
@@ -1,6 +1,7 @@
 from anytree import Node
 from defines import DOUBLE_RETURNS
 from errors import AncestorStateTypeNotFoundError
+from node_utils import get_ancestors_by_state_type
 
 
 def determine_ancestor_with_required_state_type(
@@ -19,11 +20,7 @@ def determine_ancestor_with_required_state_type(
         unresolved_leaf_node.name.get_include_ancestor_state_type_response()
     )
 
-    for ancestor in unresolved_leaf_node.ancestors:
-        if ancestor.name.get_state_type() == required_state_type:
-            return ancestor
-
-    return None
+    return get_ancestors_by_state_type(unresolved_leaf_node).get(required_state_type)
 
 
 def state_name_of_ancestor_state_type(ancestor_with_required_state_type):
@@ -74,9 +71,12 @@ def determine_if_an_ancestor_response_should_be_included(
             )
 
         # if the ancestor has been found, add his response to the prompt.
-        prompt += state_name_of_ancestor_state_type(ancestor_with_required_state_type)
-        prompt += state_response_of_ancestor(ancestor_with_required_state_type)
-
-        return prompt
+        return "".join(
+            [
+                prompt,
+                state_name_of_ancestor_state_type(ancestor_with_required_state_type),
+                state_response_of_ancestor(ancestor_with_required_state_type),
+            ]
+        )
 
     return prompt
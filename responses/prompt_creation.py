@@ -3,10 +3,13 @@ from defines import DOUBLE_RETURNS
 from enums.state_type import StateType
 from errors import InvalidParameterError
 from file_utils import create_file_path_for_response
+from node_utils import DetachedChildNode, get_cache_of_children, is_tree_node
 from responses.ancestor_responses import (
     determine_if_an_ancestor_response_should_be_included,
 )
 
+PROMPT_PREFIX_CACHE_KEY = "prompt_prefix"
+
 
 def add_to_prompt_the_response_of_parent(
     unresolved_leaf_node: Node, prompt: str
@@ -28,16 +31,54 @@ def add_to_prompt_the_response_of_parent(
         error_message += f"found that the parent didn't have a response associated. Parent: {unresolved_leaf_node.parent}"
         raise ValueError(error_message)
 
-    prompt += f"{DOUBLE_RETURNS}{unresolved_leaf_node.parent.name.get_response()}"
+    return "".join(
+        [prompt, DOUBLE_RETURNS, unresolved_leaf_node.parent.name.get_response()]
+    )
+
+
+def determine_prompt_prefix_shared_by_siblings(unresolved_leaf_node: Node) -> str:
+    """Determines the part of the prompt that is the same for the unresolved leaf node and its siblings:
+    the context, the response of the ancestor that should be included and the response of the parent.
+    It's only built once per parent, and cached along it.
+
+    Args:
+        unresolved_leaf_node (Node): the unresolved leaf node.
+
+    Returns:
+        str: the prefix of the prompt.
+    """
+    parent_node = unresolved_leaf_node.parent
+
+    cache_of_siblings = get_cache_of_children(parent_node)
 
-    return prompt
+    cache_key = (
+        PROMPT_PREFIX_CACHE_KEY,
+        unresolved_leaf_node.name.get_include_ancestor_state_type_response(),
+    )
+
+    prompt_prefix = cache_of_siblings.get(cache_key)
+
+    if prompt_prefix is None:
+        prompt_prefix = determine_if_an_ancestor_response_should_be_included(
+            unresolved_leaf_node, unresolved_leaf_node.name.get_context()
+        )
+
+        if parent_node.name.get_state_type() != StateType.CONTEXT:
+            prompt_prefix = add_to_prompt_the_response_of_parent(
+                unresolved_leaf_node, prompt_prefix
+            )
+
+        cache_of_siblings[cache_key] = prompt_prefix
+
+    return prompt_prefix
 
 
 def create_prompt_for_response(unresolved_leaf_node: Node) -> str:
     """Creates a prompt to generate a response from the AI model.
 
     Args:
-        unresolved_leaf_node (Node): an unresolved leaf node from the tree
+        unresolved_leaf_node (Node | DetachedChildNode): an unresolved leaf node from the tree, or a child
+            that hasn't been added to it yet
 
     Returns:
         str: the prompt that will be sent to the AI model.
@@ -45,7 +86,9 @@ def create_prompt_for_response(unresolved_leaf_node: Node) -> str:
     Raises:
         InvalidParameterError: if 'unresolved_leaf_node' is not a node
     """
-    if not isinstance(unresolved_leaf_node, Node):
+    if not is_tree_node(unresolved_leaf_node) and not isinstance(
+        unresolved_leaf_node, DetachedChildNode
+    ):
         raise InvalidParameterError(
             f"The function {create_file_path_for_response.__name__} received an 'unresolved_leaf_node' that wasn't a Node: {unresolved_leaf_node}"
         )
@@ -55,16 +98,15 @@ def create_prompt_for_response(unresolved_leaf_node: Node) -> str:
         error_message += f"{unresolved_leaf_node}"
         raise ValueError(error_message)
 
-    prompt = determine_if_an_ancestor_response_should_be_included(
-        unresolved_leaf_node, f"{unresolved_leaf_node.name.get_context()}"
-    )
+    prompt_prefix = determine_prompt_prefix_shared_by_siblings(unresolved_leaf_node)
 
-    if unresolved_leaf_node.parent.name.get_state_type() != StateType.CONTEXT:
-        prompt = add_to_prompt_the_response_of_parent(unresolved_leaf_node, prompt)
+    if unresolved_leaf_node.name.get_state_type() == StateType.CONTEXT:
+        return prompt_prefix
 
-    if unresolved_leaf_node.name.get_state_type() != StateType.CONTEXT:
-        prompt += (
-            f"{DOUBLE_RETURNS}{unresolved_leaf_node.name.get_state_type_related_text()}"
-        )
-
-    return prompt
+    return "".join(
+        [
+            prompt_prefix,
+            DOUBLE_RETURNS,
+            unresolved_leaf_node.name.get_state_type_related_text(),
+        ]
+    )
@@ -1,68 +1,140 @@
 """This module contains functions associated with handling and producing responses from AI models.
 """
-from typing import Callable
+import asyncio
+from typing import Awaitable, Callable
 from anytree import Node
 from colorama import Fore
-from defines import get_directory_path_for_tree_of_thoughts
 from errors import InvalidParameterError
-from file_utils import (
-    create_directories,
-    create_file_path_for_response,
-)
 from output import output_message
-from responses.response_determination import determine_response_for_node
+from responses.response_determination import (
+    determine_pending_responses_by_prompt,
+    set_sampled_responses,
+)
+from run_context import RunContext
+from run_events import arequest_samples_with_events
+from token_counting import verify_prompt_fits
+
+
+def _output_request_message(pending_nodes, prompt_tokens, run_context):
+    output_message(
+        Fore.LIGHTGREEN_EX,
+        f"Requesting {len(pending_nodes)} response(s) from AI model for state '{pending_nodes[0][0].name.get_state_type().name.lower()}' "
+        + f"(about {prompt_tokens} prompt tokens)...",
+        run_context.is_visual_output_active(),
+    )
+
+
+def _verify_that_prompts_fit(pending_responses_by_prompt, run_context):
+    # Every prompt of the layer is verified before any of them is sent, so that a prompt the AI model
+    # would reject doesn't cost the requests of the others
+    prompt_tokens_by_prompt = {}
+
+    for prompt, pending_nodes in pending_responses_by_prompt.items():
+        prompt_tokens = verify_prompt_fits(prompt, run_context.get_max_prompt_tokens())
+
+        run_context.register_prompt_tokens(
+            pending_nodes[0][0].name.get_state_type(), "response", prompt_tokens
+        )
+
+        prompt_tokens_by_prompt[prompt] = prompt_tokens
+
+    return prompt_tokens_by_prompt
+
+
+def _determine_pending_responses_by_prompt(
+    function_name,
+    leaf_nodes_without_responses,
+    run_context,
+    file_index_offset,
+    first_creation_index,
+):
+    if not isinstance(leaf_nodes_without_responses, list):
+        error_message = f"The function '{function_name}' requires 'unresolved_leaf_nodes_without_responses' to be a list, "
+        error_message += f"but it was: {leaf_nodes_without_responses}"
+        raise InvalidParameterError(error_message)
 
+    # The response should either be requested from the AI model, or loaded from the cache if one is matching
+    return determine_pending_responses_by_prompt(
+        leaf_nodes_without_responses,
+        run_context,
+        file_index_offset,
+        first_creation_index,
+    )
 
-def request_responses(
-    tree_of_thoughts_name: str,
+
+def _verify_that_all_nodes_have_responses(function_name, leaf_nodes_without_responses):
+    # sanity check
+    for unresolved_leaf_node in leaf_nodes_without_responses:
+        if not unresolved_leaf_node.name.has_response():
+            raise ValueError(
+                f"The function {function_name} failed to set the response state of node {unresolved_leaf_node} properly."
+            )
+
+
+async def arequest_responses(
     leaf_nodes_without_responses: list[Node],
-    visual_output_active: bool,
-    should_create_files: bool,
-    request_response_from_ai_model_function: Callable[[str], str],
+    run_context: RunContext,
+    arequest_samples_from_ai_model_function: Callable[[str, int], Awaitable[list[str]]],
+    file_index_offset: int = 0,
+    first_creation_index: int | None = None,
 ) -> None:
-    """Requests responses from the AI model for the leaf nodes without responses
+    """Requests responses from the AI model for the leaf nodes without responses. The nodes that share
+    a prompt (such as siblings) get all their responses from a single request that returns several samples,
+    and the requests for all the distinct prompts are sent concurrently.
 
     Args:
-        tree_of_thoughts_name (str): the name of the associated tree of thoughts
         leaf_nodes_without_responses (list[Node]): the leaf nodes without responses
-        visual_output_active (bool): whether or not the visual output should be active
-        should_create_files (bool): whether or not files should be created for the responses
-        request_response_from_ai_model_function (Callable[[str], str]): the function that will handle requesting responses from the AI model
+        run_context (RunContext): the settings of the current run
+        arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that will request samples
+            from the AI model. It's responsible for limiting how many requests are in flight at once.
+        file_index_offset (int, optional): the position of the first node within its layer, which the file paths depend on
+        first_creation_index (int | None, optional): the creation index of the node at 'file_index_offset'. If None,
+            the nodes are numbered by their position within 'leaf_nodes_without_responses'.
 
     Raises:
         InvalidParameterError: if 'leaf_nodes_without_responses' is not a list
+        PromptExceedsContextWindowError: if any of the prompts doesn't fit in the context window of the AI model
         ValueError: if any unresolved leaf node is left without a response by the end of the process
     """
-    if not isinstance(leaf_nodes_without_responses, list):
-        error_message = f"The function '{request_responses.__name__}' requires 'unresolved_leaf_nodes_without_responses' to be a list, "
-        error_message += f"but it was: {leaf_nodes_without_responses}"
-        raise InvalidParameterError(error_message)
+    pending_responses_by_prompt = _determine_pending_responses_by_prompt(
+        arequest_responses.__name__,
+        leaf_nodes_without_responses,
+        run_context,
+        file_index_offset,
+        first_creation_index,
+    )
+
+    prompt_tokens_by_prompt = _verify_that_prompts_fit(
+        pending_responses_by_prompt, run_context
+    )
 
-    # go through all these leaf nodes, requesting responses from the AI model
-    for i, unresolved_leaf_node in enumerate(leaf_nodes_without_responses):
-        output_message(
-            Fore.LIGHTGREEN_EX,
-            f"Requesting response from AI model for state '{unresolved_leaf_node.name.get_state_type().name.lower()}'...",
-            visual_output_active,
+    async def request_responses_for_prompt(prompt, pending_nodes):
+        _output_request_message(
+            pending_nodes, prompt_tokens_by_prompt[prompt], run_context
         )
 
-        # The response should either be requested from the AI model, or loaded from file if one is matching
-        directory_path = get_directory_path_for_tree_of_thoughts(tree_of_thoughts_name)
+        set_sampled_responses(
+            await arequest_samples_with_events(
+                run_context,
+                "response",
+                [node for node, _, _ in pending_nodes],
+                prompt,
+                len(pending_nodes),
+                arequest_samples_from_ai_model_function,
+            ),
+            pending_nodes,
+            run_context,
+        )
 
-        if should_create_files:
-            create_directories(directory_path)
+        run_context.save_checkpoint()
 
-        unresolved_leaf_node.name.set_response(
-            determine_response_for_node(
-                unresolved_leaf_node,
-                create_file_path_for_response(directory_path, unresolved_leaf_node, i),
-                should_create_files,
-                request_response_from_ai_model_function,
-            )
-        )
+    await asyncio.gather(
+        *[
+            request_responses_for_prompt(prompt, pending_nodes)
+            for prompt, pending_nodes in pending_responses_by_prompt.items()
+        ]
+    )
 
-        # sanity check
-        if not unresolved_leaf_node.name.has_response():
-            raise ValueError(
-                f"The function {request_responses.__name__} failed to set the response state of node {unresolved_leaf_node} properly."
-            )
+    _verify_that_all_nodes_have_responses(
+        arequest_responses.__name__, leaf_nodes_without_responses
+    )
@@ -1,52 +1,127 @@
 """This module contains functions associated with handling and producing responses from AI models.
 """
-from typing import Callable
 from anytree import Node
-from errors import InvalidParameterError
-from file_utils import (
-    read_contents_of_file_if_it_exists,
-    write_response_to_file,
-)
+from enums.run_event_type import RunEventType
+from errors import InvalidParameterError, RequestToAiModelFailedError
+from file_utils import create_file_path_for_response
+from node_utils import is_tree_node
 from responses.prompt_creation import create_prompt_for_response
+from run_context import RunContext
+from run_events import get_node_id
 
 
-def determine_response_for_node(
-    unresolved_leaf_node: Node,
-    file_path: str,
-    should_create_files: bool,
-    request_response_from_ai_model_function: Callable[[str], str],
-) -> str:
-    """Determines a response for an unresolved leaf node, relying on the AI model.
+def determine_pending_responses_by_prompt(
+    leaf_nodes_without_responses: list[Node],
+    run_context: RunContext,
+    file_index_offset: int = 0,
+    first_creation_index: int | None = None,
+) -> dict[str, list[tuple[Node, str, str | None]]]:
+    """Sets the responses of the leaf nodes whose prompts were already answered in the response cache, and groups
+    the rest by prompt, so that the identical prompts of siblings can be sent in a single request.
 
     Args:
-        unresolved_leaf_node (Node): the unresolved leaf node for which a response will be requested
-        file_path (str): the file path where the response should be saved to file
-        should_create_files (bool): whether or not a file should be created for this response
-        request_response_from_ai_model_function (Callable[[str], str]): the function that will request a response from the AI model
+        leaf_nodes_without_responses (list[Node]): the leaf nodes without responses
+        run_context (RunContext): the settings of the current run
+        file_index_offset (int, optional): the position of the first node within its layer, which the file paths depend on
+        first_creation_index (int | None, optional): the creation index of the node at 'file_index_offset', from which
+            the position of every node is counted, so that it doesn't depend on which nodes still lack a response.
+            If None, the nodes are numbered by their position within 'leaf_nodes_without_responses'.
 
     Returns:
-        str: the response received from the AI model
+        dict[str, list[tuple[Node, str, str | None]]]: for every prompt, the nodes that need a response to it along with
+            their file paths and their keys in the response cache
 
     Raises:
-        InvalidParameterError: if 'unresolved_leaf_node' is not a node
+        InvalidParameterError: if any of the leaf nodes is not a node
     """
-    if not isinstance(unresolved_leaf_node, Node):
-        raise InvalidParameterError(
-            f"The function {determine_response_for_node.__name__} received an 'unresolved_leaf_node' that wasn't a Node: {unresolved_leaf_node}"
+    response_cache = run_context.get_response_cache()
+
+    pending_responses_by_prompt = {}
+    number_of_samples_by_prompt = {}
+
+    for i, unresolved_leaf_node in enumerate(leaf_nodes_without_responses):
+        if not is_tree_node(unresolved_leaf_node):
+            raise InvalidParameterError(
+                f"The function {determine_pending_responses_by_prompt.__name__} received an 'unresolved_leaf_node' that wasn't a Node: {unresolved_leaf_node}"
+            )
+
+        file_path = create_file_path_for_response(
+            run_context.get_directory_path(),
+            unresolved_leaf_node,
+            file_index_offset
+            + (
+                i
+                if first_creation_index is None
+                else unresolved_leaf_node.creation_index - first_creation_index
+            ),
         )
 
-    response = None
+        prompt = create_prompt_for_response(unresolved_leaf_node)
+
+        # Siblings share their prompt, so each of them is cached as a different sample of it
+        sample_index = number_of_samples_by_prompt.get(prompt, 0)
+        number_of_samples_by_prompt[prompt] = sample_index + 1
+
+        cache_key = None
+        response = None
+
+        if response_cache is not None:
+            cache_key = response_cache.create_key(prompt, sample_index)
+            response = response_cache.get(cache_key)
 
-    if should_create_files:
-        response = read_contents_of_file_if_it_exists(file_path)
+        if response is not None:
+            run_context.register_cached_response(cache_key)
 
-    if response is None:
-        response = request_response_from_ai_model_function(
-            create_prompt_for_response(unresolved_leaf_node)
+            run_context.emit_event(
+                RunEventType.CACHE_HIT,
+                state_type=unresolved_leaf_node.name.get_state_type(),
+                kind="response",
+                node_ids=[get_node_id(unresolved_leaf_node)],
+                prompt_size=len(prompt),
+                response_size=len(response),
+            )
+
+            unresolved_leaf_node.name.set_response(response)
+
+            run_context.store_artifact(file_path, response)
+
+            continue
+
+        pending_responses_by_prompt.setdefault(prompt, []).append(
+            (unresolved_leaf_node, file_path, cache_key)
         )
 
-        # Write the response to a file
-        if should_create_files:
-            write_response_to_file(file_path, response)
+    return pending_responses_by_prompt
+
+
+def set_sampled_responses(
+    responses: list[str],
+    pending_nodes: list[tuple[Node, str, str | None]],
+    run_context: RunContext,
+) -> None:
+    """Sets each of the responses sampled for a prompt to one of the nodes that were waiting for it.
+
+    Args:
+        responses (list[str]): the responses sampled from the AI model
+        pending_nodes (list[tuple[Node, str, str | None]]): the nodes that need a response, along with their file paths and cache keys
+        run_context (RunContext): the settings of the current run
+
+    Raises:
+        RequestToAiModelFailedError: if the AI model didn't return as many responses as nodes were waiting
+    """
+    if len(responses) != len(pending_nodes):
+        raise RequestToAiModelFailedError(
+            f"Requested {len(pending_nodes)} responses from the AI model, but received {len(responses)}."
+        )
+
+    response_cache = run_context.get_response_cache()
+
+    for response, (unresolved_leaf_node, file_path, cache_key) in zip(
+        responses, pending_nodes
+    ):
+        unresolved_leaf_node.name.set_response(response)
+
+        if response_cache is not None:
+            response_cache.put(cache_key, response)
 
-    return response
+        run_context.store_artifact(file_path, response)
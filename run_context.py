@@ -0,0 +1,267 @@
+"""This module contains the class RunContext, that gathers the settings of a run of a tree of thoughts
+that the functions requesting responses and votes need to know about.
+"""
+import os
+import time
+from budget import determine_tokens_of_request
+from defines import get_directory_path_for_tree_of_thoughts
+from file_utils import create_directories, write_response_to_file
+from run_events import RunEvent
+
+
+class RunContext:
+    """The settings of a run of a tree of thoughts, shared by the functions that request responses and votes."""
+
+    def __init__(
+        self,
+        tree_of_thoughts_name,
+        visual_output_active=False,
+        should_create_files=False,
+        response_cache=None,
+        max_prompt_tokens=None,
+        prompt_token_report=None,
+        early_stopping=None,
+        save_checkpoint_function=None,
+        run_store=None,
+        run_hooks=None,
+        budget=None,
+        duplicate_collapsing=None,
+        speculation=None,
+    ):
+        self._tree_of_thoughts_name = tree_of_thoughts_name
+        self._visual_output_active = visual_output_active
+        self._should_create_files = should_create_files
+        self._response_cache = response_cache
+        self._max_prompt_tokens = max_prompt_tokens
+        self._prompt_token_report = prompt_token_report
+        self._early_stopping = early_stopping
+        self._save_checkpoint_function = save_checkpoint_function
+        self._run_store = run_store
+        self._run_hooks = run_hooks
+        self._budget = budget
+        self._duplicate_collapsing = duplicate_collapsing
+        self._speculation = speculation
+
+        # The layer that follows the one being processed, along with its number of steps
+        self._next_state_layer = None
+        self._number_of_steps_of_next_state_layer = None
+
+        # The directory of the files is only created once per run, before the first one is written
+        self._is_directory_created = False
+
+    def get_tree_of_thoughts_name(self):
+        return self._tree_of_thoughts_name
+
+    def get_directory_path(self):
+        return get_directory_path_for_tree_of_thoughts(self._tree_of_thoughts_name)
+
+    def is_visual_output_active(self):
+        return self._visual_output_active
+
+    def should_create_files(self):
+        return self._should_create_files
+
+    def store_artifact(self, file_path, body):
+        """Stores a response, a vote or a winner of the run, if the run creates files. If the run has a store,
+        it's kept in it under the name of its file, otherwise it's written to the file.
+
+        Args:
+            file_path (str): the path of the file of the artifact
+            body (str): the contents of the artifact
+        """
+        if not self._should_create_files:
+            return
+
+        if self._run_store is not None:
+            self._run_store.put_artifact(
+                self._tree_of_thoughts_name, os.path.basename(file_path), body
+            )
+            return
+
+        if not self._is_directory_created:
+            create_directories(os.path.dirname(file_path))
+            self._is_directory_created = True
+
+        write_response_to_file(file_path, body)
+
+    def get_response_cache(self):
+        """Returns the cache of responses of the AI model.
+
+        Returns:
+            ResponseCache | None: the cache, or None if responses shouldn't be cached
+        """
+        return self._response_cache
+
+    def get_max_prompt_tokens(self):
+        """Returns how many tokens the context window of the AI model leaves for a prompt.
+
+        Returns:
+            int | None: the maximum tokens, or None if prompts aren't limited
+        """
+        return self._max_prompt_tokens
+
+    def register_prompt_tokens(
+        self, state_type, kind, prompt_tokens, number_of_trimmed_texts=0
+    ):
+        """Registers the estimated tokens of a prompt in the report of the run, if there's one.
+
+        Args:
+            state_type (StateType): the state type of the layer that the prompt belongs to
+            kind (str): either "response" or "vote"
+            prompt_tokens (int): the estimated tokens of the prompt
+            number_of_trimmed_texts (int, optional): how many candidates were trimmed for the prompt to fit
+        """
+        if self._prompt_token_report is not None:
+            self._prompt_token_report.register_prompt(
+                state_type, kind, prompt_tokens, number_of_trimmed_texts
+            )
+
+    def get_early_stopping(self):
+        """Returns the criteria to stop requesting the votes of a vote once its winners are decided.
+
+        Returns:
+            EarlyStopping | None: the criteria, or None if every vote should be requested
+        """
+        return self._early_stopping
+
+    def get_duplicate_collapsing(self):
+        """Returns the criteria to vote on the near-duplicate candidates of a vote as one.
+
+        Returns:
+            DuplicateCollapsing | None: the criteria, or None if every candidate is voted on separately
+        """
+        return self._duplicate_collapsing
+
+    def get_speculation(self):
+        """Returns the criteria to generate the children of the likely winners of a vote before it's over.
+
+        Returns:
+            Speculation | None: the criteria, or None if the children are only generated once the winners are known
+        """
+        return self._speculation
+
+    def register_cached_response(self, cache_key):
+        """Registers that a response was found in the response cache, so that the speculation of the run,
+        if there's one, can tell whether it was one that it generated.
+
+        Args:
+            cache_key (str): the key of the response
+        """
+        if self._speculation is not None:
+            self._speculation.register_used_response(cache_key)
+
+    def set_next_state_layer(self, next_state_layer, number_of_steps):
+        """Sets the layer that follows the one being processed, which speculation generates the responses of.
+
+        Args:
+            next_state_layer (dict | None): the layer, or None if the one being processed is the last one
+            number_of_steps (int): how many children every winner will have in it
+        """
+        self._next_state_layer = next_state_layer
+        self._number_of_steps_of_next_state_layer = number_of_steps
+
+    def get_next_state_layer(self):
+        """Returns the layer that follows the one being processed.
+
+        Returns:
+            tuple[dict, int] | None: the layer and how many children every winner will have in it,
+                or None if the one being processed is the last one
+        """
+        if self._next_state_layer is None:
+            return None
+
+        return self._next_state_layer, self._number_of_steps_of_next_state_layer
+
+    def save_checkpoint(self):
+        """Saves a checkpoint of the run after a batch of requests has completed, if the run takes checkpoints."""
+        if self._save_checkpoint_function is not None:
+            self._save_checkpoint_function()
+
+    def emit_event(self, event_type, **fields):
+        """Tells the hooks of the run that something happened, if there are any.
+
+        Args:
+            event_type (RunEventType): what happened
+            **fields: the rest of the fields of the RunEvent
+
+        Returns:
+            RunEvent | None: the event, or None if the run has no hooks
+        """
+        if self._run_hooks is None or self._run_hooks.is_empty():
+            return None
+
+        event = RunEvent(event_type, **fields)
+
+        self._run_hooks.emit(event)
+
+        return event
+
+    def emit_finishing_event(self, event_type, started_event, **fields):
+        """Tells the hooks of the run that something that started with 'started_event' finished. The event
+        carries the fields of the one that started it, along with the seconds between both.
+
+        Args:
+            event_type (RunEventType): what finished
+            started_event (RunEvent | None): the event that started it, or None if the run has no hooks
+            **fields: the fields of the RunEvent that weren't known when it started
+        """
+        if started_event is None:
+            return
+
+        self.emit_event(
+            event_type,
+            state_type=started_event.state_type,
+            kind=started_event.kind,
+            node_ids=started_event.node_ids,
+            prompt_size=started_event.prompt_size,
+            number_of_samples=started_event.number_of_samples,
+            request_id=started_event.request_id,
+            duration=time.perf_counter() - started_event.timestamp,
+            **fields,
+        )
+
+    def create_request_id(self):
+        return None if self._run_hooks is None else self._run_hooks.create_request_id()
+
+    def get_budget(self):
+        """Returns the budget of tokens and cost of the run.
+
+        Returns:
+            RunBudget | None: the budget, or None if the run is unlimited
+        """
+        return self._budget
+
+    def verify_budget_allows_request(self):
+        """Verifies that the run can send another request to the AI model.
+
+        Raises:
+            BudgetExceededError: if the run has reached its hard budget
+        """
+        if self._budget is not None:
+            self._budget.verify_hard_limit_isnt_reached()
+
+    def register_spending(self, state_type, prompt, responses):
+        """Registers the tokens of a request that the AI model answered in the budget of the run, if it has one.
+        The tokens are only determined if the budget or the hooks of the run need them.
+
+        Args:
+            state_type (StateType): the state type of the layer that the request belongs to
+            prompt (str): the prompt of the request
+            responses (list[str]): the responses to it
+
+        Returns:
+            tuple[int | None, int | None]: the prompt tokens and the completion tokens, or None if they weren't determined
+        """
+        if self._budget is None and (
+            self._run_hooks is None or self._run_hooks.is_empty()
+        ):
+            return None, None
+
+        prompt_tokens, completion_tokens = determine_tokens_of_request(
+            prompt, responses
+        )
+
+        if self._budget is not None:
+            self._budget.register_request(state_type, prompt_tokens, completion_tokens)
+
+        return prompt_tokens, completion_tokens
@@ -0,0 +1,399 @@
+"""This module contains the events of a run of a tree of thoughts, the hooks that receive them,
+and an exporter that turns them into a trace for the Chrome trace viewer or Perfetto.
+"""
+import contextvars
+import itertools
+import json
+import time
+from threading import Lock
+from enums.run_event_type import RunEventType
+
+# The run, kind and nodes of the request that is being sent, for its attempts to report it
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class RunEvent:
+    """Something that happened in a run of a tree of thoughts, with the nodes it involved, sizes and timings."""
+
+    __slots__ = (
+        "event_type",
+        "timestamp",
+        "state_type",
+        "kind",
+        "node_ids",
+        "prompt_size",
+        "response_size",
+        "number_of_samples",
+        "duration",
+        "request_id",
+        "error",
+        "prompt_tokens",
+        "completion_tokens",
+        "time_to_vote",
+    )
+
+    def __init__(
+        self,
+        event_type,
+        state_type=None,
+        kind=None,
+        node_ids=(),
+        prompt_size=None,
+        response_size=None,
+        number_of_samples=None,
+        duration=None,
+        request_id=None,
+        error=None,
+        prompt_tokens=None,
+        completion_tokens=None,
+        time_to_vote=None,
+    ):
+        """Creates the event, timestamped now.
+
+        Args:
+            event_type (RunEventType): what happened
+            state_type (StateType | None, optional): the state type of the layer it happened in
+            kind (str | None, optional): "response", "vote" or "speculation", for the events about requests, cache hits and votes
+            node_ids (tuple[int], optional): the creation indexes of the nodes involved
+            prompt_size (int | None, optional): the characters of the prompt
+            response_size (int | None, optional): the characters of all the responses together
+            number_of_samples (int | None, optional): how many responses were requested
+            duration (float | None, optional): the seconds that the layer or request took, for the events that finish them
+            request_id (int | None, optional): pairs the start and the end of a request
+            error (str | None, optional): why the request failed, if it did
+            prompt_tokens (int | None, optional): the tokens of the prompt of a finished request, as reported or estimated
+            completion_tokens (int | None, optional): the tokens of the responses of a finished request, as reported or estimated
+            time_to_vote (float | None, optional): the seconds until the last vote of a streamed vote request was read
+        """
+        self.event_type = event_type
+        self.timestamp = time.perf_counter()
+        self.state_type = state_type
+        self.kind = kind
+        self.node_ids = tuple(node_ids)
+        self.prompt_size = prompt_size
+        self.response_size = response_size
+        self.number_of_samples = number_of_samples
+        self.duration = duration
+        self.request_id = request_id
+        self.error = error
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.time_to_vote = time_to_vote
+
+    def __repr__(self):
+        return f"RunEvent({self.event_type.name}, {self.state_type}, {self.kind}, nodes {list(self.node_ids)})"
+
+
+def get_node_id(node):
+    """Returns the identifier of a node within its tree, which is the order in which it was created."""
+    return node.creation_index
+
+
+class RunHooks:
+    """The functions that are called with every event of a run. They're called from the thread or task that
+    caused the event, so they must be fast and thread-safe.
+    """
+
+    def __init__(self):
+        self._hooks = []
+
+        self._request_ids = itertools.count()
+
+    def add_hook(self, hook_function):
+        self._hooks.append(hook_function)
+
+    def is_empty(self):
+        return not self._hooks
+
+    def emit(self, event):
+        for hook_function in self._hooks:
+            hook_function(event)
+
+    def create_request_id(self):
+        return next(self._request_ids)
+
+
+class ChromeTraceExporter:
+    """A hook that records the events of a run, and exports them in the JSON format of the Chrome trace viewer
+    (chrome://tracing) and Perfetto. Layers are drawn on a track of their own, and every attempt of a request on the first
+    track that is free when it starts, so the number of tracks in use shows the concurrency of the run.
+    """
+
+    _LAYERS_TRACK = 0
+
+    def __init__(self):
+        self._events = []
+
+        self._lock = Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self._events.append(event)
+
+    def get_events(self):
+        with self._lock:
+            return list(self._events)
+
+    @staticmethod
+    def _create_arguments(event):
+        arguments = {
+            "nodes": list(event.node_ids),
+            "prompt_size": event.prompt_size,
+            "response_size": event.response_size,
+            "number_of_samples": event.number_of_samples,
+            "error": event.error,
+            "prompt_tokens": event.prompt_tokens,
+            "completion_tokens": event.completion_tokens,
+            "time_to_vote": event.time_to_vote,
+        }
+
+        return {key: value for key, value in arguments.items() if value is not None}
+
+    def create_trace(self):
+        """Converts the recorded events into trace events.
+
+        Returns:
+            dict: the trace, in the JSON object format of the Chrome trace viewer
+        """
+        events = sorted(self.get_events(), key=lambda event: event.timestamp)
+
+        if not events:
+            return {"traceEvents": [], "displayTimeUnit": "ms"}
+
+        start = events[0].timestamp
+
+        def to_microseconds(seconds):
+            return round(seconds * 1_000_000, 3)
+
+        trace_events = []
+
+        # The tracks of the requests in flight, to reuse the first free one
+        request_tracks = {}
+        busy_tracks = set()
+
+        for event in events:
+            name = (
+                event.state_type.name.lower() if event.state_type is not None else "run"
+            )
+
+            if event.event_type == RunEventType.LAYER_FINISHED:
+                trace_events.append(
+                    {
+                        "name": f"layer {name}",
+                        "cat": "layer",
+                        "ph": "X",
+                        "ts": to_microseconds(event.timestamp - event.duration - start),
+                        "dur": to_microseconds(event.duration),
+                        "pid": 1,
+                        "tid": self._LAYERS_TRACK,
+                        "args": self._create_arguments(event),
+                    }
+                )
+            elif event.event_type == RunEventType.REQUEST_STARTED:
+                track = next(
+                    track
+                    for track in itertools.count(self._LAYERS_TRACK + 1)
+                    if track not in busy_tracks
+                )
+
+                busy_tracks.add(track)
+                request_tracks[event.request_id] = track
+            elif event.event_type == RunEventType.REQUEST_FINISHED:
+                track = request_tracks.pop(event.request_id)
+                busy_tracks.discard(track)
+
+                trace_events.append(
+                    {
+                        "name": f"{event.kind} {name}",
+                        "cat": "request",
+                        "ph": "X",
+                        "ts": to_microseconds(event.timestamp - event.duration - start),
+                        "dur": to_microseconds(event.duration),
+                        "pid": 1,
+                        "tid": track,
+                        "args": self._create_arguments(event),
+                    }
+                )
+            elif event.event_type in (RunEventType.CACHE_HIT, RunEventType.VOTE_PARSED):
+                trace_events.append(
+                    {
+                        "name": f"{event.event_type.name.lower()} {event.kind} {name}",
+                        "cat": event.event_type.name.lower(),
+                        "ph": "i",
+                        "s": "t",
+                        "ts": to_microseconds(event.timestamp - start),
+                        "pid": 1,
+                        "tid": self._LAYERS_TRACK,
+                        "args": self._create_arguments(event),
+                    }
+                )
+
+        trace_events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": self._LAYERS_TRACK,
+                "args": {"name": "layers"},
+            }
+        )
+
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export(self, file_path):
+        """Writes the trace to a file that the Chrome trace viewer and Perfetto can open.
+
+        Args:
+            file_path (str): the path of the file
+        """
+        with open(file_path, "w", encoding="utf8") as file:
+            json.dump(self.create_trace(), file)
+
+
+def _emit_request_started(run_context, kind, nodes, prompt, number_of_samples):
+    return run_context.emit_event(
+        RunEventType.REQUEST_STARTED,
+        state_type=nodes[0].name.get_state_type(),
+        kind=kind,
+        node_ids=[get_node_id(node) for node in nodes],
+        prompt_size=len(prompt),
+        number_of_samples=number_of_samples,
+        request_id=run_context.create_request_id(),
+    )
+
+
+def _determine_time_to_vote(responses):
+    # Only the streamed requests know when every response was complete
+    times_to_stop = getattr(responses, "times_to_stop", None)
+
+    if not times_to_stop or None in times_to_stop:
+        return None
+
+    return max(times_to_stop)
+
+
+def _emit_request_finished(
+    run_context,
+    started_event,
+    responses=None,
+    error=None,
+    prompt_tokens=None,
+    completion_tokens=None,
+):
+    run_context.emit_finishing_event(
+        RunEventType.REQUEST_FINISHED,
+        started_event,
+        response_size=None
+        if responses is None
+        else sum(len(response) for response in responses),
+        error=None if error is None else str(error),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        time_to_vote=_determine_time_to_vote(responses),
+    )
+
+
+def _emit_attempt_started(prompt, number_of_samples):
+    run_context, kind, nodes = _current_request.get()
+
+    return _emit_request_started(run_context, kind, nodes, prompt, number_of_samples)
+
+
+def _emit_attempt_finished(started_event, prompt, responses=None, error=None):
+    run_context, _, nodes = _current_request.get()
+
+    if error is not None:
+        _emit_request_finished(run_context, started_event, error=error)
+        return
+
+    prompt_tokens, completion_tokens = run_context.register_spending(
+        nodes[0].name.get_state_type(), prompt, responses
+    )
+
+    _emit_request_finished(
+        run_context,
+        started_event,
+        responses,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+    )
+
+
+def get_kind_of_current_request():
+    """Returns the kind of the request that 'arequest_samples_with_events' is sending from the current thread or task,
+    so that the functions that request samples can treat the requests depending on where they were made.
+
+    Returns:
+        str | None: "response", "vote", "score" or "speculation", or None outside of a request
+    """
+    current_request = _current_request.get()
+
+    return None if current_request is None else current_request[1]
+
+
+def report_attempts_of_arequest_samples_function(arequest_samples_function):
+    """Wraps 'arequest_samples_function' so that every call to it, which is an attempt to send the request of
+    'arequest_samples_with_events', tells the hooks of the run when it starts and finishes, and registers
+    the tokens it used in the budget of the run. It must be wrapped by the scheduler and the limits of
+    concurrency, so that the time that a request waits in them isn't reported as time in flight.
+
+    Args:
+        arequest_samples_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that requests samples from the AI model
+
+    Returns:
+        Callable[[str, int], Awaitable[list[str]]]: the reporting coroutine function
+    """
+
+    async def arequest_samples(prompt, number_of_samples):
+        if _current_request.get() is None:
+            return await arequest_samples_function(prompt, number_of_samples)
+
+        started_event = _emit_attempt_started(prompt, number_of_samples)
+
+        try:
+            responses = await arequest_samples_function(prompt, number_of_samples)
+        except Exception as exception:
+            _emit_attempt_finished(started_event, prompt, error=exception)
+            raise
+
+        _emit_attempt_finished(started_event, prompt, responses)
+
+        return responses
+
+    return arequest_samples
+
+
+async def arequest_samples_with_events(
+    run_context,
+    kind,
+    nodes,
+    prompt,
+    number_of_samples,
+    arequest_samples_from_ai_model_function,
+):
+    """Requests samples from the AI model on behalf of some nodes. Every attempt to send the request that goes through
+    'report_attempts_of_arequest_samples_function' tells the hooks of the run when it starts and finishes, and registers
+    the tokens it used in the budget of the run.
+
+    Args:
+        run_context (RunContext): the settings of the current run
+        kind (str): "response", "vote", "score" or "speculation"
+        nodes (list[Node]): the nodes that the request is for
+        prompt (str): the prompt
+        number_of_samples (int): how many responses to request
+        arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that will request samples from the AI model
+
+    Returns:
+        list[str]: the responses
+
+    Raises:
+        BudgetExceededError: if the run has reached its hard budget, in which case the request isn't sent
+    """
+    run_context.verify_budget_allows_request()
+
+    token = _current_request.set((run_context, kind, nodes))
+
+    try:
+        return await arequest_samples_from_ai_model_function(prompt, number_of_samples)
+    finally:
+        _current_request.reset(token)
@@ -0,0 +1,277 @@
+"""This module contains the class RunStore, that keeps every artifact of the runs of trees of thoughts (their responses,
+votes and winners), along with the entries of the response cache, in a single SQLite database rather than
+in thousands of small text files.
+"""
+import os
+import sqlite3
+import time
+import zlib
+from threading import Lock
+from defines import RUN_STORE_WRITES_PER_TRANSACTION
+from errors import InvalidParameterError
+from file_utils import create_directories, write_response_to_file
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_name TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    body BLOB NOT NULL,
+    is_compressed INTEGER NOT NULL,
+    PRIMARY KEY (run_name, file_name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    is_compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    last_used_at REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS cache_entries_by_last_use ON cache_entries (last_used_at);
+"""
+
+
+class RunStore:
+    """A single-file store for the artifacts of runs and the entries of the response cache. Writes are grouped
+    into transactions of several writes each, and the bodies can be compressed. Reads go through the same connection,
+    so they also see the writes of the transaction that hasn't been committed yet.
+    """
+
+    def __init__(
+        self,
+        file_path,
+        compress=False,
+        writes_per_transaction=RUN_STORE_WRITES_PER_TRANSACTION,
+    ):
+        """Opens the store, creating it if it doesn't exist.
+
+        Args:
+            file_path (str): the path of the database. ':memory:' keeps it in memory.
+            compress (bool, optional): whether the bodies written from now on are compressed
+            writes_per_transaction (int, optional): how many writes are committed together
+
+        Raises:
+            InvalidParameterError: if 'writes_per_transaction' is lower than 1
+        """
+        if writes_per_transaction < 1:
+            raise InvalidParameterError(
+                f"The RunStore requires 'writes_per_transaction' to be at least 1, but it was {writes_per_transaction}"
+            )
+
+        if file_path != ":memory:":
+            create_directories(os.path.dirname(file_path) or ".")
+
+        self._compress = compress
+        self._writes_per_transaction = writes_per_transaction
+
+        self._number_of_uncommitted_writes = 0
+
+        # The store is shared by the worker threads that requests run in
+        self._connection = sqlite3.connect(file_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+        self._lock = Lock()
+
+    def _encode_body(self, body):
+        encoded_body = body.encode("utf8")
+
+        if self._compress:
+            return zlib.compress(encoded_body), True
+
+        return encoded_body, False
+
+    @staticmethod
+    def _decode_body(body, is_compressed):
+        if is_compressed:
+            body = zlib.decompress(body)
+
+        return body.decode("utf8")
+
+    def _write(self, statement, parameters):
+        # Must be called with the lock held
+        self._connection.execute(statement, parameters)
+
+        self._number_of_uncommitted_writes += 1
+
+        if self._number_of_uncommitted_writes >= self._writes_per_transaction:
+            self._commit()
+
+    def _commit(self):
+        self._connection.commit()
+
+        self._number_of_uncommitted_writes = 0
+
+    def flush(self):
+        """Commits the writes that haven't been committed yet."""
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        """Commits the pending writes and closes the store."""
+        with self._lock:
+            self._commit()
+
+            self._connection.close()
+
+    def put_artifact(self, run_name, file_name, body):
+        """Stores an artifact of a run, replacing the one with the same name, if any.
+
+        Args:
+            run_name (str): the name of the tree of thoughts of the run
+            file_name (str): the name of the file that the artifact would be written to, such as 'planning_1.txt'
+            body (str): the contents of the artifact
+        """
+        encoded_body, is_compressed = self._encode_body(body)
+
+        with self._lock:
+            self._write(
+                "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?)",
+                (run_name.lower(), file_name, encoded_body, is_compressed),
+            )
+
+    def get_artifact(self, run_name, file_name):
+        """Returns an artifact of a run.
+
+        Args:
+            run_name (str): the name of the tree of thoughts of the run
+            file_name (str): the name of the artifact
+
+        Returns:
+            str | None: the contents of the artifact, or None if there isn't any
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, is_compressed FROM artifacts WHERE run_name = ? AND file_name = ?",
+                (run_name.lower(), file_name),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return self._decode_body(*row)
+
+    def get_run_names(self):
+        with self._lock:
+            return [
+                run_name
+                for (run_name,) in self._connection.execute(
+                    "SELECT DISTINCT run_name FROM artifacts ORDER BY run_name"
+                )
+            ]
+
+    def export_artifacts(self, run_name, directory_path):
+        """Writes every artifact of a run as a file of its own, with the layout that runs without a store have.
+
+        Args:
+            run_name (str): the name of the tree of thoughts of the run
+            directory_path (str): the directory that the files are written to
+
+        Returns:
+            int: how many files were written
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT file_name, body, is_compressed FROM artifacts WHERE run_name = ? ORDER BY file_name",
+                (run_name.lower(),),
+            ).fetchall()
+
+        create_directories(directory_path)
+
+        for file_name, body, is_compressed in rows:
+            write_response_to_file(
+                os.path.join(directory_path, file_name),
+                self._decode_body(body, is_compressed),
+            )
+
+        return len(rows)
+
+    def get_cache_entry(self, key):
+        """Returns the response stored in the cache under 'key', marking it as recently used.
+
+        Args:
+            key (str): the key of the entry
+
+        Returns:
+            str | None: the response, or None if there isn't any
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, is_compressed FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._write(
+                "UPDATE cache_entries SET last_used_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+
+        return self._decode_body(*row)
+
+    def put_cache_entry(self, key, response):
+        """Stores a response in the cache under 'key'.
+
+        Args:
+            key (str): the key of the entry
+            response (str): the response
+
+        Returns:
+            int: how many bytes the cache grew by, which is negative if it replaced a larger entry
+        """
+        encoded_body, is_compressed = self._encode_body(response)
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            self._write(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?)",
+                (key, encoded_body, is_compressed, len(encoded_body), time.time()),
+            )
+
+        return len(encoded_body) - (0 if row is None else row[0])
+
+    def get_size_of_cache_entries(self):
+        """Returns how many bytes the bodies of the cache entries take."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()[0]
+
+    def evict_cache_entries(self, target_size):
+        """Removes the least recently used entries of the cache until their bodies take at most 'target_size' bytes.
+
+        Args:
+            target_size (int): the size in bytes to shrink the cache to
+
+        Returns:
+            tuple[list[str], int]: the keys of the entries removed, and the size of the cache afterwards
+        """
+        with self._lock:
+            size = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()[0]
+
+            evicted_keys = []
+
+            for key, entry_size in self._connection.execute(
+                "SELECT key, size FROM cache_entries ORDER BY last_used_at"
+            ).fetchall():
+                if size <= target_size:
+                    break
+
+                evicted_keys.append(key)
+                size -= entry_size
+
+            self._connection.executemany(
+                "DELETE FROM cache_entries WHERE key = ?",
+                [(key,) for key in evicted_keys],
+            )
+            self._commit()
+
+        return evicted_keys, size
@@ -0,0 +1,229 @@
+"""This module contains the functions that evaluate a layer of states by scoring every candidate on its own,
+rather than voting on all of them together. Since the prompt of every candidate only contains its own response,
+the prompts can be requested concurrently, and the scores of a response are reused from the response cache
+wherever the same response appears again. The scores are added to the votes of the candidates, which rank them.
+"""
+import asyncio
+from colorama import Fore
+from defines import (
+    DOUBLE_RETURNS,
+    MAX_SCORE,
+    SCORES_PER_CANDIDATE,
+    SCORING_STRING_FOR_AI_MODEL,
+)
+from enums.run_event_type import RunEventType
+from errors import RequestToAiModelFailedError, UnableToExtractScoreFromResponse
+from file_utils import create_file_path_for_score
+from output import output_message
+from regular_expressions import extract_score
+from run_events import arequest_samples_with_events, get_node_id
+from token_counting import verify_prompt_fits
+
+
+def create_prompt_for_score(unresolved_leaf_node_with_response):
+    return "".join(
+        [
+            unresolved_leaf_node_with_response.name.get_context(),
+            f"{DOUBLE_RETURNS}{unresolved_leaf_node_with_response.name.get_state_type_related_text()}",
+            f"{DOUBLE_RETURNS}Answer: {unresolved_leaf_node_with_response.name.get_response()}",
+            f"{DOUBLE_RETURNS}Score the answer from 1 to {MAX_SCORE}. Use the format: '{SCORING_STRING_FOR_AI_MODEL}'.",
+        ]
+    )
+
+
+def is_prompt_for_score(prompt):
+    return SCORING_STRING_FOR_AI_MODEL in prompt
+
+
+def register_score(response, file_path, unresolved_leaf_node, run_context):
+    """Extracts the score of a response, and stores the response.
+
+    Returns:
+        int: the score
+
+    Raises:
+        UnableToExtractScoreFromResponse: if the response doesn't contain a valid score
+    """
+    score = extract_score(response.lower())
+
+    if score is None or not 1 <= score <= MAX_SCORE:
+        error_message = f"Was unable to determine the score given the following response from the AI model: {response}\n"
+        error_message += f"The response should contain the text 'score is X', with X from 1 to {MAX_SCORE}."
+        raise UnableToExtractScoreFromResponse(error_message)
+
+    # Store the response, now that we know that it contains a valid score
+    run_context.store_artifact(file_path, response)
+
+    run_context.emit_event(
+        RunEventType.VOTE_PARSED,
+        state_type=unresolved_leaf_node.name.get_state_type(),
+        kind="score",
+        node_ids=[get_node_id(unresolved_leaf_node)],
+        response_size=len(response),
+    )
+
+    return score
+
+
+def _determine_pending_scores(prompt, unresolved_leaf_node, run_context):
+    # Scores already stored in the response cache are registered right away. The rest must be requested from the AI model.
+    response_cache = run_context.get_response_cache()
+
+    scores = []
+    pending_scores = []
+
+    for i in range(SCORES_PER_CANDIDATE):
+        file_path = create_file_path_for_score(
+            run_context.get_directory_path(), unresolved_leaf_node, i
+        )
+
+        cache_key = None
+        response = None
+
+        if response_cache is not None:
+            cache_key = response_cache.create_key(prompt, i)
+            response = response_cache.get(cache_key)
+
+        if response is None:
+            pending_scores.append((file_path, cache_key))
+            continue
+
+        run_context.emit_event(
+            RunEventType.CACHE_HIT,
+            state_type=unresolved_leaf_node.name.get_state_type(),
+            kind="score",
+            node_ids=[get_node_id(unresolved_leaf_node)],
+            prompt_size=len(prompt),
+            response_size=len(response),
+        )
+
+        scores.append(
+            register_score(response, file_path, unresolved_leaf_node, run_context)
+        )
+
+    return scores, pending_scores
+
+
+def _register_sampled_scores(
+    responses, pending_scores, unresolved_leaf_node, run_context
+):
+    if len(responses) != len(pending_scores):
+        raise RequestToAiModelFailedError(
+            f"Requested {len(pending_scores)} scores from the AI model, but received {len(responses)}."
+        )
+
+    response_cache = run_context.get_response_cache()
+
+    scores = []
+
+    for response, (file_path, cache_key) in zip(responses, pending_scores):
+        scores.append(
+            register_score(response, file_path, unresolved_leaf_node, run_context)
+        )
+
+        # Only cached once we know that it contains a valid score
+        if response_cache is not None:
+            response_cache.put(cache_key, response)
+
+    return scores
+
+
+def _resolve_candidate(unresolved_leaf_node, scores, run_context):
+    # The scores are only added once all of them are in, along with the resolution, so that a checkpoint
+    # never holds a candidate with part of its scores, which a resumed run would score again
+    unresolved_leaf_node.name.add_vote(sum(scores))
+    unresolved_leaf_node.name.consider_resolved()
+
+    run_context.save_checkpoint()
+
+
+def _create_fitting_prompt_for_score(unresolved_leaf_node, run_context):
+    prompt = create_prompt_for_score(unresolved_leaf_node)
+
+    prompt_tokens = verify_prompt_fits(prompt, run_context.get_max_prompt_tokens())
+
+    run_context.register_prompt_tokens(
+        unresolved_leaf_node.name.get_state_type(), "score", prompt_tokens
+    )
+
+    return prompt
+
+
+def _output_scoring_message(unresolved_leaf_nodes_with_responses, run_context):
+    output_message(
+        Fore.LIGHTBLUE_EX,
+        f"Scoring {len(unresolved_leaf_nodes_with_responses)} answer(s) for state "
+        + f"'{unresolved_leaf_nodes_with_responses[0].name.get_state_type().name.lower()}' on their own",
+        run_context.is_visual_output_active(),
+    )
+
+
+async def aprocess_scoring(
+    unresolved_leaf_nodes_with_responses,
+    run_context,
+    arequest_samples_from_ai_model_function,
+):
+    """Requests the scores of every node, adds them to its votes, and resolves it. The scores of all the nodes
+    are requested concurrently, and a checkpoint is saved every time that a node is resolved.
+
+    Args:
+        unresolved_leaf_nodes_with_responses (list[Node]): the nodes of the layer, which have their responses
+        run_context (RunContext): the settings of the current run
+        arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that will request samples from the AI model
+
+    Raises:
+        PromptExceedsContextWindowError: if the prompt of any node doesn't fit in the context window of the AI model
+        UnableToExtractScoreFromResponse: if a response of the AI model doesn't contain a valid score
+    """
+    if not unresolved_leaf_nodes_with_responses:
+        return
+
+    _output_scoring_message(unresolved_leaf_nodes_with_responses, run_context)
+
+    # Every prompt is verified before any of them is sent
+    prompts = [
+        _create_fitting_prompt_for_score(node, run_context)
+        for node in unresolved_leaf_nodes_with_responses
+    ]
+
+    async def score_candidate(prompt, unresolved_leaf_node):
+        scores, pending_scores = _determine_pending_scores(
+            prompt, unresolved_leaf_node, run_context
+        )
+
+        if pending_scores:
+            scores += _register_sampled_scores(
+                await arequest_samples_with_events(
+                    run_context,
+                    "score",
+                    [unresolved_leaf_node],
+                    prompt,
+                    len(pending_scores),
+                    arequest_samples_from_ai_model_function,
+                ),
+                pending_scores,
+                unresolved_leaf_node,
+                run_context,
+            )
+
+        _resolve_candidate(unresolved_leaf_node, scores, run_context)
+
+    # The candidates whose prompt is repeated wait for the first one, so that they find its scores in the response cache
+    first_candidates = {}
+    repeated_candidates = []
+
+    for prompt, unresolved_leaf_node in zip(
+        prompts, unresolved_leaf_nodes_with_responses
+    ):
+        if prompt in first_candidates:
+            repeated_candidates.append((prompt, unresolved_leaf_node))
+        else:
+            first_candidates[prompt] = unresolved_leaf_node
+
+    for candidates in [list(first_candidates.items()), repeated_candidates]:
+        await asyncio.gather(
+            *[
+                score_candidate(prompt, unresolved_leaf_node)
+                for prompt, unresolved_leaf_node in candidates
+            ]
+        )
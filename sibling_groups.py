@@ -0,0 +1,90 @@
+"""This module contains the functions that process a layer of states in groups of siblings (the children
+of each previous winner), so that each group is voted on separately, as soon as its responses are in.
+"""
+import asyncio
+from anytree import Node
+from responses.requesting import arequest_responses
+from voting import adetermine_winners
+
+
+def group_leaf_nodes_by_parent(leaf_nodes: list[Node]) -> list[tuple[int, list[Node]]]:
+    """Groups the leaf nodes by their parent, keeping the order in which they appear.
+
+    Args:
+        leaf_nodes (list[Node]): the leaf nodes of a layer
+
+    Returns:
+        list[tuple[int, list[Node]]]: for every group of siblings, the position of its first node within 'leaf_nodes' and the siblings themselves
+    """
+    sibling_groups = {}
+
+    for i, leaf_node in enumerate(leaf_nodes):
+        sibling_groups.setdefault(leaf_node.parent, (i, []))[1].append(leaf_node)
+
+    return list(sibling_groups.values())
+
+
+def _determine_siblings_without_responses(sibling_nodes):
+    # When resuming from a checkpoint, some groups may already have their responses
+    return [node for node in sibling_nodes if not node.name.has_response()]
+
+
+def _determine_unresolved_sibling_groups(layer_nodes):
+    # The groups are numbered among all those of the layer, so that a resumed layer names its files like an uninterrupted one
+    return [
+        (sibling_group_index, file_index_offset, sibling_nodes)
+        for sibling_group_index, (file_index_offset, sibling_nodes) in enumerate(
+            group_leaf_nodes_by_parent(layer_nodes)
+        )
+        if not all(node.name.is_resolved() for node in sibling_nodes)
+    ]
+
+
+async def aprocess_sibling_groups(
+    layer_nodes,
+    number_of_steps,
+    run_context,
+    arequest_samples_from_ai_model_function,
+):
+    """Requests the responses of every group of siblings, and right after the votes among them.
+    The groups are processed concurrently, so a group's votes are requested while other groups
+    are still generating their responses. A checkpoint is saved every time that a group is resolved.
+
+    Args:
+        layer_nodes (list[Node]): all the nodes of the layer in creation order, including the groups already resolved, which are skipped
+        number_of_steps (int): how many votes will be requested for every group of siblings
+        run_context (RunContext): the settings of the current run
+        arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that will request samples from the AI model
+    """
+
+    async def process_sibling_group(
+        sibling_group_index, file_index_offset, sibling_nodes
+    ):
+        await arequest_responses(
+            _determine_siblings_without_responses(sibling_nodes),
+            run_context,
+            arequest_samples_from_ai_model_function,
+            file_index_offset,
+            sibling_nodes[0].creation_index,
+        )
+
+        await adetermine_winners(
+            sibling_nodes,
+            number_of_steps,
+            run_context,
+            arequest_samples_from_ai_model_function,
+            sibling_group_index,
+        )
+
+        run_context.save_checkpoint()
+
+    await asyncio.gather(
+        *[
+            process_sibling_group(sibling_group_index, file_index_offset, sibling_nodes)
+            for (
+                sibling_group_index,
+                file_index_offset,
+                sibling_nodes,
+            ) in _determine_unresolved_sibling_groups(layer_nodes)
+        ]
+    )
@@ -0,0 +1,331 @@
+"""This module contains the class Speculation, that generates the responses of the children of the candidates that are
+almost certain to win a vote while the rest of its votes are still being requested. The responses are kept in the response
+cache under the prompts that the children will have, so the next layer finds them there instead of waiting for them.
+The responses of the candidates that don't win after all stay in the cache.
+"""
+import asyncio
+import math
+from threading import Lock
+from colorama import Fore
+from defines import SPECULATION_MAX_RESPONSES
+from errors import AncestorStateTypeNotFoundError, InvalidParameterError
+from node_utils import create_detached_child_state_node
+from output import output_message
+from responses.prompt_creation import create_prompt_for_response
+from run_events import arequest_samples_with_events
+from token_counting import verify_prompt_fits
+
+
+class Speculation:
+    """Decides which candidates of a vote are likely enough to win to generate the responses of their children early,
+    within a limit of responses for the whole run. Speculating on a candidate that is certain to win costs nothing extra.
+    It also counts the responses that it generated, and how many of them the next layers used.
+    """
+
+    def __init__(
+        self,
+        lead_fraction=1,
+        max_speculative_responses=SPECULATION_MAX_RESPONSES,
+        batch_size=None,
+    ):
+        """Creates the speculation criteria.
+
+        Args:
+            lead_fraction (float, optional): between 0 and 1, the fraction of the remaining votes that the lead of a candidate
+                over the first one that could take its place among the winners must exceed. With 1, only the candidates
+                that are certain to win are speculated on.
+            max_speculative_responses (int, optional): how many responses can be generated speculatively in a run
+            batch_size (int | None, optional): how many votes are requested at once between checks, unless the run stops
+                votes early. If None, the first half of the votes of every vote is requested before the first check,
+                so that only one more request is sent than without speculation.
+
+        Raises:
+            InvalidParameterError: if the lead fraction isn't between 0 and 1, or the maximum responses are negative,
+                or the batch size is lower than 1
+        """
+        if not 0 <= lead_fraction <= 1:
+            raise InvalidParameterError(
+                f"The Speculation requires a lead fraction between 0 and 1, but it was {lead_fraction}"
+            )
+
+        if max_speculative_responses < 0:
+            raise InvalidParameterError(
+                f"The Speculation requires 'max_speculative_responses' to be at least 0, but it was {max_speculative_responses}"
+            )
+
+        if batch_size is not None and batch_size < 1:
+            raise InvalidParameterError(
+                f"The Speculation requires a batch size of at least 1, but it was {batch_size}"
+            )
+
+        self._lead_fraction = lead_fraction
+        self._max_speculative_responses = max_speculative_responses
+        self._batch_size = batch_size
+
+        self._speculated_cache_keys = set()
+        self._used_cache_keys = set()
+
+        self._lock = Lock()
+
+    def determine_batch_size(self, number_of_votes):
+        """Determines how many of the votes of a vote are requested at once between checks.
+
+        Args:
+            number_of_votes (int): how many votes the vote has
+
+        Returns:
+            int: the size of the batches
+        """
+        if self._batch_size is None:
+            return math.ceil(number_of_votes / 2)
+
+        return self._batch_size
+
+    def get_number_of_speculated_responses(self):
+        with self._lock:
+            return len(self._speculated_cache_keys)
+
+    def get_number_of_used_responses(self):
+        with self._lock:
+            return len(self._used_cache_keys)
+
+    def get_hit_rate(self):
+        """Returns the fraction of the responses generated speculatively that the next layers used.
+
+        Returns:
+            float | None: the hit rate, or None if nothing was speculated
+        """
+        with self._lock:
+            if not self._speculated_cache_keys:
+                return None
+
+            return len(self._used_cache_keys) / len(self._speculated_cache_keys)
+
+    def determine_likely_winners(self, votes, number_of_winners, remaining_votes):
+        """Determines which candidates are likely enough to win to speculate on them.
+
+        Args:
+            votes (list[int]): the votes of every candidate so far
+            number_of_winners (int): how many of the candidates win
+            remaining_votes (int): how many votes could still be requested
+
+        Returns:
+            list[int]: the positions of the candidates
+        """
+        likely_winners = []
+
+        for i, candidate_votes in enumerate(votes):
+            other_votes = sorted(votes[:i] + votes[i + 1 :], reverse=True)
+
+            # Every candidate wins if there aren't more than the winners
+            if number_of_winners > len(other_votes):
+                likely_winners.append(i)
+                continue
+
+            if number_of_winners <= 0:
+                continue
+
+            # The candidate that would take its place if it overtook it
+            rival_votes = other_votes[number_of_winners - 1]
+
+            if candidate_votes > rival_votes + self._lead_fraction * remaining_votes:
+                likely_winners.append(i)
+
+        return likely_winners
+
+    def reserve_responses(self, cache_keys):
+        """Reserves the responses of a prompt within the limit of the run, unless they were already speculated.
+
+        Args:
+            cache_keys (list[str]): the keys that the responses will be cached under
+
+        Returns:
+            bool: whether they should be generated
+        """
+        with self._lock:
+            if any(
+                cache_key in self._speculated_cache_keys for cache_key in cache_keys
+            ):
+                return False
+
+            if (
+                len(self._speculated_cache_keys) + len(cache_keys)
+                > self._max_speculative_responses
+            ):
+                return False
+
+            self._speculated_cache_keys.update(cache_keys)
+
+            return True
+
+    def release_responses(self, cache_keys):
+        """Releases the responses reserved for a prompt that failed to be generated."""
+        with self._lock:
+            self._speculated_cache_keys.difference_update(cache_keys)
+
+    def register_used_response(self, cache_key):
+        """Registers that a layer found a response in the cache, which counts as a hit if it was speculated."""
+        with self._lock:
+            if cache_key in self._speculated_cache_keys:
+                self._used_cache_keys.add(cache_key)
+
+
+def _create_speculative_request(candidate_node, run_context):
+    next_state_layer, number_of_steps = run_context.get_next_state_layer()
+
+    child_node = create_detached_child_state_node(
+        next_state_layer["state_type"],
+        next_state_layer["state_type_text"],
+        next_state_layer["include_ancestor_state_type_response"],
+        candidate_node,
+    )
+
+    try:
+        prompt = create_prompt_for_response(child_node)
+    except AncestorStateTypeNotFoundError:
+        # The next layer will fail on its own when it starts
+        return None
+
+    response_cache = run_context.get_response_cache()
+
+    cache_keys = [
+        response_cache.create_key(prompt, sample_index)
+        for sample_index in range(number_of_steps)
+    ]
+
+    # The children may have been generated by a previous run
+    if response_cache.get(cache_keys[0]) is not None:
+        return None
+
+    return child_node, prompt, cache_keys
+
+
+def _determine_speculative_requests(
+    candidate_nodes, votes, number_of_winners, remaining_votes, run_context
+):
+    speculation = run_context.get_speculation()
+    budget = run_context.get_budget()
+
+    if (
+        speculation is None
+        or run_context.get_next_state_layer() is None
+        or run_context.get_response_cache() is None
+        or (budget is not None and budget.is_soft_limit_reached())
+    ):
+        return []
+
+    speculative_requests = []
+
+    for i in speculation.determine_likely_winners(
+        votes, number_of_winners, remaining_votes
+    ):
+        speculative_request = _create_speculative_request(
+            candidate_nodes[i], run_context
+        )
+
+        if speculative_request is None or not speculation.reserve_responses(
+            speculative_request[2]
+        ):
+            continue
+
+        output_message(
+            Fore.LIGHTBLUE_EX,
+            f"Speculatively requesting {len(speculative_request[2])} response(s) for state "
+            + f"'{speculative_request[0].name.get_state_type().name.lower()}' while the vote is still going",
+            run_context.is_visual_output_active(),
+        )
+
+        speculative_requests.append(speculative_request)
+
+    return speculative_requests
+
+
+def _store_speculative_responses(responses, cache_keys, run_context):
+    if len(responses) != len(cache_keys):
+        raise ValueError(
+            f"Requested {len(cache_keys)} speculative responses from the AI model, but received {len(responses)}."
+        )
+
+    response_cache = run_context.get_response_cache()
+
+    for response, cache_key in zip(responses, cache_keys):
+        response_cache.put(cache_key, response)
+
+
+def _discard_failed_speculation(exception, cache_keys, run_context):
+    run_context.get_speculation().release_responses(cache_keys)
+
+    output_message(
+        Fore.LIGHTYELLOW_EX,
+        f"A speculative request was discarded, since it failed: {exception}",
+        run_context.is_visual_output_active(),
+    )
+
+
+async def _aspeculate(
+    child_node,
+    prompt,
+    cache_keys,
+    run_context,
+    arequest_samples_from_ai_model_function,
+):
+    # A speculation that fails never stops the run, since the next layer requests whatever isn't cached
+    try:
+        verify_prompt_fits(prompt, run_context.get_max_prompt_tokens())
+
+        _store_speculative_responses(
+            await arequest_samples_with_events(
+                run_context,
+                "speculation",
+                [child_node],
+                prompt,
+                len(cache_keys),
+                arequest_samples_from_ai_model_function,
+            ),
+            cache_keys,
+            run_context,
+        )
+    except Exception as exception:
+        _discard_failed_speculation(exception, cache_keys, run_context)
+
+
+def aspeculate_on_likely_winners(
+    candidate_nodes,
+    votes,
+    number_of_winners,
+    remaining_votes,
+    run_context,
+    arequest_samples_from_ai_model_function,
+):
+    """Starts generating, as tasks of the event loop, the responses of the children in the next layer of the candidates
+    that are likely to win the vote, if the run speculates and they weren't speculated on already.
+
+    Args:
+        candidate_nodes (list[Node]): the nodes that are voted on
+        votes (list[int]): the votes of every candidate so far in this vote
+        number_of_winners (int): how many of the candidates will win
+        remaining_votes (int): how many votes could still be requested
+        run_context (RunContext): the settings of the current run
+        arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that will request samples from the AI model
+
+    Returns:
+        list[asyncio.Task]: the speculations that started, which must be awaited before the next layer starts
+    """
+    return [
+        asyncio.create_task(
+            _aspeculate(
+                child_node,
+                prompt,
+                cache_keys,
+                run_context,
+                arequest_samples_from_ai_model_function,
+            )
+        )
+        for child_node, prompt, cache_keys in _determine_speculative_requests(
+            candidate_nodes, votes, number_of_winners, remaining_votes, run_context
+        )
+    ]
+
+
+async def await_speculations(speculations):
+    await asyncio.gather(*speculations)
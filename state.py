@@ -1,9 +1,22 @@
+from threading import Lock
 from types import NoneType
 from enums.state_type import StateType
 from errors import InvalidParameterError
 
 
 class State:
+    __slots__ = (
+        "_context",
+        "_state_type",
+        "_state_type_related_text",
+        "_include_ancestor_state_type_response",
+        "_response",
+        "_is_resolved",
+        "_votes",
+        "_lock",
+        "_on_change_function",
+    )
+
     def __init__(self, context, state_type):
         self._context = context
         self._state_type = state_type
@@ -21,6 +34,12 @@ class State:
 
         self._votes = 0
 
+        # Responses and votes may be set from concurrent requests
+        self._lock = Lock()
+
+        # Called whenever the response or the resolution of this state changes
+        self._on_change_function = None
+
     def set_state_type_related_text(self, state_type_related_text):
         self._state_type_related_text = state_type_related_text
 
@@ -59,14 +78,30 @@ class State:
     def get_response(self):
         return self._response
 
+    def set_on_change_function(self, on_change_function):
+        """Sets the function that will be called whenever the response or the resolution of this state changes.
+
+        Args:
+            on_change_function (Callable[[], None] | None): the function, or None to stop notifying changes
+        """
+        self._on_change_function = on_change_function
+
+    def _notify_change(self):
+        if self._on_change_function is not None:
+            self._on_change_function()
+
     def set_response(self, response):
-        self._response = response
+        with self._lock:
+            self._response = response
+
+        self._notify_change()
 
     def is_resolved(self):
         return self._is_resolved
 
-    def add_vote(self):
-        self._votes += 1
+    def add_vote(self, number_of_votes=1):
+        with self._lock:
+            self._votes += number_of_votes
 
     def get_votes(self):
         return self._votes
@@ -74,6 +109,8 @@ class State:
     def consider_resolved(self):
         self._is_resolved = True
 
+        self._notify_change()
+
     def __str__(self):
         return f"State: {self._state_type} | Is resolved: {self._is_resolved}"
 
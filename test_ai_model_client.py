@@ -0,0 +1,234 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from ai_model_client import AiModelClient
+from defines import VOTING_STRING_FOR_AI_MODEL
+from enums.run_event_type import RunEventType
+from enums.state_type import StateType
+from errors import (
+    RequestToAiModelFailedError,
+    RequestToAiModelThrottledError,
+    RequestToAiModelUnavailableError,
+)
+from fake_ai_model_server import (
+    FakeAiModelServer,
+    create_constant_latency_profile,
+    create_random_fake_response_function,
+)
+from regular_expressions import contains_complete_vote
+
+from state import State
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+from tree_of_thoughts import TreeOfThoughts
+
+
+def create_verbose_fake_response_function(voted_answer):
+    # Like real AI models, which often keep explaining their votes after giving them
+    def create_verbose_fake_response(prompt):
+        if VOTING_STRING_FOR_AI_MODEL in prompt:
+            return (
+                f"The best answer is number {voted_answer}, because"
+                + " it is better" * 100
+            )
+
+        return "Fake response."
+
+    return create_verbose_fake_response
+
+
+class TestAiModelClient(unittest.TestCase):
+    def test_can_request_several_samples_in_a_single_request(self):
+        with FakeAiModelServer() as fake_server:
+            ai_model_client = AiModelClient("key", base_url=fake_server.get_base_url())
+
+            responses = ai_model_client.request_samples("Prompt.", 3)
+
+            self.assertEqual(responses, ["Fake response."] * 3)
+            self.assertEqual(len(fake_server.get_requests()), 1)
+            self.assertEqual(
+                fake_server.get_requests()[0]["authorization"], "Bearer key"
+            )
+
+    def test_the_api_key_is_read_once_and_the_connection_is_reused(self):
+        with FakeAiModelServer() as fake_server, tempfile.TemporaryDirectory() as directory_path:
+            api_key_file_path = os.path.join(directory_path, "api_key.txt")
+
+            with open(api_key_file_path, "w", encoding="utf8") as file:
+                file.write("key from file\n")
+
+            ai_model_client = AiModelClient(
+                api_key_file_path=api_key_file_path,
+                base_url=fake_server.get_base_url(),
+            )
+
+            ai_model_client.request_response("First prompt.")
+
+            os.remove(api_key_file_path)
+
+            ai_model_client.request_response("Second prompt.")
+
+            requests = fake_server.get_requests()
+
+            self.assertEqual(requests[1]["authorization"], "Bearer key from file")
+            self.assertEqual(
+                requests[0]["client_address"], requests[1]["client_address"]
+            )
+
+            ai_model_client.close()
+
+    def test_concurrent_tasks_share_the_client(self):
+        with FakeAiModelServer(response_delay=0.05) as fake_server:
+            ai_model_client = AiModelClient(
+                "key", base_url=fake_server.get_base_url(), connection_pool_size=4
+            )
+
+            async def request_concurrently():
+                return await asyncio.gather(
+                    *[ai_model_client.arequest_response("Prompt.") for _ in range(8)]
+                )
+
+            self.assertEqual(
+                asyncio.run(request_concurrently()), ["Fake response."] * 8
+            )
+
+            client_addresses = {
+                request["client_address"] for request in fake_server.get_requests()
+            }
+
+            self.assertLessEqual(len(client_addresses), 4)
+
+    def test_a_request_that_takes_too_long_fails(self):
+        with FakeAiModelServer(response_delay=0.5) as fake_server:
+            ai_model_client = AiModelClient("key", base_url=fake_server.get_base_url())
+
+            with self.assertRaises(RequestToAiModelFailedError):
+                ai_model_client.request_response("Prompt.", timeout=0.1)
+
+    def test_the_fake_server_injects_errors_and_throttles_at_the_rates_set(self):
+        with FakeAiModelServer(error_rate=1) as fake_server:
+            ai_model_client = AiModelClient("key", base_url=fake_server.get_base_url())
+
+            with self.assertRaises(RequestToAiModelUnavailableError):
+                ai_model_client.request_response("Prompt.")
+
+        with FakeAiModelServer(
+            throttle_rate=1, latency_profile=create_constant_latency_profile(1)
+        ) as fake_server:
+            ai_model_client = AiModelClient("key", base_url=fake_server.get_base_url())
+
+            # Throttled requests are rejected before the latency
+            with self.assertRaises(RequestToAiModelThrottledError):
+                ai_model_client.request_response("Prompt.", timeout=0.5)
+
+    def test_the_random_fake_responses_vote_for_one_of_the_answers(self):
+        create_random_fake_response = create_random_fake_response_function(seed=0)
+
+        prompt = "Context.\nAnswer 1: A\nAnswer 2: B\nAnswer 3: C\n\nChoose the best answer. Use the format: 'The best answer is number X'."
+
+        votes = {create_random_fake_response(prompt) for _ in range(50)}
+
+        self.assertEqual(votes, {f"The best answer is number {i}" for i in range(1, 4)})
+        self.assertNotEqual(
+            create_random_fake_response("Prompt."),
+            create_random_fake_response("Prompt."),
+        )
+
+    def test_streamed_votes_stop_as_soon_as_they_are_given(self):
+        self.assertFalse(contains_complete_vote("The best answer is number 1"))
+        self.assertTrue(contains_complete_vote("The best answer is number 12,"))
+
+        with FakeAiModelServer(
+            create_verbose_fake_response_function(12), stream_chunk_delay=0.005
+        ) as fake_server:
+            ai_model_client = AiModelClient("key", base_url=fake_server.get_base_url())
+
+            start = time.perf_counter()
+
+            responses = ai_model_client.stream_samples_until(
+                f"Choose the best answer. Use the format: '{VOTING_STRING_FOR_AI_MODEL}'.",
+                3,
+                contains_complete_vote,
+            )
+
+            # The whole responses would take over a second to stream
+            self.assertLess(time.perf_counter() - start, 0.5)
+            self.assertEqual(responses, ["The best answer is number 12,"] * 3)
+            self.assertEqual(len(responses.times_to_stop), 3)
+            self.assertTrue(
+                all(0 < seconds < 0.5 for seconds in responses.times_to_stop)
+            )
+
+            # Responses that never become complete are read to the end
+            self.assertEqual(
+                ai_model_client.stream_samples_until(
+                    "Prompt.", 2, contains_complete_vote
+                ),
+                ["Fake response."] * 2,
+            )
+
+    def test_a_tree_of_thoughts_can_stream_its_votes(self):
+        with FakeAiModelServer(create_verbose_fake_response_function(2)) as fake_server:
+            tree_of_thoughts = TreeOfThoughts(
+                "test",
+                State("Context.", StateType.CONTEXT),
+                [
+                    {
+                        "state_type": StateType.PLANNING,
+                        "state_type_text": "Planning text",
+                        "include_ancestor_state_type_response": None,
+                    }
+                ],
+                3,
+                1,
+            )
+            tree_of_thoughts.set_ai_model_client(
+                AiModelClient("key", base_url=fake_server.get_base_url())
+            )
+            tree_of_thoughts.activate_streaming_votes()
+
+            events = []
+            tree_of_thoughts.add_hook(events.append)
+
+            winners = tree_of_thoughts.process_tree_of_thoughts()
+
+            self.assertEqual(winners[0].name.get_votes(), 3)
+
+            self.assertEqual(
+                [
+                    (event.kind, event.time_to_vote is not None)
+                    for event in events
+                    if event.event_type == RunEventType.REQUEST_FINISHED
+                ],
+                [("response", False), ("vote", True)],
+            )
+
+    def test_only_the_vote_requests_are_streamed_even_if_the_context_quotes_a_vote(
+        self,
+    ):
+        quoted_vote = "The best answer is number 1 of this list, followed by the rest."
+
+        def create_fake_response(prompt):
+            if "Choose the best answer" in prompt:
+                return "The best answer is number 1"
+
+            return quoted_vote
+
+        with FakeAiModelServer(create_fake_response) as fake_server:
+            tree_of_thoughts = create_tree_of_thoughts(
+                3, 1, context=f"Reply with '{VOTING_STRING_FOR_AI_MODEL}'."
+            )
+            tree_of_thoughts.set_ai_model_client(
+                AiModelClient("key", base_url=fake_server.get_base_url())
+            )
+            tree_of_thoughts.activate_streaming_votes()
+
+            winners = tree_of_thoughts.process_tree_of_thoughts()
+
+            # The responses aren't cut once they quote a vote
+            self.assertEqual(winners[0].name.get_response(), quoted_vote)
+
+
+if __name__ == "__main__":
+    unittest.main()
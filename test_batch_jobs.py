@@ -0,0 +1,137 @@
+import asyncio
+import tempfile
+import unittest
+from ai_model_client import AiModelClient
+from batch_jobs import BatchJobs, LocalBatchJobProvider
+from enums.state_type import StateType
+from errors import InvalidParameterError, RequestToAiModelFailedError
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+class NumberedResponses:
+    """Votes for the first answer of every vote, and numbers every other response."""
+
+    def __init__(self):
+        self.number_of_responses = 0
+
+    def __call__(self, prompt):
+        if "Choose the best answer" in prompt:
+            return "The best answer is number 1"
+
+        self.number_of_responses += 1
+
+        return f"Response {self.number_of_responses}."
+
+
+class TestBatchJobs(unittest.TestCase):
+    def setUp(self):
+        self._temporary_directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._temporary_directory.cleanup()
+
+    def _create_batch_jobs(self, create_response_function):
+        batch_job_provider = LocalBatchJobProvider(
+            f"{self._temporary_directory.name}/provider",
+            create_response_function,
+            number_of_polls_to_finish=2,
+        )
+
+        batch_jobs = BatchJobs(
+            batch_job_provider,
+            f"{self._temporary_directory.name}/jobs",
+            collection_seconds=0,
+            poll_interval=0,
+        )
+
+        return batch_job_provider, batch_jobs
+
+    def test_the_generation_and_the_vote_prompts_of_every_layer_are_a_batch_job_each(
+        self,
+    ):
+        batch_job_provider, batch_jobs = self._create_batch_jobs(NumberedResponses())
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            state_types=[StateType.PLANNING, StateType.IMPLEMENTATION],
+            include_previous_response=True,
+        )
+        tree_of_thoughts.set_batch_jobs(batch_jobs)
+
+        winners = tree_of_thoughts.process_tree_of_thoughts()
+
+        self.assertEqual(
+            [winner.name.get_response() for winner in winners],
+            ["Response 4.", "Response 5."],
+        )
+        self.assertEqual(winners[0].parent.name.get_response(), "Response 1.")
+
+        batch_jobs_requests = [
+            batch_job_provider.read_batch_job_requests(batch_job_id)
+            for batch_job_id in batch_job_provider.get_batch_job_ids()
+        ]
+
+        # The plans, the vote on them, the implementations of both winning plans, and the vote on them
+        self.assertEqual(
+            [len(requests) for requests in batch_jobs_requests], [1, 1, 2, 1]
+        )
+        self.assertEqual(batch_jobs.get_number_of_batch_jobs(), 4)
+        self.assertEqual(batch_jobs.get_number_of_requests(), 5)
+
+        first_request = batch_jobs_requests[0][0]
+        self.assertEqual(first_request["url"], "/v1/chat/completions")
+        self.assertEqual(first_request["body"]["n"], 3)
+        self.assertIn("Planning text", first_request["body"]["messages"][-1]["content"])
+
+    def test_the_requests_are_sent_with_the_model_parameters_of_the_tree_of_thoughts(
+        self,
+    ):
+        batch_job_provider, batch_jobs = self._create_batch_jobs(NumberedResponses())
+
+        model_parameters = {
+            "model": "other-model",
+            "temperature": 0.3,
+            "max_tokens": 50,
+        }
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            state_types=[StateType.PLANNING, StateType.IMPLEMENTATION],
+            include_previous_response=True,
+        )
+        tree_of_thoughts.set_ai_model_client(
+            AiModelClient("key", model_parameters=model_parameters)
+        )
+        tree_of_thoughts.set_batch_jobs(batch_jobs)
+
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        for batch_job_id in batch_job_provider.get_batch_job_ids():
+            for request in batch_job_provider.read_batch_job_requests(batch_job_id):
+                self.assertEqual(request["body"]["model"], "other-model")
+                self.assertEqual(request["body"]["temperature"], 0.3)
+                self.assertEqual(request["body"]["max_tokens"], 50)
+
+    def test_a_request_that_the_batch_job_failed_to_answer_fails(self):
+        def fail_votes(prompt):
+            if "Choose the best answer" in prompt:
+                raise ValueError("The vote was rejected.")
+
+            return "Response."
+
+        _, batch_jobs = self._create_batch_jobs(fail_votes)
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            state_types=[StateType.PLANNING, StateType.IMPLEMENTATION],
+            include_previous_response=True,
+        )
+        tree_of_thoughts.set_batch_jobs(batch_jobs)
+
+        with self.assertRaises(RequestToAiModelFailedError):
+            asyncio.run(tree_of_thoughts.aprocess_tree_of_thoughts())
+
+        with self.assertRaises(InvalidParameterError):
+            BatchJobs(LocalBatchJobProvider(".", fail_votes), poll_interval=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
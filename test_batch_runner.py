@@ -0,0 +1,115 @@
+import asyncio
+import time
+import unittest
+from threading import Lock
+from batch_runner import BatchRunner, FairConcurrencyLimiter
+from enums.state_type import StateType
+from errors import InvalidParameterError, RequestToAiModelFailedError
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+class InFlightCounter:
+    """Requests samples slowly, keeping track of how many requests are in flight at once."""
+
+    def __init__(self):
+        self._in_flight = 0
+        self.max_in_flight = 0
+
+        self._lock = Lock()
+
+    def __call__(self, prompt, number_of_samples):
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+        time.sleep(0.01)
+
+        with self._lock:
+            self._in_flight -= 1
+
+        if "Choose the best answer" in prompt:
+            return ["The best answer is number 1"] * number_of_samples
+
+        return [f"Response {i}." for i in range(number_of_samples)]
+
+
+def fail_request_samples(prompt, number_of_samples):
+    raise RequestToAiModelFailedError("The AI model is down.")
+
+
+class TestBatchRunner(unittest.TestCase):
+    def test_free_slots_are_handed_to_the_owners_in_turns(self):
+        async def run():
+            fair_concurrency_limiter = FairConcurrencyLimiter(1)
+            order = []
+
+            async def request(owner):
+                async with fair_concurrency_limiter.create_share(owner):
+                    order.append(owner)
+                    await asyncio.sleep(0)
+
+            # The first tree queues all of its requests before the second tree queues any
+            await asyncio.gather(
+                *[request("first") for _ in range(4)],
+                *[request("second") for _ in range(2)],
+            )
+
+            return order
+
+        self.assertEqual(
+            asyncio.run(run()),
+            ["first", "first", "second", "first", "second", "first"],
+        )
+
+    def test_the_trees_share_the_cap_and_a_failing_tree_doesnt_stop_the_rest(self):
+        in_flight_counter = InFlightCounter()
+
+        batch_runner = BatchRunner(max_concurrent_requests=3)
+
+        for i in range(4):
+            tree_of_thoughts = create_tree_of_thoughts(
+                name=f"tree_{i}",
+                state_types=[StateType.PLANNING, StateType.IMPLEMENTATION],
+            )
+            tree_of_thoughts.set_request_samples_from_ai_model_function(
+                in_flight_counter
+            )
+            batch_runner.add_tree_of_thoughts(tree_of_thoughts)
+
+        failing_tree_of_thoughts = create_tree_of_thoughts(
+            name="failing", state_types=[StateType.PLANNING, StateType.IMPLEMENTATION]
+        )
+        failing_tree_of_thoughts.set_request_samples_from_ai_model_function(
+            fail_request_samples
+        )
+        batch_runner.add_tree_of_thoughts(failing_tree_of_thoughts)
+
+        with self.assertRaises(InvalidParameterError):
+            batch_runner.add_tree_of_thoughts(
+                create_tree_of_thoughts(
+                    name="TREE_0",
+                    state_types=[StateType.PLANNING, StateType.IMPLEMENTATION],
+                )
+            )
+
+        results = batch_runner.run()
+
+        self.assertEqual(
+            [result["name"] for result in results],
+            ["tree_0", "tree_1", "tree_2", "tree_3", "failing"],
+        )
+
+        for result in results[:4]:
+            self.assertIsNone(result["error"])
+            self.assertEqual(len(result["winners"]), 2)
+
+        self.assertIsInstance(results[4]["error"], RequestToAiModelFailedError)
+        self.assertEqual(results[4]["winners"], [])
+
+        self.assertLessEqual(in_flight_counter.max_in_flight, 3)
+        self.assertGreater(in_flight_counter.max_in_flight, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
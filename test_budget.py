@@ -0,0 +1,170 @@
+import unittest
+from ai_model_client import SampledResponses
+from budget import RunBudget, determine_tokens_of_request
+from enums.state_type import StateType
+from errors import BudgetExceededError, InvalidParameterError
+
+from token_counting import count_tokens, count_tokens_of_prompt
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+class FakeRequestSamplesFunction:
+    """Answers every prompt with the same responses and votes, reporting a fixed usage of tokens."""
+
+    def __init__(self, prompt_tokens=100, completion_tokens=10):
+        self._prompt_tokens = prompt_tokens
+        self._completion_tokens = completion_tokens
+
+        self.prompts = []
+
+    def __call__(self, prompt, number_of_samples):
+        self.prompts.append(prompt)
+
+        if "Choose the best answer" in prompt:
+            responses = ["The best answer is number 1"] * number_of_samples
+        else:
+            responses = [f"Response {i}." for i in range(number_of_samples)]
+
+        return SampledResponses(
+            responses,
+            {
+                "prompt_tokens": self._prompt_tokens,
+                "completion_tokens": self._completion_tokens,
+            },
+        )
+
+
+class TestBudget(unittest.TestCase):
+    def test_the_usage_reported_by_the_api_is_preferred_over_the_estimate(self):
+        prompt = "Write a function that sorts a list."
+        responses = ["def sort(values):\n    return sorted(values)", "Sorted."]
+
+        self.assertEqual(
+            determine_tokens_of_request(
+                prompt,
+                SampledResponses(
+                    responses, {"prompt_tokens": 12, "completion_tokens": 34}
+                ),
+            ),
+            (12, 34),
+        )
+        self.assertEqual(
+            determine_tokens_of_request(prompt, responses),
+            (
+                count_tokens_of_prompt(prompt),
+                sum(count_tokens(response) for response in responses),
+            ),
+        )
+
+        budget = RunBudget(
+            hard_max_tokens=100,
+            cost_per_prompt_token=0.5,
+            cost_per_completion_token=1,
+        )
+        budget.register_request(StateType.PLANNING, 12, 34)
+        budget.register_request(StateType.PLANNING, 10, 0)
+
+        self.assertEqual(budget.get_spent_tokens(), 56)
+        self.assertEqual(budget.get_spent_cost(), 45)
+        self.assertEqual(
+            budget.get_spending_by_layer()[StateType.PLANNING]["requests"], 2
+        )
+
+        budget.register_request(StateType.IMPLEMENTATION, 44, 0)
+
+        with self.assertRaises(BudgetExceededError):
+            budget.verify_hard_limit_isnt_reached()
+
+        with self.assertRaises(InvalidParameterError):
+            RunBudget(soft_max_cost=2, hard_max_cost=1)
+
+    def test_the_hard_limit_stops_with_the_winners_of_the_last_finished_layer(self):
+        request_samples_function = FakeRequestSamplesFunction()
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            4,
+            state_types=[
+                StateType.PLANNING,
+                StateType.IMPLEMENTATION,
+                StateType.REFINEMENT,
+            ],
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            request_samples_function
+        )
+
+        # The responses and the vote of the first layer spend 220 tokens, which reaches the limit
+        budget = RunBudget(hard_max_tokens=220)
+        tree_of_thoughts.set_budget(budget)
+
+        winners = tree_of_thoughts.process_tree_of_thoughts()
+
+        self.assertEqual(len(request_samples_function.prompts), 2)
+        self.assertEqual(budget.get_spent_tokens(), 220)
+        self.assertEqual(len(winners), 2)
+        self.assertTrue(
+            all(
+                winner.name.get_state_type() == StateType.PLANNING
+                and len(winner.children) == 4
+                for winner in winners
+            )
+        )
+
+    def test_the_hard_limit_before_any_layer_finishes_stops_without_winners(self):
+        request_samples_function = FakeRequestSamplesFunction()
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            4,
+            state_types=[
+                StateType.PLANNING,
+                StateType.IMPLEMENTATION,
+                StateType.REFINEMENT,
+            ],
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            request_samples_function
+        )
+        tree_of_thoughts.set_budget(RunBudget(hard_max_cost=0))
+
+        self.assertEqual(tree_of_thoughts.process_tree_of_thoughts(), [])
+        self.assertEqual(request_samples_function.prompts, [])
+
+    def test_the_soft_limit_shrinks_the_layers_that_start_afterwards(self):
+        request_samples_function = FakeRequestSamplesFunction()
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            4,
+            state_types=[
+                StateType.PLANNING,
+                StateType.IMPLEMENTATION,
+                StateType.REFINEMENT,
+            ],
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            request_samples_function
+        )
+
+        budget = RunBudget(soft_max_tokens=1)
+        tree_of_thoughts.set_budget(budget)
+
+        winners = tree_of_thoughts.process_tree_of_thoughts()
+
+        # The first layer has the full size, and the ones after it half the steps of a single winner
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(
+            [
+                budget.get_spending_by_layer()[state_type]["requests"]
+                for state_type in (
+                    StateType.PLANNING,
+                    StateType.IMPLEMENTATION,
+                    StateType.REFINEMENT,
+                )
+            ],
+            [2, 2, 2],
+        )
+        self.assertEqual(len(winners[0].parent.children), 2)
+        self.assertEqual(len(winners[0].parent.parent.children), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,249 @@
+import os
+import tempfile
+import unittest
+from defines import MAX_SCORE
+from enums.state_type import StateType
+from enums.voting_mode import VotingMode
+from errors import InvalidCheckpointError, RequestToAiModelFailedError
+from run_store import RunStore
+from scoring import is_prompt_for_score
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+STATE_TYPES = [StateType.PLANNING, StateType.IMPLEMENTATION]
+
+
+class FakeAiModel:
+    """Answers every prompt deterministically, and fails once it has answered 'number_of_requests_before_failing'."""
+
+    def __init__(self, number_of_requests_before_failing=None):
+        self.number_of_requests_before_failing = number_of_requests_before_failing
+        self.prompts = []
+
+    def request_samples(self, prompt, number_of_samples):
+        if len(self.prompts) == self.number_of_requests_before_failing:
+            raise RequestToAiModelFailedError("The AI model is down.")
+
+        self.prompts.append(prompt)
+
+        if "Choose the best answer" in prompt:
+            return [
+                f"The best answer is number {i % 2 + 1}"
+                for i in range(number_of_samples)
+            ]
+
+        if is_prompt_for_score(prompt):
+            return [
+                f"The score is {(len(self.prompts) + i) % MAX_SCORE + 1}"
+                for i in range(number_of_samples)
+            ]
+
+        return [f"Response {len(self.prompts)}.{i}." for i in range(number_of_samples)]
+
+
+def get_responses_of_winners(tree_of_thoughts):
+    return [
+        winner.name.get_response()
+        for winner in tree_of_thoughts.get_winners_of_type(StateType.IMPLEMENTATION)
+    ]
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self._temporary_directory = tempfile.TemporaryDirectory()
+        self._checkpoint_file_path = os.path.join(
+            self._temporary_directory.name, "checkpoint.json"
+        )
+
+    def tearDown(self):
+        self._temporary_directory.cleanup()
+
+    def _process_until_failure_and_resume(
+        self,
+        voting_mode,
+        number_of_requests_before_failing,
+        compact=False,
+        run_store=None,
+    ):
+        failing_ai_model = FakeAiModel(number_of_requests_before_failing)
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            state_types=STATE_TYPES,
+            voting_mode=voting_mode,
+            include_previous_response=True,
+        )
+        if compact:
+            tree_of_thoughts.activate_compact_tree()
+        if run_store is not None:
+            tree_of_thoughts.set_run_store(run_store)
+            tree_of_thoughts.activate_create_files()
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            failing_ai_model.request_samples
+        )
+        tree_of_thoughts.activate_checkpoints(self._checkpoint_file_path)
+
+        with self.assertRaises(RequestToAiModelFailedError):
+            tree_of_thoughts.process_tree_of_thoughts()
+
+        # The resumed run continues numbering the responses where the failed one stopped
+        resumed_ai_model = FakeAiModel()
+        resumed_ai_model.prompts = list(failing_ai_model.prompts)
+
+        resumed_tree_of_thoughts = create_tree_of_thoughts(
+            state_types=STATE_TYPES,
+            voting_mode=voting_mode,
+            include_previous_response=True,
+        )
+        if compact:
+            resumed_tree_of_thoughts.activate_compact_tree()
+        if run_store is not None:
+            resumed_tree_of_thoughts.set_run_store(run_store)
+            resumed_tree_of_thoughts.activate_create_files()
+        resumed_tree_of_thoughts.set_request_samples_from_ai_model_function(
+            resumed_ai_model.request_samples
+        )
+
+        self.assertTrue(
+            resumed_tree_of_thoughts.resume_from_checkpoint(self._checkpoint_file_path)
+        )
+
+        resumed_tree_of_thoughts.process_tree_of_thoughts()
+
+        return resumed_tree_of_thoughts, resumed_ai_model.prompts
+
+    def _process_without_failures(self, voting_mode, run_store=None):
+        ai_model = FakeAiModel()
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            state_types=STATE_TYPES,
+            voting_mode=voting_mode,
+            include_previous_response=True,
+        )
+        if run_store is not None:
+            tree_of_thoughts.set_run_store(run_store)
+            tree_of_thoughts.activate_create_files()
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            ai_model.request_samples
+        )
+
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        return tree_of_thoughts, ai_model.prompts
+
+    def test_a_run_resumed_after_a_failure_ends_like_an_uninterrupted_one(self):
+        for voting_mode in VotingMode:
+            for compact in (False, True):
+                (
+                    expected_tree_of_thoughts,
+                    expected_prompts,
+                ) = self._process_without_failures(voting_mode)
+
+                for number_of_requests_before_failing in range(
+                    1, len(expected_prompts)
+                ):
+                    with self.subTest(
+                        voting_mode=voting_mode,
+                        compact=compact,
+                        number_of_requests_before_failing=number_of_requests_before_failing,
+                    ):
+                        (
+                            resumed_tree_of_thoughts,
+                            prompts,
+                        ) = self._process_until_failure_and_resume(
+                            voting_mode, number_of_requests_before_failing, compact
+                        )
+
+                        self.assertEqual(
+                            get_responses_of_winners(resumed_tree_of_thoughts),
+                            get_responses_of_winners(expected_tree_of_thoughts),
+                        )
+
+                        # The responses requested before the failure aren't requested again
+                        response_prompts = [
+                            prompt
+                            for prompt in prompts
+                            if "Choose the best answer" not in prompt
+                        ]
+                        self.assertEqual(
+                            len(response_prompts), len(set(response_prompts))
+                        )
+
+    def _export_files(self, run_store, directory_name):
+        directory_path = os.path.join(self._temporary_directory.name, directory_name)
+
+        run_store.export_artifacts("test", directory_path)
+        run_store.close()
+
+        files = {}
+
+        for file_name in os.listdir(directory_path):
+            with open(os.path.join(directory_path, file_name), encoding="utf8") as file:
+                files[file_name] = file.read()
+
+        return files
+
+    def test_a_run_resumed_after_a_failure_writes_the_files_of_an_uninterrupted_one(
+        self,
+    ):
+        for voting_mode in (VotingMode.STANDARD, VotingMode.SIBLING_GROUPS):
+            run_store = RunStore(
+                os.path.join(self._temporary_directory.name, f"{voting_mode.name}.db")
+            )
+
+            _, expected_prompts = self._process_without_failures(voting_mode, run_store)
+
+            expected_files = self._export_files(run_store, voting_mode.name)
+
+            for number_of_requests_before_failing in range(1, len(expected_prompts)):
+                with self.subTest(
+                    voting_mode=voting_mode,
+                    number_of_requests_before_failing=number_of_requests_before_failing,
+                ):
+                    run_store = RunStore(
+                        os.path.join(
+                            self._temporary_directory.name,
+                            f"{voting_mode.name}_{number_of_requests_before_failing}.db",
+                        )
+                    )
+
+                    self._process_until_failure_and_resume(
+                        voting_mode,
+                        number_of_requests_before_failing,
+                        run_store=run_store,
+                    )
+
+                    # No file of a node that finished before the failure is overwritten by one that didn't
+                    self.assertEqual(
+                        self._export_files(
+                            run_store,
+                            f"{voting_mode.name}_{number_of_requests_before_failing}",
+                        ),
+                        expected_files,
+                    )
+
+            os.remove(self._checkpoint_file_path)
+
+    def test_a_checkpoint_of_another_tree_of_thoughts_is_rejected(self):
+        tree_of_thoughts = create_tree_of_thoughts(
+            state_types=STATE_TYPES, include_previous_response=True
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            FakeAiModel().request_samples
+        )
+        tree_of_thoughts.activate_checkpoints(self._checkpoint_file_path)
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        with self.assertRaises(InvalidCheckpointError):
+            create_tree_of_thoughts(
+                4, state_types=STATE_TYPES, include_previous_response=True
+            ).resume_from_checkpoint(self._checkpoint_file_path)
+
+    def test_there_is_nothing_to_resume_without_a_checkpoint(self):
+        self.assertFalse(
+            create_tree_of_thoughts(
+                state_types=STATE_TYPES, include_previous_response=True
+            ).resume_from_checkpoint(self._checkpoint_file_path)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
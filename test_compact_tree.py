@@ -0,0 +1,160 @@
+import unittest
+from compact_tree import CompactTree
+from enums.state_type import StateType
+from enums.tiebreak import Tiebreak
+from enums.voting_mode import VotingMode
+
+from state import State
+from tree import Tree
+from tree_of_thoughts import TreeOfThoughts
+
+
+def describe_nodes(nodes):
+    return [
+        (
+            node.name.get_state_type(),
+            node.name.get_response(),
+            node.name.get_votes(),
+            node.name.is_resolved(),
+            [ancestor.name.get_state_type() for ancestor in node.ancestors],
+        )
+        for node in nodes
+    ]
+
+
+def fake_request_samples_from_ai_model_function(prompt, number_of_samples):
+    if "Choose the best answer" in prompt:
+        # Spreads the votes, so that the winners aren't simply the first answers
+        return [
+            f"The best answer is number {number_of_samples - i % 2}"
+            for i in range(number_of_samples)
+        ]
+
+    return [f"Response {i} to {len(prompt)}." for i in range(number_of_samples)]
+
+
+class TestCompactTree(unittest.TestCase):
+    def test_the_queries_match_those_of_a_tree(self):
+        tree = Tree(State("Context.", StateType.CONTEXT))
+        compact_tree = CompactTree(State("Context.", StateType.CONTEXT))
+
+        last_state_type = StateType.CONTEXT
+
+        for state_type in [
+            StateType.PLANNING,
+            StateType.IMPLEMENTATION,
+            StateType.PLANNING,
+        ]:
+            for each_tree in [tree, compact_tree]:
+                each_tree.add_state_type(
+                    state_type, last_state_type, "Text", StateType.PLANNING, 4, 2
+                )
+
+                for i, node in enumerate(each_tree.get_leaf_nodes_without_responses()):
+                    node.name.set_response(f"Response {i}.")
+
+                for i, node in enumerate(
+                    each_tree.get_unresolved_leaf_nodes_with_responses()
+                ):
+                    for _ in range(i % 3):
+                        node.name.add_vote()
+
+                    node.name.consider_resolved()
+
+            for tiebreak in Tiebreak:
+                for breadth in [2, None]:
+                    self.assertEqual(
+                        describe_nodes(
+                            compact_tree.get_winners_of_type(
+                                state_type, breadth, tiebreak
+                            )
+                        ),
+                        describe_nodes(
+                            tree.get_winners_of_type(state_type, breadth, tiebreak)
+                        ),
+                    )
+
+            # The first layer is under the context, and the others under both winners of the previous one
+            self.assertEqual(
+                len(tree.get_nodes_of_last_layer()),
+                4 if last_state_type == StateType.CONTEXT else 8,
+            )
+            self.assertEqual(
+                describe_nodes(compact_tree.get_nodes_of_last_layer()),
+                describe_nodes(tree.get_nodes_of_last_layer()),
+            )
+            self.assertEqual(
+                compact_tree.get_number_of_expanded_nodes(),
+                sum(
+                    1
+                    for node in (tree.get_root_node(),)
+                    + tree.get_root_node().descendants
+                    if not node.is_leaf
+                ),
+            )
+            self.assertEqual(
+                tree.get_number_of_expanded_nodes(),
+                compact_tree.get_number_of_expanded_nodes(),
+            )
+
+            last_state_type = state_type
+
+        self.assertEqual(
+            compact_tree.get_number_of_nodes(),
+            len(tree.get_root_node().descendants) + 1,
+        )
+
+    def test_a_tree_of_thoughts_produces_the_same_prompts_with_either_tree(self):
+        prompts_by_tree = []
+
+        for should_use_compact_tree in [False, True]:
+            prompts = []
+
+            def request_samples_from_ai_model_function(prompt, number_of_samples):
+                prompts.append((prompt, number_of_samples))
+
+                return fake_request_samples_from_ai_model_function(
+                    prompt, number_of_samples
+                )
+
+            tree_of_thoughts = TreeOfThoughts(
+                "test",
+                State("Context.", StateType.CONTEXT),
+                [
+                    {
+                        "state_type": StateType.PLANNING,
+                        "state_type_text": "Planning text",
+                        "include_ancestor_state_type_response": None,
+                    },
+                    {
+                        "state_type": StateType.IMPLEMENTATION,
+                        "state_type_text": "Implementation text",
+                        "include_ancestor_state_type_response": None,
+                        "voting_mode": VotingMode.SIBLING_GROUPS,
+                    },
+                    {
+                        "state_type": StateType.REFINEMENT,
+                        "state_type_text": "Refinement text",
+                        "include_ancestor_state_type_response": StateType.PLANNING,
+                    },
+                ],
+                3,
+                2,
+            )
+
+            if should_use_compact_tree:
+                tree_of_thoughts.activate_compact_tree()
+
+            tree_of_thoughts.set_request_samples_from_ai_model_function(
+                request_samples_from_ai_model_function
+            )
+
+            tree_of_thoughts.process_tree_of_thoughts()
+
+            prompts_by_tree.append(prompts)
+
+        self.assertEqual(prompts_by_tree[0], prompts_by_tree[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
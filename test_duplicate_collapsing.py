@@ -0,0 +1,162 @@
+import unittest
+from duplicate_collapsing import (
+    DuplicateCollapsing,
+    create_minhash_signature,
+    estimate_similarity,
+)
+from early_stopping import EarlyStopping
+from enums.state_type import StateType
+from errors import InvalidParameterError
+
+from state import State
+from tree_of_thoughts import TreeOfThoughts
+
+RESPONSE = "First we read the list of numbers from the input, then we sort them in place with a merge sort, and finally we print them one per line."
+NEAR_DUPLICATE_RESPONSE = "First we read the list of numbers from the input, then we sort them in place with a merge sort, and finally we print them one per line!"
+DIFFERENT_RESPONSE = "We could store every number in a binary heap, and pop the smallest one until the heap is empty, writing each of them out."
+NEAR_DUPLICATE_DIFFERENT_RESPONSE = "We could store every number in a binary heap, and pop the smallest one until the heap is empty, writing each of them out!"
+
+
+class TestDuplicateCollapsing(unittest.TestCase):
+    def test_near_duplicates_are_estimated_to_be_similar(self):
+        self.assertGreater(
+            estimate_similarity(
+                create_minhash_signature(RESPONSE),
+                create_minhash_signature(NEAR_DUPLICATE_RESPONSE.upper()),
+            ),
+            0.8,
+        )
+        self.assertLess(
+            estimate_similarity(
+                create_minhash_signature(RESPONSE),
+                create_minhash_signature(DIFFERENT_RESPONSE),
+            ),
+            0.2,
+        )
+
+        with self.assertRaises(InvalidParameterError):
+            DuplicateCollapsing(similarity_threshold=0)
+
+    def test_the_process_pool_finds_the_same_clusters(self):
+        texts = [RESPONSE, DIFFERENT_RESPONSE, NEAR_DUPLICATE_RESPONSE, "Short."]
+
+        duplicate_collapsing = DuplicateCollapsing()
+        pooled_duplicate_collapsing = DuplicateCollapsing(
+            min_characters_for_process_pool=0, max_workers=2
+        )
+
+        try:
+            self.assertEqual(
+                pooled_duplicate_collapsing.create_signatures(texts),
+                duplicate_collapsing.create_signatures(texts),
+            )
+            self.assertEqual(
+                pooled_duplicate_collapsing.find_clusters(texts),
+                [[0, 2], [1], [3]],
+            )
+        finally:
+            pooled_duplicate_collapsing.close()
+
+        self.assertEqual(
+            pooled_duplicate_collapsing.get_number_of_collapsed_candidates(), 1
+        )
+
+    def test_near_duplicates_are_voted_on_as_one_and_share_its_votes(self):
+        vote_prompts = []
+
+        def request_samples(prompt, number_of_samples):
+            if "Choose the best answer" in prompt:
+                vote_prompts.append(prompt)
+
+                return ["The best answer is number 1"] * number_of_samples
+
+            return [RESPONSE, DIFFERENT_RESPONSE, NEAR_DUPLICATE_RESPONSE][
+                :number_of_samples
+            ]
+
+        tree_of_thoughts = TreeOfThoughts(
+            "test",
+            State("Context.", StateType.CONTEXT),
+            [
+                {
+                    "state_type": StateType.PLANNING,
+                    "state_type_text": "Planning text",
+                    "include_ancestor_state_type_response": None,
+                }
+            ],
+            3,
+            2,
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(request_samples)
+        tree_of_thoughts.set_duplicate_collapsing(DuplicateCollapsing())
+
+        winners = tree_of_thoughts.process_tree_of_thoughts()
+
+        self.assertEqual(len(vote_prompts), 1)
+        self.assertIn("Answer 2: " + DIFFERENT_RESPONSE, vote_prompts[0])
+        self.assertNotIn("Answer 3:", vote_prompts[0])
+
+        self.assertEqual(
+            [
+                (winner.name.get_response(), winner.name.get_votes())
+                for winner in winners
+            ],
+            [(RESPONSE, 3), (NEAR_DUPLICATE_RESPONSE, 3)],
+        )
+
+    def test_a_vote_among_clusters_stops_early_only_once_the_winning_nodes_are_decided(
+        self,
+    ):
+        vote_responses = [
+            f"The best answer is number {answer}" for answer in (2, 1, 1, 2, 2)
+        ]
+        number_of_requested_votes = 0
+
+        def request_samples(prompt, number_of_samples):
+            nonlocal number_of_requested_votes
+
+            if "Choose the best answer" in prompt:
+                number_of_requested_votes += number_of_samples
+
+                return [vote_responses.pop(0) for _ in range(number_of_samples)]
+
+            return [
+                RESPONSE,
+                DIFFERENT_RESPONSE,
+                NEAR_DUPLICATE_RESPONSE,
+                NEAR_DUPLICATE_DIFFERENT_RESPONSE,
+                "Short.",
+            ][:number_of_samples]
+
+        early_stopping = EarlyStopping()
+
+        tree_of_thoughts = TreeOfThoughts(
+            "test",
+            State("Context.", StateType.CONTEXT),
+            [
+                {
+                    "state_type": StateType.PLANNING,
+                    "state_type_text": "Planning text",
+                    "include_ancestor_state_type_response": None,
+                }
+            ],
+            5,
+            2,
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(request_samples)
+        tree_of_thoughts.set_duplicate_collapsing(DuplicateCollapsing())
+        tree_of_thoughts.set_early_stopping(early_stopping)
+
+        winners = tree_of_thoughts.process_tree_of_thoughts()
+
+        # After four votes, both clusters of two fill the two places, but which of them does wasn't decided yet
+        self.assertEqual(number_of_requested_votes, 5)
+        self.assertEqual(early_stopping.get_number_of_saved_votes(), 0)
+        self.assertEqual(
+            [winner.name.get_response() for winner in winners],
+            [DIFFERENT_RESPONSE, NEAR_DUPLICATE_DIFFERENT_RESPONSE],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
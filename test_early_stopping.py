@@ -0,0 +1,76 @@
+import unittest
+from early_stopping import EarlyStopping
+from enums.state_type import StateType
+from errors import InvalidParameterError
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+class TestEarlyStopping(unittest.TestCase):
+    def test_the_winners_are_decided_once_the_remaining_votes_cant_change_them(self):
+        early_stopping = EarlyStopping()
+
+        self.assertFalse(early_stopping.is_decided([3, 1, 0], 1, 2))
+        self.assertTrue(early_stopping.is_decided([4, 1, 0], 1, 2))
+
+        # The second place is contested
+        self.assertFalse(early_stopping.is_decided([6, 2, 1], 2, 2))
+        self.assertTrue(early_stopping.is_decided([6, 4, 1], 2, 2))
+
+        # Every candidate wins, or no vote is left
+        self.assertTrue(early_stopping.is_decided([0, 0], 2, 5))
+        self.assertTrue(early_stopping.is_decided([1, 1, 1], 1, 0))
+
+    def test_a_confidence_stops_before_the_winners_are_certain(self):
+        votes = [8, 1, 1]
+
+        self.assertFalse(EarlyStopping().is_decided(votes, 1, 10))
+        self.assertTrue(EarlyStopping(confidence=0.95).is_decided(votes, 1, 10))
+
+        # A tie is never decided
+        self.assertFalse(EarlyStopping(confidence=0.5).is_decided([4, 4, 0], 1, 10))
+
+    def test_invalid_parameters_are_rejected(self):
+        with self.assertRaises(InvalidParameterError):
+            EarlyStopping(confidence=1)
+
+        with self.assertRaises(InvalidParameterError):
+            EarlyStopping(batch_size=0)
+
+    def test_unanimous_votes_are_requested_until_the_winner_is_decided(self):
+        number_of_requested_votes = 0
+
+        def fake_request_samples_from_ai_model_function(prompt, number_of_samples):
+            nonlocal number_of_requested_votes
+
+            if "Choose the best answer" in prompt:
+                number_of_requested_votes += number_of_samples
+
+                return ["The best answer is number 2"] * number_of_samples
+
+            return [f"Answer {i}." for i in range(number_of_samples)]
+
+        early_stopping = EarlyStopping()
+
+        tree_of_thoughts = create_tree_of_thoughts(5, 1)
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            fake_request_samples_from_ai_model_function
+        )
+        tree_of_thoughts.set_early_stopping(early_stopping)
+
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        winners = tree_of_thoughts.get_winners_of_type(StateType.PLANNING)
+
+        self.assertEqual(
+            [winner.name.get_response() for winner in winners], ["Answer 1."]
+        )
+
+        # Three votes out of five already give the majority
+        self.assertEqual(number_of_requested_votes, 3)
+        self.assertEqual(early_stopping.get_number_of_requested_votes(), 3)
+        self.assertEqual(early_stopping.get_number_of_saved_votes(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
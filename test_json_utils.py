@@ -1,5 +1,6 @@
 import unittest
 from enums.state_type import StateType
+from enums.voting_mode import VotingMode
 from json_utils import convert_raw_json_data
 
 
@@ -19,6 +20,7 @@ class TestJsonUtils(unittest.TestCase):
                     "state_type": "IMPLEMENTATION",
                     "state_type_text": "Implementation text",
                     "include_ancestor_state_type_response": None,
+                    "voting_mode": "SIBLING_GROUPS",
                 },
             ],
         }
@@ -38,6 +40,9 @@ class TestJsonUtils(unittest.TestCase):
         self.assertEqual(implementation_layer["state_type"], StateType.IMPLEMENTATION)
         self.assertEqual(implementation_layer["state_type_text"], "Implementation text")
 
+        self.assertEqual(planning_layer["voting_mode"], VotingMode.STANDARD)
+        self.assertEqual(implementation_layer["voting_mode"], VotingMode.SIBLING_GROUPS)
+
 
 if __name__ == "__main__":
     unittest.main()
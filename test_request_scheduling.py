@@ -0,0 +1,168 @@
+import asyncio
+import time
+import unittest
+from ai_model_client import AiModelClient
+from errors import (
+    RequestToAiModelFailedError,
+    RequestToAiModelThrottledError,
+    RequestToAiModelTimedOutError,
+)
+from fake_ai_model_server import FakeAiModelServer
+from request_scheduling import RequestScheduler, TokenBucket
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+def create_failing_request_samples_function(exceptions):
+    calls = []
+
+    def request_samples(prompt, number_of_samples):
+        calls.append(prompt)
+
+        if exceptions:
+            raise exceptions.pop(0)
+
+        return ["Response."] * number_of_samples
+
+    return request_samples, calls
+
+
+class TestRequestScheduling(unittest.TestCase):
+    def test_a_token_bucket_makes_requests_wait_once_it_is_empty(self):
+        token_bucket = TokenBucket(2, 10)
+
+        self.assertEqual(token_bucket.try_take(1), 0)
+        self.assertEqual(token_bucket.try_take(1), 0)
+        self.assertAlmostEqual(token_bucket.try_take(1), 0.1, delta=0.02)
+
+    def test_throttled_requests_are_retried_and_decrease_the_concurrency(self):
+        request_scheduler = RequestScheduler(initial_backoff=0.01, max_concurrency=8)
+
+        request_samples, calls = create_failing_request_samples_function(
+            [
+                RequestToAiModelThrottledError("Throttled."),
+                RequestToAiModelTimedOutError("Timed out."),
+            ]
+        )
+
+        responses = request_scheduler.schedule(request_samples)("Prompt.", 2)
+
+        self.assertEqual(responses, ["Response."] * 2)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(request_scheduler.get_number_of_retries(), 2)
+        self.assertEqual(request_scheduler.get_number_of_throttles(), 1)
+        self.assertEqual(request_scheduler.get_concurrency_limit(), 4)
+
+    def test_requests_that_keep_failing_give_up_after_the_retries(self):
+        request_scheduler = RequestScheduler(max_retries=2, initial_backoff=0.01)
+
+        request_samples, calls = create_failing_request_samples_function(
+            [RequestToAiModelTimedOutError("Timed out.") for _ in range(5)]
+        )
+
+        with self.assertRaises(RequestToAiModelFailedError):
+            request_scheduler.schedule(request_samples)("Prompt.", 1)
+
+        self.assertEqual(len(calls), 3)
+
+    def test_errors_that_are_not_temporary_are_not_retried(self):
+        request_scheduler = RequestScheduler(initial_backoff=0.01)
+
+        request_samples, calls = create_failing_request_samples_function(
+            [RequestToAiModelFailedError("Bad request.")]
+        )
+
+        with self.assertRaises(RequestToAiModelFailedError):
+            request_scheduler.schedule(request_samples)("Prompt.", 1)
+
+        self.assertEqual(len(calls), 1)
+
+    def test_a_request_that_fails_unexpectedly_or_is_cancelled_frees_its_slot(self):
+        request_scheduler = RequestScheduler(max_concurrency=1)
+
+        def request_malformed_samples(prompt, number_of_samples):
+            raise ValueError("The body of the response is malformed.")
+
+        with self.assertRaises(ValueError):
+            request_scheduler.schedule(request_malformed_samples)("Prompt.", 1)
+
+        async def arequest_samples(prompt, number_of_samples):
+            if prompt == "Slow prompt.":
+                await asyncio.sleep(10)
+
+            return ["Response."] * number_of_samples
+
+        arequest_scheduled_samples = request_scheduler.aschedule(arequest_samples)
+
+        async def cancel_a_request_and_send_another():
+            slow_request = asyncio.create_task(
+                arequest_scheduled_samples("Slow prompt.", 1)
+            )
+            await asyncio.sleep(0.01)
+
+            # Waits for the slot of the slow request, until it's cancelled
+            waiting_request = asyncio.create_task(
+                arequest_scheduled_samples("Prompt.", 1)
+            )
+            await asyncio.sleep(0.01)
+            self.assertFalse(waiting_request.done())
+
+            slow_request.cancel()
+
+            return await asyncio.wait_for(waiting_request, 1)
+
+        self.assertEqual(
+            asyncio.run(cancel_a_request_and_send_another()), ["Response."]
+        )
+
+    def test_throttling_by_the_server_is_absorbed_by_the_scheduler(self):
+        with FakeAiModelServer(number_of_throttled_requests=2) as fake_server:
+            ai_model_client = AiModelClient("key", base_url=fake_server.get_base_url())
+
+            request_scheduler = RequestScheduler(initial_backoff=0.01)
+
+            arequest_samples = request_scheduler.aschedule(
+                ai_model_client.arequest_samples
+            )
+
+            async def request_concurrently():
+                return await asyncio.gather(
+                    *[arequest_samples("Prompt.", 1) for _ in range(4)]
+                )
+
+            self.assertEqual(
+                asyncio.run(request_concurrently()), [["Fake response."]] * 4
+            )
+            self.assertEqual(request_scheduler.get_number_of_throttles(), 2)
+
+    def test_a_request_that_backs_off_does_not_hold_a_slot_of_the_concurrency_limit(
+        self,
+    ):
+        call_times = []
+
+        async def arequest_response(prompt):
+            call_times.append(time.monotonic())
+
+            if len(call_times) == 1:
+                raise RequestToAiModelThrottledError("Throttled.", retry_after=0.5)
+
+            if "Choose the best answer" in prompt:
+                return "The best answer is number 1"
+
+            return "Response."
+
+        tree_of_thoughts = create_tree_of_thoughts(3, 1)
+        tree_of_thoughts.set_request_scheduler(RequestScheduler())
+
+        asyncio.run(
+            tree_of_thoughts.aprocess_tree_of_thoughts(
+                arequest_response_from_ai_model_function=arequest_response,
+                max_concurrent_requests=1,
+            )
+        )
+
+        # The other samples are requested while the throttled one waits to be retried
+        self.assertLess(call_times[1] - call_times[0], 0.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from enums.state_type import StateType
+from response_cache import ResponseCache
+
+from state import State
+from tree_of_thoughts import TreeOfThoughts
+
+
+def create_state_layers(implementation_text):
+    return [
+        {
+            "state_type": StateType.PLANNING,
+            "state_type_text": "Planning text",
+            "include_ancestor_state_type_response": None,
+        },
+        {
+            "state_type": StateType.IMPLEMENTATION,
+            "state_type_text": implementation_text,
+            "include_ancestor_state_type_response": None,
+        },
+    ]
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_keys_depend_on_the_prompt_the_sample_and_the_model_parameters(self):
+        response_cache = ResponseCache(None)
+
+        self.assertEqual(
+            response_cache.create_key("Prompt", 0),
+            response_cache.create_key("Prompt", 0),
+        )
+        self.assertNotEqual(
+            response_cache.create_key("Prompt", 0),
+            response_cache.create_key("Prompt", 1),
+        )
+        self.assertNotEqual(
+            response_cache.create_key("Prompt", 0),
+            response_cache.create_key("Other", 0),
+        )
+        self.assertNotEqual(
+            response_cache.create_key("Prompt", 0),
+            ResponseCache(None, model_parameters={"model": "other"}).create_key(
+                "Prompt", 0
+            ),
+        )
+
+    def test_the_least_recently_used_entries_are_dropped_from_memory(self):
+        response_cache = ResponseCache(None, max_entries_in_memory=2)
+
+        response_cache.put("a", "A")
+        response_cache.put("b", "B")
+        response_cache.get("a")
+        response_cache.put("c", "C")
+
+        self.assertEqual(response_cache.get("a"), "A")
+        self.assertIsNone(response_cache.get("b"))
+        self.assertEqual(response_cache.get("c"), "C")
+
+    def test_entries_on_disk_are_shared_between_caches_and_evicted_by_size(self):
+        with tempfile.TemporaryDirectory() as directory_path:
+            response_cache = ResponseCache(directory_path, max_size_on_disk=25)
+
+            first_key = response_cache.create_key("First", 0)
+            second_key = response_cache.create_key("Second", 0)
+
+            response_cache.put(first_key, "0123456789")
+
+            self.assertTrue(
+                os.path.isfile(
+                    f"{directory_path}/{first_key[:2]}/{first_key[2:4]}/{first_key}.txt"
+                )
+            )
+            self.assertEqual(ResponseCache(directory_path).get(first_key), "0123456789")
+
+            os.utime(
+                f"{directory_path}/{first_key[:2]}/{first_key[2:4]}/{first_key}.txt",
+                (0, 0),
+            )
+
+            response_cache.put(second_key, "01234567890123456789")
+
+            self.assertIsNone(ResponseCache(directory_path).get(first_key))
+            self.assertEqual(
+                ResponseCache(directory_path).get(second_key), "01234567890123456789"
+            )
+
+    def test_a_rerun_only_requests_the_prompts_that_changed(self):
+        response_cache = ResponseCache(None)
+        prompts = []
+
+        def fake_request_samples_from_ai_model_function(prompt, number_of_samples):
+            prompts.append(prompt)
+
+            if "Choose the best answer" in prompt:
+                return ["The best answer is number 1"] * number_of_samples
+
+            return [f"Response {i}." for i in range(number_of_samples)]
+
+        for implementation_text in ["Implementation text", "Changed text"]:
+            tree_of_thoughts = TreeOfThoughts(
+                "test",
+                State("Context.", StateType.CONTEXT),
+                create_state_layers(implementation_text),
+                3,
+                1,
+            )
+
+            tree_of_thoughts.set_response_cache(response_cache)
+            tree_of_thoughts.set_request_samples_from_ai_model_function(
+                fake_request_samples_from_ai_model_function
+            )
+
+            tree_of_thoughts.process_tree_of_thoughts()
+
+        # The second run only requests the responses and votes of the changed layer
+        self.assertEqual(len(prompts), 6)
+        self.assertTrue(all("Changed text" in prompt for prompt in prompts[4:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
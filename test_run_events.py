@@ -0,0 +1,194 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from collections import Counter
+from enums.run_event_type import RunEventType
+from enums.state_type import StateType
+from errors import RequestToAiModelThrottledError
+from request_scheduling import RequestScheduler
+from response_cache import ResponseCache
+from run_events import ChromeTraceExporter
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+async def fake_arequest_samples_from_ai_model_function(prompt, number_of_samples):
+    await asyncio.sleep(0.01)
+
+    if "Choose the best answer" in prompt:
+        return ["The best answer is number 1"] * number_of_samples
+
+    return [f"Response {i}." for i in range(number_of_samples)]
+
+
+class TestRunEvents(unittest.TestCase):
+    def test_the_hooks_receive_every_layer_request_and_vote(self):
+        events = []
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            state_types=[StateType.PLANNING, StateType.IMPLEMENTATION]
+        )
+        tree_of_thoughts.add_hook(events.append)
+
+        asyncio.run(
+            tree_of_thoughts.aprocess_tree_of_thoughts(
+                arequest_samples_from_ai_model_function=fake_arequest_samples_from_ai_model_function
+            )
+        )
+
+        counts = Counter(event.event_type for event in events)
+
+        self.assertEqual(counts[RunEventType.LAYER_STARTED], 2)
+        self.assertEqual(counts[RunEventType.LAYER_FINISHED], 2)
+        # A response request for the context, one per winner of the planning, and a vote request per layer
+        self.assertEqual(counts[RunEventType.REQUEST_STARTED], 5)
+        self.assertEqual(counts[RunEventType.REQUEST_FINISHED], 5)
+        self.assertEqual(counts[RunEventType.VOTE_PARSED], 6)
+
+        request_started_events = {
+            event.request_id: event
+            for event in events
+            if event.event_type == RunEventType.REQUEST_STARTED
+        }
+
+        for event in events:
+            if event.event_type != RunEventType.REQUEST_FINISHED:
+                continue
+
+            started_event = request_started_events[event.request_id]
+
+            self.assertEqual(event.node_ids, started_event.node_ids)
+            self.assertEqual(
+                len(event.node_ids),
+                3
+                if event.kind == "response" or event.state_type == StateType.PLANNING
+                else 6,
+            )
+            self.assertGreater(event.prompt_size, 0)
+            self.assertGreater(event.response_size, 0)
+            self.assertGreaterEqual(event.duration, 0.01)
+
+    def test_every_attempt_of_a_request_is_reported_without_the_time_it_waited(self):
+        events = []
+        number_of_requests = 0
+
+        def request_samples(prompt, number_of_samples):
+            nonlocal number_of_requests
+            number_of_requests += 1
+
+            if number_of_requests == 1:
+                raise RequestToAiModelThrottledError("Throttled.", retry_after=0.1)
+
+            if "Choose the best answer" in prompt:
+                return ["The best answer is number 1"] * number_of_samples
+
+            return [f"Response {i}." for i in range(number_of_samples)]
+
+        tree_of_thoughts = create_tree_of_thoughts(3, 1)
+        tree_of_thoughts.set_request_samples_from_ai_model_function(request_samples)
+        tree_of_thoughts.set_request_scheduler(RequestScheduler())
+        tree_of_thoughts.add_hook(events.append)
+
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        request_events = [
+            event
+            for event in events
+            if event.event_type
+            in (RunEventType.REQUEST_STARTED, RunEventType.REQUEST_FINISHED)
+        ]
+
+        # The throttled attempt and its retry, then the vote
+        self.assertEqual(
+            [(event.event_type, event.kind) for event in request_events],
+            [
+                (RunEventType.REQUEST_STARTED, "response"),
+                (RunEventType.REQUEST_FINISHED, "response"),
+                (RunEventType.REQUEST_STARTED, "response"),
+                (RunEventType.REQUEST_FINISHED, "response"),
+                (RunEventType.REQUEST_STARTED, "vote"),
+                (RunEventType.REQUEST_FINISHED, "vote"),
+            ],
+        )
+        self.assertIsNotNone(request_events[1].error)
+        self.assertIsNone(request_events[3].error)
+        self.assertLess(request_events[1].duration, 0.1)
+        self.assertLess(request_events[3].duration, 0.1)
+        self.assertGreaterEqual(
+            request_events[2].timestamp - request_events[1].timestamp, 0.1
+        )
+
+    def test_responses_found_in_the_cache_are_reported(self):
+        response_cache = ResponseCache(None)
+
+        for expected_number_of_cache_hits in (0, 15):
+            events = []
+
+            tree_of_thoughts = create_tree_of_thoughts(
+                state_types=[StateType.PLANNING, StateType.IMPLEMENTATION]
+            )
+            tree_of_thoughts.set_response_cache(response_cache)
+            tree_of_thoughts.add_hook(events.append)
+
+            asyncio.run(
+                tree_of_thoughts.aprocess_tree_of_thoughts(
+                    arequest_samples_from_ai_model_function=fake_arequest_samples_from_ai_model_function
+                )
+            )
+
+            # Every response and vote of the second run: 3 + 6 responses, and 3 + 3 votes
+            self.assertEqual(
+                sum(
+                    1 for event in events if event.event_type == RunEventType.CACHE_HIT
+                ),
+                expected_number_of_cache_hits,
+            )
+
+    def test_the_trace_shows_the_concurrent_requests_on_separate_tracks(self):
+        chrome_trace_exporter = ChromeTraceExporter()
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            state_types=[StateType.PLANNING, StateType.IMPLEMENTATION]
+        )
+        tree_of_thoughts.add_hook(chrome_trace_exporter)
+
+        asyncio.run(
+            tree_of_thoughts.aprocess_tree_of_thoughts(
+                arequest_samples_from_ai_model_function=fake_arequest_samples_from_ai_model_function
+            )
+        )
+
+        trace_events = chrome_trace_exporter.create_trace()["traceEvents"]
+
+        layers = [event for event in trace_events if event.get("cat") == "layer"]
+        requests = [event for event in trace_events if event.get("cat") == "request"]
+
+        self.assertEqual(
+            [layer["name"] for layer in layers],
+            ["layer planning", "layer implementation"],
+        )
+        self.assertEqual(len(requests), 5)
+
+        # The responses to the children of both winners of the planning are requested at once
+        self.assertEqual(
+            len(
+                {
+                    request["tid"]
+                    for request in requests
+                    if request["name"] == "response implementation"
+                }
+            ),
+            2,
+        )
+
+        with tempfile.TemporaryDirectory() as directory_path:
+            file_path = os.path.join(directory_path, "trace.json")
+
+            chrome_trace_exporter.export(file_path)
+
+            self.assertTrue(os.path.getsize(file_path) > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
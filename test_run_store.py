@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from response_cache import ResponseCache
+from run_store import RunStore
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+def fake_request_samples_from_ai_model_function(prompt, number_of_samples):
+    if "Choose the best answer" in prompt:
+        return ["The best answer is number 2"] * number_of_samples
+
+    return [f"Response {i}." for i in range(number_of_samples)]
+
+
+class TestRunStore(unittest.TestCase):
+    def setUp(self):
+        self._temporary_directory = tempfile.TemporaryDirectory()
+        self._file_path = os.path.join(self._temporary_directory.name, "store.db")
+
+    def tearDown(self):
+        self._temporary_directory.cleanup()
+
+    def test_artifacts_survive_reopening_the_store_compressed_or_not(self):
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                run_store = RunStore(
+                    self._file_path, compress=compress, writes_per_transaction=10
+                )
+                run_store.put_artifact("Test", "planning_1.txt", "Response é.")
+                run_store.close()
+
+                run_store = RunStore(self._file_path)
+
+                self.assertEqual(
+                    run_store.get_artifact("test", "planning_1.txt"), "Response é."
+                )
+                self.assertIsNone(run_store.get_artifact("test", "planning_2.txt"))
+
+                run_store.close()
+
+    def test_the_response_cache_evicts_the_least_recently_used_entries_of_the_store(
+        self,
+    ):
+        run_store = RunStore(self._file_path)
+        response_cache = ResponseCache(
+            None, max_entries_in_memory=1, max_size_on_disk=25, run_store=run_store
+        )
+
+        response_cache.put("first", "0123456789")
+        response_cache.put("second", "0123456789")
+
+        # Marks the first entry as used more recently than the second
+        self.assertEqual(response_cache.get("first"), "0123456789")
+
+        response_cache.put("third", "0123456789")
+
+        self.assertIsNone(run_store.get_cache_entry("second"))
+        self.assertEqual(response_cache.get("first"), "0123456789")
+        self.assertEqual(response_cache.get("third"), "0123456789")
+
+        run_store.close()
+
+    def test_a_run_keeps_its_files_in_the_store_and_exports_them(self):
+        run_store = RunStore(self._file_path, compress=True)
+
+        tree_of_thoughts = create_tree_of_thoughts(3, 1, name="Test")
+        tree_of_thoughts.set_run_store(run_store)
+        tree_of_thoughts.activate_create_files()
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            fake_request_samples_from_ai_model_function
+        )
+
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        self.assertEqual(run_store.get_run_names(), ["test"])
+
+        export_directory_path = os.path.join(self._temporary_directory.name, "test")
+
+        self.assertEqual(run_store.export_artifacts("Test", export_directory_path), 7)
+
+        with open(
+            os.path.join(export_directory_path, "planning_winner_1.txt"),
+            encoding="utf8",
+        ) as file:
+            self.assertEqual(file.read(), "Response 1.")
+
+        # The responses of a second run come from the cache in the store
+        second_tree_of_thoughts = create_tree_of_thoughts(3, 1, name="Test")
+        second_tree_of_thoughts.set_run_store(run_store)
+        second_tree_of_thoughts.activate_create_files()
+        second_tree_of_thoughts.set_request_samples_from_ai_model_function(
+            lambda prompt, number_of_samples: self.fail(
+                "The response should have come from the cache"
+            )
+        )
+
+        second_tree_of_thoughts.process_tree_of_thoughts()
+
+        run_store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
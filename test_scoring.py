@@ -0,0 +1,87 @@
+import asyncio
+import unittest
+from enums.voting_mode import VotingMode
+from errors import UnableToExtractScoreFromResponse
+from response_cache import ResponseCache
+from scoring import is_prompt_for_score
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+def score_by_response(prompt, number_of_samples):
+    """Scores every plan with its own number, so that 'Plan 3.' gets 3 in every sample."""
+    if is_prompt_for_score(prompt):
+        plan_number = prompt.split("Answer: Plan ")[1].split(".")[0]
+
+        return [f"The score is {plan_number}"] * number_of_samples
+
+    return [f"Plan {i + 1}." for i in range(number_of_samples)]
+
+
+class TestScoring(unittest.TestCase):
+    def test_every_candidate_is_scored_on_its_own_and_ranked_by_its_scores(self):
+        prompts = []
+
+        async def arequest_samples(prompt, number_of_samples):
+            prompts.append(prompt)
+
+            return score_by_response(prompt, number_of_samples)
+
+        tree_of_thoughts = create_tree_of_thoughts(4, 2, voting_mode=VotingMode.SCORING)
+
+        winners = asyncio.run(
+            tree_of_thoughts.aprocess_tree_of_thoughts(
+                arequest_samples_from_ai_model_function=arequest_samples
+            )
+        )
+
+        self.assertEqual(
+            [winner.name.get_response() for winner in winners], ["Plan 4.", "Plan 3."]
+        )
+        self.assertEqual(winners[0].name.get_votes(), 12)
+
+        # One prompt per candidate, which only contains its own response
+        score_prompts = [prompt for prompt in prompts if is_prompt_for_score(prompt)]
+        self.assertEqual(len(score_prompts), 4)
+        for prompt in score_prompts:
+            self.assertEqual(prompt.count("Answer: Plan"), 1)
+
+    def test_the_scores_of_a_repeated_response_are_reused(self):
+        score_prompts = []
+
+        def request_samples(prompt, number_of_samples):
+            if is_prompt_for_score(prompt):
+                score_prompts.append(prompt)
+
+                return ["The score is 7"] * number_of_samples
+
+            return ["Plan 1."] * number_of_samples
+
+        tree_of_thoughts = create_tree_of_thoughts(3, 1, voting_mode=VotingMode.SCORING)
+        tree_of_thoughts.set_request_samples_from_ai_model_function(request_samples)
+        tree_of_thoughts.set_response_cache(ResponseCache(None))
+
+        winners = tree_of_thoughts.process_tree_of_thoughts()
+
+        self.assertEqual(len(score_prompts), 1)
+        self.assertEqual(winners[0].name.get_votes(), 21)
+
+        def request_invalid_score(prompt, number_of_samples):
+            if is_prompt_for_score(prompt):
+                return ["The score is 11"] * number_of_samples
+
+            return ["Plan 1."] * number_of_samples
+
+        invalid_tree_of_thoughts = create_tree_of_thoughts(
+            2, 1, voting_mode=VotingMode.SCORING
+        )
+        invalid_tree_of_thoughts.set_request_samples_from_ai_model_function(
+            request_invalid_score
+        )
+
+        with self.assertRaises(UnableToExtractScoreFromResponse):
+            invalid_tree_of_thoughts.process_tree_of_thoughts()
+
+
+if __name__ == "__main__":
+    unittest.main()
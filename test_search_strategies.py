@@ -0,0 +1,128 @@
+import asyncio
+import unittest
+from enums.search_strategy import SearchStrategy
+from enums.state_type import StateType
+from errors import InvalidParameterError
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+class RequestCounter:
+    """Votes for the first answer of every vote, and counts the requests and the samples of responses."""
+
+    def __init__(self):
+        self.number_of_requests = 0
+        self.number_of_responses = 0
+
+    def __call__(self, prompt, number_of_samples):
+        self.number_of_requests += 1
+
+        if "Choose the best answer" in prompt:
+            return ["The best answer is number 1"] * number_of_samples
+
+        self.number_of_responses += number_of_samples
+
+        return [
+            f"{prompt.split()[-2]} {self.number_of_responses - number_of_samples + i}."
+            for i in range(number_of_samples)
+        ]
+
+
+def count_non_leaf_nodes(node):
+    if node.is_leaf:
+        return 0
+
+    return 1 + sum(count_non_leaf_nodes(child) for child in node.children)
+
+
+class TestSearchStrategies(unittest.TestCase):
+    def test_a_beam_search_narrows_the_layers_to_fit_the_node_expansions(self):
+        request_counter = RequestCounter()
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            2,
+            2,
+            [StateType.PLANNING, StateType.IMPLEMENTATION, StateType.REFINEMENT],
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(request_counter)
+        tree_of_thoughts.set_search_strategy(SearchStrategy.BEAM, 4)
+
+        winners = tree_of_thoughts.process_tree_of_thoughts()
+
+        # The root, then one planning, then both implementations under it
+        self.assertEqual(len(winners), 2)
+        self.assertEqual(
+            count_non_leaf_nodes(winners[0].root),
+            4,
+        )
+        self.assertEqual(request_counter.number_of_responses, 2 + 2 + 4)
+
+        starved_tree_of_thoughts = create_tree_of_thoughts(
+            2,
+            2,
+            [StateType.PLANNING, StateType.IMPLEMENTATION, StateType.REFINEMENT],
+        )
+        starved_tree_of_thoughts.set_request_samples_from_ai_model_function(
+            request_counter
+        )
+        starved_tree_of_thoughts.set_search_strategy(SearchStrategy.BEAM, 2)
+
+        self.assertEqual(starved_tree_of_thoughts.process_tree_of_thoughts(), [])
+
+        with self.assertRaises(InvalidParameterError):
+            tree_of_thoughts.set_search_strategy(SearchStrategy.BEST_FIRST)
+
+    def test_a_best_first_search_only_expands_the_most_voted_nodes(self):
+        request_counter = RequestCounter()
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            3, 1, [StateType.PLANNING, StateType.IMPLEMENTATION]
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(request_counter)
+        tree_of_thoughts.set_search_strategy(SearchStrategy.BEST_FIRST, 10)
+
+        winners = tree_of_thoughts.process_tree_of_thoughts()
+
+        self.assertEqual(
+            [
+                (winner.name.get_response(), winner.parent.name.get_response())
+                for winner in winners
+            ],
+            [("Implementation 3.", "Planning 0.")],
+        )
+
+        # The root and the most voted plan were expanded, the other plans weren't
+        self.assertEqual(count_non_leaf_nodes(winners[0].root), 2)
+        self.assertEqual(request_counter.number_of_requests, 4)
+
+    def test_a_best_first_search_stops_once_its_budget_is_spent(self):
+        request_counter = RequestCounter()
+
+        async def arequest_samples(prompt, number_of_samples):
+            return request_counter(prompt, number_of_samples)
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            2, 1, [StateType.PLANNING, StateType.IMPLEMENTATION]
+        )
+        tree_of_thoughts.set_search_strategy(SearchStrategy.BEST_FIRST, 1)
+
+        winners = asyncio.run(
+            tree_of_thoughts.aprocess_tree_of_thoughts(
+                arequest_samples_from_ai_model_function=arequest_samples
+            )
+        )
+
+        # Only the root was expanded, so no node of the last layer was reached
+        self.assertEqual(winners, [])
+        self.assertEqual(request_counter.number_of_responses, 2)
+
+        with self.assertRaises(InvalidParameterError):
+            asyncio.run(
+                tree_of_thoughts.aprocess_tree_of_thoughts(
+                    arequest_samples_from_ai_model_function=arequest_samples
+                )
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
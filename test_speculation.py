@@ -0,0 +1,125 @@
+import asyncio
+import unittest
+from threading import Lock
+from enums.state_type import StateType
+from errors import InvalidParameterError
+from speculation import Speculation
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+class TestSpeculation(unittest.TestCase):
+    def test_only_the_candidates_with_a_wide_enough_lead_are_likely_winners(self):
+        speculation = Speculation()
+
+        self.assertEqual(speculation.determine_likely_winners([3, 1, 0], 1, 1), [0])
+        self.assertEqual(speculation.determine_likely_winners([3, 1, 0], 1, 2), [])
+        self.assertEqual(speculation.determine_likely_winners([0, 0], 2, 5), [0, 1])
+        self.assertEqual(
+            Speculation(lead_fraction=0).determine_likely_winners([2, 1, 1], 2, 5),
+            [0],
+        )
+
+        capped_speculation = Speculation(max_speculative_responses=3)
+
+        self.assertTrue(capped_speculation.reserve_responses(["a", "b"]))
+        self.assertFalse(capped_speculation.reserve_responses(["a"]))
+        self.assertFalse(capped_speculation.reserve_responses(["c", "d"]))
+
+        with self.assertRaises(InvalidParameterError):
+            Speculation(lead_fraction=2)
+
+    def test_the_next_layer_uses_the_children_speculated_for_a_certain_winner(self):
+        prompts = []
+        lock = Lock()
+
+        def request_samples(prompt, number_of_samples):
+            with lock:
+                prompts.append(prompt)
+
+            if "Choose the best answer" in prompt:
+                return ["The best answer is number 1"] * number_of_samples
+
+            if "Implementation text" in prompt:
+                return [f"Implementation {i}." for i in range(number_of_samples)]
+
+            return [f"Plan {i}." for i in range(number_of_samples)]
+
+        speculation = Speculation()
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            3,
+            1,
+            state_types=[StateType.PLANNING, StateType.IMPLEMENTATION],
+            include_previous_response=True,
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(request_samples)
+        tree_of_thoughts.set_speculation(speculation)
+
+        winners = tree_of_thoughts.process_tree_of_thoughts()
+
+        self.assertEqual(winners[0].name.get_response(), "Implementation 0.")
+        self.assertEqual(
+            winners[0].parent.name.get_response(),
+            "Plan 0.",
+        )
+
+        # The children of the winner of the plans were requested once, while its last vote was still pending
+        self.assertEqual(
+            len(
+                [prompt for prompt in prompts if prompt.endswith("Implementation text")]
+            ),
+            1,
+        )
+        self.assertEqual(speculation.get_number_of_speculated_responses(), 3)
+        self.assertEqual(speculation.get_hit_rate(), 1)
+
+    def test_the_children_of_a_candidate_that_was_overtaken_are_left_unused(self):
+        vote_responses = [
+            ["The best answer is number 1"] * 2 + ["The best answer is number 2"],
+            ["The best answer is number 2"] * 2,
+        ]
+        response_prompts = []
+
+        async def arequest_samples(prompt, number_of_samples):
+            if "Choose the best answer" in prompt:
+                if "Answer 1: Plan" in prompt:
+                    return vote_responses.pop(0)
+
+                return ["The best answer is number 1"] * number_of_samples
+
+            response_prompts.append(prompt)
+
+            if "Implementation text" in prompt:
+                return [f"Implementation {i}." for i in range(number_of_samples)]
+
+            return [f"Plan {i}." for i in range(number_of_samples)]
+
+        speculation = Speculation(lead_fraction=0)
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            5,
+            1,
+            state_types=[StateType.PLANNING, StateType.IMPLEMENTATION],
+            include_previous_response=True,
+        )
+        tree_of_thoughts.set_speculation(speculation)
+
+        winners = asyncio.run(
+            tree_of_thoughts.aprocess_tree_of_thoughts(
+                arequest_samples_from_ai_model_function=arequest_samples
+            )
+        )
+
+        self.assertEqual(winners[0].parent.name.get_response(), "Plan 1.")
+
+        self.assertEqual(len(response_prompts), 3)
+        self.assertIn("Plan 0.", response_prompts[1])
+        self.assertIn("Plan 1.", response_prompts[2])
+
+        self.assertEqual(speculation.get_number_of_speculated_responses(), 5)
+        self.assertEqual(speculation.get_hit_rate(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from defines import AI_MODEL_MAX_TOKENS, TRIMMED_TEXT_MARKER
+from errors import PromptExceedsContextWindowError
+from token_counting import count_tokens, count_tokens_of_prompt, trim_text_to_tokens
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+def create_tree_of_thoughts_with_context_window(
+    context, context_window, request_samples_function
+):
+    tree_of_thoughts = create_tree_of_thoughts(5, 1, context=context)
+
+    tree_of_thoughts.set_context_window(context_window)
+    tree_of_thoughts.set_request_samples_from_ai_model_function(
+        request_samples_function
+    )
+
+    return tree_of_thoughts
+
+
+class TestTokenCounting(unittest.TestCase):
+    def test_trimmed_texts_fit_in_their_tokens_and_are_always_the_same(self):
+        text = "The quick brown fox jumps over the lazy dog, 1234567 times. " * 20
+
+        self.assertEqual(trim_text_to_tokens(text, count_tokens(text)), text)
+
+        for max_tokens in [10, 50, 100]:
+            trimmed_text = trim_text_to_tokens(text, max_tokens)
+
+            self.assertLessEqual(count_tokens(trimmed_text), max_tokens)
+            self.assertTrue(trimmed_text.endswith(TRIMMED_TEXT_MARKER))
+            self.assertEqual(trimmed_text, trim_text_to_tokens(text, max_tokens))
+
+    def test_the_answers_of_a_vote_are_trimmed_to_fit_in_the_context_window(self):
+        context_window = AI_MODEL_MAX_TOKENS + 300
+        vote_prompts = []
+
+        def fake_request_samples_function(prompt, number_of_samples):
+            if "Choose the best answer" in prompt:
+                vote_prompts.append(prompt)
+
+                return ["The best answer is number 2"] * number_of_samples
+
+            # One long answer among short ones
+            return ["Short answer."] * (number_of_samples - 1) + [
+                "A much longer answer that goes on and on. " * 100
+            ]
+
+        tree_of_thoughts = create_tree_of_thoughts_with_context_window(
+            "Context.", context_window, fake_request_samples_function
+        )
+
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        self.assertEqual(len(vote_prompts), 1)
+        self.assertLessEqual(count_tokens_of_prompt(vote_prompts[0]), 300)
+        self.assertEqual(vote_prompts[0].count("Short answer."), 4)
+        self.assertIn(TRIMMED_TEXT_MARKER, vote_prompts[0])
+
+        entries = tree_of_thoughts.get_prompt_token_report().get_entries()
+
+        self.assertEqual([entry["kind"] for entry in entries], ["response", "vote"])
+        self.assertEqual(entries[1]["number_of_trimmed_texts"], 1)
+
+    def test_a_prompt_that_doesnt_fit_fails_before_being_requested(self):
+        prompts = []
+
+        def fake_request_samples_function(prompt, number_of_samples):
+            prompts.append(prompt)
+
+            return ["Response."] * number_of_samples
+
+        tree_of_thoughts = create_tree_of_thoughts_with_context_window(
+            "A very long context. " * 1000,
+            AI_MODEL_MAX_TOKENS + 300,
+            fake_request_samples_function,
+        )
+
+        with self.assertRaises(PromptExceedsContextWindowError):
+            tree_of_thoughts.process_tree_of_thoughts()
+
+        self.assertEqual(prompts, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import asyncio
+import re
+import unittest
+from enums.state_type import StateType
+from enums.voting_mode import VotingMode
+
+from tests.tree_of_thoughts_factory import create_tree_of_thoughts
+
+
+def vote_by_quality(prompt, number_of_samples):
+    # The answers state their quality. Every other vote goes to the second best answer.
+    qualities = [int(quality) for quality in re.findall(r"Quality (\d+)\.", prompt)]
+
+    ranking = sorted(range(len(qualities)), key=lambda i: -qualities[i])
+
+    return [
+        f"The best answer is number {ranking[i % 2] + 1}"
+        for i in range(number_of_samples)
+    ]
+
+
+class TestTournament(unittest.TestCase):
+    def test_the_winners_are_the_candidates_that_won_their_brackets(self):
+        vote_prompts = []
+        qualities = [3, 9, 1, 7, 5, 0, 2, 8, 4, 6]
+
+        def fake_request_samples_from_ai_model_function(prompt, number_of_samples):
+            if "Choose the best answer" in prompt:
+                vote_prompts.append(prompt)
+
+                return vote_by_quality(prompt, number_of_samples)
+
+            return [f"Quality {quality}." for quality in qualities]
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            len(qualities), 2, voting_mode=VotingMode.TOURNAMENT
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            fake_request_samples_from_ai_model_function
+        )
+
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        winners = tree_of_thoughts.get_winners_of_type(StateType.PLANNING)
+
+        self.assertEqual(
+            [winner.name.get_response() for winner in winners],
+            ["Quality 9.", "Quality 8."],
+        )
+
+        # Ten candidates in groups of four: three groups, then a group among the four of the five that advanced
+        # (the fifth advances alone), then a final among the three left
+        self.assertEqual(len(vote_prompts), 5)
+        self.assertTrue(all(prompt.count("Answer ") <= 4 for prompt in vote_prompts))
+
+    def test_every_round_advances_at_least_as_many_candidates_as_winners(self):
+        vote_prompts = []
+        qualities = [3, 9, 1, 7, 5, 0, 2, 8, 4]
+
+        def fake_request_samples_from_ai_model_function(prompt, number_of_samples):
+            if "Choose the best answer" in prompt:
+                vote_prompts.append(prompt)
+
+                return vote_by_quality(prompt, number_of_samples)
+
+            return [f"Quality {quality}." for quality in qualities]
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            len(qualities), 8, voting_mode=VotingMode.TOURNAMENT
+        )
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            fake_request_samples_from_ai_model_function
+        )
+
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        winners = tree_of_thoughts.get_winners_of_type(StateType.PLANNING)
+
+        # Nine candidates in groups of four, four and one: the first group advances whole, three of the second
+        # advance, and the one left behind is the only candidate that loses
+        self.assertEqual(len(vote_prompts), 1)
+        self.assertEqual(vote_prompts[0].count("Answer "), 4)
+        self.assertEqual(
+            sorted(winner.name.get_response() for winner in winners),
+            sorted(f"Quality {quality}." for quality in qualities if quality != 2),
+        )
+
+    def test_the_groups_of_a_round_are_voted_on_concurrently(self):
+        in_flight_votes = 0
+        max_in_flight_votes = 0
+
+        async def fake_arequest_samples_from_ai_model_function(
+            prompt, number_of_samples
+        ):
+            nonlocal in_flight_votes, max_in_flight_votes
+
+            if "Choose the best answer" not in prompt:
+                return [f"Quality {i}." for i in range(number_of_samples)]
+
+            in_flight_votes += 1
+            max_in_flight_votes = max(max_in_flight_votes, in_flight_votes)
+
+            await asyncio.sleep(0.01)
+
+            in_flight_votes -= 1
+
+            return vote_by_quality(prompt, number_of_samples)
+
+        tree_of_thoughts = create_tree_of_thoughts(
+            10, 1, voting_mode=VotingMode.TOURNAMENT
+        )
+
+        asyncio.run(
+            tree_of_thoughts.aprocess_tree_of_thoughts(
+                arequest_samples_from_ai_model_function=fake_arequest_samples_from_ai_model_function
+            )
+        )
+
+        winners = tree_of_thoughts.get_winners_of_type(StateType.PLANNING)
+
+        self.assertEqual(winners[0].name.get_response(), "Quality 9.")
+        self.assertEqual(max_in_flight_votes, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
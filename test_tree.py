@@ -0,0 +1,122 @@
+import unittest
+from enums.state_type import StateType
+from enums.tiebreak import Tiebreak
+
+from state import State
+from tree import Tree
+
+
+def find_by_walking_the_tree(tree, condition):
+    return [node for node in tree.get_root_node().leaves if condition(node.name)]
+
+
+class TestTree(unittest.TestCase):
+    def assert_queries_match_a_walk_of_the_tree(self, tree, state_type):
+        self.assertEqual(
+            tree.get_leaf_nodes_without_responses(),
+            find_by_walking_the_tree(tree, lambda state: not state.has_response()),
+        )
+        self.assertEqual(
+            tree.get_unresolved_leaf_nodes_with_responses(),
+            find_by_walking_the_tree(
+                tree, lambda state: state.has_response() and not state.is_resolved()
+            ),
+        )
+
+        resolved_leaf_nodes = find_by_walking_the_tree(
+            tree,
+            lambda state: state.is_resolved() and state.get_state_type() == state_type,
+        )
+
+        self.assertEqual(
+            tree.get_winners_of_type(state_type, len(resolved_leaf_nodes)),
+            sorted(
+                resolved_leaf_nodes,
+                key=lambda node: node.name.get_votes(),
+                reverse=True,
+            ),
+        )
+
+    def test_the_leaf_queries_match_a_walk_of_the_tree_as_it_grows(self):
+        tree = Tree(State("Context.", StateType.CONTEXT))
+
+        self.assertEqual(
+            tree.get_leaf_nodes_without_responses(), [tree.get_root_node()]
+        )
+
+        last_state_type = StateType.CONTEXT
+
+        for state_type in [
+            StateType.PLANNING,
+            StateType.IMPLEMENTATION,
+            StateType.PLANNING,
+        ]:
+            tree.add_state_type(state_type, last_state_type, "Text", None, 3, 2)
+
+            self.assert_queries_match_a_walk_of_the_tree(tree, state_type)
+
+            # Responses arrive in an order different from the one of the tree
+            for node in reversed(tree.get_leaf_nodes_without_responses()):
+                node.name.set_response("Response.")
+
+                self.assert_queries_match_a_walk_of_the_tree(tree, state_type)
+
+            for i, node in enumerate(tree.get_unresolved_leaf_nodes_with_responses()):
+                for _ in range(i % 3):
+                    node.name.add_vote()
+
+                node.name.consider_resolved()
+
+                self.assert_queries_match_a_walk_of_the_tree(tree, state_type)
+
+            last_state_type = state_type
+
+    def test_ties_are_broken_by_the_tiebreak_and_the_full_ranking_can_be_returned(
+        self,
+    ):
+        tree = Tree(State("Context.", StateType.CONTEXT))
+
+        tree.add_state_type(StateType.PLANNING, StateType.CONTEXT, "Text", None, 4, 1)
+
+        first, second, third, fourth = tree.get_leaf_nodes_without_responses()
+
+        # Responses arrive in an order different from the one of the tree
+        for node, response in [
+            (third, "Medium."),
+            (first, "Much longer response."),
+            (fourth, "Short"),
+            (second, "Tiny"),
+        ]:
+            node.name.set_response(response)
+
+        for node in [first, second, third, fourth]:
+            if node is not third:
+                node.name.add_vote()
+
+            node.name.consider_resolved()
+
+        self.assertEqual(
+            tree.get_winners_of_type(StateType.PLANNING, 2), [first, second]
+        )
+        self.assertEqual(
+            tree.get_winners_of_type(StateType.PLANNING, 2, Tiebreak.SHORTEST_RESPONSE),
+            [second, fourth],
+        )
+        self.assertEqual(
+            tree.get_winners_of_type(StateType.PLANNING, 1, Tiebreak.LONGEST_RESPONSE),
+            [first],
+        )
+
+        tree.set_tiebreak(Tiebreak.SHORTEST_RESPONSE)
+
+        self.assertEqual(
+            tree.get_winners_of_type(StateType.PLANNING, None),
+            [second, fourth, first, third],
+        )
+
+        with self.assertRaises(ValueError):
+            tree.get_winners_of_type(StateType.PLANNING, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
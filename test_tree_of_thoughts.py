@@ -1,5 +1,7 @@
+import asyncio
 import unittest
 from enums.state_type import StateType
+from enums.voting_mode import VotingMode
 from errors import InvalidParameterError
 
 from state import State
@@ -44,6 +46,138 @@ class TestTreeOfThoughts(unittest.TestCase):
                 1,
             )
 
+    def test_processing_asynchronously_respects_the_concurrency_limit(self):
+        in_flight = 0
+        max_in_flight = 0
+        prompts = []
+
+        async def fake_arequest_response_from_ai_model_function(prompt):
+            nonlocal in_flight, max_in_flight
+
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+
+            await asyncio.sleep(0.01)
+
+            in_flight -= 1
+
+            prompts.append(prompt)
+
+            if "Choose the best answer" in prompt:
+                return "The best answer is number 1"
+
+            return "Response."
+
+        tree_of_thoughts = TreeOfThoughts(
+            "test",
+            State("Context.", StateType.CONTEXT),
+            [
+                {
+                    "state_type": StateType.PLANNING,
+                    "state_type_text": "Planning text",
+                    "include_ancestor_state_type_response": None,
+                },
+                {
+                    "state_type": StateType.IMPLEMENTATION,
+                    "state_type_text": "Implementation text",
+                    "include_ancestor_state_type_response": None,
+                },
+            ],
+            5,
+            1,
+        )
+
+        asyncio.run(
+            tree_of_thoughts.aprocess_tree_of_thoughts(
+                fake_arequest_response_from_ai_model_function, 3
+            )
+        )
+
+        # Each layer requests 5 responses and 5 votes
+        self.assertEqual(len(prompts), 20)
+        self.assertEqual(max_in_flight, 3)
+
+    def test_siblings_and_votes_are_requested_as_samples_of_a_single_request(self):
+        requests = []
+
+        def fake_request_samples_from_ai_model_function(prompt, number_of_samples):
+            requests.append(number_of_samples)
+
+            if "Choose the best answer" in prompt:
+                return ["The best answer is number 2"] * number_of_samples
+
+            return [f"Response {i}." for i in range(number_of_samples)]
+
+        tree_of_thoughts = TreeOfThoughts(
+            "test",
+            State("Context.", StateType.CONTEXT),
+            [
+                {
+                    "state_type": StateType.PLANNING,
+                    "state_type_text": "Planning text",
+                    "include_ancestor_state_type_response": None,
+                },
+                {
+                    "state_type": StateType.IMPLEMENTATION,
+                    "state_type_text": "Implementation text",
+                    "include_ancestor_state_type_response": None,
+                },
+            ],
+            5,
+            1,
+        )
+
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            fake_request_samples_from_ai_model_function
+        )
+
+        tree_of_thoughts.process_tree_of_thoughts()
+
+        # Each layer requests its 5 responses in one request, and its 5 votes in another
+        self.assertEqual(requests, [5, 5, 5, 5])
+
+    def test_sibling_groups_are_voted_on_separately(self):
+        vote_prompts = []
+
+        def fake_request_samples_from_ai_model_function(prompt, number_of_samples):
+            if "Choose the best answer" in prompt:
+                vote_prompts.append(prompt)
+                return ["The best answer is number 1"] * number_of_samples
+
+            return [f"Response {i}." for i in range(number_of_samples)]
+
+        tree_of_thoughts = TreeOfThoughts(
+            "test",
+            State("Context.", StateType.CONTEXT),
+            [
+                {
+                    "state_type": StateType.PLANNING,
+                    "state_type_text": "Planning text",
+                    "include_ancestor_state_type_response": None,
+                },
+                {
+                    "state_type": StateType.IMPLEMENTATION,
+                    "state_type_text": "Implementation text",
+                    "include_ancestor_state_type_response": None,
+                    "voting_mode": VotingMode.SIBLING_GROUPS,
+                },
+            ],
+            3,
+            2,
+        )
+
+        tree_of_thoughts.set_request_samples_from_ai_model_function(
+            fake_request_samples_from_ai_model_function
+        )
+
+        asyncio.run(tree_of_thoughts.aprocess_tree_of_thoughts())
+
+        # The planning layer is voted on as a whole, then each of its 2 winners' children separately
+        self.assertEqual(len(vote_prompts), 3)
+        self.assertIn("Answer 3:", vote_prompts[0])
+        self.assertIn("Answer 3:", vote_prompts[1])
+        self.assertNotIn("Answer 4:", vote_prompts[1])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -2,6 +2,7 @@ import unittest
 
 from anytree import Node
 from enums.state_type import StateType
+from node_utils import get_ancestors_by_state_type
 from responses.ancestor_responses import (
     determine_if_an_ancestor_response_should_be_included,
 )
@@ -35,6 +36,33 @@ class TestAncestorResponses(unittest.TestCase):
 
         self.assertEqual(prompt, "\n\nIMPLEMENTATION:\n\nImplementation")
 
+    def test_siblings_share_the_map_of_ancestors_inherited_from_their_parent(self):
+        context_node = Node(State("context", StateType.CONTEXT))
+        planning_node = Node(State("context", StateType.PLANNING), parent=context_node)
+        implementation_node = Node(
+            State("context", StateType.IMPLEMENTATION), parent=planning_node
+        )
+        refinement_nodes = [
+            Node(State("context", StateType.REFINEMENT), parent=implementation_node)
+            for _ in range(3)
+        ]
+
+        ancestors_by_state_type = get_ancestors_by_state_type(refinement_nodes[0])
+
+        self.assertEqual(
+            ancestors_by_state_type,
+            {
+                StateType.CONTEXT: context_node,
+                StateType.PLANNING: planning_node,
+                StateType.IMPLEMENTATION: implementation_node,
+            },
+        )
+
+        for refinement_node in refinement_nodes[1:]:
+            self.assertIs(
+                get_ancestors_by_state_type(refinement_node), ancestors_by_state_type
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
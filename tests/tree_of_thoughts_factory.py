@@ -0,0 +1,50 @@
+"""This module contains the function that the tests create their trees of thoughts with, so that every test
+only states what sets its tree of thoughts apart.
+"""
+from enums.state_type import StateType
+from enums.voting_mode import VotingMode
+from state import State
+from tree_of_thoughts import TreeOfThoughts
+
+
+def create_tree_of_thoughts(
+    number_of_steps=3,
+    breadth=2,
+    state_types=(StateType.PLANNING,),
+    voting_mode=VotingMode.STANDARD,
+    include_previous_response=False,
+    name="test",
+    context="Context.",
+):
+    """Creates a tree of thoughts with a layer for every state type, whose text is the name of the state type,
+    e.g. 'Planning text'.
+
+    Args:
+        number_of_steps (int, optional): how many samples are requested for every prompt
+        breadth (int, optional): how many winners every layer has
+        state_types (list[StateType], optional): the state type of every layer
+        voting_mode (VotingMode, optional): how the candidates of every layer are voted on
+        include_previous_response (bool, optional): whether every layer includes the response of the layer before it
+        name (str, optional): the name of the tree of thoughts
+        context (str, optional): the response of the root
+
+    Returns:
+        TreeOfThoughts: the tree of thoughts
+    """
+    return TreeOfThoughts(
+        name,
+        State(context, StateType.CONTEXT),
+        [
+            {
+                "state_type": state_type,
+                "state_type_text": f"{state_type.name.capitalize()} text",
+                "include_ancestor_state_type_response": state_types[i - 1]
+                if include_previous_response and i > 0
+                else None,
+                "voting_mode": voting_mode,
+            }
+            for i, state_type in enumerate(state_types)
+        ],
+        number_of_steps,
+        breadth,
+    )
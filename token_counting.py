@@ -0,0 +1,261 @@
+"""This module contains the functions that count the tokens of prompts offline, and that fit prompts into
+the context window of the AI model by trimming the text of the candidates deterministically.
+"""
+import math
+import re
+from threading import Lock
+from defines import (
+    INSTRUCT_GPT_PROMPT_ANSWER_OPENING,
+    INSTRUCT_GPT_PROMPT_HEADER,
+    TRIMMED_TEXT_MARKER,
+)
+from errors import PromptExceedsContextWindowError
+
+# Splits text the way the tokenizers of the GPT models do before merging characters into tokens:
+# contractions, words, numbers, runs of punctuation and runs of whitespace.
+_PIECES_PATTERN = re.compile(
+    r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d+| ?(?:[^\s\w]|_)+|\s+", re.IGNORECASE
+)
+
+# Every piece of text counts at least one token. Longer pieces count one token for every few characters,
+# which overestimates slightly for English text, so that budgets err on the safe side.
+_CHARACTERS_PER_TOKEN_OF_WORDS = 5
+_CHARACTERS_PER_TOKEN_OF_NUMBERS = 3
+_CHARACTERS_PER_TOKEN_OF_WHITESPACE = 8
+
+# How many times fitting a prompt is retried with a smaller budget, since the tokens of the pieces of a prompt
+# don't always add up to the tokens of the whole prompt
+_MAX_FITTING_ATTEMPTS = 5
+
+
+def _count_tokens_of_piece(piece):
+    stripped_piece = piece.strip()
+
+    if not stripped_piece:
+        return math.ceil(len(piece) / _CHARACTERS_PER_TOKEN_OF_WHITESPACE)
+
+    if stripped_piece.isdigit():
+        return math.ceil(len(stripped_piece) / _CHARACTERS_PER_TOKEN_OF_NUMBERS)
+
+    if stripped_piece.isalpha():
+        return math.ceil(len(stripped_piece) / _CHARACTERS_PER_TOKEN_OF_WORDS)
+
+    # Punctuation rarely merges
+    return len(stripped_piece)
+
+
+def _split_into_pieces(text):
+    return _PIECES_PATTERN.findall(text)
+
+
+def count_tokens(text):
+    """Estimates how many tokens the AI model would split 'text' into, without a network connection
+    or the tokenizer of the model.
+
+    Args:
+        text (str): the text
+
+    Returns:
+        int: the estimated tokens
+    """
+    return sum(_count_tokens_of_piece(piece) for piece in _split_into_pieces(text))
+
+
+def count_tokens_of_prompt(prompt):
+    """Estimates the tokens of a prompt as it's sent to the AI model, with the header and the answer opening.
+
+    Args:
+        prompt (str): the prompt
+
+    Returns:
+        int: the estimated tokens
+    """
+    return count_tokens(
+        INSTRUCT_GPT_PROMPT_HEADER + prompt + INSTRUCT_GPT_PROMPT_ANSWER_OPENING
+    )
+
+
+def trim_text_to_tokens(text, max_tokens):
+    """Trims the end of 'text' so that it counts at most 'max_tokens', marking that it was trimmed.
+    The same text and maximum always produce the same result.
+
+    Args:
+        text (str): the text
+        max_tokens (int): the maximum tokens of the result
+
+    Returns:
+        str: the text itself if it fits, otherwise its beginning followed by the trimmed text marker,
+            or an empty string if not even the marker fits
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    max_tokens_of_text = max_tokens - count_tokens(TRIMMED_TEXT_MARKER)
+
+    if max_tokens_of_text < 0:
+        return ""
+
+    kept_pieces = []
+    kept_tokens = 0
+
+    for piece in _split_into_pieces(text):
+        tokens_of_piece = _count_tokens_of_piece(piece)
+
+        if kept_tokens + tokens_of_piece > max_tokens_of_text:
+            break
+
+        kept_pieces.append(piece)
+        kept_tokens += tokens_of_piece
+
+    return "".join(kept_pieces).rstrip() + TRIMMED_TEXT_MARKER
+
+
+def verify_prompt_fits(prompt, max_prompt_tokens):
+    """Verifies that the prompt fits in the tokens that the context window of the AI model leaves for prompts.
+
+    Args:
+        prompt (str): the prompt
+        max_prompt_tokens (int | None): the maximum tokens of a prompt, or None if prompts aren't limited
+
+    Returns:
+        int: the estimated tokens of the prompt
+
+    Raises:
+        PromptExceedsContextWindowError: if the prompt doesn't fit
+    """
+    prompt_tokens = count_tokens_of_prompt(prompt)
+
+    if max_prompt_tokens is not None and prompt_tokens > max_prompt_tokens:
+        raise PromptExceedsContextWindowError(
+            f"The prompt takes about {prompt_tokens} tokens, but the context window of the AI model only leaves {max_prompt_tokens} for it."
+        )
+
+    return prompt_tokens
+
+
+def _distribute_tokens(tokens_of_texts, available_tokens):
+    # Texts shorter than an even share keep all their tokens, and leave the rest to the longer ones
+    allowed_tokens = [0] * len(tokens_of_texts)
+
+    remaining_tokens = available_tokens
+
+    sorted_indexes = sorted(
+        range(len(tokens_of_texts)), key=lambda i: (tokens_of_texts[i], i)
+    )
+
+    for position, i in enumerate(sorted_indexes):
+        share = remaining_tokens // (len(tokens_of_texts) - position)
+
+        allowed_tokens[i] = min(tokens_of_texts[i], share)
+        remaining_tokens -= allowed_tokens[i]
+
+    return allowed_tokens
+
+
+def fit_prompt_with_texts(create_prompt_function, texts, max_prompt_tokens):
+    """Creates a prompt that contains several texts, trimming the longest ones as little as needed
+    so that the prompt fits in 'max_prompt_tokens'.
+
+    Args:
+        create_prompt_function (Callable[[list[str]], str]): creates the prompt that contains the texts
+        texts (list[str]): the texts
+        max_prompt_tokens (int | None): the maximum tokens of the prompt, or None if prompts aren't limited
+
+    Returns:
+        tuple[str, int, int]: the prompt, its estimated tokens, and how many of the texts were trimmed
+
+    Raises:
+        PromptExceedsContextWindowError: if the prompt doesn't fit even without the texts
+    """
+    prompt = create_prompt_function(texts)
+    prompt_tokens = count_tokens_of_prompt(prompt)
+
+    if max_prompt_tokens is None or prompt_tokens <= max_prompt_tokens:
+        return prompt, prompt_tokens, 0
+
+    tokens_of_texts = [count_tokens(text) for text in texts]
+
+    # What the prompt takes without the texts
+    fixed_tokens = count_tokens_of_prompt(create_prompt_function([""] * len(texts)))
+
+    available_tokens = max_prompt_tokens - fixed_tokens
+
+    for _ in range(_MAX_FITTING_ATTEMPTS):
+        if available_tokens < 0:
+            break
+
+        allowed_tokens = _distribute_tokens(tokens_of_texts, available_tokens)
+
+        fitted_texts = [
+            trim_text_to_tokens(text, allowed)
+            for text, allowed in zip(texts, allowed_tokens)
+        ]
+
+        prompt = create_prompt_function(fitted_texts)
+        prompt_tokens = count_tokens_of_prompt(prompt)
+
+        if prompt_tokens <= max_prompt_tokens:
+            number_of_trimmed_texts = sum(
+                1
+                for text, fitted_text in zip(texts, fitted_texts)
+                if text != fitted_text
+            )
+
+            return prompt, prompt_tokens, number_of_trimmed_texts
+
+        available_tokens -= prompt_tokens - max_prompt_tokens
+
+    raise PromptExceedsContextWindowError(
+        f"The prompt takes about {fixed_tokens} tokens without the texts of its {len(texts)} candidates, "
+        + f"and couldn't be fitted in the {max_prompt_tokens} tokens that the context window of the AI model leaves for it."
+    )
+
+
+class PromptTokenReport:
+    """Records the estimated tokens of the prompts of a run, per layer, for responses and for votes."""
+
+    def __init__(self):
+        self._entries = []
+
+        self._lock = Lock()
+
+    def register_prompt(
+        self, state_type, kind, prompt_tokens, number_of_trimmed_texts=0
+    ):
+        """Registers a prompt that is about to be sent.
+
+        Args:
+            state_type (StateType): the state type of the layer that the prompt belongs to
+            kind (str): either "response" or "vote"
+            prompt_tokens (int): the estimated tokens of the prompt
+            number_of_trimmed_texts (int, optional): how many candidates were trimmed for the prompt to fit
+        """
+        with self._lock:
+            self._entries.append(
+                {
+                    "state_type": state_type,
+                    "kind": kind,
+                    "prompt_tokens": prompt_tokens,
+                    "number_of_trimmed_texts": number_of_trimmed_texts,
+                }
+            )
+
+    def get_entries(self):
+        with self._lock:
+            return list(self._entries)
+
+    def get_prompt_tokens_by_layer(self):
+        """Adds up the estimated tokens of the prompts of every layer, by kind.
+
+        Returns:
+            dict[StateType, dict[str, int]]: the tokens of the response and vote prompts of every layer
+        """
+        prompt_tokens_by_layer = {}
+
+        for entry in self.get_entries():
+            prompt_tokens_of_layer = prompt_tokens_by_layer.setdefault(
+                entry["state_type"], {"response": 0, "vote": 0}
+            )
+            prompt_tokens_of_layer[entry["kind"]] += entry["prompt_tokens"]
+
+        return prompt_tokens_by_layer
@@ -0,0 +1,192 @@
+"""This module contains the functions that vote on a layer of states as a tournament: the candidates are split
+into small groups that are voted on separately, and the most voted of every group advance to the next round,
+until no more candidates are left than winners are needed.
+"""
+import asyncio
+import math
+from anytree import Node
+from defines import TOURNAMENT_GROUP_SIZE, TOURNAMENT_VOTES_PER_GROUP
+from errors import InvalidParameterError
+from voting import arequest_as_many_votes_as_steps, create_fitted_prompt_for_vote
+
+
+def split_into_groups(candidates: list[Node], group_size: int) -> list[list[Node]]:
+    """Splits the candidates of a round into consecutive groups of, at most, 'group_size' candidates.
+
+    Args:
+        candidates (list[Node]): the candidates of the round
+        group_size (int): the maximum number of candidates of a group
+
+    Returns:
+        list[list[Node]]: the groups
+    """
+    return [
+        candidates[i : i + group_size] for i in range(0, len(candidates), group_size)
+    ]
+
+
+class _Tournament:
+    """Keeps track of the rounds of a tournament, and of how far every candidate advanced."""
+
+    def __init__(self, candidates, breadth, group_size, votes_per_group):
+        if group_size < 2:
+            raise InvalidParameterError(
+                f"A tournament requires groups of at least 2 candidates, but the group size was {group_size}"
+            )
+
+        self._candidates = list(candidates)
+        self._breadth = breadth
+        self._group_size = group_size
+        self._votes_per_group = votes_per_group
+
+        self._rounds_advanced = {candidate: 0 for candidate in candidates}
+        self._number_of_rounds = 0
+
+        self._votes_before_round = {}
+
+    def is_over(self):
+        return len(self._candidates) <= self._breadth
+
+    def get_votes_per_group(self):
+        return self._votes_per_group
+
+    def get_round_index(self):
+        return self._number_of_rounds
+
+    def start_round(self):
+        """Splits the current candidates into groups.
+
+        Returns:
+            list[list[Node]]: the groups of the round. Only those with candidates left behind must be voted on.
+        """
+        self._votes_before_round = {
+            candidate: candidate.name.get_votes() for candidate in self._candidates
+        }
+
+        return split_into_groups(self._candidates, self._group_size)
+
+    def _rank_by_votes_of_round(self, group):
+        # Sorting is stable, so the candidates with the same votes keep the order of the tree
+        return sorted(
+            group,
+            key=lambda candidate: self._votes_before_round[candidate]
+            - candidate.name.get_votes(),
+        )
+
+    def determine_numbers_of_advancing_candidates(self, groups):
+        """Determines how many candidates of every group advance to the next round. Half of every group advances,
+        but never fewer than 'breadth' candidates in total: the missing places go to the groups with the most
+        candidates left behind, so that the winners always come out of their brackets.
+
+        Args:
+            groups (list[list[Node]]): the groups of the round
+
+        Returns:
+            list[int]: how many candidates of every group advance
+        """
+        if len(groups) == 1:
+            # The final, among which the winners are chosen
+            return [self._breadth]
+
+        numbers_of_advancing_candidates = [
+            math.ceil(len(group) / 2) for group in groups
+        ]
+
+        while sum(numbers_of_advancing_candidates) < self._breadth:
+            # The first group with the most candidates left behind gets one more place
+            group_index = max(
+                range(len(groups)),
+                key=lambda i: len(groups[i]) - numbers_of_advancing_candidates[i],
+            )
+
+            numbers_of_advancing_candidates[group_index] += 1
+
+        return numbers_of_advancing_candidates
+
+    def finish_round(self, groups):
+        """Advances the most voted candidates of every group to the next round.
+
+        Args:
+            groups (list[list[Node]]): the groups of the round, already voted on
+        """
+        self._candidates = []
+
+        for group, number_of_advancing_candidates in zip(
+            groups, self.determine_numbers_of_advancing_candidates(groups)
+        ):
+            self._candidates += self._rank_by_votes_of_round(group)[
+                :number_of_advancing_candidates
+            ]
+
+        for candidate in self._candidates:
+            self._rounds_advanced[candidate] += 1
+
+        self._number_of_rounds += 1
+
+    def resolve(self):
+        """Gives every candidate a bonus of votes for every round it advanced, larger than all the votes
+        it could have received, so that the candidates that advanced furthest are the most voted of the layer.
+        Then marks the candidates as resolved.
+        """
+        bonus_per_round_advanced = self._number_of_rounds * self._votes_per_group + 1
+
+        for candidate, rounds_advanced in self._rounds_advanced.items():
+            if rounds_advanced > 0:
+                candidate.name.add_vote(rounds_advanced * bonus_per_round_advanced)
+
+            candidate.name.consider_resolved()
+
+
+async def aprocess_tournament(
+    unresolved_leaf_nodes_with_responses,
+    breadth,
+    run_context,
+    arequest_samples_from_ai_model_function,
+    group_size=TOURNAMENT_GROUP_SIZE,
+    votes_per_group=TOURNAMENT_VOTES_PER_GROUP,
+):
+    """Votes on the candidates of a layer as a tournament, and marks them as resolved. The candidates
+    that advanced furthest end up with the most votes, so they're the winners of the layer. The groups
+    of every round are voted on concurrently.
+
+    Args:
+        unresolved_leaf_nodes_with_responses (list[Node]): the candidates of the layer
+        breadth (int): how many winners the tournament must produce
+        run_context (RunContext): the settings of the current run
+        arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that will request samples from the AI model
+        group_size (int, optional): the maximum number of candidates that are voted on together
+        votes_per_group (int, optional): how many votes every group gets
+
+    Raises:
+        InvalidParameterError: if 'group_size' is lower than 2
+    """
+    tournament = _Tournament(
+        unresolved_leaf_nodes_with_responses, breadth, group_size, votes_per_group
+    )
+
+    while not tournament.is_over():
+        groups = tournament.start_round()
+        numbers_of_advancing_candidates = (
+            tournament.determine_numbers_of_advancing_candidates(groups)
+        )
+
+        await asyncio.gather(
+            *[
+                arequest_as_many_votes_as_steps(
+                    tournament.get_votes_per_group(),
+                    create_fitted_prompt_for_vote(group, run_context),
+                    group,
+                    run_context,
+                    arequest_samples_from_ai_model_function,
+                    group_index,
+                    tournament.get_round_index(),
+                    numbers_of_advancing_candidates[group_index],
+                )
+                for group_index, group in enumerate(groups)
+                if numbers_of_advancing_candidates[group_index] < len(group)
+            ]
+        )
+
+        tournament.finish_round(groups)
+
+    tournament.resolve()
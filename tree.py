@@ -1,54 +1,227 @@
 """This module contains the class Tree, that handles the nodes and links of a tree of thoughts.
 """
+from threading import Lock
 from anytree import Node
 from enums.state_type import StateType
+from enums.tiebreak import Tiebreak
 from errors import InvalidParameterError
-from node_utils import create_child_state_node
+from node_utils import create_child_state_node, get_ancestors_by_state_type
 
 from state import State
+from winner_ranking import create_ranking_key, rank
 
 
 class Tree:
-    """This class handles the nodes and their relationships involved in a tree of thoughts."""
+    """This class handles the nodes and their relationships involved in a tree of thoughts.
 
-    def __init__(self, context_state):
+    The leaf nodes are kept in indexes that are updated as nodes are created, receive their responses
+    and get resolved, so that querying them costs as much as the result, rather than a walk of the whole tree.
+    """
+
+    def __init__(self, context_state, tiebreak=Tiebreak.TREE_ORDER):
         if not isinstance(context_state, State):
             raise InvalidParameterError(
                 f"During creation of a Tree, the 'context_state' passed wasn't a State: {context_state}"
             )
 
-        self._root_node: Node = Node(context_state)
+        self._lock = Lock()
+
+        self._tiebreak = tiebreak
+
+        # Every node is appended as it's created, and the nodes of a layer are created together after those of the
+        # previous one, so the last layer is the end of the list, which starts at the first node of its depth
+        self._nodes_in_creation_order = []
+        self._first_creation_index_of_last_layer = 0
+        self._number_of_expanded_nodes = 0
+
+        self._leaf_nodes_without_responses = {}
+        self._unresolved_leaf_nodes_with_responses = {}
+        self._resolved_leaf_nodes_by_state_type = {}
+
+        # The position of every node in a pre-order walk is determined by the path of child indexes from the root,
+        # which is what orders the results of the queries the same way as 'anytree' orders leaves.
+        self._root_node: Node = Node(context_state, order_key=(), creation_index=0)
+        self._nodes_in_creation_order.append(self._root_node)
+
+        self._start_tracking_node(self._root_node)
+
+    def _start_tracking_node(self, node):
+        node.name.set_on_change_function(lambda: self._update_indexes_of_node(node))
+
+        self._update_indexes_of_node(node)
+
+    def _remove_node_from_indexes(self, node):
+        self._leaf_nodes_without_responses.pop(node, None)
+        self._unresolved_leaf_nodes_with_responses.pop(node, None)
+
+        for resolved_leaf_nodes in self._resolved_leaf_nodes_by_state_type.values():
+            resolved_leaf_nodes.pop(node, None)
+
+    def _update_indexes_of_node(self, node):
+        with self._lock:
+            self._remove_node_from_indexes(node)
+
+            if not node.is_leaf:
+                return
+
+            if node.name.is_resolved():
+                self._resolved_leaf_nodes_by_state_type.setdefault(
+                    node.name.get_state_type(), {}
+                )[node] = None
+            elif node.name.has_response():
+                self._unresolved_leaf_nodes_with_responses[node] = None
+
+            if not node.name.has_response():
+                self._leaf_nodes_without_responses[node] = None
+
+    def _create_child_node(
+        self,
+        state_type: StateType,
+        state_type_related_text: str,
+        include_ancestor_state_type_response: StateType | None,
+        parent_node: Node,
+    ) -> Node:
+        order_key = parent_node.order_key + (len(parent_node.children),)
+
+        if parent_node.is_leaf:
+            self._number_of_expanded_nodes += 1
+
+        # The length of the order key is the depth of the node
+        if len(order_key) != len(self._nodes_in_creation_order[-1].order_key):
+            self._first_creation_index_of_last_layer = len(
+                self._nodes_in_creation_order
+            )
+
+        child_node = create_child_state_node(
+            state_type,
+            state_type_related_text,
+            include_ancestor_state_type_response,
+            parent_node,
+        )
+
+        child_node.order_key = order_key
+        child_node.creation_index = len(self._nodes_in_creation_order)
+
+        self._nodes_in_creation_order.append(child_node)
+
+        # Inherits the map of ancestors from its parent, which is shared by all its siblings
+        get_ancestors_by_state_type(child_node)
 
-    def get_winners_of_type(self, state_type: StateType, breadth: int) -> list[Node]:
+        # The parent is no longer a leaf
+        self._update_indexes_of_node(parent_node)
+
+        self._start_tracking_node(child_node)
+
+        return child_node
+
+    @staticmethod
+    def _sort_in_tree_order(nodes) -> list[Node]:
+        return sorted(nodes, key=lambda node: node.order_key)
+
+    def get_root_node(self) -> Node:
+        return self._root_node
+
+    def get_nodes_in_creation_order(self) -> list[Node]:
+        """Returns every node of the tree, in the order in which they were created, so that every parent
+        comes before its children, and the children of a parent keep their order.
+
+        Returns:
+            list[Node]: the nodes
+        """
+        return list(self._nodes_in_creation_order)
+
+    def get_nodes_of_last_layer(self) -> list[Node]:
+        """Returns the nodes of the last layer added to the tree, resolved or not, in the order in which they were created.
+
+        Returns:
+            list[Node]: the nodes, of which the first one has the lowest creation index of the layer
+        """
+        return self._nodes_in_creation_order[self._first_creation_index_of_last_layer :]
+
+    def get_number_of_expanded_nodes(self) -> int:
+        """Returns how many nodes have children, which is how many were expanded.
+
+        Returns:
+            int: the number of expanded nodes
+        """
+        return self._number_of_expanded_nodes
+
+    def add_child_node(
+        self,
+        parent_node: Node,
+        state_type: StateType,
+        state_type_related_text: str,
+        include_ancestor_state_type_response: StateType | None,
+    ) -> Node:
+        """Adds a single node as the last child of 'parent_node', for example to rebuild a tree from a checkpoint.
+
+        Args:
+            parent_node (Node): the parent of the new node
+            state_type (StateType): the state type of the new node
+            state_type_related_text (str): the text associated with the state type
+            include_ancestor_state_type_response (StateType | None): whether or not the response of an ancestor should be included in the prompt.
+
+        Returns:
+            Node: the new node
+        """
+        return self._create_child_node(
+            state_type,
+            state_type_related_text,
+            include_ancestor_state_type_response,
+            parent_node,
+        )
+
+    def set_tiebreak(self, tiebreak: Tiebreak) -> None:
+        """Sets how the winners with the same number of votes are ordered.
+
+        Args:
+            tiebreak (Tiebreak): the tiebreak
+        """
+        self._tiebreak = tiebreak
+
+    def get_winners_of_type(
+        self,
+        state_type: StateType,
+        breadth: int | None,
+        tiebreak: Tiebreak | None = None,
+    ) -> list[Node]:
         """Returns the winning nodes of a specific state type
 
         Args:
             state_type (StateType): the state type that the winners will be returned from
-            breadth (int): the amount of winners that will be chosen among those of a state type
+            breadth (int | None): the amount of winners that will be chosen among those of a state type.
+                If None, every resolved leaf node of the state type is returned, ranked.
+            tiebreak (Tiebreak | None, optional): how the nodes with the same votes are ordered. If None, the tiebreak of the tree is used.
 
         Returns:
             list[Node]: the winners of the specific state type
         """
+        if tiebreak is None:
+            tiebreak = self._tiebreak
+
         # Must collect all leaf nodes that are considered resolved and that are of the specified type
-        resolved_leaf_nodes = [
-            node
-            for node in self._root_node.leaves
-            if node.name.is_resolved() and node.name.get_state_type() == state_type
-        ]
+        with self._lock:
+            resolved_leaf_nodes = list(
+                self._resolved_leaf_nodes_by_state_type.get(state_type, {})
+            )
 
-        if len(resolved_leaf_nodes) < breadth:
+        if breadth is not None and len(resolved_leaf_nodes) < breadth:
             error_message = f"The function {self.get_winners_of_type.__name__} found less resolved leaf nodes ({len(resolved_leaf_nodes)}) "
             error_message += f"than the specified breadth ({breadth})."
             raise ValueError(error_message)
 
-        # Sort the nodes in descending order of vote counts
-        sorted_nodes = sorted(
-            resolved_leaf_nodes, key=lambda node: node.name.get_votes(), reverse=True
+        return rank(
+            resolved_leaf_nodes,
+            lambda node: create_ranking_key(
+                node.name.get_votes(),
+                tiebreak,
+                node.order_key,
+                node.creation_index,
+                node.name.get_response(),
+            ),
+            breadth,
         )
 
-        # Return the first '_breadth' nodes
-        return list(sorted_nodes[:breadth])
-
     def add_state_type(
         self,
         state_type_of_new_state: StateType,
@@ -68,11 +241,15 @@ class Tree:
             number_of_steps (int): the number of steps that this layer of states will have
             breadth (int): now many winners will be picked among those voted the most
         """
-        winners = self.get_winners_of_type(state_type_of_last_winners, breadth)
+        if state_type_of_last_winners == StateType.CONTEXT:
+            # The context is the only state of its type, regardless of the breadth
+            winners = [self._root_node]
+        else:
+            winners = self.get_winners_of_type(state_type_of_last_winners, breadth)
 
         for winner in winners:
             for _ in range(number_of_steps):
-                create_child_state_node(
+                self._create_child_node(
                     state_type_of_new_state,
                     state_type_related_text,
                     include_ancestor_state_type_response,
@@ -85,11 +262,25 @@ class Tree:
         Returns:
             list[Node]: the list of leaf nodes that are unresolved and have responses
         """
-        return [
-            node
-            for node in self._root_node.leaves
-            if node.name.has_response() and not node.name.is_resolved()
-        ]
+        with self._lock:
+            return self._sort_in_tree_order(self._unresolved_leaf_nodes_with_responses)
+
+    def get_unresolved_leaf_nodes(self) -> list[Node]:
+        """Returns the leaf nodes that aren't resolved yet, whether they have responses or not
+
+        Returns:
+            list[Node]: the unresolved leaf nodes, in tree order
+        """
+        with self._lock:
+            # The context has no response, but is resolved from the start
+            return self._sort_in_tree_order(
+                [
+                    node
+                    for node in self._leaf_nodes_without_responses
+                    if not node.name.is_resolved()
+                ]
+                + list(self._unresolved_leaf_nodes_with_responses)
+            )
 
     def get_leaf_nodes_without_responses(self) -> list[Node]:
         """Returns the leaf nodes that don't have responses stored in them
@@ -97,4 +288,5 @@ class Tree:
         Returns:
             list[Node]: returns a list of leaf nodes that don't have responses stored in them
         """
-        return [node for node in self._root_node.leaves if not node.name.has_response()]
+        with self._lock:
+            return self._sort_in_tree_order(self._leaf_nodes_without_responses)
@@ -1,26 +1,67 @@
 """This module contains the definition of a tree of thoughts, which handles the complex relationship
 between a series of intermediate prompts to achieve a specific result with GPT-4.
 """
+import asyncio
+import math
+import os
 from collections import deque
-from api_requests import request_response_from_ai_model
+from colorama import Fore
+from ai_model_client import AiModelClient
+from api_requests import (
+    create_arequest_samples_function,
+    create_request_samples_function,
+    limit_concurrency_of_arequest_samples_function,
+    split_arequest_samples_function,
+)
+from best_first_search import aprocess_best_first_search
+from checkpoint import (
+    create_snapshot,
+    read_snapshot,
+    restore_state_layers,
+    restore_tree,
+    verify_snapshot_matches,
+    write_snapshot,
+)
+from compact_tree import CompactTree
 from defines import (
+    AI_MODEL_CONTEXT_WINDOW,
+    AI_MODEL_MAX_TOKENS,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
     MAX_NUMBER_OF_STEPS,
     MIN_NUMBER_OF_STEPS,
     get_directory_path_for_tree_of_thoughts,
 )
+from enums.run_event_type import RunEventType
+from enums.search_strategy import SearchStrategy
 from enums.state_type import StateType
+from enums.tiebreak import Tiebreak
+from enums.voting_mode import VotingMode
 from errors import (
+    BudgetExceededError,
     InvalidParameterError,
 )
 from file_utils import (
     create_directories,
+    create_file_path_for_checkpoint,
     create_file_path_for_winner,
-    write_response_to_file,
 )
-from responses.requesting import request_responses
+from output import output_message
+from response_cache import ResponseCache
+from responses.requesting import arequest_responses
+from run_context import RunContext
+from regular_expressions import contains_complete_vote
+from run_events import (
+    RunHooks,
+    get_kind_of_current_request,
+    report_attempts_of_arequest_samples_function,
+)
+from scoring import aprocess_scoring
+from sibling_groups import aprocess_sibling_groups
 from state import State
+from token_counting import PromptTokenReport
+from tournament import aprocess_tournament
 from tree import Tree
-from voting import determine_winners
+from voting import adetermine_winners
 
 
 class TreeOfThoughts:
@@ -64,26 +105,420 @@ class TreeOfThoughts:
 
         self._tree_of_thoughts_name = tree_of_thoughts_name
 
-        self._tree = Tree(context_state)
+        self._tiebreak = Tiebreak.TREE_ORDER
+
+        self._tree = Tree(context_state, self._tiebreak)
 
         self._number_of_steps = number_of_steps
         self._breadth = breadth
 
+        # The steps and breadth of the layers that start from now on, which a budget can reduce
+        self._layer_number_of_steps = number_of_steps
+        self._layer_breadth = breadth
+
         self._queue = deque(state_layers)
 
-        self._request_response_from_ai_model_function = request_response_from_ai_model
+        # The layer whose nodes have been added to the tree, but that hasn't finished yet
+        self._state_layer_in_progress = None
+        self._state_type_of_last_winners = StateType.CONTEXT
+        # Kept since they stop being leaves, and can't be ranked again, once the next layer is added under them
+        self._winners_of_last_layer = []
+
+        # The credentials and connections of the client are only set up once the first request is sent
+        self._ai_model_client = AiModelClient()
+
+        self._request_response_from_ai_model_function = (
+            self._ai_model_client.request_response
+        )
+        self._request_samples_from_ai_model_function = (
+            self._ai_model_client.request_samples
+        )
 
         self._visual_output_active = False
         self._should_create_files = False
 
+        self._response_cache = None
+
+        self._request_scheduler = None
+
+        self._context_window = AI_MODEL_CONTEXT_WINDOW
+
+        self._prompt_token_report = PromptTokenReport()
+
+        self._early_stopping = None
+
+        self._checkpoint_file_path = None
+
+        self._run_store = None
+
+        self._run_hooks = RunHooks()
+
+        self._budget = None
+
+        self._should_stream_votes = False
+
+        self._duplicate_collapsing = None
+
+        self._speculation = None
+
+        self._search_strategy = SearchStrategy.LAYER_SYNCHRONOUS
+        self._max_node_expansions = None
+        self._batch_jobs = None
+
     def activate_visual_output(self):
         """Makes this class and other related functions output informative text to the console."""
         self._visual_output_active = True
 
+    def activate_compact_tree(self):
+        """Makes this tree of thoughts store its nodes in a CompactTree, which takes much less memory than a Tree
+        when many trees of thoughts are held at once. It must be activated before processing the tree of thoughts.
+
+        Raises:
+            InvalidParameterError: if the tree of thoughts has already been processed, even partially
+        """
+        if isinstance(self._tree, CompactTree):
+            return
+
+        root_node = self._tree.get_root_node()
+
+        if not root_node.is_leaf:
+            raise InvalidParameterError(
+                "The compact tree must be activated before processing the tree of thoughts."
+            )
+
+        self._tree = CompactTree(root_node.name, self._tiebreak)
+
+    def set_tiebreak(self, tiebreak):
+        """Sets how the winners with the same number of votes are ordered, so that the same votes
+        always produce the same winners, regardless of the order in which the responses arrived.
+
+        Args:
+            tiebreak (Tiebreak): the tiebreak
+        """
+        self._tiebreak = tiebreak
+
+        self._tree.set_tiebreak(tiebreak)
+
     def activate_create_files(self):
-        """Activates creating files to store responses to prompts, voting results, winners, etc."""
+        """Activates creating files to store responses to prompts, voting results, winners, etc.
+        Unless a response cache has been set already, the responses will also be cached on disk, so that
+        later runs only request the prompts that changed.
+        """
         self._should_create_files = True
 
+        if self._response_cache is None:
+            self._response_cache = ResponseCache(
+                model_parameters=self._ai_model_client.get_model_parameters(),
+                run_store=self._run_store,
+            )
+
+    def set_run_store(self, run_store):
+        """Sets the store that the responses, votes and winners are kept in when creating files, instead of
+        a file for each of them. It must be set before activating the creation of files, for the response cache
+        to keep its entries in the store as well.
+
+        Args:
+            run_store (RunStore | None): the store, or None to write a file for each of them
+        """
+        self._run_store = run_store
+
+    def set_response_cache(self, response_cache):
+        """Sets the cache that responses and votes will be looked up in before requesting them from the AI model.
+
+        Args:
+            response_cache (ResponseCache | None): the cache, or None to disable caching
+        """
+        self._response_cache = response_cache
+
+    def set_request_scheduler(self, request_scheduler):
+        """Sets the scheduler that every request to the AI model will go through, which keeps them within
+        the quotas of the AI model and retries the ones that fail temporarily.
+
+        Args:
+            request_scheduler (RequestScheduler | None): the scheduler, or None to send the requests directly
+        """
+        self._request_scheduler = request_scheduler
+
+    def set_context_window(self, context_window):
+        """Sets how many tokens fit in the context window of the AI model. Prompts are checked against it
+        before they're sent, and the answers of the vote prompts are trimmed to fit in it.
+
+        Args:
+            context_window (int | None): the tokens of the context window, or None to not limit prompts
+        """
+        self._context_window = context_window
+
+    def set_early_stopping(self, early_stopping):
+        """Sets the criteria to stop requesting the votes of a layer once its winners are decided.
+        Only the layers voted on all at once, or as a tournament, can stop early, since the winners of a group of siblings
+        depend on the votes of the other groups.
+
+        Args:
+            early_stopping (EarlyStopping | None): the criteria, which also counts the votes saved, or None to request every vote
+        """
+        self._early_stopping = early_stopping
+
+    def get_tree_of_thoughts_name(self):
+        return self._tree_of_thoughts_name
+
+    def set_budget(self, budget):
+        """Sets the budget of tokens or cost of the runs. Once its soft limit is reached, the layers that start
+        afterwards have half the steps and a breadth of 1. Once its hard limit is reached, no more requests are sent,
+        and the run stops with the winners of the last layer that finished.
+
+        Args:
+            budget (RunBudget | None): the budget, which also reports what every layer spent, or None to not limit the runs
+        """
+        self._budget = budget
+
+    def activate_streaming_votes(self):
+        """Activates streaming the responses of the vote prompts, which stop being read, and generated, as soon as
+        their votes can be extracted, rather than waiting for the reasoning that the AI model may write after them.
+        It only applies to the requests sent through the client of the AI model, not to substitute request functions.
+        """
+        self._should_stream_votes = True
+
+    def set_duplicate_collapsing(self, duplicate_collapsing):
+        """Sets the criteria to vote on the candidates whose responses are near-duplicates of each other as one,
+        so that they don't split the votes between them. Every candidate of the group gets the votes of the group.
+        Only applies to the layers that aren't voted on as a tournament.
+
+        Args:
+            duplicate_collapsing (DuplicateCollapsing | None): the criteria, which also counts the candidates collapsed,
+                or None to vote on every candidate separately
+        """
+        self._duplicate_collapsing = duplicate_collapsing
+
+    def set_speculation(self, speculation):
+        """Sets the criteria to start generating the children of the candidates that are likely to win a layer
+        while its votes are still being requested, so that the next layer finds their responses in the response cache.
+        Only applies to the layers that aren't voted on as a tournament or in groups of siblings. Unless a response cache
+        has been set, the speculated responses are kept in one that lives in memory.
+
+        Args:
+            speculation (Speculation | None): the criteria, which also counts the responses speculated and used,
+                or None to only generate the children once the winners are known
+        """
+        self._speculation = speculation
+
+    def set_search_strategy(self, search_strategy, max_node_expansions=None):
+        """Sets how the nodes to expand are chosen. By default, every layer expands the winners of the previous one.
+        The other strategies are limited by how many nodes can be expanded among the whole run, where every expansion
+        creates as many children as the number of steps. A best-first search can't be resumed from a checkpoint.
+
+        Args:
+            search_strategy (SearchStrategy): the strategy
+            max_node_expansions (int | None, optional): how many nodes can be expanded, which is required by every strategy
+                except LAYER_SYNCHRONOUS
+
+        Raises:
+            InvalidParameterError: if the strategy requires a budget of node expansions and it's missing or lower than 1
+        """
+        if search_strategy != SearchStrategy.LAYER_SYNCHRONOUS and (
+            max_node_expansions is None or max_node_expansions < 1
+        ):
+            raise InvalidParameterError(
+                f"The search strategy {search_strategy.name} requires a budget of at least 1 node expansion, but it was {max_node_expansions}"
+            )
+
+        self._search_strategy = search_strategy
+        self._max_node_expansions = max_node_expansions
+
+    def set_batch_jobs(self, batch_jobs):
+        """Sets the batch jobs that every request to the AI model will be sent in, rather than one by one. All the generation
+        prompts of a layer are submitted as a single job, and then all of its vote prompts, which is slower but cheaper.
+        The run is processed asynchronously, so that the requests of a layer are sent at once, and neither the request
+        scheduler nor the limits of concurrent requests apply, since the provider of the batch jobs takes care of them.
+
+        Args:
+            batch_jobs (BatchJobs | None): the batch jobs, or None to send every request on its own
+        """
+        self._batch_jobs = batch_jobs
+
+    def activate_checkpoints(self, checkpoint_file_path=None):
+        """Activates saving a checkpoint of the whole tree of thoughts whenever a layer starts or finishes,
+        and whenever a batch of requests completes, so that a failed run can be resumed from where it stopped.
+
+        Args:
+            checkpoint_file_path (str | None, optional): the file the checkpoint is saved to. If None, it's saved
+                in the directory of this tree of thoughts.
+        """
+        if checkpoint_file_path is None:
+            checkpoint_file_path = create_file_path_for_checkpoint(
+                get_directory_path_for_tree_of_thoughts(self._tree_of_thoughts_name)
+            )
+
+        self._checkpoint_file_path = checkpoint_file_path
+
+    def resume_from_checkpoint(self, checkpoint_file_path=None):
+        """Restores the tree, the queued layers and the layer in progress from a checkpoint, so that processing
+        the tree of thoughts continues from where the run that saved it stopped. It also activates checkpoints,
+        so the resumed run keeps saving them to the same file.
+
+        Args:
+            checkpoint_file_path (str | None, optional): the file of the checkpoint. If None, the one in the directory
+                of this tree of thoughts.
+
+        Returns:
+            bool: whether there was a checkpoint to resume from
+
+        Raises:
+            InvalidCheckpointError: if the checkpoint is corrupt, or was saved by a tree of thoughts with other settings
+        """
+        self.activate_checkpoints(checkpoint_file_path)
+
+        snapshot = read_snapshot(self._checkpoint_file_path)
+
+        if snapshot is None:
+            return False
+
+        verify_snapshot_matches(
+            snapshot,
+            self._tree_of_thoughts_name,
+            self._tree.get_root_node().name.get_context(),
+            self._number_of_steps,
+            self._breadth,
+        )
+
+        self._tree = restore_tree(snapshot, type(self._tree), self._tiebreak)
+
+        (
+            queued_state_layers,
+            self._state_layer_in_progress,
+            self._state_type_of_last_winners,
+        ) = restore_state_layers(snapshot)
+
+        self._queue = deque(queued_state_layers)
+
+        # The layers keep the size that a budget reduced them to, if it did
+        self._layer_number_of_steps = snapshot.get(
+            "layer_number_of_steps", self._number_of_steps
+        )
+        self._layer_breadth = snapshot.get("layer_breadth", self._breadth)
+
+        self._winners_of_last_layer = self._determine_winners_of_last_layer()
+
+        return True
+
+    def _determine_winners_of_last_layer(self):
+        if self._state_type_of_last_winners == StateType.CONTEXT:
+            return []
+
+        if self._state_layer_in_progress is None:
+            return self._tree.get_winners_of_type(
+                self._state_type_of_last_winners, self._layer_breadth
+            )
+
+        # The layer in progress was added under the winners, most voted first
+        state_type_in_progress = self._state_layer_in_progress["state_type"]
+
+        winners = {}
+
+        for node in self._tree.get_nodes_of_last_layer():
+            if (
+                node.name.get_state_type() == state_type_in_progress
+                and node.parent.name.get_state_type()
+                == self._state_type_of_last_winners
+            ):
+                winners.setdefault(node.parent.creation_index, node.parent)
+
+        return list(winners.values())
+
+    def _save_checkpoint(self):
+        # The artifacts and cached responses that the checkpoint relies on must be committed before it's saved
+        if self._run_store is not None:
+            self._run_store.flush()
+
+        if self._checkpoint_file_path is None:
+            return
+
+        create_directories(os.path.dirname(self._checkpoint_file_path) or ".")
+
+        write_snapshot(
+            self._checkpoint_file_path,
+            create_snapshot(
+                self._tree_of_thoughts_name,
+                self._number_of_steps,
+                self._breadth,
+                self._tree,
+                self._queue,
+                self._state_layer_in_progress,
+                self._state_type_of_last_winners,
+                self._layer_number_of_steps,
+                self._layer_breadth,
+            ),
+        )
+
+    def add_hook(self, hook_function):
+        """Adds a function that will be called with every event of the runs: when layers start and finish,
+        when requests to the AI model start and finish, when responses are found in the cache and when votes are parsed.
+        A ChromeTraceExporter is a hook that turns them into a trace.
+
+        Args:
+            hook_function (Callable[[RunEvent], None]): the function. It's called from the thread or task
+                that caused the event, so it must be fast and thread-safe.
+        """
+        self._run_hooks.add_hook(hook_function)
+
+    def get_prompt_token_report(self):
+        """Returns the report of the estimated tokens of every prompt sent while processing this tree of thoughts.
+
+        Returns:
+            PromptTokenReport: the report
+        """
+        return self._prompt_token_report
+
+    def _determine_max_prompt_tokens(self):
+        if self._context_window is None:
+            return None
+
+        # The response of the AI model must fit in the context window too
+        return self._context_window - self._ai_model_client.get_model_parameters().get(
+            "max_tokens", AI_MODEL_MAX_TOKENS
+        )
+
+    def _determine_response_cache(self):
+        # The speculated responses can only reach the next layer through a response cache
+        if self._response_cache is None and self._speculation is not None:
+            self._response_cache = ResponseCache(
+                directory_path=None,
+                model_parameters=self._ai_model_client.get_model_parameters(),
+            )
+
+        return self._response_cache
+
+    def _create_run_context(self):
+        return RunContext(
+            self._tree_of_thoughts_name,
+            visual_output_active=self._visual_output_active,
+            should_create_files=self._should_create_files,
+            response_cache=self._determine_response_cache(),
+            max_prompt_tokens=self._determine_max_prompt_tokens(),
+            prompt_token_report=self._prompt_token_report,
+            early_stopping=self._early_stopping,
+            # The nodes that a best-first search expands don't belong to layers, which checkpoints are made of
+            save_checkpoint_function=None
+            if self._search_strategy == SearchStrategy.BEST_FIRST
+            else self._save_checkpoint,
+            run_store=self._run_store,
+            run_hooks=self._run_hooks,
+            budget=self._budget,
+            duplicate_collapsing=self._duplicate_collapsing,
+            speculation=self._speculation,
+        )
+
+    def set_ai_model_client(self, ai_model_client):
+        """Sets the client that will send the requests to the AI model, for example to share
+        its pooled connections between several trees of thoughts, or to point it at another server.
+
+        Args:
+            ai_model_client (AiModelClient): the client
+        """
+        self._ai_model_client = ai_model_client
+
+        self._request_response_from_ai_model_function = ai_model_client.request_response
+        self._request_samples_from_ai_model_function = ai_model_client.request_samples
+
     def set_request_response_from_ai_model_function(
         self, request_response_from_ai_model_function
     ):
@@ -98,60 +533,373 @@ class TreeOfThoughts:
             request_response_from_ai_model_function
         )
 
-    def _create_files_for_winners(self, winners):
-        directory_path = get_directory_path_for_tree_of_thoughts(
-            self._tree_of_thoughts_name
+        # The substitute can only produce a response per call, so the samples will be requested one by one
+        self._request_samples_from_ai_model_function = create_request_samples_function(
+            request_response_from_ai_model_function
+        )
+
+    def set_request_samples_from_ai_model_function(
+        self, request_samples_from_ai_model_function
+    ):
+        """Sets the function that will request several responses (samples) to the same prompt
+        from the AI model in a single request.
+
+        Args:
+            request_samples_from_ai_model_function (function): the function that receives a prompt and a number of samples, and returns a list of responses
+        """
+        self._request_samples_from_ai_model_function = (
+            request_samples_from_ai_model_function
+        )
+
+    def get_winners_of_type(self, state_type):
+        """Returns the winners of the layer of a state type, once it has been processed.
+
+        Args:
+            state_type (StateType): the state type of the layer
+
+        Returns:
+            list[Node]: as many winners as the breadth, the most voted first
+        """
+        return self._tree.get_winners_of_type(state_type, self._layer_breadth)
+
+    def _create_files_for_winners(self, winners, run_context):
+        for i, winner in enumerate(winners):
+            file_path = create_file_path_for_winner(
+                run_context.get_directory_path(), winner, i
+            )
+
+            run_context.store_artifact(file_path, winner.name.get_response())
+
+    def _pop_state_layer(self):
+        state_layer = self._queue.popleft()
+
+        if not isinstance(state_layer, dict):
+            error_message = f"The function '{self._pop_state_layer.__name__}' expected the popped value of the queue to be a dict, but it was: {state_layer}"
+            raise ValueError(error_message)
+
+        return state_layer
+
+    def _add_state_layer_to_tree(
+        self, state_layer, state_type_of_last_winners, number_of_nodes_to_expand
+    ):
+        self._tree.add_state_type(
+            state_layer["state_type"],
+            state_type_of_last_winners,
+            state_layer["state_type_text"],
+            state_layer["include_ancestor_state_type_response"],
+            self._layer_number_of_steps,
+            number_of_nodes_to_expand,
+        )
+
+    def _determine_number_of_nodes_to_expand(self):
+        if self._search_strategy != SearchStrategy.BEAM:
+            return self._layer_breadth
+
+        remaining_node_expansions = (
+            self._max_node_expansions - self._tree.get_number_of_expanded_nodes()
+        )
+        number_of_remaining_layers = len(self._queue)
+
+        # Every layer expands at least one node, so the beam is narrowed for the budget to reach the last layer
+        if remaining_node_expansions < number_of_remaining_layers:
+            raise BudgetExceededError(
+                f"The budget of {self._max_node_expansions} node expansions can't reach the last layer."
+            )
+
+        return min(
+            self._layer_breadth, remaining_node_expansions // number_of_remaining_layers
+        )
+
+    def _reduce_layers_if_over_soft_budget(self, run_context):
+        if (
+            self._budget is None
+            or not self._budget.is_soft_limit_reached()
+            or (self._layer_number_of_steps, self._layer_breadth)
+            == (math.ceil(self._number_of_steps / 2), 1)
+        ):
+            return
+
+        self._layer_number_of_steps = math.ceil(self._number_of_steps / 2)
+        self._layer_breadth = 1
+
+        output_message(
+            Fore.LIGHTYELLOW_EX,
+            f"The soft budget has been reached, so the remaining layers will have {self._layer_number_of_steps} steps and a breadth of 1.",
+            run_context.is_visual_output_active(),
+        )
+
+    def _start_state_layer(self, run_context):
+        # A layer that was in progress when a checkpoint was saved continues, rather than being added to the tree again
+        if self._state_layer_in_progress is None:
+            self._reduce_layers_if_over_soft_budget(run_context)
+
+            number_of_nodes_to_expand = self._determine_number_of_nodes_to_expand()
+
+            self._state_layer_in_progress = self._pop_state_layer()
+
+            self._add_state_layer_to_tree(
+                self._state_layer_in_progress,
+                self._state_type_of_last_winners,
+                number_of_nodes_to_expand,
+            )
+
+            self._save_checkpoint()
+
+        run_context.set_next_state_layer(
+            self._queue[0] if self._queue else None, self._layer_number_of_steps
+        )
+
+        return self._state_layer_in_progress
+
+    def _finish_state_layer(self, state_layer, run_context):
+        self._winners_of_last_layer = self._tree.get_winners_of_type(
+            state_layer["state_type"], self._layer_breadth
+        )
+
+        self._create_files_for_winners(self._winners_of_last_layer, run_context)
+
+        # Set state type of these winners
+        self._state_type_of_last_winners = state_layer["state_type"]
+        self._state_layer_in_progress = None
+
+        self._save_checkpoint()
+
+    async def _aprocess_state_layer(
+        self, state_layer, run_context, arequest_samples_from_ai_model_function
+    ):
+        if (
+            state_layer.get("voting_mode", VotingMode.STANDARD)
+            == VotingMode.SIBLING_GROUPS
+        ):
+            await aprocess_sibling_groups(
+                self._tree.get_nodes_of_last_layer(),
+                self._layer_number_of_steps,
+                run_context,
+                arequest_samples_from_ai_model_function,
+            )
+            return
+
+        await arequest_responses(
+            self._tree.get_leaf_nodes_without_responses(),
+            run_context,
+            arequest_samples_from_ai_model_function,
+            first_creation_index=self._tree.get_nodes_of_last_layer()[0].creation_index,
+        )
+
+        if state_layer.get("voting_mode", VotingMode.STANDARD) == VotingMode.SCORING:
+            await aprocess_scoring(
+                self._tree.get_unresolved_leaf_nodes_with_responses(),
+                run_context,
+                arequest_samples_from_ai_model_function,
+            )
+            return
+
+        if state_layer.get("voting_mode", VotingMode.STANDARD) == VotingMode.TOURNAMENT:
+            await aprocess_tournament(
+                self._tree.get_unresolved_leaf_nodes_with_responses(),
+                self._layer_breadth,
+                run_context,
+                arequest_samples_from_ai_model_function,
+            )
+            return
+
+        await adetermine_winners(
+            self._tree.get_unresolved_leaf_nodes_with_responses(),
+            self._layer_number_of_steps,
+            run_context,
+            arequest_samples_from_ai_model_function,
+            number_of_winners=self._layer_breadth,
         )
 
-        if self._should_create_files:
-            create_directories(directory_path)
+    def _stop_for_budget(self, exception, run_context):
+        # The layer that was interrupted stays in progress, so a checkpoint can resume it with a larger budget
+        output_message(
+            Fore.LIGHTYELLOW_EX,
+            f"{exception} The tree of thoughts stopped with the winners of the last layer that finished.",
+            run_context.is_visual_output_active(),
+        )
+
+        return self._winners_of_last_layer
+
+    def _finish_best_first_search(self, winners, run_context):
+        self._queue.clear()
+
+        self._winners_of_last_layer = winners
 
-            for i, winner in enumerate(winners):
-                file_path = create_file_path_for_winner(directory_path, winner, i)
+        self._create_files_for_winners(self._winners_of_last_layer, run_context)
 
-                write_response_to_file(file_path, winner.name.get_response())
+        return self._winners_of_last_layer
 
     def process_tree_of_thoughts(self):
         """Processes the whole tree of thoughts from start to finish. The options of the tree
-        should have already been set properly.
+        should have already been set properly. It runs 'aprocess_tree_of_thoughts' in an event loop of its own,
+        so the request functions of this tree of thoughts are run concurrently in worker threads, and must be
+        thread-safe. Within a running event loop, 'aprocess_tree_of_thoughts' must be awaited instead.
+
+        Returns:
+            list[Node]: the winners of the last layer, or of the last layer that finished if the hard budget
+                stopped the run, which is empty if none did. With a best-first search, the most voted nodes
+                of the last layer that it reached.
         """
-        state_type_of_last_winners = StateType.CONTEXT
+        return asyncio.run(self.aprocess_tree_of_thoughts())
 
-        while self._queue:
-            state_layer = self._queue.popleft()
+    def _request_samples_streaming_votes(self, prompt, number_of_samples):
+        # Decided by where the request was made, since the context or the responses may quote the format of a vote
+        if get_kind_of_current_request() == "vote":
+            return self._ai_model_client.stream_samples_until(
+                prompt, number_of_samples, contains_complete_vote
+            )
 
-            if not isinstance(state_layer, dict):
-                error_message = f"The function '{self.process_tree_of_thoughts.__name__}' expected the popped value of the queue to be a dict, but it was: {state_layer}"
-                raise ValueError(error_message)
+        return self._ai_model_client.request_samples(prompt, number_of_samples)
 
-            self._tree.add_state_type(
-                state_layer["state_type"],
-                state_type_of_last_winners,
-                state_layer["state_type_text"],
-                state_layer["include_ancestor_state_type_response"],
-                self._number_of_steps,
-                self._breadth,
+    def _determine_request_samples_function(self):
+        if (
+            self._should_stream_votes
+            and self._request_samples_from_ai_model_function
+            == self._ai_model_client.request_samples
+        ):
+            return self._request_samples_streaming_votes
+
+        return self._request_samples_from_ai_model_function
+
+    async def _arequest_samples_from_ai_model_function(self, prompt, number_of_samples):
+        # Runs the blocking request function in a worker thread so that it doesn't stall the event loop
+        return await asyncio.to_thread(
+            self._determine_request_samples_function(), prompt, number_of_samples
+        )
+
+    def _create_arequest_samples_function(
+        self,
+        arequest_response_from_ai_model_function,
+        arequest_samples_from_ai_model_function,
+        semaphore,
+    ):
+        if self._batch_jobs is not None:
+            # The same parameters that the responses are cached under, unless the batch jobs were given their own
+            self._batch_jobs.set_default_model_parameters(
+                self._ai_model_client.get_model_parameters()
             )
 
-            request_responses(
-                self._tree_of_thoughts_name,
-                self._tree.get_leaf_nodes_without_responses(),
-                self._visual_output_active,
-                self._should_create_files,
-                self._request_response_from_ai_model_function,
+            return report_attempts_of_arequest_samples_function(
+                self._batch_jobs.arequest_samples
             )
 
-            determine_winners(
-                self._tree_of_thoughts_name,
-                self._tree.get_unresolved_leaf_nodes_with_responses(),
-                self._number_of_steps,
-                self._should_create_files,
-                self._request_response_from_ai_model_function,
+        should_split_samples = False
+
+        if arequest_samples_from_ai_model_function is None:
+            if arequest_response_from_ai_model_function is not None:
+                # Can only produce a response per call, so each sample will be a request of its own
+                arequest_samples_from_ai_model_function = (
+                    create_arequest_samples_function(
+                        arequest_response_from_ai_model_function
+                    )
+                )
+                should_split_samples = True
+            else:
+                arequest_samples_from_ai_model_function = (
+                    self._arequest_samples_from_ai_model_function
+                )
+
+        # Reported and limited before it's scheduled, so that only every attempt in flight is reported and holds
+        # a slot, and not while the scheduler waits for the quotas or backs off before a retry
+        arequest_samples_from_ai_model_function = (
+            limit_concurrency_of_arequest_samples_function(
+                report_attempts_of_arequest_samples_function(
+                    arequest_samples_from_ai_model_function
+                ),
+                semaphore,
+            )
+        )
+
+        if self._request_scheduler is not None:
+            arequest_samples_from_ai_model_function = self._request_scheduler.aschedule(
+                arequest_samples_from_ai_model_function
+            )
+
+        if should_split_samples:
+            return split_arequest_samples_function(
+                arequest_samples_from_ai_model_function
+            )
+
+        return arequest_samples_from_ai_model_function
+
+    async def aprocess_tree_of_thoughts(
+        self,
+        arequest_response_from_ai_model_function=None,
+        max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS,
+        arequest_samples_from_ai_model_function=None,
+        semaphore=None,
+    ):
+        """Processes the whole tree of thoughts from start to finish, asynchronously. All the generation prompts of a layer
+        are sent concurrently, and then all of its vote prompts are sent concurrently. If batch jobs have been set,
+        the requests are sent in them instead of through the request functions.
+
+        Args:
+            arequest_response_from_ai_model_function (Callable[[str], Awaitable[str]], optional): the coroutine function that will request
+                a response from the AI model. If None, the request functions of this tree of thoughts will be run in worker threads.
+            max_concurrent_requests (int, optional): the maximum number of requests to the AI model that can be in flight at once.
+            arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]], optional): the coroutine function that will request
+                several samples to the same prompt in a single request. Takes precedence over 'arequest_response_from_ai_model_function'.
+            semaphore (asyncio.Semaphore | FairShare | None, optional): limits the requests in flight along with other
+                trees of thoughts that share it, such as those of a BatchRunner. Takes precedence over 'max_concurrent_requests'.
+
+        Raises:
+            InvalidParameterError: if 'max_concurrent_requests' is lower than 1
+
+        Returns:
+            list[Node]: the winners of the last layer, or of the last layer that finished if the hard budget
+                stopped the run, which is empty if none did. With a best-first search, the most voted nodes
+                of the last layer that it reached.
+        """
+        if max_concurrent_requests < 1:
+            raise InvalidParameterError(
+                f"The function '{self.aprocess_tree_of_thoughts.__name__}' requires 'max_concurrent_requests' to be at least 1, but it was {max_concurrent_requests}"
+            )
+
+        arequest_samples_from_ai_model_function = (
+            self._create_arequest_samples_function(
+                arequest_response_from_ai_model_function,
+                arequest_samples_from_ai_model_function,
+                asyncio.Semaphore(max_concurrent_requests)
+                if semaphore is None
+                else semaphore,
             )
+        )
+
+        run_context = self._create_run_context()
+
+        if self._search_strategy == SearchStrategy.BEST_FIRST:
+            return self._finish_best_first_search(
+                await aprocess_best_first_search(
+                    self._tree,
+                    list(self._queue),
+                    self._number_of_steps,
+                    self._breadth,
+                    self._max_node_expansions,
+                    run_context,
+                    arequest_samples_from_ai_model_function,
+                ),
+                run_context,
+            )
+
+        while self._queue or self._state_layer_in_progress is not None:
+            try:
+                state_layer = self._start_state_layer(run_context)
+
+                layer_started_event = run_context.emit_event(
+                    RunEventType.LAYER_STARTED, state_type=state_layer["state_type"]
+                )
+
+                await self._aprocess_state_layer(
+                    state_layer, run_context, arequest_samples_from_ai_model_function
+                )
+            except BudgetExceededError as exception:
+                return self._stop_for_budget(exception, run_context)
+
+            self._finish_state_layer(state_layer, run_context)
 
-            self._create_files_for_winners(
-                self._tree.get_winners_of_type(state_layer["state_type"], self._breadth)
+            run_context.emit_finishing_event(
+                RunEventType.LAYER_FINISHED, layer_started_event
             )
 
-            # Set state type of these winners
-            state_type_of_last_winners = state_layer["state_type"]
+        return self._winners_of_last_layer
@@ -1,38 +1,84 @@
+import asyncio
+from colorama import Fore
 from defines import (
     DOUBLE_RETURNS,
     VOTING_STRING_FOR_AI_MODEL,
-    get_directory_path_for_tree_of_thoughts,
-)
-from errors import UnableToExtractVoteFromResponse
-from file_utils import (
-    create_directories,
-    create_file_path_for_vote,
-    read_contents_of_file_if_it_exists,
-    write_response_to_file,
 )
+from enums.run_event_type import RunEventType
+from errors import RequestToAiModelFailedError, UnableToExtractVoteFromResponse
+from file_utils import create_file_path_for_vote
+from output import output_message
 from regular_expressions import extract_vote
+from run_events import arequest_samples_with_events, get_node_id
+from speculation import aspeculate_on_likely_winners, await_speculations
+from token_counting import fit_prompt_with_texts
 
 
-def determine_vote_for_step(
-    prompt,
-    directory_path,
-    i,
-    unresolved_leaf_nodes,
-    should_create_files,
-    request_response_from_ai_model_function,
-):
-    file_path = create_file_path_for_vote(
-        directory_path, unresolved_leaf_nodes[i - 1], i
+def _create_prompt_for_vote_with_answers(context, state_type_related_text, answers):
+    prompt_parts = [context, f"{DOUBLE_RETURNS}{state_type_related_text}\n"]
+
+    for i, answer in enumerate(answers):
+        prompt_parts.append(f"\nAnswer {i + 1}: {answer}")
+
+    prompt_parts.append(
+        f"{DOUBLE_RETURNS}Choose the best answer. Use the format: '{VOTING_STRING_FOR_AI_MODEL}'."
+    )
+
+    return "".join(prompt_parts)
+
+
+def create_prompt_for_vote(unresolved_leaf_nodes_with_responses):
+    return _create_prompt_for_vote_with_answers(
+        unresolved_leaf_nodes_with_responses[0].name.get_context(),
+        unresolved_leaf_nodes_with_responses[0].name.get_state_type_related_text(),
+        [node.name.get_response() for node in unresolved_leaf_nodes_with_responses],
+    )
+
+
+def create_fitted_prompt_for_vote(unresolved_leaf_nodes_with_responses, run_context):
+    """Creates the prompt for the vote among the nodes, trimming the longest answers if needed
+    for the prompt to fit in the context window of the AI model, and registers its tokens.
+
+    Args:
+        unresolved_leaf_nodes_with_responses (list[Node]): the nodes that are voted on
+        run_context (RunContext): the settings of the current run
+
+    Returns:
+        str: the prompt
+
+    Raises:
+        PromptExceedsContextWindowError: if the prompt doesn't fit even with every answer trimmed
+    """
+    first_node = unresolved_leaf_nodes_with_responses[0]
+
+    prompt, prompt_tokens, number_of_trimmed_answers = fit_prompt_with_texts(
+        lambda answers: _create_prompt_for_vote_with_answers(
+            first_node.name.get_context(),
+            first_node.name.get_state_type_related_text(),
+            answers,
+        ),
+        [node.name.get_response() for node in unresolved_leaf_nodes_with_responses],
+        run_context.get_max_prompt_tokens(),
+    )
+
+    run_context.register_prompt_tokens(
+        first_node.name.get_state_type(),
+        "vote",
+        prompt_tokens,
+        number_of_trimmed_answers,
     )
 
-    response = None
+    message = f"The vote for state '{first_node.name.get_state_type().name.lower()}' takes about {prompt_tokens} prompt tokens"
 
-    if should_create_files:
-        response = read_contents_of_file_if_it_exists(file_path)
+    if number_of_trimmed_answers > 0:
+        message += f", after trimming {number_of_trimmed_answers} answer(s) to fit in the context window"
 
-    if response is None:
-        response = request_response_from_ai_model_function(prompt)
+    output_message(Fore.LIGHTBLUE_EX, message, run_context.is_visual_output_active())
 
+    return prompt
+
+
+def register_vote(response, file_path, unresolved_leaf_nodes, run_context):
     voted_answer = extract_vote(response.lower())
 
     if voted_answer is None:
@@ -42,61 +88,406 @@ def determine_vote_for_step(
         )
         raise UnableToExtractVoteFromResponse(error_message)
 
-    # Write the response to a file, now that we know that it contains a valid vote
-    if should_create_files:
-        write_response_to_file(file_path, response)
+    # Store the response, now that we know that it contains a valid vote
+    run_context.store_artifact(file_path, response)
 
-    unresolved_leaf_nodes[voted_answer - 1].name.add_vote()
+    voted_node = unresolved_leaf_nodes[voted_answer - 1]
 
+    voted_node.name.add_vote()
 
-def request_as_many_votes_as_steps(
-    tree_of_thoughts_name,
-    number_of_steps,
+    run_context.emit_event(
+        RunEventType.VOTE_PARSED,
+        state_type=voted_node.name.get_state_type(),
+        kind="vote",
+        node_ids=[get_node_id(voted_node)],
+        response_size=len(response),
+    )
+
+
+def determine_pending_votes(
     prompt,
+    number_of_steps,
     unresolved_leaf_nodes,
-    should_create_files,
-    request_response_from_ai_model_function,
+    run_context,
+    sibling_group_index=None,
+    round_index=None,
 ):
-    directory_path = get_directory_path_for_tree_of_thoughts(tree_of_thoughts_name)
+    # Votes already stored in the response cache are registered right away. The rest must be requested from the AI model.
+    response_cache = run_context.get_response_cache()
 
-    if should_create_files:
-        create_directories(directory_path)
+    pending_votes = []
 
     for i in range(number_of_steps):
-        determine_vote_for_step(
-            prompt,
-            directory_path,
+        file_path = create_file_path_for_vote(
+            run_context.get_directory_path(),
+            unresolved_leaf_nodes[0],
             i,
+            sibling_group_index,
+            round_index,
+        )
+
+        cache_key = None
+        response = None
+
+        if response_cache is not None:
+            cache_key = response_cache.create_key(prompt, i)
+            response = response_cache.get(cache_key)
+
+        if response is None:
+            pending_votes.append((file_path, cache_key))
+            continue
+
+        run_context.emit_event(
+            RunEventType.CACHE_HIT,
+            state_type=unresolved_leaf_nodes[0].name.get_state_type(),
+            kind="vote",
+            node_ids=[get_node_id(node) for node in unresolved_leaf_nodes],
+            prompt_size=len(prompt),
+            response_size=len(response),
+        )
+
+        register_vote(response, file_path, unresolved_leaf_nodes, run_context)
+
+    return pending_votes
+
+
+def register_sampled_votes(
+    responses, pending_votes, unresolved_leaf_nodes, run_context
+):
+    if len(responses) != len(pending_votes):
+        raise RequestToAiModelFailedError(
+            f"Requested {len(pending_votes)} votes from the AI model, but received {len(responses)}."
+        )
+
+    response_cache = run_context.get_response_cache()
+
+    for response, (file_path, cache_key) in zip(responses, pending_votes):
+        register_vote(response, file_path, unresolved_leaf_nodes, run_context)
+
+        # Only cached once we know that it contains a valid vote
+        if response_cache is not None:
+            response_cache.put(cache_key, response)
+
+
+def _determine_votes_of_this_vote(unresolved_leaf_nodes, votes_before):
+    return [
+        node.name.get_votes() - votes
+        for node, votes in zip(unresolved_leaf_nodes, votes_before)
+    ]
+
+
+def _should_request_votes_in_batches(run_context, number_of_winners, should_speculate):
+    # Only the votes whose number of winners is known can be decided, or speculated on, before they're over
+    if number_of_winners is None:
+        return False
+
+    return run_context.get_early_stopping() is not None or (
+        should_speculate and run_context.get_speculation() is not None
+    )
+
+
+def _is_decided_among_clusters(
+    early_stopping, votes, cluster_sizes, number_of_winners, remaining_votes
+):
+    # Every node of a cluster gets its votes, so the winners are decided once the clusters that hold the winning places
+    # can't change. A cluster that only holds some of them must also keep its place among the clusters above it,
+    # since which of its nodes win depends on the tiebreak rather than on the votes
+    number_of_whole_clusters = 0
+    number_of_places = 0
+
+    for i in sorted(range(len(votes)), key=lambda i: votes[i], reverse=True):
+        if number_of_places + cluster_sizes[i] > number_of_winners:
+            break
+
+        number_of_places += cluster_sizes[i]
+        number_of_whole_clusters += 1
+
+    if not early_stopping.is_decided(votes, number_of_whole_clusters, remaining_votes):
+        return False
+
+    return number_of_places == number_of_winners or early_stopping.is_decided(
+        votes, number_of_whole_clusters + 1, remaining_votes
+    )
+
+
+def _determine_batch_size(run_context, number_of_pending_votes):
+    early_stopping = run_context.get_early_stopping()
+
+    if early_stopping is not None:
+        return early_stopping.get_batch_size()
+
+    return run_context.get_speculation().determine_batch_size(number_of_pending_votes)
+
+
+def _determine_next_batch_of_votes(
+    pending_votes,
+    number_of_requested_votes,
+    clusters,
+    votes_before,
+    number_of_winners,
+    run_context,
+):
+    remaining_votes = len(pending_votes) - number_of_requested_votes
+
+    early_stopping = run_context.get_early_stopping()
+
+    if early_stopping is not None and _is_decided_among_clusters(
+        early_stopping,
+        _determine_votes_of_this_vote(
+            [cluster[0] for cluster in clusters], votes_before
+        ),
+        [len(cluster) for cluster in clusters],
+        number_of_winners,
+        remaining_votes,
+    ):
+        return []
+
+    return pending_votes[
+        number_of_requested_votes : number_of_requested_votes
+        + _determine_batch_size(run_context, len(pending_votes))
+    ]
+
+
+def _determine_speculation_arguments(
+    pending_votes,
+    number_of_requested_votes,
+    clusters,
+    votes_before,
+    number_of_winners,
+):
+    # Every node of a cluster is a candidate of its own, with the votes of the cluster, since each of them has
+    # different children. The nodes of a cluster tie with each other, so those of a cluster that only holds
+    # some of the winning places are never likely winners.
+    votes = _determine_votes_of_this_vote(
+        [cluster[0] for cluster in clusters], votes_before
+    )
+
+    return (
+        [node for cluster in clusters for node in cluster],
+        [
+            cluster_votes
+            for cluster, cluster_votes in zip(clusters, votes)
+            for _ in cluster
+        ],
+        number_of_winners,
+        len(pending_votes) - number_of_requested_votes,
+    )
+
+
+def _register_stopped_votes(
+    pending_votes, number_of_requested_votes, unresolved_leaf_nodes, run_context
+):
+    early_stopping = run_context.get_early_stopping()
+
+    if early_stopping is None:
+        return
+
+    number_of_saved_votes = len(pending_votes) - number_of_requested_votes
+
+    early_stopping.register_votes(number_of_requested_votes, number_of_saved_votes)
+
+    if number_of_saved_votes > 0:
+        output_message(
+            Fore.LIGHTBLUE_EX,
+            f"The vote for state '{unresolved_leaf_nodes[0].name.get_state_type().name.lower()}' was decided "
+            + f"{number_of_saved_votes} vote(s) early",
+            run_context.is_visual_output_active(),
+        )
+
+
+async def arequest_as_many_votes_as_steps(
+    number_of_steps,
+    prompt,
+    unresolved_leaf_nodes,
+    run_context,
+    arequest_samples_from_ai_model_function,
+    sibling_group_index=None,
+    round_index=None,
+    number_of_winners=None,
+    should_speculate=False,
+    clusters=None,
+):
+    """Requests 'number_of_steps' votes among the nodes, and registers them. If the run stops votes early,
+    and 'number_of_winners' is known, the votes are requested in batches until the winners are decided.
+    If the run speculates as well, between batches it starts generating the children of the likely winners,
+    and waits for them before returning.
+
+    Args:
+        number_of_steps (int): how many votes to request
+        prompt (str): the prompt of the vote
+        unresolved_leaf_nodes (list[Node]): the nodes that are voted on
+        run_context (RunContext): the settings of the current run
+        arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that will request samples from the AI model
+        sibling_group_index (int | None, optional): the group that the nodes belong to, which the file paths depend on
+        round_index (int | None, optional): the round of the tournament that the vote belongs to, which the file paths depend on
+        number_of_winners (int | None, optional): how many of the nodes will win, or None if it isn't known by this vote alone.
+            With clusters, how many of the nodes of all the clusters will win.
+        should_speculate (bool, optional): whether the winners of this vote are the winners of the layer,
+            so that their children can be speculated on
+        clusters (list[list[Node]] | None, optional): the near-duplicates that every node is voted on for, starting with
+            the node itself, which will get its votes. If None, every node is voted on for itself alone.
+    """
+    if clusters is None:
+        clusters = [[node] for node in unresolved_leaf_nodes]
+
+    votes_before = [node.name.get_votes() for node in unresolved_leaf_nodes]
+
+    pending_votes = determine_pending_votes(
+        prompt,
+        number_of_steps,
+        unresolved_leaf_nodes,
+        run_context,
+        sibling_group_index,
+        round_index,
+    )
+
+    if not _should_request_votes_in_batches(
+        run_context, number_of_winners, should_speculate
+    ):
+        # All the votes share the same prompt, so they can be sampled in a single request
+        if pending_votes:
+            register_sampled_votes(
+                await arequest_samples_with_events(
+                    run_context,
+                    "vote",
+                    unresolved_leaf_nodes,
+                    prompt,
+                    len(pending_votes),
+                    arequest_samples_from_ai_model_function,
+                ),
+                pending_votes,
+                unresolved_leaf_nodes,
+                run_context,
+            )
+
+        return
+
+    number_of_requested_votes = 0
+
+    speculations = []
+
+    while batch_of_votes := _determine_next_batch_of_votes(
+        pending_votes,
+        number_of_requested_votes,
+        clusters,
+        votes_before,
+        number_of_winners,
+        run_context,
+    ):
+        if should_speculate:
+            speculations += aspeculate_on_likely_winners(
+                *_determine_speculation_arguments(
+                    pending_votes,
+                    number_of_requested_votes,
+                    clusters,
+                    votes_before,
+                    number_of_winners,
+                ),
+                run_context,
+                arequest_samples_from_ai_model_function,
+            )
+
+        register_sampled_votes(
+            await arequest_samples_with_events(
+                run_context,
+                "vote",
+                unresolved_leaf_nodes,
+                prompt,
+                len(batch_of_votes),
+                arequest_samples_from_ai_model_function,
+            ),
+            batch_of_votes,
             unresolved_leaf_nodes,
-            should_create_files,
-            request_response_from_ai_model_function,
+            run_context,
         )
 
+        number_of_requested_votes += len(batch_of_votes)
 
-def determine_winners(
-    tree_of_thoughts_name,
+    # The next layer must find the speculated responses in the cache, rather than requesting them again
+    await await_speculations(speculations)
+
+    _register_stopped_votes(
+        pending_votes, number_of_requested_votes, unresolved_leaf_nodes, run_context
+    )
+
+
+def _determine_clusters(unresolved_leaf_nodes_with_responses, run_context):
+    duplicate_collapsing = run_context.get_duplicate_collapsing()
+
+    if duplicate_collapsing is None or len(unresolved_leaf_nodes_with_responses) < 2:
+        return [[node] for node in unresolved_leaf_nodes_with_responses]
+
+    clusters = [
+        [unresolved_leaf_nodes_with_responses[i] for i in cluster]
+        for cluster in duplicate_collapsing.find_clusters(
+            [node.name.get_response() for node in unresolved_leaf_nodes_with_responses]
+        )
+    ]
+
+    number_of_collapsed_candidates = len(unresolved_leaf_nodes_with_responses) - len(
+        clusters
+    )
+
+    if number_of_collapsed_candidates > 0:
+        output_message(
+            Fore.LIGHTBLUE_EX,
+            f"Collapsed {number_of_collapsed_candidates} near-duplicate answer(s) for state "
+            + f"'{unresolved_leaf_nodes_with_responses[0].name.get_state_type().name.lower()}' before voting",
+            run_context.is_visual_output_active(),
+        )
+
+    return clusters
+
+
+def _credit_votes_to_clusters(clusters, votes_before):
+    # The first node of every cluster was voted on for all of them
+    for cluster, votes in zip(clusters, votes_before):
+        votes_of_this_vote = cluster[0].name.get_votes() - votes
+
+        for node in cluster[1:]:
+            node.name.add_vote(votes_of_this_vote)
+
+
+async def adetermine_winners(
     unresolved_leaf_nodes_with_responses,
     number_of_steps,
-    should_create_files,
-    request_response_from_ai_model_function,
+    run_context,
+    arequest_samples_from_ai_model_function,
+    sibling_group_index=None,
+    number_of_winners=None,
 ):
-    prompt = unresolved_leaf_nodes_with_responses[0].name.get_context()
-
-    prompt += f"{DOUBLE_RETURNS}{unresolved_leaf_nodes_with_responses[0].name.get_state_type_related_text()}\n"
+    """Requests the votes among the nodes, and resolves them. If the run collapses near-duplicates, the nodes whose
+    responses are nearly identical are voted on as one, and all of them get its votes. The near-duplicates are
+    found in a worker thread.
 
-    for i, unresolved_leaf_node in enumerate(unresolved_leaf_nodes_with_responses):
-        prompt += f"\nAnswer {i + 1}: {unresolved_leaf_node.name.get_response()}"
+    Args:
+        unresolved_leaf_nodes_with_responses (list[Node]): the nodes that are voted on
+        number_of_steps (int): how many votes to request
+        run_context (RunContext): the settings of the current run
+        arequest_samples_from_ai_model_function (Callable[[str, int], Awaitable[list[str]]]): the coroutine function that will request samples from the AI model
+        sibling_group_index (int | None, optional): the group that the nodes belong to, which the file paths depend on
+        number_of_winners (int | None, optional): how many of the nodes will win, or None if it isn't known by this vote alone
+    """
+    clusters = await asyncio.to_thread(
+        _determine_clusters, unresolved_leaf_nodes_with_responses, run_context
+    )
+    candidates = [cluster[0] for cluster in clusters]
 
-    prompt += f"{DOUBLE_RETURNS}Choose the best answer. Use the format: '{VOTING_STRING_FOR_AI_MODEL}'."
+    votes_before = [node.name.get_votes() for node in candidates]
 
-    request_as_many_votes_as_steps(
-        tree_of_thoughts_name,
+    await arequest_as_many_votes_as_steps(
         number_of_steps,
-        prompt,
-        unresolved_leaf_nodes_with_responses,
-        should_create_files,
-        request_response_from_ai_model_function,
+        create_fitted_prompt_for_vote(candidates, run_context),
+        candidates,
+        run_context,
+        arequest_samples_from_ai_model_function,
+        sibling_group_index,
+        number_of_winners=number_of_winners,
+        should_speculate=number_of_winners is not None,
+        clusters=clusters,
     )
 
+    _credit_votes_to_clusters(clusters, votes_before)
+
     for unresolved_leaf_node in unresolved_leaf_nodes_with_responses:
         unresolved_leaf_node.name.consider_resolved()
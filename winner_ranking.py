@@ -0,0 +1,58 @@
+"""This module contains the functions that rank the resolved leaf nodes of a layer by their votes,
+to pick the winners among them.
+"""
+import heapq
+from enums.tiebreak import Tiebreak
+from errors import InvalidParameterError
+
+
+def create_ranking_key(votes, tiebreak, order_key, creation_index, response):
+    """Creates the key that ranks a node, in ascending order: the most voted nodes first, then
+    the ones that win the tiebreak, then the ones that come first in the tree.
+
+    Args:
+        votes (int): the votes of the node
+        tiebreak (Tiebreak): how the nodes with the same votes are ordered
+        order_key (Sequence[int]): the position of the node in a pre-order walk of the tree
+        creation_index (int): the order in which the node was created
+        response (str | None): the response of the node
+
+    Returns:
+        tuple: the key
+
+    Raises:
+        InvalidParameterError: if 'tiebreak' isn't a Tiebreak
+    """
+    if tiebreak is Tiebreak.TREE_ORDER:
+        return (-votes, order_key)
+
+    if tiebreak is Tiebreak.CREATION_ORDER:
+        return (-votes, creation_index, order_key)
+
+    if tiebreak is Tiebreak.SHORTEST_RESPONSE:
+        return (-votes, len(response or ""), order_key)
+
+    if tiebreak is Tiebreak.LONGEST_RESPONSE:
+        return (-votes, -len(response or ""), order_key)
+
+    raise InvalidParameterError(
+        f"The function {create_ranking_key.__name__} received a 'tiebreak' that wasn't a Tiebreak: {tiebreak}"
+    )
+
+
+def rank(items, create_ranking_key_of_item, number_of_winners=None):
+    """Ranks the items by their ranking keys. Only the first 'number_of_winners' are selected,
+    which takes O(n log k) rather than sorting all of them.
+
+    Args:
+        items (Iterable): the items to rank
+        create_ranking_key_of_item (Callable[[Any], tuple]): creates the ranking key of an item
+        number_of_winners (int | None, optional): how many of the best ranked items are returned. If None, the full ranking is returned.
+
+    Returns:
+        list: the best ranked items, in order
+    """
+    if number_of_winners is None:
+        return sorted(items, key=create_ranking_key_of_item)
+
+    return heapq.nsmallest(number_of_winners, items, key=create_ranking_key_of_item)